@@ -0,0 +1,303 @@
+"""
+ALMACÉN DE DESCARGAS POR CONTENIDO - HERMACO ERP
+================================================
+Un mismo DTE se descarga varias veces: el diario, el corrector, el de
+anuladas, el historial y el semanal. El almacén guarda cada archivo una sola
+vez, con su SHA-256 como nombre, y un índice SQLite que relaciona:
+
+- DTE / codigoGeneracion + extensión -> hash, tamaño y ruta
+- hash -> todas las rutas donde se publicó ese contenido
+
+Antes de abrir la ventana de impresión de un registro, los descargadores
+preguntan al almacén. Si el PDF y el JSON ya están, se publican en la carpeta
+de destino (enlace duro al archivo del almacén, o copia si no se puede) y se
+omite la descarga.
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+from manifiesto_descargas import anotar_archivo
+
+CARPETA_ALMACEN = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "almacen_descargas"
+)
+ARCHIVO_INDICE = os.path.join(CARPETA_ALMACEN, "indice.db")
+
+TAMANO_BLOQUE = 64 * 1024
+
+_conexiones = threading.local()
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS objetos (
+    sha256 TEXT PRIMARY KEY,
+    tamano INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documentos (
+    identificador TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    ruta TEXT NOT NULL,
+    actualizado TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (identificador, extension)
+);
+CREATE TABLE IF NOT EXISTS alias (
+    alias TEXT PRIMARY KEY,
+    identificador TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ubicaciones (
+    ruta TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    identificador TEXT NOT NULL,
+    extension TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ubicaciones_sha256 ON ubicaciones (sha256);
+"""
+
+
+def conectar():
+    """Conexión al índice (una por hilo; el índice se crea la primera vez)."""
+    conexion = getattr(_conexiones, "conexion", None)
+    if conexion is None:
+        os.makedirs(CARPETA_ALMACEN, exist_ok=True)
+        conexion = sqlite3.connect(ARCHIVO_INDICE, timeout=30)
+        conexion.row_factory = sqlite3.Row
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.executescript(ESQUEMA)
+        _conexiones.conexion = conexion
+    return conexion
+
+
+def calcular_sha256(ruta):
+    """SHA-256 del archivo, leído por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def ruta_objeto(sha256):
+    """Ruta del archivo del almacén para un hash ('ab/abcdef...')."""
+    return os.path.join(CARPETA_ALMACEN, sha256[:2], sha256)
+
+
+def enlazar_o_copiar(origen, destino):
+    """
+    Deja en 'destino' el contenido de 'origen' con un enlace duro (el cuerpo
+    queda una sola vez en disco) o con una copia si el disco no lo permite.
+    """
+    temporal = f"{destino}.enlace.part"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    try:
+        os.link(origen, temporal)
+    except OSError:
+        shutil.copy2(origen, temporal)
+    os.replace(temporal, destino)
+
+
+def resolver_identificador(clave):
+    """Convierte un codigoGeneracion en su DTE; cualquier otra clave queda igual."""
+    fila = (
+        conectar()
+        .execute("SELECT identificador FROM alias WHERE alias = ?", (clave,))
+        .fetchone()
+    )
+    return fila["identificador"] if fila else clave
+
+
+def alias_de_json(ruta):
+    """numeroControl y codigoGeneracion de un JSON de DTE (vacío si no se puede leer)."""
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            identificacion = json.load(f).get("identificacion", {})
+    except (OSError, ValueError, AttributeError):
+        return []
+    return [
+        valor
+        for valor in (
+            identificacion.get("numeroControl"),
+            identificacion.get("codigoGeneracion"),
+        )
+        if valor
+    ]
+
+
+def guardar_en_almacen(ruta, identificador, extension):
+    """
+    Registra un archivo recién descargado en el almacén.
+
+    Si el contenido ya estaba guardado, el archivo descargado se reemplaza
+    por un enlace al del almacén (mismo contenido, una sola copia en disco).
+
+    Args:
+        ruta: Archivo ya descargado (con su nombre final)
+        identificador: DTE o código del documento
+        extension: 'pdf' o 'json'
+
+    Returns:
+        str: SHA-256 del archivo, o None si no se pudo registrar
+    """
+    if not identificador or not ruta or not os.path.exists(ruta):
+        return None
+
+    try:
+        sha256 = calcular_sha256(ruta)
+        tamano = os.path.getsize(ruta)
+        objeto = ruta_objeto(sha256)
+        ruta = os.path.abspath(ruta)
+
+        if os.path.exists(objeto):
+            if not os.path.samefile(objeto, ruta):
+                enlazar_o_copiar(objeto, ruta)
+        else:
+            os.makedirs(os.path.dirname(objeto), exist_ok=True)
+            enlazar_o_copiar(ruta, objeto)
+
+        conexion = conectar()
+        with conexion:
+            conexion.execute(
+                "INSERT OR IGNORE INTO objetos (sha256, tamano) VALUES (?, ?)",
+                (sha256, tamano),
+            )
+            conexion.execute(
+                "INSERT OR REPLACE INTO documentos "
+                "(identificador, extension, sha256, ruta) VALUES (?, ?, ?, ?)",
+                (identificador, extension, sha256, ruta),
+            )
+            conexion.execute(
+                "INSERT OR REPLACE INTO ubicaciones "
+                "(ruta, sha256, identificador, extension) VALUES (?, ?, ?, ?)",
+                (ruta, sha256, identificador, extension),
+            )
+            if extension == "json":
+                for alias in alias_de_json(ruta):
+                    if alias != identificador:
+                        conexion.execute(
+                            "INSERT OR REPLACE INTO alias (alias, identificador) "
+                            "VALUES (?, ?)",
+                            (alias, identificador),
+                        )
+        return sha256
+    except (OSError, sqlite3.Error) as e:
+        print(f"  ⚠️ No se pudo registrar {os.path.basename(ruta)} en el almacén: {e}")
+        return None
+
+
+def buscar_en_almacen(clave, extension):
+    """
+    Busca un documento por DTE o codigoGeneracion.
+
+    Returns:
+        dict: {'sha256', 'tamano', 'ruta', 'objeto'} o None si no está
+              (o si su archivo ya no existe en el almacén)
+    """
+    try:
+        fila = (
+            conectar()
+            .execute(
+                "SELECT d.sha256, o.tamano, d.ruta FROM documentos d "
+                "JOIN objetos o ON o.sha256 = d.sha256 "
+                "WHERE d.identificador = ? AND d.extension = ?",
+                (resolver_identificador(clave), extension),
+            )
+            .fetchone()
+        )
+    except sqlite3.Error as e:
+        print(f"  ⚠️ No se pudo consultar el almacén: {e}")
+        return None
+
+    if fila is None:
+        return None
+
+    objeto = ruta_objeto(fila["sha256"])
+    if not os.path.exists(objeto) or os.path.getsize(objeto) != fila["tamano"]:
+        return None
+    return {
+        "sha256": fila["sha256"],
+        "tamano": fila["tamano"],
+        "ruta": fila["ruta"],
+        "objeto": objeto,
+    }
+
+
+def publicar_desde_almacen(clave, carpeta, extensiones=("pdf", "json")):
+    """
+    Si todos los archivos del documento están en el almacén, los deja en
+    'carpeta' con el nombre con que se descargaron y retorna True (la
+    descarga se omite).
+    """
+    if not clave:
+        return False
+
+    encontrados = [(ext, buscar_en_almacen(clave, ext)) for ext in extensiones]
+    if not all(documento for _, documento in encontrados):
+        return False
+
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        for extension, documento in encontrados:
+            destino = os.path.join(carpeta, os.path.basename(documento["ruta"]))
+            if os.path.exists(destino) and os.path.samefile(
+                destino, documento["objeto"]
+            ):
+                estado = "identico"
+            else:
+                enlazar_o_copiar(documento["objeto"], destino)
+                estado = "almacen"
+            anotar_archivo(
+                destino,
+                resolver_identificador(clave),
+                extension,
+                documento["sha256"],
+                estado,
+            )
+            conexion = conectar()
+            with conexion:
+                conexion.execute(
+                    "INSERT OR REPLACE INTO ubicaciones "
+                    "(ruta, sha256, identificador, extension) VALUES (?, ?, ?, ?)",
+                    (
+                        os.path.abspath(destino),
+                        documento["sha256"],
+                        resolver_identificador(clave),
+                        extension,
+                    ),
+                )
+    except (OSError, sqlite3.Error) as e:
+        print(f"  ⚠️ No se pudo publicar {clave} desde el almacén: {e}")
+        return False
+
+    print(f"  📦 {clave} ya estaba en el almacén, se omite la descarga")
+    return True
+
+
+def contenidos_repetidos():
+    """
+    Rutas que comparten el mismo contenido según el índice (sin leer archivos).
+
+    Returns:
+        dict: sha256 -> lista de {'ruta', 'identificador', 'extension'} con
+              más de una ruta que todavía existe
+    """
+    grupos = {}
+    filas = conectar().execute(
+        "SELECT sha256, ruta, identificador, extension FROM ubicaciones "
+        "WHERE sha256 IN (SELECT sha256 FROM ubicaciones "
+        "GROUP BY sha256 HAVING COUNT(*) > 1) ORDER BY sha256, ruta"
+    )
+    for fila in filas:
+        if os.path.exists(fila["ruta"]):
+            grupos.setdefault(fila["sha256"], []).append(
+                {
+                    "ruta": fila["ruta"],
+                    "identificador": fila["identificador"],
+                    "extension": fila["extension"],
+                }
+            )
+    return {sha256: rutas for sha256, rutas in grupos.items() if len(rutas) > 1}
@@ -0,0 +1,186 @@
+"""
+BITÁCORA DE PROGRESO - HERMACO ERP
+==================================
+Cada resultado de un registro (procesado, fallido, ignorado, anulado, último
+DTE / correlativo) se agrega como una línea JSON compacta a
+'bitacora_descargas.jsonl' en la carpeta de descargas, en lugar de escribir
+en el estado de descargas (SQLite) uno por uno.
+
+- Cada línea se escribe y se vacía al sistema operativo al momento; la
+  sincronización a disco (fsync) se hace por lotes: cada LOTE_SINCRONIZACION
+  líneas o cada INTERVALO_SINCRONIZACION segundos.
+- Cada COMPACTAR_CADA líneas, y al cerrar, la bitácora se compacta: sus
+  eventos se aplican al estado en una sola transacción (solo el último punto
+  de control del lote) y el archivo se vacía.
+- Al abrir, si quedó una bitácora sin compactar (ejecución interrumpida),
+  se vuelve a aplicar antes de leer el último exitoso. Aplicarla dos veces
+  no cambia el resultado.
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from estado_descargas import aplicar_eventos
+
+NOMBRE_BITACORA = "bitacora_descargas.jsonl"
+
+LOTE_SINCRONIZACION = 20
+INTERVALO_SINCRONIZACION = 2.0
+COMPACTAR_CADA = 500
+
+
+def abrir_bitacora(estado):
+    """
+    Abre la bitácora del estado, aplicando antes lo que haya quedado de una
+    ejecución anterior.
+
+    Args:
+        estado: dict de estado_descargas.abrir_estado
+
+    Returns:
+        dict: Bitácora para las funciones anotar_* y compactar_bitacora
+    """
+    bitacora = {
+        "estado": estado,
+        "ruta": os.path.join(estado["carpeta"], NOMBRE_BITACORA),
+        "archivo": None,
+        "candado": threading.Lock(),
+        "sin_sincronizar": 0,
+        "ultima_sincronizacion": time.monotonic(),
+        "lineas": 0,
+    }
+
+    try:
+        with bitacora["candado"]:
+            recuperados = compactar(bitacora)
+        if recuperados:
+            print(
+                f"♻️ Bitácora recuperada: {recuperados} eventos de la ejecución anterior"
+            )
+    except Exception as e:
+        print(f"⚠️ No se pudo aplicar la bitácora anterior: {e}")
+    return bitacora
+
+
+def leer_eventos(ruta):
+    """Eventos de la bitácora (omite una última línea cortada por un corte)."""
+    eventos = []
+    if not os.path.exists(ruta):
+        return eventos
+
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                eventos.append(json.loads(linea))
+            except ValueError:
+                print(f"⚠️ Línea incompleta en la bitácora, se omite: {linea[:60]}")
+    return eventos
+
+
+def sincronizar(bitacora):
+    """Pasa a disco lo escrito en la bitácora."""
+    if bitacora["archivo"] and bitacora["sin_sincronizar"]:
+        bitacora["archivo"].flush()
+        os.fsync(bitacora["archivo"].fileno())
+    bitacora["sin_sincronizar"] = 0
+    bitacora["ultima_sincronizacion"] = time.monotonic()
+
+
+def compactar(bitacora):
+    """
+    Aplica la bitácora al estado de descargas y la vacía.
+    Debe llamarse con el candado de la bitácora tomado.
+
+    Returns:
+        int: Eventos aplicados
+    """
+    if bitacora["archivo"]:
+        sincronizar(bitacora)
+        bitacora["archivo"].close()
+        bitacora["archivo"] = None
+
+    eventos = leer_eventos(bitacora["ruta"])
+    if eventos:
+        aplicar_eventos(bitacora["estado"], eventos)
+
+    # El estado ya tiene los eventos: la bitácora empieza de nuevo
+    if os.path.exists(bitacora["ruta"]):
+        os.remove(bitacora["ruta"])
+    bitacora["lineas"] = 0
+    return len(eventos)
+
+
+def anotar(bitacora, evento):
+    """Agrega un evento a la bitácora (una línea)."""
+    evento["fecha"] = datetime.now().isoformat()
+    linea = json.dumps(evento, ensure_ascii=False, separators=(",", ":"))
+
+    with bitacora["candado"]:
+        if bitacora["archivo"] is None:
+            bitacora["archivo"] = open(bitacora["ruta"], "a", encoding="utf-8")
+        # flush por línea (sobrevive a que se cierre el proceso);
+        # fsync por lotes (sobrevive a que se apague el equipo)
+        bitacora["archivo"].write(linea + "\n")
+        bitacora["archivo"].flush()
+        bitacora["sin_sincronizar"] += 1
+        bitacora["lineas"] += 1
+
+        if bitacora["lineas"] >= COMPACTAR_CADA:
+            try:
+                compactar(bitacora)
+            except Exception as e:
+                print(f"⚠️ No se pudo compactar la bitácora: {e}")
+        elif (
+            bitacora["sin_sincronizar"] >= LOTE_SINCRONIZACION
+            or time.monotonic() - bitacora["ultima_sincronizacion"]
+            >= INTERVALO_SINCRONIZACION
+        ):
+            sincronizar(bitacora)
+
+
+def anotar_documento(bitacora, categoria, identificador, datos=None):
+    """Anota el resultado de un documento ('procesado', 'fallido', 'ignorado', 'anulado')."""
+    anotar(
+        bitacora,
+        {
+            "evento": "documento",
+            "categoria": categoria,
+            "id": identificador,
+            "datos": datos,
+        },
+    )
+
+
+def anotar_quitar(bitacora, categoria, identificador):
+    """Anota que un documento sale de una categoría (por ejemplo, de ignorados)."""
+    anotar(bitacora, {"evento": "quitar", "categoria": categoria, "id": identificador})
+
+
+def anotar_punto_control(bitacora, valor, descripcion=None, datos=None):
+    """Anota el último DTE / correlativo / código procesado."""
+    anotar(
+        bitacora,
+        {"evento": "punto", "valor": valor, "descripcion": descripcion, "datos": datos},
+    )
+
+
+def compactar_bitacora(bitacora):
+    """
+    Compacta lo pendiente en el estado de descargas (al terminar, o antes de
+    leer el estado a mitad de la ejecución).
+    """
+    try:
+        with bitacora["candado"]:
+            aplicados = compactar(bitacora)
+        if aplicados:
+            print(
+                f"💾 Bitácora compactada en el estado de descargas ({aplicados} eventos)"
+            )
+    except Exception as e:
+        print(f"⚠️ No se pudo compactar la bitácora (se aplicará al reiniciar): {e}")
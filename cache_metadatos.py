@@ -0,0 +1,358 @@
+"""
+CACHÉ DE METADATOS DE JSON DE DTE - HERMACO ERP
+===============================================
+Un DTE descargado no cambia, pero el detector de duplicados, el renombrador
+y el generador de clientes abrían y parseaban todos los JSON en cada
+ejecución. Esta caché guarda, por archivo, lo que esas herramientas usan:
+
+- identificacion: numeroControl, codigoGeneracion, fecEmi, horEmi
+- emisor: nombre
+- receptor: nombre, nit / numDocumento
+- resumen: totalPagar, montoTotalOperacion
+- cantidad de items de cuerpoDocumento
+- huella SHA-256 del contenido (JSON con claves ordenadas)
+
+Cada entrada se guarda con la ruta, el tamaño y la fecha de modificación
+del archivo en 'cache_metadatos.db' (SQLite, junto a este script). Solo se
+vuelven a parsear los archivos nuevos o que cambiaron.
+
+La huella y la cantidad de items necesitan el documento completo; cuando no
+se piden (renombrador, generador) los campos se leen con el extractor
+rápido de extractor_campos_dte, y la huella se completa la primera vez que
+la pide el detector de duplicados.
+
+La tabla 'procesados' guarda, con la misma firma (ruta, tamaño, fecha de
+modificación), qué archivos ya se sumaron a una lista generada (por ejemplo
+lista_clientes.json), para que la lista se actualice solo con los nuevos.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+from extractor_campos_dte import campos_de_documento, extraer_campos
+
+ARCHIVO_CACHE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache_metadatos.db"
+)
+
+# Cambiar al agregar campos: las entradas de otra versión se vuelven a leer
+VERSION_CACHE = 1
+
+# Campos (sección, campo) que se guardan de cada JSON
+CAMPOS_CACHE = [
+    ("identificacion", "numeroControl"),
+    ("identificacion", "codigoGeneracion"),
+    ("identificacion", "fecEmi"),
+    ("identificacion", "horEmi"),
+    ("emisor", "nombre"),
+    ("receptor", "nombre"),
+    ("receptor", "nit"),
+    ("receptor", "numDocumento"),
+    ("resumen", "totalPagar"),
+    ("resumen", "montoTotalOperacion"),
+]
+
+# Archivos que cada proceso parsea por lote, y rutas por consulta a la caché
+LOTE_ANALISIS = 64
+LOTE_CONSULTA = 500
+
+_conexiones = threading.local()
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS metadatos (
+    ruta TEXT PRIMARY KEY,
+    tamano INTEGER NOT NULL,
+    modificado INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    datos TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS procesados (
+    lista TEXT NOT NULL,
+    ruta TEXT NOT NULL,
+    tamano INTEGER NOT NULL,
+    modificado INTEGER NOT NULL,
+    PRIMARY KEY (lista, ruta)
+);
+CREATE TABLE IF NOT EXISTS listas (
+    lista TEXT PRIMARY KEY,
+    version TEXT NOT NULL
+);
+"""
+
+
+def conectar():
+    """Conexión a la caché (una por hilo; la caché se crea la primera vez)."""
+    conexion = getattr(_conexiones, "conexion", None)
+    if conexion is None:
+        conexion = sqlite3.connect(ARCHIVO_CACHE, timeout=30)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.executescript(ESQUEMA)
+        _conexiones.conexion = conexion
+    return conexion
+
+
+def huella_json(datos):
+    """SHA-256 del JSON serializado con claves ordenadas."""
+    contenido = json.dumps(
+        datos, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def extraer_metadatos(datos):
+    """
+    Metadatos de un DTE ya parseado.
+
+    Returns:
+        dict: 'seccion.campo' de CAMPOS_CACHE, 'cuerpoDocumento.cantidad'
+              y 'huella'
+    """
+    metadatos = campos_de_documento(datos, CAMPOS_CACHE)
+    cuerpo = datos.get("cuerpoDocumento") or []
+    metadatos["cuerpoDocumento.cantidad"] = (
+        len(cuerpo) if isinstance(cuerpo, list) else 0
+    )
+    metadatos["huella"] = huella_json(datos)
+    return metadatos
+
+
+def leer_metadatos(ruta, con_huella=True):
+    """
+    Lee un JSON y devuelve sus metadatos (se ejecuta en los procesos del
+    pool, así que solo devuelve datos pequeños y no el documento completo).
+    Sin 'con_huella' solo se decodifican las secciones de CAMPOS_CACHE.
+
+    Returns:
+        dict: Metadatos, o {'error': ...} si no se pudo leer
+    """
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            texto = f.read()
+        if not con_huella:
+            campos = extraer_campos(texto, CAMPOS_CACHE)
+            if campos is not None:
+                return campos
+        datos = json.loads(texto)
+    except json.JSONDecodeError as e:
+        return {"error": f"Error al leer JSON - {e}"}
+    except Exception as e:
+        return {"error": f"Error inesperado - {e}"}
+
+    if not isinstance(datos, dict):
+        return {"error": "El JSON no es un documento"}
+    return extraer_metadatos(datos)
+
+
+def leer_pendientes(rutas, procesos, con_huella):
+    """Lee las rutas, en un pool de procesos si 'procesos' y son muchas."""
+    leer = functools.partial(leer_metadatos, con_huella=con_huella)
+    if not procesos or len(rutas) < LOTE_ANALISIS:
+        return [leer(ruta) for ruta in rutas]
+
+    try:
+        executor = ProcessPoolExecutor()
+    except (OSError, NotImplementedError) as e:
+        print(f"⚠️  No se pudo crear el pool de procesos ({e}), se analiza en serie")
+        return [leer(ruta) for ruta in rutas]
+
+    with executor:
+        return list(executor.map(leer, rutas, chunksize=LOTE_ANALISIS))
+
+
+def buscar_en_cache(firmas, con_huella):
+    """
+    Metadatos guardados de las rutas cuyo tamaño y fecha de modificación
+    coinciden con 'firmas' ({ruta: (tamaño, modificado)}). Con 'con_huella'
+    se omiten las entradas que se leyeron con el extractor rápido.
+    """
+    encontrados = {}
+    rutas = list(firmas)
+    conexion = conectar()
+    for inicio in range(0, len(rutas), LOTE_CONSULTA):
+        lote = rutas[inicio : inicio + LOTE_CONSULTA]
+        filas = conexion.execute(
+            "SELECT ruta, tamano, modificado, version, datos FROM metadatos "
+            f"WHERE ruta IN ({','.join('?' * len(lote))})",
+            lote,
+        )
+        for ruta, tamano, modificado, version, datos in filas:
+            if version != VERSION_CACHE or (tamano, modificado) != firmas[ruta]:
+                continue
+            datos = json.loads(datos)
+            if con_huella and "huella" not in datos and "error" not in datos:
+                continue
+            encontrados[ruta] = datos
+    return encontrados
+
+
+def guardar_en_cache(firmas, metadatos_por_ruta):
+    """Guarda los metadatos recién leídos en una sola transacción."""
+    conexion = conectar()
+    with conexion:
+        conexion.executemany(
+            "INSERT OR REPLACE INTO metadatos "
+            "(ruta, tamano, modificado, version, datos) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    ruta,
+                    firmas[ruta][0],
+                    firmas[ruta][1],
+                    VERSION_CACHE,
+                    json.dumps(metadatos, ensure_ascii=False),
+                )
+                for ruta, metadatos in metadatos_por_ruta.items()
+            ],
+        )
+
+
+def metadatos_de_archivos(rutas, procesos=False, con_huella=False):
+    """
+    Metadatos de cada JSON, leídos de la caché si el archivo no cambió.
+
+    Args:
+        rutas: Rutas de los JSON (str o Path)
+        procesos: Parsear los archivos nuevos en un pool de procesos
+                  (el script que llama debe tener 'if __name__ == "__main__"')
+        con_huella: Incluir 'huella' y 'cuerpoDocumento.cantidad' (parsea
+                    el documento completo)
+
+    Returns:
+        list: Un dict por ruta, en el mismo orden, con 'ruta', 'archivo' y
+              los metadatos (o 'error' si no se pudo leer)
+    """
+    rutas = [os.path.abspath(str(ruta)) for ruta in rutas]
+    resultados = {}
+    firmas = {}
+    for ruta in rutas:
+        try:
+            estado = os.stat(ruta)
+            firmas[ruta] = (estado.st_size, estado.st_mtime_ns)
+        except OSError as e:
+            resultados[ruta] = {"error": f"No se pudo leer - {e}"}
+
+    try:
+        resultados.update(buscar_en_cache(firmas, con_huella))
+    except sqlite3.Error as e:
+        print(f"⚠️  No se pudo consultar la caché de metadatos: {e}")
+
+    pendientes = [ruta for ruta in firmas if ruta not in resultados]
+    leidos = dict(zip(pendientes, leer_pendientes(pendientes, procesos, con_huella)))
+    resultados.update(leidos)
+
+    if leidos:
+        try:
+            guardar_en_cache(firmas, leidos)
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudo actualizar la caché de metadatos: {e}")
+
+    print(
+        f"🗂️  Caché de metadatos: {len(firmas) - len(leidos)} sin cambios, "
+        f"{len(leidos)} leídos"
+    )
+    return [
+        {"ruta": ruta, "archivo": os.path.basename(ruta), **resultados[ruta]}
+        for ruta in rutas
+    ]
+
+
+def mover_en_cache(ruta_anterior, ruta_nueva):
+    """
+    Actualiza la ruta de una entrada (y de los registros de procesados)
+    después de renombrar el archivo.
+    """
+    try:
+        conexion = conectar()
+        with conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO metadatos "
+                "SELECT ?, tamano, modificado, version, datos FROM metadatos "
+                "WHERE ruta = ?",
+                (os.path.abspath(str(ruta_nueva)), os.path.abspath(str(ruta_anterior))),
+            )
+            conexion.execute(
+                "DELETE FROM metadatos WHERE ruta = ?",
+                (os.path.abspath(str(ruta_anterior)),),
+            )
+            conexion.execute(
+                "UPDATE OR REPLACE procesados SET ruta = ? WHERE ruta = ?",
+                (os.path.abspath(str(ruta_nueva)), os.path.abspath(str(ruta_anterior))),
+            )
+    except sqlite3.Error as e:
+        print(f"⚠️  No se pudo actualizar la caché de metadatos: {e}")
+
+
+def leer_procesados(lista):
+    """
+    Archivos ya sumados a una lista generada.
+
+    Args:
+        lista: Ruta del archivo de la lista (identifica sus registros)
+
+    Returns:
+        tuple: (versión guardada o None, {ruta: (tamaño, modificado)})
+    """
+    lista = os.path.abspath(str(lista))
+    try:
+        conexion = conectar()
+        fila = conexion.execute(
+            "SELECT version FROM listas WHERE lista = ?", (lista,)
+        ).fetchone()
+        firmas = {
+            ruta: (tamano, modificado)
+            for ruta, tamano, modificado in conexion.execute(
+                "SELECT ruta, tamano, modificado FROM procesados WHERE lista = ?",
+                (lista,),
+            )
+        }
+    except sqlite3.Error as e:
+        print(f"⚠️  No se pudo leer el registro de procesados: {e}")
+        return None, {}
+    return (fila[0] if fila else None), firmas
+
+
+def guardar_procesados(lista, version, firmas, quitar=(), reemplazar=False):
+    """
+    Anota en una sola transacción los archivos sumados a la lista y la
+    versión de la lista que los incluye (la lista debe guardar la misma).
+
+    Args:
+        lista: Ruta del archivo de la lista
+        version: Marca de la lista generada (p. ej. su fecha de generación)
+        firmas: {ruta: (tamaño, modificado)} de los archivos nuevos o cambiados
+        quitar: Rutas que ya no existen
+        reemplazar: Borrar antes todo lo anotado (lista generada desde cero)
+
+    Returns:
+        bool: True si se guardó
+    """
+    lista = os.path.abspath(str(lista))
+    try:
+        conexion = conectar()
+        with conexion:
+            if reemplazar:
+                conexion.execute("DELETE FROM procesados WHERE lista = ?", (lista,))
+            conexion.executemany(
+                "DELETE FROM procesados WHERE lista = ? AND ruta = ?",
+                [(lista, ruta) for ruta in quitar],
+            )
+            conexion.executemany(
+                "INSERT OR REPLACE INTO procesados (lista, ruta, tamano, modificado) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (lista, ruta, tamano, modificado)
+                    for ruta, (tamano, modificado) in firmas.items()
+                ],
+            )
+            conexion.execute(
+                "INSERT OR REPLACE INTO listas (lista, version) VALUES (?, ?)",
+                (lista, version),
+            )
+        return True
+    except sqlite3.Error as e:
+        print(f"⚠️  No se pudo guardar el registro de procesados: {e}")
+        return False
@@ -4,7 +4,27 @@ from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
-import time
+from descarga_http import descargar_pdf_y_json_http
+from almacen_descargas import publicar_desde_almacen
+from estado_descargas import abrir_estado, listar_documentos, marcar_corregido
+from sesion_erp import abrir_pagina_autenticada
+from extraccion_tabla import extraer_registros_tabla, indexar_registros, obtener_fila
+from listado_datatables import listar_registros_datatable, abrir_modal_desde_href
+from seguimiento_descargas import (
+    configurar_registro_descargas,
+    descargar_pdf_y_json_chrome,
+)
+from manifiesto_descargas import abrir_manifiesto, cerrar_manifiesto
+from metricas_pasos import paso, guardar_reporte_pasos
+from esperas import (
+    esperar_dropdown_visible,
+    esperar_modal_visible,
+    esperar_modal_cerrado,
+    esperar_nueva_ventana,
+    preparar_espera_draw,
+    esperar_draw_tabla,
+    imprimir_resumen_esperas,
+)
 import os
 import json
 import glob
@@ -15,6 +35,14 @@ from datetime import datetime
 DOWNLOAD_FOLDER = r"C:\Dashboard\extractor de facturas\extractor-facturas-selenium-hermaco\decargas_diarias"
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
+# Modo de descarga: True = PDF/JSON por HTTP directo con las cookies de Selenium,
+# False = clicks en los enlaces de la ventana de impresión (gestor de Chrome)
+DESCARGA_DIRECTA_HTTP = True
+
+# Listado: True = filas pedidas al endpoint JSON de la tabla (con los filtros
+# de la página), False = mostrar "Todos" y leer la grilla dibujada
+LISTADO_POR_ENDPOINT = True
+
 # Configuración de Chrome para descargas automáticas
 chrome_options = webdriver.ChromeOptions()
 prefs = {
@@ -30,39 +58,33 @@ chrome_options.add_argument("--no-sandbox")
 chrome_options.add_argument("--disable-dev-shm-usage")
 chrome_options.add_argument("--disable-gpu")
 chrome_options.add_argument("--window-size=1920,1080")
+configurar_registro_descargas(chrome_options)
 
 # Variables globales
 registros_corregidos = []
 registros_aun_fallidos = []
-ARCHIVO_FALLIDOS = os.path.join(DOWNLOAD_FOLDER, "reporte_fallidos.json")
+# Fallidos del descargador diario (misma carpeta de descargas)
+ESTADO = abrir_estado(DOWNLOAD_FOLDER, "facturas")
 
 
 def cargar_reporte_fallidos():
     """
-    Carga el reporte de fallidos único
+    Carga los fallidos sin corregir del estado de descargas
     """
     try:
-        if not os.path.exists(ARCHIVO_FALLIDOS):
-            print("⚠️ No se encontró el archivo reporte_fallidos.json")
-            return None
-
-        print(f"📂 Cargando reporte: {os.path.basename(ARCHIVO_FALLIDOS)}")
+        print(f"📂 Cargando reporte: {os.path.basename(ESTADO['ruta'])}")
 
-        with open(ARCHIVO_FALLIDOS, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            # Filtrar solo los no corregidos
-            registros_sin_corregir = [
-                r for r in data.get("registros", []) if not r.get("corregido", False)
-            ]
-            total_sin_corregir = len(registros_sin_corregir)
-            print(f"📊 Total de fallidos sin corregir: {total_sin_corregir}")
+        registros_sin_corregir = listar_documentos(
+            ESTADO, "fallido", incluir_corregidos=False
+        )
+        total_sin_corregir = len(registros_sin_corregir)
+        print(f"📊 Total de fallidos sin corregir: {total_sin_corregir}")
 
-            if total_sin_corregir == 0:
-                print("✅ No hay registros pendientes de corrección")
-                return None
+        if total_sin_corregir == 0:
+            print("✅ No hay registros pendientes de corrección")
+            return None
 
-            data["registros"] = registros_sin_corregir
-            return data
+        return {"registros": registros_sin_corregir}
 
     except Exception as e:
         print(f"⚠️ Error al cargar reporte de fallidos: {e}")
@@ -71,24 +93,14 @@ def cargar_reporte_fallidos():
 
 def marcar_como_corregido(dte):
     """
-    Marca un DTE como corregido en el archivo de fallidos
+    Marca un DTE como corregido en el estado de descargas
     """
     try:
-        with open(ARCHIVO_FALLIDOS, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        # Buscar y marcar el registro como corregido
-        for registro in data.get("registros", []):
-            if registro.get("dte") == dte:
-                registro["corregido"] = True
-                registro["fecha_correccion"] = datetime.now().isoformat()
-                break
-
-        # Guardar cambios
-        with open(ARCHIVO_FALLIDOS, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        if not marcar_corregido(ESTADO, dte):
+            print(f"    ⚠️ El DTE {dte} no estaba en los fallidos")
+            return False
 
-        print(f"    ✅ DTE {dte} marcado como corregido en reporte_fallidos.json")
+        print(f"    ✅ DTE {dte} marcado como corregido en el estado de descargas")
         return True
 
     except Exception as e:
@@ -96,64 +108,7 @@ def marcar_como_corregido(dte):
         return False
 
 
-def buscar_dte_con_ctrl_f(driver, dte_buscado):
-    """
-    Busca un DTE específico usando Ctrl+F y retorna su índice si lo encuentra
-    """
-    try:
-        print(f"  🔍 Buscando DTE: {dte_buscado}")
-
-        # Abrir búsqueda con Ctrl+F
-        actions = ActionChains(driver)
-        actions.key_down(Keys.CONTROL).send_keys("f").key_up(Keys.CONTROL).perform()
-        time.sleep(0.5)
-
-        # Escribir el DTE
-        actions.send_keys(dte_buscado).perform()
-        time.sleep(1)
-
-        # Presionar Enter
-        actions.send_keys(Keys.ENTER).perform()
-        time.sleep(2)
-
-        # Cerrar búsqueda
-        actions.send_keys(Keys.ESCAPE).perform()
-        time.sleep(0.5)
-
-        # Buscar la celda con el DTE
-        try:
-            celda_dte = driver.find_element(
-                By.XPATH, f"//td[contains(normalize-space(.), '{dte_buscado}')]"
-            )
-            fila = celda_dte.find_element(By.XPATH, "./ancestor::tr[@role='row']")
-
-            # Hacer scroll a la fila
-            driver.execute_script(
-                "arguments[0].scrollIntoView({block: 'center'});", fila
-            )
-            time.sleep(0.5)
-
-            # Obtener el índice
-            filas = driver.find_elements(
-                By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-            )
-            for idx, f in enumerate(filas):
-                if f == fila:
-                    print(f"  ✅ DTE encontrado en índice: {idx}")
-                    return idx
-
-            print("  ⚠️ DTE encontrado pero no se pudo determinar el índice")
-            return None
-
-        except Exception:
-            print(f"  ❌ DTE no encontrado en la tabla")
-            return None
-
-    except Exception as e:
-        print(f"  ❌ Error al buscar DTE: {e}")
-        return None
-
-
+@paso("acciones")
 def click_acciones_fila(driver, fila):
     """
     Hace click en el botón de Acciones de la fila
@@ -163,7 +118,6 @@ def click_acciones_fila(driver, fila):
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", boton_acciones
         )
-        time.sleep(0.2)
 
         try:
             boton_acciones.click()
@@ -171,7 +125,6 @@ def click_acciones_fila(driver, fila):
             driver.execute_script("arguments[0].click();", boton_acciones)
 
         print("    ✅ Click en 'Acciones'")
-        time.sleep(0.5)
         return True
 
     except Exception as e:
@@ -179,20 +132,13 @@ def click_acciones_fila(driver, fila):
         return False
 
 
+@paso("ver_modal")
 def click_ver_en_dropdown(driver, fila, wait):
     """
     Hace click en la opción 'Ver' del dropdown de acciones
     """
     try:
-
-        def obtener_menu_visible(_):
-            menus = fila.find_elements(
-                By.XPATH, ".//ul[contains(@class,'dropdown-menu')]"
-            )
-            visibles = [m for m in menus if m.is_displayed()]
-            return visibles[0] if visibles else False
-
-        menu = WebDriverWait(driver, 5).until(obtener_menu_visible)
+        menu = esperar_dropdown_visible(driver, fila)
 
         boton_ver = menu.find_element(
             By.XPATH, ".//a[@class='btn-modal' and contains(., 'Ver')]"
@@ -201,7 +147,6 @@ def click_ver_en_dropdown(driver, fila, wait):
         driver.execute_script(
             "arguments[0].scrollIntoView({block:'nearest'});", boton_ver
         )
-        time.sleep(0.2)
 
         try:
             boton_ver.click()
@@ -209,7 +154,6 @@ def click_ver_en_dropdown(driver, fila, wait):
             driver.execute_script("arguments[0].click();", boton_ver)
 
         print("    ✅ Click en 'Ver'")
-        time.sleep(1)
         return True
 
     except Exception as e:
@@ -217,26 +161,15 @@ def click_ver_en_dropdown(driver, fila, wait):
         return False
 
 
+@paso("impresion")
 def click_impresion_en_modal(driver, wait):
     """
     Hace click en el botón 'Impresión' del modal flotante
     """
     try:
         print("    ⏳ Esperando que aparezca el modal...")
-        modal = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "modal-content"))
-        )
-
+        modal = esperar_modal_visible(driver)
         print("    ✅ Modal de detalles abierto")
-        time.sleep(2)
-
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "modal-footer"))
-            )
-            print("    ✓ Footer del modal cargado")
-        except:
-            print("    ⚠️ Footer del modal no encontrado, continuando...")
 
         boton_impresion = None
 
@@ -285,7 +218,6 @@ def click_impresion_en_modal(driver, wait):
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", boton_impresion
         )
-        time.sleep(0.5)
 
         try:
             boton_impresion.click()
@@ -293,7 +225,6 @@ def click_impresion_en_modal(driver, wait):
             driver.execute_script("arguments[0].click();", boton_impresion)
 
         print("    ✅ Click en 'Impresión' del modal")
-        time.sleep(0.5)
         return True
 
     except Exception as e:
@@ -301,74 +232,32 @@ def click_impresion_en_modal(driver, wait):
         return False
 
 
+@paso("ventana_impresion")
 def cambiar_a_nueva_ventana(driver, ventana_original):
     """Cambia el contexto a la nueva ventana abierta"""
     try:
-        WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) > 1)
-        for ventana in driver.window_handles:
-            if ventana != ventana_original:
-                driver.switch_to.window(ventana)
-                print("    ✅ Cambiado a nueva ventana de impresión")
-                return True
-        return False
+        ventana = esperar_nueva_ventana(driver, ventana_original)
+        driver.switch_to.window(ventana)
+        print("    ✅ Cambiado a nueva ventana de impresión")
+        return True
     except Exception as e:
         print(f"    ❌ Error al cambiar de ventana: {e}")
         return False
 
 
-def descargar_pdf_y_json(driver, wait):
+@paso("descarga")
+def descargar_pdf_y_json(driver, wait, dte=None):
     """
     Descarga PDF y JSON de la ventana actual
     """
-    descargas_exitosas = 0
+    if DESCARGA_DIRECTA_HTTP:
+        return descargar_pdf_y_json_http(driver, wait, DOWNLOAD_FOLDER, dte)
 
-    try:
-        # Descargar PDF
-        try:
-            boton_pdf = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//a[@class='btn-download-action' and contains(@href, '/pdf/')]",
-                    )
-                )
-            )
-            boton_pdf.click()
-            print("    ⬇️ Click en descarga PDF...")
-            descargas_exitosas += 1
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"    ⚠️ No se pudo hacer click en PDF: {e}")
-
-        # Descargar JSON
-        try:
-            boton_json = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//a[@class='btn-download-action' and contains(@href, '/json/')]",
-                    )
-                )
-            )
-            boton_json.click()
-            print("    ⬇️ Click en descarga JSON...")
-            descargas_exitosas += 1
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"    ⚠️ No se pudo hacer click en JSON: {e}")
-
-        if descargas_exitosas == 2:
-            print("    🎉 Ambas descargas iniciadas")
-            return True
-        else:
-            print(f"    ⚠️ Solo se ejecutaron {descargas_exitosas}/2 descargas")
-            return False
-
-    except Exception as e:
-        print(f"    ❌ Error al iniciar descargas: {e}")
-        return False
+    # Gestor de descargas de Chrome, con seguimiento por eventos de DevTools
+    return descargar_pdf_y_json_chrome(driver, wait, DOWNLOAD_FOLDER, dte)
 
 
+@paso("cierre_modal", por_resultado=False)
 def cerrar_modal_si_esta_abierto(driver):
     """
     Cierra el modal si está abierto
@@ -387,7 +276,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 )
                 boton_cerrar.click()
                 print("    ✅ Modal cerrado (botón 'Cerrar')")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -400,7 +289,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 )
                 boton_cerrar.click()
                 print("    ✅ Modal cerrado (data-dismiss)")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -413,7 +302,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 )
                 boton_x.click()
                 print("    ✅ Modal cerrado (botón X)")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -423,7 +312,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 actions = ActionChains(driver)
                 actions.send_keys(Keys.ESCAPE).perform()
                 print("    ✅ Modal cerrado (tecla ESC)")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -434,15 +323,18 @@ def cerrar_modal_si_esta_abierto(driver):
         return True
 
 
-def procesar_dte_fallido(driver, dte, ventana_principal, wait):
+@paso("registro")
+def procesar_dte_fallido(
+    driver, dte, registros_tabla, indice_dtes, ventana_principal, wait
+):
     """
-    Procesa un DTE fallido: lo busca y lo descarga
+    Procesa un DTE fallido: lo busca en la foto de la tabla y lo descarga
     """
     try:
         print(f"\n  📄 Procesando DTE fallido: {dte}")
 
-        # Buscar el DTE con Ctrl+F
-        idx = buscar_dte_con_ctrl_f(driver, dte)
+        # Buscar el DTE en el índice DTE -> fila
+        idx = indice_dtes.get(dte)
 
         if idx is None:
             print(f"  ❌ No se encontró el DTE {dte} en la tabla")
@@ -455,40 +347,65 @@ def procesar_dte_fallido(driver, dte, ventana_principal, wait):
             )
             return False
 
-        # Obtener la fila
-        driver.switch_to.window(ventana_principal)
-        filas = driver.find_elements(
-            By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-        )
-        if idx >= len(filas):
-            print("    ⚠️ La fila ya no está disponible")
-            return False
-        fila = filas[idx]
-
-        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", fila)
-        time.sleep(0.3)
+        print(f"    ✅ DTE encontrado en índice: {idx}")
 
-        # Click en Acciones
-        if not click_acciones_fila(driver, fila):
-            registros_aun_fallidos.append(
+        # PDF y JSON ya descargados antes (por este u otro descargador)
+        if publicar_desde_almacen(dte, DOWNLOAD_FOLDER):
+            marcar_como_corregido(dte)
+            registros_corregidos.append(
                 {
                     "dte": dte,
-                    "error": "No se pudo hacer click en Acciones",
-                    "timestamp": datetime.now().isoformat(),
+                    "descargado_en": datetime.now().isoformat(),
                 }
             )
-            return False
+            return True
 
-        # Click en Ver
-        if not click_ver_en_dropdown(driver, fila, wait):
-            registros_aun_fallidos.append(
-                {
-                    "dte": dte,
-                    "error": "No se pudo hacer click en Ver",
-                    "timestamp": datetime.now().isoformat(),
-                }
+        registro = registros_tabla[idx]
+        driver.switch_to.window(ventana_principal)
+
+        if registro.get("data_href"):
+            # Abrir el modal 'Ver' directamente, sin buscar la fila en la grilla
+            if not abrir_modal_desde_href(driver, registro):
+                registros_aun_fallidos.append(
+                    {
+                        "dte": dte,
+                        "error": "No se pudo abrir el modal Ver",
+                        "timestamp": datetime.now().isoformat(),
+                    }
+                )
+                return False
+        else:
+            # Obtener la fila
+            fila = obtener_fila(driver, "sell_table", idx)
+            if fila is None:
+                print("    ⚠️ La fila ya no está disponible")
+                return False
+
+            driver.execute_script(
+                "arguments[0].scrollIntoView({block: 'center'});", fila
             )
-            return False
+
+            # Click en Acciones
+            if not click_acciones_fila(driver, fila):
+                registros_aun_fallidos.append(
+                    {
+                        "dte": dte,
+                        "error": "No se pudo hacer click en Acciones",
+                        "timestamp": datetime.now().isoformat(),
+                    }
+                )
+                return False
+
+            # Click en Ver
+            if not click_ver_en_dropdown(driver, fila, wait):
+                registros_aun_fallidos.append(
+                    {
+                        "dte": dte,
+                        "error": "No se pudo hacer click en Ver",
+                        "timestamp": datetime.now().isoformat(),
+                    }
+                )
+                return False
 
         # Click en Impresión del modal
         if not click_impresion_en_modal(driver, wait):
@@ -512,10 +429,8 @@ def procesar_dte_fallido(driver, dte, ventana_principal, wait):
             )
             return False
 
-        time.sleep(0.5)
-
         # Descargar archivos
-        if descargar_pdf_y_json(driver, wait):
+        if descargar_pdf_y_json(driver, wait, dte):
             print(f"    ✅ DTE {dte} descargado correctamente")
 
             # Marcar como corregido en el archivo JSON
@@ -528,9 +443,6 @@ def procesar_dte_fallido(driver, dte, ventana_principal, wait):
                 }
             )
 
-            print("    ⏳ Esperando a que se completen las descargas...")
-            time.sleep(2)
-
             # Cerrar ventana de impresión
             print("    🔒 Cerrando ventana de descarga...")
             driver.close()
@@ -541,7 +453,6 @@ def procesar_dte_fallido(driver, dte, ventana_principal, wait):
 
             return True
         else:
-            time.sleep(1)
 
             print("    🔒 Cerrando ventana de descarga...")
             driver.close()
@@ -609,6 +520,8 @@ def guardar_reporte_correccion():
     print(f"\n📄 Reporte de corrección guardado: {archivo_reporte}")
 
 
+manifiesto = abrir_manifiesto(DOWNLOAD_FOLDER, "corrector")
+
 try:
     # Cargar el reporte de fallidos
     reporte = cargar_reporte_fallidos()
@@ -629,63 +542,10 @@ try:
     driver.maximize_window()
     print("\n🚀 Iniciando navegador...")
 
-    # URL de tu ERP
-    URL_ERP = "https://hermaco.findexbusiness.com"
-    driver.get(URL_ERP)
-    print(f"📍 Navegando a: {URL_ERP}")
-
     wait = WebDriverWait(driver, 10)
 
-    # Click en "Inicio de sesión"
-    login_link = wait.until(
-        EC.element_to_be_clickable(
-            (By.XPATH, "//a[@href='https://hermaco.findexbusiness.com/login']")
-        )
-    )
-    login_link.click()
-    print("✅ Click en 'Inicio de sesión'")
-
-    time.sleep(2)
-    print("🔄 Rellenando credenciales...")
-
-    # Rellenar usuario
-    username_input = wait.until(EC.presence_of_element_located((By.ID, "username")))
-    username_input.send_keys("Henri")
-    print("✅ Usuario ingresado")
-
-    # Rellenar contraseña
-    password_input = driver.find_element(By.ID, "password")
-    password_input.send_keys("Bajmut")
-    print("✅ Contraseña ingresada")
-
-    # Click en botón de login
-    login_button = driver.find_element(
-        By.XPATH, "//button[@type='submit' and contains(@class, 'btn-primary')]"
-    )
-    login_button.click()
-    print("✅ Click en botón 'Acceder'")
-
-    time.sleep(3)
-    print("✅ Login completado, esperando dashboard...")
-
-    # Navegar a Gestión de ventas
-    print("\n🔄 Navegando a 'Gestión de ventas'...")
-    gestion_ventas = wait.until(EC.element_to_be_clickable((By.ID, "tour_step7_menu")))
-    gestion_ventas.click()
-    print("✅ Click en 'Gestión de ventas' (desplegable abierto)")
-
-    time.sleep(1)
-
-    # Click en "Todas las ventas"
-    todas_ventas = wait.until(
-        EC.element_to_be_clickable(
-            (By.XPATH, "//a[@href='https://hermaco.findexbusiness.com/sells']")
-        )
-    )
-    todas_ventas.click()
-    print("✅ Click en 'Todas las ventas'")
-
-    time.sleep(2)
+    # Sesión compartida: reutiliza las cookies guardadas o hace login completo
+    abrir_pagina_autenticada(driver, wait, "/sells")
     print("📍 Estamos en la página de facturas")
 
     # Filtro de fecha - AYER
@@ -693,8 +553,6 @@ try:
     filtro_fecha = wait.until(EC.element_to_be_clickable((By.ID, "sell_date_filter")))
     filtro_fecha.click()
     print("✅ Click en 'Filtrar por fecha' (desplegable abierto)")
-
-    time.sleep(2)
     try:
         ayer = wait.until(
             EC.element_to_be_clickable(
@@ -704,55 +562,65 @@ try:
                 )
             )
         )
+        preparar_espera_draw(driver, "sell_table")
         ayer.click()
         print("✅ Seleccionado 'Ayer'")
     except:
         print("⚠️ No se encontró 'Ayer'. Continuando...")
 
-    time.sleep(3)
+    esperar_draw_tabla(driver, "sell_table")
 
-    # Mostrar TODOS los registros
-    print("\n🔄 Cambiando filtro a mostrar TODOS los registros...")
-    select_length = wait.until(
-        EC.presence_of_element_located((By.NAME, "sell_table_length"))
-    )
-    try:
-        # Buscar la opción "Todos" o "-1" como valor
-        select_obj = Select(select_length)
-        opciones = [option.get_attribute("value") for option in select_obj.options]
-        print(f"  📋 Opciones disponibles: {opciones}")
-
-        # Intentar seleccionar "Todos" (puede ser "-1" o "all")
-        if "-1" in opciones:
-            Select(select_length).select_by_value("-1")
-            print("✅ Seleccionado mostrar TODOS los registros")
-        elif "all" in opciones:
-            Select(select_length).select_by_value("all")
-            print("✅ Seleccionado mostrar TODOS los registros")
-        else:
-            # Si no existe "Todos", usar el valor más alto
-            valores_numericos = [int(v) for v in opciones if v.isdigit()]
-            if valores_numericos:
-                max_valor = str(max(valores_numericos))
-                Select(select_length).select_by_value(max_valor)
-                print(
-                    f"✅ Seleccionado mostrar {max_valor} registros (máximo disponible)"
-                )
+    registros_tabla = None
+    if LISTADO_POR_ENDPOINT:
+        # Listado directo desde el endpoint JSON de la tabla (mismos filtros)
+        print("\n🔄 Listando registros desde el endpoint de la tabla...")
+        registros_tabla = listar_registros_datatable(driver, "sell_table")
+
+    if registros_tabla is None:
+        # Mostrar TODOS los registros
+        print("\n🔄 Cambiando filtro a mostrar TODOS los registros...")
+        select_length = wait.until(
+            EC.presence_of_element_located((By.NAME, "sell_table_length"))
+        )
+        preparar_espera_draw(driver, "sell_table")
+        try:
+            # Buscar la opción "Todos" o "-1" como valor
+            select_obj = Select(select_length)
+            opciones = [option.get_attribute("value") for option in select_obj.options]
+            print(f"  📋 Opciones disponibles: {opciones}")
+
+            # Intentar seleccionar "Todos" (puede ser "-1" o "all")
+            if "-1" in opciones:
+                Select(select_length).select_by_value("-1")
+                print("✅ Seleccionado mostrar TODOS los registros")
+            elif "all" in opciones:
+                Select(select_length).select_by_value("all")
+                print("✅ Seleccionado mostrar TODOS los registros")
             else:
-                print("⚠️ No se pudo determinar cómo mostrar todos los registros")
-    except Exception as e:
-        print(f"  ❌ No se pudo cambiar el tamaño de página: {e}")
+                # Si no existe "Todos", usar el valor más alto
+                valores_numericos = [int(v) for v in opciones if v.isdigit()]
+                if valores_numericos:
+                    max_valor = str(max(valores_numericos))
+                    Select(select_length).select_by_value(max_valor)
+                    print(
+                        f"✅ Seleccionado mostrar {max_valor} registros (máximo disponible)"
+                    )
+                else:
+                    print("⚠️ No se pudo determinar cómo mostrar todos los registros")
+        except Exception as e:
+            print(f"  ❌ No se pudo cambiar el tamaño de página: {e}")
 
-    # Dar tiempo a que carguen los registros
-    print("⏳ Esperando 5 segundos a que carguen los registros...")
-    time.sleep(5)
-    print("✅ Registros cargados")
+        # Esperar a que la tabla dibuje los registros
 
-    # Obtener todas las filas
-    filas = driver.find_elements(
-        By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-    )
-    total_filas = len(filas)
+        print("⏳ Esperando a que carguen los registros...")
+
+        esperar_draw_tabla(driver, "sell_table")
+        print("✅ Registros cargados")
+
+        # Foto de la grilla: todas las filas en una sola llamada al navegador
+        registros_tabla = extraer_registros_tabla(driver, "sell_table")
+    indice_dtes = indexar_registros(registros_tabla, "dte")
+    total_filas = len(registros_tabla)
     print(f"\n📊 Total de registros en tabla de ayer: {total_filas}")
 
     if total_filas == 0:
@@ -769,7 +637,9 @@ try:
 
     for idx, dte in enumerate(dtes_fallidos, 1):
         print(f"\n📄 Procesando {idx}/{len(dtes_fallidos)}: {dte}")
-        procesar_dte_fallido(driver, dte, ventana_principal, wait)
+        procesar_dte_fallido(
+            driver, dte, registros_tabla, indice_dtes, ventana_principal, wait
+        )
 
     print(f"\n{'='*60}")
     print(f"🎉 CORRECCIÓN COMPLETADA")
@@ -797,5 +667,8 @@ except Exception as e:
     guardar_reporte_correccion()
 
 finally:
+    cerrar_manifiesto(manifiesto)
+    imprimir_resumen_esperas()
+    guardar_reporte_pasos(DOWNLOAD_FOLDER, "corrector")
     driver.quit()
     print("\n👋 Navegador cerrado")
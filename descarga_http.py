@@ -0,0 +1,302 @@
+"""
+DESCARGA DIRECTA POR HTTP
+=========================
+Descarga el PDF y el JSON de un DTE leyendo los enlaces 'btn-download-action'
+de la ventana de impresión y reutilizando las cookies de la sesión de Selenium.
+
+El navegador solo se usa para navegar: los dos archivos se piden en paralelo
+con un cliente HTTP compartido (urllib3) y se escriben directamente en disco,
+sin pasar por el gestor de descargas de Chrome.
+
+Cada archivo se escribe con un nombre temporal único y al terminar se renombra
+al nombre canónico 'hermaco-<DTE>.pdf/.json'. Si ya existe un archivo idéntico
+con ese nombre la copia nueva se descarta, así nunca aparecen 'nombre (1).pdf'.
+"""
+
+import os
+import re
+import uuid
+import filecmp
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, unquote
+
+import urllib3
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+from almacen_descargas import guardar_en_almacen
+from manifiesto_descargas import anotar_archivo
+
+XPATH_ENLACE_PDF = "//a[@class='btn-download-action' and contains(@href, '/pdf/')]"
+XPATH_ENLACE_JSON = "//a[@class='btn-download-action' and contains(@href, '/json/')]"
+
+# Tamaño de cada bloque escrito a disco al recibir la respuesta
+TAMANO_BLOQUE = 64 * 1024
+
+_cliente_http = None
+_candado_cliente = threading.Lock()
+_user_agent = None
+
+
+def obtener_cliente_http():
+    """
+    Retorna el cliente HTTP compartido (pool de conexiones reutilizable).
+    Se crea una sola vez por proceso.
+    """
+    global _cliente_http
+
+    with _candado_cliente:
+        if _cliente_http is None:
+            _cliente_http = urllib3.PoolManager(
+                num_pools=4,
+                maxsize=8,
+                timeout=urllib3.Timeout(connect=10.0, read=60.0),
+                retries=urllib3.Retry(
+                    total=3,
+                    backoff_factor=0.5,
+                    status_forcelist=(502, 503, 504),
+                    redirect=False,
+                ),
+            )
+        return _cliente_http
+
+
+def limpiar_nombre_archivo(nombre):
+    """Limpia caracteres no válidos para nombres de archivo."""
+    invalidos = '<>:"/\\|?*'
+    limpio = nombre.strip()
+    for caracter in invalidos:
+        limpio = limpio.replace(caracter, "_")
+    return limpio
+
+
+def cookies_para_url(driver, url):
+    """
+    Construye el encabezado 'Cookie' con las cookies del navegador
+    que aplican al dominio de la URL.
+    """
+    host = urlparse(url).hostname or ""
+    partes = []
+    for cookie in driver.get_cookies():
+        dominio = cookie.get("domain", "").lstrip(".")
+        if not dominio or host == dominio or host.endswith("." + dominio):
+            partes.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(partes)
+
+
+def construir_encabezados(driver, url):
+    """
+    Arma los encabezados HTTP que imitan al navegador: cookies de sesión,
+    User-Agent y Referer de la ventana actual.
+    """
+    global _user_agent
+
+    if _user_agent is None:
+        try:
+            _user_agent = driver.execute_script("return navigator.userAgent;")
+        except Exception:
+            _user_agent = "Mozilla/5.0"
+
+    encabezados = {
+        "Cookie": cookies_para_url(driver, url),
+        "User-Agent": _user_agent,
+        "Accept": "*/*",
+    }
+    try:
+        encabezados["Referer"] = driver.current_url
+    except Exception:
+        pass
+    return encabezados
+
+
+def nombre_canonico(nombre_base, extension):
+    """Nombre fijo de un DTE: 'hermaco-<DTE>.<extension>'."""
+    nombre = limpiar_nombre_archivo(nombre_base)
+    if not nombre.lower().startswith("hermaco-"):
+        nombre = f"hermaco-{nombre}"
+    if not nombre.lower().endswith(f".{extension}"):
+        nombre = f"{nombre}.{extension}"
+    return nombre
+
+
+def ruta_temporal_descarga(carpeta):
+    """Ruta temporal única para una descarga en curso."""
+    return os.path.join(carpeta, f".descarga-{uuid.uuid4().hex}.part")
+
+
+def finalizar_descarga(ruta_temporal, ruta_final):
+    """
+    Mueve una descarga terminada a su nombre final de forma atómica.
+    Si ya existe un archivo idéntico se descarta la copia nueva; si existe
+    uno distinto se reemplaza (la descarga nueva es la vigente).
+
+    Returns:
+        tuple: (ruta_final, estado) con estado 'nuevo', 'identico' o 'reemplazado'
+    """
+    estado = "nuevo"
+    if os.path.exists(ruta_final):
+        if os.path.getsize(ruta_final) == os.path.getsize(
+            ruta_temporal
+        ) and filecmp.cmp(ruta_final, ruta_temporal, shallow=False):
+            os.remove(ruta_temporal)
+            return ruta_final, "identico"
+        estado = "reemplazado"
+
+    os.replace(ruta_temporal, ruta_final)
+    return ruta_final, estado
+
+
+def nombre_desde_content_disposition(valor):
+    """
+    Extrae el nombre de archivo del encabezado Content-Disposition.
+    Retorna None si el encabezado no trae nombre.
+    """
+    if not valor:
+        return None
+
+    coincidencia = re.search(r"filename\*\s*=\s*[^']*'[^']*'([^;]+)", valor)
+    if coincidencia:
+        return unquote(coincidencia.group(1).strip().strip('"'))
+
+    coincidencia = re.search(r'filename\s*=\s*"?([^";]+)"?', valor)
+    if coincidencia:
+        return coincidencia.group(1).strip()
+
+    return None
+
+
+def obtener_enlaces_descarga(driver, wait):
+    """
+    Lee los href de los enlaces de descarga PDF y JSON de la ventana de impresión.
+    Retorna (url_pdf, url_json); cualquiera puede ser None si no se encontró.
+    """
+    enlaces = []
+    for xpath in (XPATH_ENLACE_PDF, XPATH_ENLACE_JSON):
+        try:
+            enlace = wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
+            enlaces.append(enlace.get_attribute("href"))
+        except Exception as e:
+            print(f"  ⚠️ No se encontró el enlace de descarga: {e}")
+            enlaces.append(None)
+    return enlaces[0], enlaces[1]
+
+
+def descargar_archivo(url, carpeta, extension, encabezados, nombre_base=None):
+    """
+    Descarga una URL directamente a disco.
+
+    El cuerpo se escribe primero en un archivo temporal único y al terminar
+    se renombra de forma atómica al nombre final, así nunca queda un archivo
+    a medias con el nombre definitivo.
+
+    Args:
+        url: URL del archivo a descargar
+        carpeta: Carpeta destino
+        extension: 'pdf' o 'json'
+        encabezados: Encabezados HTTP (cookies de sesión incluidas)
+        nombre_base: DTE o código; da el nombre canónico 'hermaco-<DTE>'
+                     (sin él se usa el nombre que envía el servidor)
+
+    Returns:
+        str: Ruta del archivo descargado, o None si falló
+    """
+    cliente = obtener_cliente_http()
+    respuesta = cliente.request("GET", url, headers=encabezados, preload_content=False)
+
+    try:
+        if respuesta.status != 200:
+            print(f"  ⚠️ HTTP {respuesta.status} al descargar {extension.upper()}")
+            return None
+
+        tipo_contenido = respuesta.headers.get("Content-Type", "")
+        if "text/html" in tipo_contenido:
+            # El ERP responde con la página de login cuando la sesión expiró
+            print(f"  ⚠️ El servidor respondió HTML en lugar de {extension.upper()}")
+            return None
+
+        if nombre_base:
+            nombre = nombre_canonico(nombre_base, extension)
+        else:
+            nombre = nombre_desde_content_disposition(
+                respuesta.headers.get("Content-Disposition")
+            ) or unquote(urlparse(url).path.rstrip("/").split("/")[-1])
+            nombre = limpiar_nombre_archivo(nombre)
+            if not nombre.lower().endswith(f".{extension}"):
+                nombre = f"{nombre}.{extension}"
+
+        ruta_temporal = ruta_temporal_descarga(carpeta)
+        try:
+            with open(ruta_temporal, "wb") as f:
+                for bloque in respuesta.stream(TAMANO_BLOQUE):
+                    f.write(bloque)
+        except Exception:
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+            raise
+
+        ruta_final, estado = finalizar_descarga(
+            ruta_temporal, os.path.join(carpeta, nombre)
+        )
+        if estado == "identico":
+            print(f"  ♻️ {nombre} ya existía idéntico, no se duplica")
+        elif estado == "reemplazado":
+            print(f"  🔄 {nombre} actualizado con la versión nueva")
+        sha256 = None
+        if nombre_base:
+            sha256 = guardar_en_almacen(ruta_final, nombre_base, extension)
+        anotar_archivo(ruta_final, nombre_base, extension, sha256, estado)
+        return ruta_final
+
+    finally:
+        respuesta.release_conn()
+
+
+def descargar_pdf_y_json_http(driver, wait, carpeta, nombre_base=None):
+    """
+    Descarga PDF y JSON de la ventana de impresión actual por HTTP directo.
+    Ambos archivos se descargan al mismo tiempo.
+
+    Returns:
+        bool: True si ambos archivos quedaron en disco
+    """
+    try:
+        url_pdf, url_json = obtener_enlaces_descarga(driver, wait)
+        if not url_pdf or not url_json:
+            print("  ⚠️ Faltan enlaces de descarga en la ventana de impresión")
+            return False
+
+        encabezados = construir_encabezados(driver, url_pdf)
+        nombre_base = limpiar_nombre_archivo(nombre_base) if nombre_base else None
+
+        print("  ⬇️ Descargando PDF y JSON por HTTP directo...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futuro_pdf = executor.submit(
+                descargar_archivo, url_pdf, carpeta, "pdf", encabezados, nombre_base
+            )
+            futuro_json = executor.submit(
+                descargar_archivo, url_json, carpeta, "json", encabezados, nombre_base
+            )
+            rutas = []
+            for futuro in (futuro_pdf, futuro_json):
+                try:
+                    rutas.append(futuro.result())
+                except Exception as e:
+                    print(f"  ⚠️ Error en descarga HTTP: {e}")
+                    rutas.append(None)
+
+        descargas_exitosas = sum(1 for ruta in rutas if ruta)
+        for ruta in rutas:
+            if ruta:
+                print(f"  💾 Guardado: {os.path.basename(ruta)}")
+
+        if descargas_exitosas == 2:
+            print("  🎉 Ambas descargas completadas")
+            return True
+
+        print(f"  ⚠️ Solo se completaron {descargas_exitosas}/2 descargas")
+        return False
+
+    except Exception as e:
+        print(f"  ❌ Error en descarga HTTP: {e}")
+        return False
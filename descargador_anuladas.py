@@ -1,12 +1,41 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
-import time
+from descarga_http import descargar_pdf_y_json_http
+from almacen_descargas import publicar_desde_almacen
+from estado_descargas import (
+    abrir_estado,
+    ultimo_punto_control,
+    contar_documentos,
+)
+from bitacora_descargas import (
+    abrir_bitacora,
+    anotar_documento,
+    anotar_punto_control,
+    compactar_bitacora,
+)
+from sesion_erp import abrir_pagina_autenticada, crear_navegador
+from extraccion_tabla import extraer_registros_tabla, indexar_registros, obtener_fila
+from listado_datatables import listar_registros_datatable, abrir_modal_desde_href
+from seguimiento_descargas import (
+    descargar_pdf_y_json_chrome,
+)
+from manifiesto_descargas import abrir_manifiesto, cerrar_manifiesto
+from metricas_pasos import paso, reiniciar_metricas, guardar_reporte_pasos
+from esperas import (
+    esperar_dropdown_visible,
+    esperar_modal_visible,
+    esperar_modal_cerrado,
+    esperar_nueva_ventana,
+    esperar_elemento_visible,
+    preparar_espera_draw,
+    esperar_draw_tabla,
+    imprimir_resumen_esperas,
+    reiniciar_esperas,
+)
 import os
-import json
 import traceback
 from datetime import datetime
 
@@ -14,44 +43,36 @@ from datetime import datetime
 DOWNLOAD_FOLDER = r"C:\Users\H01ventas05\Desktop\extractor-facturas-selenium-hermaco-main\descargas_anuladas"
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
-# Configuración de Chrome para descargas automáticas
-chrome_options = webdriver.ChromeOptions()
-prefs = {
-    "download.default_directory": DOWNLOAD_FOLDER,
-    "download.prompt_for_download": False,
-    "download.directory_upgrade": True,
-    "plugins.always_open_pdf_externally": True,
-    "safebrowsing.enabled": True,
-}
-chrome_options.add_experimental_option("prefs", prefs)
-chrome_options.add_argument("--headless=new")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--window-size=1920,1080")
-
-# Inicializar el navegador
-driver = webdriver.Chrome(options=chrome_options)
+# Modo de descarga: True = PDF/JSON por HTTP directo con las cookies de Selenium,
+# False = clicks en los enlaces de la ventana de impresión (gestor de Chrome)
+DESCARGA_DIRECTA_HTTP = True
+
+# Listado: True = filas pedidas al endpoint JSON de la tabla (con los filtros
+# de la página), False = mostrar "Todos" y leer la grilla dibujada
+LISTADO_POR_ENDPOINT = True
+
+# Navegador del script (lo crea ejecutar() o lo recibe del orquestador)
+driver = None
 
 # Variables globales
 registros_fallidos = []
 ultimo_dte_exitoso = None
-ARCHIVO_FALLIDOS = os.path.join(DOWNLOAD_FOLDER, "reporte_fallidos.json")
+# Último exitoso y fallidos (importa los JSON anteriores la primera vez)
+ESTADO = abrir_estado(DOWNLOAD_FOLDER, "anuladas")
+BITACORA = abrir_bitacora(ESTADO)
 
 
 def cargar_ultimo_exitoso():
     """
-    Carga el último DTE exitoso desde el archivo JSON
+    Carga el último DTE exitoso desde el estado de descargas
     """
-    archivo = os.path.join(DOWNLOAD_FOLDER, "ultimo_exitoso.json")
     try:
-        if os.path.exists(archivo):
-            with open(archivo, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                print(f"📂 Último DTE exitoso cargado: {data.get('ultimo_dte', 'N/A')}")
-                return data.get("ultimo_dte")
+        punto = ultimo_punto_control(ESTADO)
+        if punto:
+            print(f"📂 Último DTE exitoso cargado: {punto['valor']}")
+            return punto["valor"]
         else:
-            print("📂 No hay archivo de último exitoso. Comenzando desde el principio.")
+            print("📂 No hay último exitoso guardado. Comenzando desde el principio.")
             return None
     except Exception as e:
         print(f"⚠️ Error al cargar último exitoso: {e}")
@@ -60,118 +81,21 @@ def cargar_ultimo_exitoso():
 
 def guardar_ultimo_exitoso(dte, tiene_descargas_nuevas=True):
     """
-    Guarda el último DTE exitoso en el archivo JSON
+    Anota el último DTE exitoso en la bitácora de progreso
     """
-    archivo = os.path.join(DOWNLOAD_FOLDER, "ultimo_exitoso.json")
     try:
-        fecha_actual = datetime.now()
         estado = (
             "Todo actualizado - nuevas descargas"
             if tiene_descargas_nuevas
             else "Todo actualizado - nada nuevo"
         )
-        data = {
-            "ultima_ejecucion": fecha_actual.strftime("%Y-%m-%d %H:%M:%S"),
-            "fecha_actualizacion": fecha_actual.isoformat(),
-            "ultimo_dte": dte,
-            "estado": estado,
-        }
-        with open(archivo, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        anotar_punto_control(BITACORA, dte, estado)
         print(f"💾 Último DTE guardado: {dte}")
     except Exception as e:
         print(f"⚠️ Error al guardar último exitoso: {e}")
 
 
-def buscar_dte_con_ctrl_f(driver, dte_buscado):
-    """
-    Busca un DTE específico usando Ctrl+F y retorna su índice si lo encuentra
-    """
-    try:
-        print(f"🔍 Buscando DTE: {dte_buscado}")
-
-        # Abrir búsqueda con Ctrl+F
-        actions = ActionChains(driver)
-        actions.key_down(Keys.CONTROL).send_keys("f").key_up(Keys.CONTROL).perform()
-        time.sleep(0.5)
-
-        # Escribir el DTE
-        actions.send_keys(dte_buscado).perform()
-        time.sleep(1)
-
-        # Presionar Enter
-        actions.send_keys(Keys.ENTER).perform()
-        time.sleep(2)
-
-        # Cerrar búsqueda
-        actions.send_keys(Keys.ESCAPE).perform()
-        time.sleep(0.5)
-
-        # Buscar la celda con el DTE
-        try:
-            celda_dte = driver.find_element(
-                By.XPATH, f"//td[contains(normalize-space(.), '{dte_buscado}')]"
-            )
-            fila = celda_dte.find_element(By.XPATH, "./ancestor::tr[@role='row']")
-
-            # Hacer scroll a la fila
-            driver.execute_script(
-                "arguments[0].scrollIntoView({block: 'center'});", fila
-            )
-            time.sleep(0.5)
-
-            # Obtener el índice
-            filas = driver.find_elements(
-                By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-            )
-            for idx, f in enumerate(filas):
-                if f == fila:
-                    print(f"✅ DTE encontrado en índice: {idx}")
-                    return idx
-
-            print("⚠️ DTE encontrado pero no se pudo determinar el índice")
-            return None
-
-        except Exception:
-            print(f"❌ DTE no encontrado en la tabla")
-            return None
-
-    except Exception as e:
-        print(f"❌ Error al buscar DTE: {e}")
-        return None
-
-
-def extraer_dte_de_fila(fila):
-    """
-    Extrae el DTE de una fila
-    """
-    try:
-        celda = fila.find_element(
-            By.XPATH, ".//td[contains(normalize-space(.), 'DTE-')]"
-        )
-        dte = celda.text.strip()
-        if dte and "DTE-" in dte:
-            return dte
-    except Exception:
-        pass
-    return None
-
-
-def extraer_fecha_de_fila(fila):
-    """
-    Extrae la fecha de una fila
-    """
-    try:
-        celdas = fila.find_elements(By.TAG_NAME, "td")
-        for celda in celdas:
-            texto = celda.text.strip()
-            if "/" in texto and any(char.isdigit() for char in texto):
-                return texto
-    except Exception:
-        pass
-    return None
-
-
+@paso("acciones")
 def click_acciones_fila(driver, fila):
     """
     Hace click en el botón de Acciones de la fila
@@ -181,7 +105,6 @@ def click_acciones_fila(driver, fila):
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", boton_acciones
         )
-        time.sleep(0.2)
 
         try:
             boton_acciones.click()
@@ -189,7 +112,6 @@ def click_acciones_fila(driver, fila):
             driver.execute_script("arguments[0].click();", boton_acciones)
 
         print("  ✅ Click en 'Acciones'")
-        time.sleep(0.5)
         return True
 
     except Exception as e:
@@ -197,20 +119,13 @@ def click_acciones_fila(driver, fila):
         return False
 
 
+@paso("ver_modal")
 def click_ver_en_dropdown(driver, fila, wait):
     """
     Hace click en la opción 'Ver' del dropdown de acciones
     """
     try:
-
-        def obtener_menu_visible(_):
-            menus = fila.find_elements(
-                By.XPATH, ".//ul[contains(@class,'dropdown-menu')]"
-            )
-            visibles = [m for m in menus if m.is_displayed()]
-            return visibles[0] if visibles else False
-
-        menu = WebDriverWait(driver, 5).until(obtener_menu_visible)
+        menu = esperar_dropdown_visible(driver, fila)
 
         boton_ver = menu.find_element(
             By.XPATH, ".//a[@class='btn-modal' and contains(., 'Ver')]"
@@ -219,7 +134,6 @@ def click_ver_en_dropdown(driver, fila, wait):
         driver.execute_script(
             "arguments[0].scrollIntoView({block:'nearest'});", boton_ver
         )
-        time.sleep(0.2)
 
         try:
             boton_ver.click()
@@ -227,7 +141,6 @@ def click_ver_en_dropdown(driver, fila, wait):
             driver.execute_script("arguments[0].click();", boton_ver)
 
         print("  ✅ Click en 'Ver'")
-        time.sleep(1)
         return True
 
     except Exception as e:
@@ -235,26 +148,15 @@ def click_ver_en_dropdown(driver, fila, wait):
         return False
 
 
+@paso("impresion")
 def click_impresion_en_modal(driver, wait):
     """
     Hace click en el botón 'Impresión' del modal flotante
     """
     try:
         print("  ⏳ Esperando que aparezca el modal...")
-        modal = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "modal-content"))
-        )
-
+        modal = esperar_modal_visible(driver)
         print("  ✅ Modal de detalles abierto")
-        time.sleep(2)
-
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "modal-footer"))
-            )
-            print("  ✓ Footer del modal cargado")
-        except:
-            print("  ⚠️ Footer del modal no encontrado, continuando...")
 
         boton_impresion = None
 
@@ -303,7 +205,6 @@ def click_impresion_en_modal(driver, wait):
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", boton_impresion
         )
-        time.sleep(0.5)
 
         try:
             boton_impresion.click()
@@ -311,7 +212,6 @@ def click_impresion_en_modal(driver, wait):
             driver.execute_script("arguments[0].click();", boton_impresion)
 
         print("  ✅ Click en 'Impresión' del modal")
-        time.sleep(0.5)
         return True
 
     except Exception as e:
@@ -319,74 +219,32 @@ def click_impresion_en_modal(driver, wait):
         return False
 
 
+@paso("ventana_impresion")
 def cambiar_a_nueva_ventana(driver, ventana_original):
     """Cambia el contexto a la nueva ventana abierta"""
     try:
-        WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) > 1)
-        for ventana in driver.window_handles:
-            if ventana != ventana_original:
-                driver.switch_to.window(ventana)
-                print("  ✅ Cambiado a nueva ventana de impresión")
-                return True
-        return False
+        ventana = esperar_nueva_ventana(driver, ventana_original)
+        driver.switch_to.window(ventana)
+        print("  ✅ Cambiado a nueva ventana de impresión")
+        return True
     except Exception as e:
         print(f"  ❌ Error al cambiar de ventana: {e}")
         return False
 
 
-def descargar_pdf_y_json(driver, wait):
+@paso("descarga")
+def descargar_pdf_y_json(driver, wait, dte=None):
     """
     Descarga PDF y JSON de la ventana actual
     """
-    descargas_exitosas = 0
+    if DESCARGA_DIRECTA_HTTP:
+        return descargar_pdf_y_json_http(driver, wait, DOWNLOAD_FOLDER, dte)
 
-    try:
-        # Descargar PDF
-        try:
-            boton_pdf = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//a[@class='btn-download-action' and contains(@href, '/pdf/')]",
-                    )
-                )
-            )
-            boton_pdf.click()
-            print("  ⬇️ Click en descarga PDF...")
-            descargas_exitosas += 1
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"  ⚠️ No se pudo hacer click en PDF: {e}")
-
-        # Descargar JSON
-        try:
-            boton_json = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//a[@class='btn-download-action' and contains(@href, '/json/')]",
-                    )
-                )
-            )
-            boton_json.click()
-            print("  ⬇️ Click en descarga JSON...")
-            descargas_exitosas += 1
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"  ⚠️ No se pudo hacer click en JSON: {e}")
-
-        if descargas_exitosas == 2:
-            print("  🎉 Ambas descargas iniciadas")
-            return True
-        else:
-            print(f"  ⚠️ Solo se ejecutaron {descargas_exitosas}/2 descargas")
-            return False
-
-    except Exception as e:
-        print(f"  ❌ Error al iniciar descargas: {e}")
-        return False
+    # Gestor de descargas de Chrome, con seguimiento por eventos de DevTools
+    return descargar_pdf_y_json_chrome(driver, wait, DOWNLOAD_FOLDER, dte)
 
 
+@paso("cierre_modal", por_resultado=False)
 def cerrar_modal_si_esta_abierto(driver):
     """
     Cierra el modal si está abierto
@@ -405,7 +263,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 )
                 boton_cerrar.click()
                 print("  ✅ Modal cerrado (botón 'Cerrar')")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -418,7 +276,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 )
                 boton_cerrar.click()
                 print("  ✅ Modal cerrado (data-dismiss)")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -431,7 +289,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 )
                 boton_x.click()
                 print("  ✅ Modal cerrado (botón X)")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -441,7 +299,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 actions = ActionChains(driver)
                 actions.send_keys(Keys.ESCAPE).perform()
                 print("  ✅ Modal cerrado (tecla ESC)")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -452,39 +310,52 @@ def cerrar_modal_si_esta_abierto(driver):
         return True
 
 
-def procesar_registro_con_modal(driver, fila, idx, ventana_principal, wait):
+@paso("registro")
+def procesar_registro_con_modal(driver, registro, ventana_principal, wait):
     """
     Procesa un registro usando el flujo de modal (Ver -> Modal -> Impresión)
     """
     global ultimo_dte_exitoso
 
-    dte = extraer_dte_de_fila(fila)
+    idx = registro["indice"]
+    dte = registro["dte"]
     if dte:
         print(f"  🏷️ DTE detectado: {dte}")
     else:
         print("  ⚠️ No se pudo detectar DTE en la fila")
 
+    # PDF y JSON ya descargados antes (por este u otro descargador)
+    if publicar_desde_almacen(dte, DOWNLOAD_FOLDER):
+        ultimo_dte_exitoso = dte
+        guardar_ultimo_exitoso(dte)
+        anotar_documento(BITACORA, "procesado", dte, {"posicion": idx + 1})
+        return True
+
     try:
-        # Re-obtener la fila
         driver.switch_to.window(ventana_principal)
-        filas = driver.find_elements(
-            By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-        )
-        if idx >= len(filas):
-            print("  ⚠️ La fila ya no está disponible")
-            return False
-        fila = filas[idx]
 
-        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", fila)
-        time.sleep(0.3)
+        if registro.get("data_href"):
+            # Abrir el modal 'Ver' directamente, sin buscar la fila en la grilla
+            if not abrir_modal_desde_href(driver, registro):
+                return False
+        else:
+            # Obtener solo la fila que se va a descargar
+            fila = obtener_fila(driver, "sell_table", idx)
+            if fila is None:
+                print("  ⚠️ La fila ya no está disponible")
+                return False
 
-        # Click en Acciones
-        if not click_acciones_fila(driver, fila):
-            return False
+            driver.execute_script(
+                "arguments[0].scrollIntoView({block: 'center'});", fila
+            )
 
-        # Click en Ver
-        if not click_ver_en_dropdown(driver, fila, wait):
-            return False
+            # Click en Acciones
+            if not click_acciones_fila(driver, fila):
+                return False
+
+            # Click en Ver
+            if not click_ver_en_dropdown(driver, fila, wait):
+                return False
 
         # Click en Impresión del modal
         if not click_impresion_en_modal(driver, wait):
@@ -494,19 +365,15 @@ def procesar_registro_con_modal(driver, fila, idx, ventana_principal, wait):
         if not cambiar_a_nueva_ventana(driver, ventana_principal):
             return False
 
-        time.sleep(0.5)
-
         # Descargar archivos
-        if descargar_pdf_y_json(driver, wait):
+        if descargar_pdf_y_json(driver, wait, dte):
             print("  ✅ Descarga completada correctamente")
             ultimo_dte_exitoso = dte if dte else f"registro_{idx + 1}"
 
             # Guardar inmediatamente el último exitoso
             if dte:
                 guardar_ultimo_exitoso(dte)
-
-            print("  ⏳ Esperando a que se completen las descargas...")
-            time.sleep(2)
+                anotar_documento(BITACORA, "procesado", dte, {"posicion": idx + 1})
 
             # Cerrar ventana de impresión
             print("  🔒 Cerrando ventana de descarga...")
@@ -518,7 +385,6 @@ def procesar_registro_con_modal(driver, fila, idx, ventana_principal, wait):
 
             return True
         else:
-            time.sleep(1)
 
             print("  🔒 Cerrando ventana de descarga...")
             driver.close()
@@ -547,423 +413,377 @@ def procesar_registro_con_modal(driver, fila, idx, ventana_principal, wait):
         return False
 
 
+def agregar_fallido(registro_fallido):
+    """
+    Agrega un registro fallido a la lista y a la bitácora
+    (así no se pierde si la ejecución se corta)
+    """
+    registro_fallido["corregido"] = False
+    registros_fallidos.append(registro_fallido)
+    anotar_documento(BITACORA, "fallido", registro_fallido["dte"], registro_fallido)
+
+
 def guardar_reporte_fallidos():
     """
-    Guarda o actualiza el reporte de registros fallidos en un único archivo
+    Aplica la bitácora al estado de descargas y muestra el total de fallidos
+    (los que ya estaban registrados conservan su marca de corregido)
     """
     if not registros_fallidos:
         return
 
     try:
-        # Cargar registros existentes si el archivo ya existe
-        registros_existentes = []
-        if os.path.exists(ARCHIVO_FALLIDOS):
-            with open(ARCHIVO_FALLIDOS, "r", encoding="utf-8") as f:
-                data_existente = json.load(f)
-                registros_existentes = data_existente.get("registros", [])
-
-        # Agregar nuevos fallidos (evitar duplicados por DTE)
-        dtes_existentes = {r.get("dte") for r in registros_existentes}
-        for nuevo_fallido in registros_fallidos:
-            if nuevo_fallido.get("dte") not in dtes_existentes:
-                nuevo_fallido["corregido"] = False
-                registros_existentes.append(nuevo_fallido)
-
-        # Guardar todo junto
-        with open(ARCHIVO_FALLIDOS, "w", encoding="utf-8") as f:
-            json.dump(
-                {
-                    "fecha_actualizacion": datetime.now().isoformat(),
-                    "total_fallidos": len(registros_existentes),
-                    "registros": registros_existentes,
-                },
-                f,
-                indent=2,
-                ensure_ascii=False,
-            )
-        print(f"\n📄 Reporte de fallidos actualizado: {ARCHIVO_FALLIDOS}")
-        print(f"   Total de registros fallidos: {len(registros_existentes)}")
-        print(f"   Nuevos fallidos agregados: {len(registros_fallidos)}")
+        compactar_bitacora(BITACORA)
+        print(f"\n📄 Reporte de fallidos actualizado: {ESTADO['ruta']}")
+        print(f"   Total de registros fallidos: {contar_documentos(ESTADO, 'fallido')}")
+        print(f"   Fallidos en esta ejecución: {len(registros_fallidos)}")
 
     except Exception as e:
         print(f"⚠️ Error al guardar reporte de fallidos: {e}")
 
 
-try:
-    # Maximizar ventana
-    driver.maximize_window()
-    print("\n🚀 Iniciando navegador...")
+def ejecutar(driver_compartido=None):
+    """
+    Descarga las facturas anuladas de ayer.
 
-    # URL de tu ERP
-    URL_ERP = "https://hermaco.findexbusiness.com"
-    driver.get(URL_ERP)
-    print(f"📍 Navegando a: {URL_ERP}")
+    Args:
+        driver_compartido: Navegador ya abierto (por ejemplo, el del
+            orquestador). Se usa sin cerrarlo; si es None se crea uno propio.
 
-    wait = WebDriverWait(driver, 10)
+    Returns:
+        bool: True si el proceso terminó sin errores
+    """
+    global driver
+    driver = driver_compartido or crear_navegador(DOWNLOAD_FOLDER)
+    exitoso = False
+    reiniciar_metricas()
+    reiniciar_esperas()
+    manifiesto = abrir_manifiesto(DOWNLOAD_FOLDER, "anuladas")
 
-    # Click en "Inicio de sesión"
-    login_link = wait.until(
-        EC.element_to_be_clickable(
-            (By.XPATH, "//a[@href='https://hermaco.findexbusiness.com/login']")
-        )
-    )
-    login_link.click()
-    print("✅ Click en 'Inicio de sesión'")
-
-    time.sleep(2)
-    print("🔄 Rellenando credenciales...")
-
-    # Rellenar usuario
-    username_input = wait.until(EC.presence_of_element_located((By.ID, "username")))
-    username_input.send_keys("Henri")
-    print("✅ Usuario ingresado")
-
-    # Rellenar contraseña
-    password_input = driver.find_element(By.ID, "password")
-    password_input.send_keys("Bajmut")
-    print("✅ Contraseña ingresada")
-
-    # Click en botón de login
-    login_button = driver.find_element(
-        By.XPATH, "//button[@type='submit' and contains(@class, 'btn-primary')]"
-    )
-    login_button.click()
-    print("✅ Click en botón 'Acceder'")
-
-    time.sleep(3)
-    print("✅ Login completado, esperando dashboard...")
-
-    # Navegar a Gestión de ventas
-    print("\n🔄 Navegando a 'Gestión de ventas'...")
-    gestion_ventas = wait.until(EC.element_to_be_clickable((By.ID, "tour_step7_menu")))
-    gestion_ventas.click()
-    print("✅ Click en 'Gestión de ventas' (desplegable abierto)")
-
-    time.sleep(1)
-
-    # Click en "Todas las ventas"
-    todas_ventas = wait.until(
-        EC.element_to_be_clickable(
-            (By.XPATH, "//a[@href='https://hermaco.findexbusiness.com/sells']")
-        )
-    )
-    todas_ventas.click()
-    print("✅ Click en 'Todas las ventas'")
+    try:
+        # Maximizar ventana
+        driver.maximize_window()
+        print("\n🚀 Iniciando navegador...")
 
-    time.sleep(2)
-    print("📍 Estamos en la página de facturas")
+        wait = WebDriverWait(driver, 10)
 
-    # APLICAR FILTROS: 1) Estado = Anulado, 2) Fecha = Ayer, 3) Mostrar = Todos
-    print("\n" + "=" * 60)
-    print("🔧 APLICANDO FILTROS PARA FACTURAS ANULADAS DE AYER")
-    print("=" * 60)
+        # Sesión compartida: reutiliza las cookies guardadas o hace login completo
+        abrir_pagina_autenticada(driver, wait, "/sells")
+        print("📍 Estamos en la página de facturas")
 
-    # Filtro de ESTADO - ANULADO
-    print("\n🔄 Aplicando filtro de estado 'Anulado'...")
-    try:
-        # Click en el selector de estado
-        filtro_estado = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//span[@id='select2-efactura_status-container']")
-            )
-        )
-        filtro_estado.click()
-        print("✅ Click en filtro de estado (desplegable abierto)")
-        time.sleep(1)
+        # APLICAR FILTROS: 1) Estado = Anulado, 2) Fecha = Ayer, 3) Mostrar = Todos
+        print("\n" + "=" * 60)
+        print("🔧 APLICANDO FILTROS PARA FACTURAS ANULADAS DE AYER")
+        print("=" * 60)
 
-        # Buscar y seleccionar "Anulado"
+        # Filtro de ESTADO - ANULADO
+        print("\n🔄 Aplicando filtro de estado 'Anulado'...")
         try:
-            opcion_anulado = wait.until(
+            # Click en el selector de estado
+            filtro_estado = wait.until(
                 EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//li[contains(@class, 'select2-results__option') and contains(text(), 'Anulado')]",
-                    )
+                    (By.XPATH, "//span[@id='select2-efactura_status-container']")
                 )
             )
-            opcion_anulado.click()
-            print("✅ Seleccionado estado 'Anulado'")
-        except:
-            # Intento alternativo
-            search_box = wait.until(
-                EC.presence_of_element_located((By.CLASS_NAME, "select2-search__field"))
-            )
-            search_box.send_keys("Anulado")
-            time.sleep(0.5)
-            search_box.send_keys(Keys.ENTER)
-            print("✅ Seleccionado estado 'Anulado' (mediante búsqueda)")
+            filtro_estado.click()
+            print("✅ Click en filtro de estado (desplegable abierto)")
 
-        time.sleep(2)
-    except Exception as e:
-        print(f"⚠️ Error al aplicar filtro de estado: {e}")
-        print("   Continuando con la ejecución...")
+            # Buscar y seleccionar "Anulado"
+            try:
+                opcion_anulado = wait.until(
+                    EC.element_to_be_clickable(
+                        (
+                            By.XPATH,
+                            "//li[contains(@class, 'select2-results__option') and contains(text(), 'Anulado')]",
+                        )
+                    )
+                )
+                preparar_espera_draw(driver, "sell_table")
+                opcion_anulado.click()
+                print("✅ Seleccionado estado 'Anulado'")
+            except:
+                # Intento alternativo
+                search_box = wait.until(
+                    EC.presence_of_element_located(
+                        (By.CLASS_NAME, "select2-search__field")
+                    )
+                )
+                search_box.send_keys("Anulado")
+                try:
+                    esperar_elemento_visible(
+                        driver,
+                        (
+                            By.XPATH,
+                            "//li[contains(@class, 'select2-results__option') and contains(text(), 'Anulado')]",
+                        ),
+                        timeout=5,
+                    )
+                except Exception:
+                    pass
+                preparar_espera_draw(driver, "sell_table")
+                search_box.send_keys(Keys.ENTER)
+                print("✅ Seleccionado estado 'Anulado' (mediante búsqueda)")
 
-    # Filtro de fecha - AYER
-    print("\n🔄 Abriendo filtro de fecha...")
-    try:
-        filtro_fecha = wait.until(
-            EC.element_to_be_clickable((By.ID, "sell_date_filter"))
-        )
-        filtro_fecha.click()
-        print("✅ Click en 'Filtrar por fecha' (desplegable abierto)")
+            esperar_draw_tabla(driver, "sell_table")
+        except Exception as e:
+            print(f"⚠️ Error al aplicar filtro de estado: {e}")
+            print("   Continuando con la ejecución...")
 
-        time.sleep(2)
+        # Filtro de fecha - AYER
+        print("\n🔄 Abriendo filtro de fecha...")
         try:
-            ayer = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//li[contains(text(), 'Ayer')] | //a[contains(text(), 'Ayer')] | //span[contains(text(), 'Ayer')]",
+            filtro_fecha = wait.until(
+                EC.element_to_be_clickable((By.ID, "sell_date_filter"))
+            )
+            filtro_fecha.click()
+            print("✅ Click en 'Filtrar por fecha' (desplegable abierto)")
+            try:
+                ayer = wait.until(
+                    EC.element_to_be_clickable(
+                        (
+                            By.XPATH,
+                            "//li[contains(text(), 'Ayer')] | //a[contains(text(), 'Ayer')] | //span[contains(text(), 'Ayer')]",
+                        )
                     )
                 )
+                preparar_espera_draw(driver, "sell_table")
+                ayer.click()
+                print("✅ Seleccionado 'Ayer'")
+            except:
+                print("⚠️ No se encontró 'Ayer'. Continuando...")
+
+            esperar_draw_tabla(driver, "sell_table")
+        except Exception as e:
+            print(f"⚠️ Error al aplicar filtro de fecha: {e}")
+            print("   Continuando con la ejecución...")
+
+        registros_tabla = None
+        if LISTADO_POR_ENDPOINT:
+            # Listado directo desde el endpoint JSON de la tabla (mismos filtros)
+            print("\n🔄 Listando registros desde el endpoint de la tabla...")
+            registros_tabla = listar_registros_datatable(driver, "sell_table")
+
+        if registros_tabla is None:
+            # Mostrar TODOS los registros
+            print("\n🔄 Cambiando filtro a mostrar TODOS los registros...")
+            select_length = wait.until(
+                EC.presence_of_element_located((By.NAME, "sell_table_length"))
             )
-            ayer.click()
-            print("✅ Seleccionado 'Ayer'")
-        except:
-            print("⚠️ No se encontró 'Ayer'. Continuando...")
+            preparar_espera_draw(driver, "sell_table")
+            try:
+                # Buscar la opción "Todos" o "-1" como valor
+                select_obj = Select(select_length)
+                opciones = [
+                    option.get_attribute("value") for option in select_obj.options
+                ]
+                print(f"  📋 Opciones disponibles: {opciones}")
+
+                # Intentar seleccionar "Todos" (puede ser "-1" o "all")
+                if "-1" in opciones:
+                    Select(select_length).select_by_value("-1")
+                    print("✅ Seleccionado mostrar TODOS los registros")
+                elif "all" in opciones:
+                    Select(select_length).select_by_value("all")
+                    print("✅ Seleccionado mostrar TODOS los registros")
+                else:
+                    # Si no existe "Todos", usar el valor más alto
+                    valores_numericos = [int(v) for v in opciones if v.isdigit()]
+                    if valores_numericos:
+                        max_valor = str(max(valores_numericos))
+                        Select(select_length).select_by_value(max_valor)
+                        print(
+                            f"✅ Seleccionado mostrar {max_valor} registros (máximo disponible)"
+                        )
+                    else:
+                        print(
+                            "⚠️ No se pudo determinar cómo mostrar todos los registros"
+                        )
+            except Exception as e:
+                print(f"  ❌ No se pudo cambiar el tamaño de página: {e}")
+
+            # Esperar a que la tabla dibuje los registros
+
+            print("⏳ Esperando a que carguen los registros...")
+
+            esperar_draw_tabla(driver, "sell_table")
+            print("✅ Registros cargados")
+
+            # Foto de la grilla: todas las filas en una sola llamada al navegador
+            print("\n🔄 Leyendo registros de la tabla...")
+            registros_tabla = extraer_registros_tabla(driver, "sell_table")
+        total_filas = len(registros_tabla)
+
+        # Cargar el último DTE exitoso
+        ultimo_dte_cargado = cargar_ultimo_exitoso()
+        print(f"\n📊 Total de registros anulados en tabla: {total_filas}")
+
+        if total_filas == 0:
+            print("⚠️ No hay registros anulados para procesar de ayer")
+            print("✅ Todo actualizado - no hay facturas anuladas de ayer")
+
+            # Actualizar el JSON con el estado
+            if ultimo_dte_cargado:
+                guardar_ultimo_exitoso(ultimo_dte_cargado, tiene_descargas_nuevas=False)
 
-        time.sleep(3)
-    except Exception as e:
-        print(f"⚠️ Error al aplicar filtro de fecha: {e}")
-        print("   Continuando con la ejecución...")
-
-    # Mostrar TODOS los registros
-    print("\n🔄 Cambiando filtro a mostrar TODOS los registros...")
-    select_length = wait.until(
-        EC.presence_of_element_located((By.NAME, "sell_table_length"))
-    )
-    try:
-        # Buscar la opción "Todos" o "-1" como valor
-        select_obj = Select(select_length)
-        opciones = [option.get_attribute("value") for option in select_obj.options]
-        print(f"  📋 Opciones disponibles: {opciones}")
-
-        # Intentar seleccionar "Todos" (puede ser "-1" o "all")
-        if "-1" in opciones:
-            Select(select_length).select_by_value("-1")
-            print("✅ Seleccionado mostrar TODOS los registros")
-        elif "all" in opciones:
-            Select(select_length).select_by_value("all")
-            print("✅ Seleccionado mostrar TODOS los registros")
-        else:
-            # Si no existe "Todos", usar el valor más alto
-            valores_numericos = [int(v) for v in opciones if v.isdigit()]
-            if valores_numericos:
-                max_valor = str(max(valores_numericos))
-                Select(select_length).select_by_value(max_valor)
-                print(
-                    f"✅ Seleccionado mostrar {max_valor} registros (máximo disponible)"
-                )
-            else:
-                print("⚠️ No se pudo determinar cómo mostrar todos los registros")
-    except Exception as e:
-        print(f"  ❌ No se pudo cambiar el tamaño de página: {e}")
+            return True
 
-    # Dar tiempo a que carguen los registros
-    print("⏳ Esperando 5 segundos a que carguen los registros...")
-    time.sleep(5)
-    print("✅ Registros cargados")
+        # Determinar desde dónde empezar
+        indice_inicio = None
 
-    # Hacer scroll al final de la tabla
-    print("\n🔄 Desplazando al final de la página...")
-    try:
-        # Obtener todas las filas
-        filas = driver.find_elements(
-            By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-        )
-        if filas:
-            ultima_fila = filas[-1]
-            driver.execute_script(
-                "arguments[0].scrollIntoView({block: 'center'});", ultima_fila
+        if ultimo_dte_cargado:
+            print(f"\n🔍 Buscando último DTE procesado: {ultimo_dte_cargado}")
+            indice_ultimo = indexar_registros(registros_tabla, "dte").get(
+                ultimo_dte_cargado
             )
-            time.sleep(1)
-            print(f"✅ Desplazado al final de la tabla ({len(filas)} registros)")
-        else:
-            print("⚠️ No se encontraron registros en la tabla")
-    except Exception as e:
-        print(f"⚠️ Error al hacer scroll: {e}")
-
-    # Cargar el último DTE exitoso
-    ultimo_dte_cargado = cargar_ultimo_exitoso()
 
-    # Obtener todas las filas
-    filas = driver.find_elements(
-        By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-    )
-    total_filas = len(filas)
-    print(f"\n📊 Total de registros anulados en tabla: {total_filas}")
+            if indice_ultimo is not None:
+                # Empezar desde el ANTERIOR al último procesado (hacia arriba/más reciente)
+                indice_inicio = indice_ultimo - 1
+                print(
+                    f"✅ Se continuará desde el índice {indice_inicio} (anterior al último procesado)"
+                )
+            else:
+                print("⚠️ No se encontró el último DTE procesado")
+                print("   Se procesará desde el final de la tabla")
+                indice_inicio = total_filas - 1
+        else:
+            # Si no hay último exitoso, empezar desde el final
+            indice_inicio = total_filas - 1
+            print(f"📍 Comenzando desde el final de la tabla (índice {indice_inicio})")
 
-    if total_filas == 0:
-        print("⚠️ No hay registros anulados para procesar de ayer")
-        print("✅ Todo actualizado - no hay facturas anuladas de ayer")
+        # Validar que hay registros para procesar
+        if indice_inicio < 0:
+            print("⚠️ No hay registros nuevos para procesar")
+            return True
 
-        # Actualizar el JSON con el estado
-        if ultimo_dte_cargado:
-            guardar_ultimo_exitoso(ultimo_dte_cargado, tiene_descargas_nuevas=False)
+        registros_a_procesar = indice_inicio + 1
+        print(f"\n✅ Se procesarán {registros_a_procesar} registros:")
+        print(f"   Desde índice: {indice_inicio} (último registro) - HACIA ARRIBA")
+        print(f"   Hasta índice: 0 (primer registro)")
+        print(f"   Dirección: ⬆️ Hacia registros más recientes (índices menores)")
 
-        driver.quit()
-        print("\n👋 Navegador cerrado")
-        exit(0)
+        # Procesamiento de registros
+        print("\n" + "=" * 60)
+        print("🚀 INICIANDO PROCESAMIENTO DE FACTURAS ANULADAS DE AYER")
+        print("=" * 60)
 
-    # Determinar desde dónde empezar
-    indice_inicio = None
+        ventana_principal = driver.current_window_handle
+        registros_procesados = 0
+        registros_exitosos = 0
 
-    if ultimo_dte_cargado:
-        print(f"\n🔍 Buscando último DTE procesado: {ultimo_dte_cargado}")
-        indice_ultimo = buscar_dte_con_ctrl_f(driver, ultimo_dte_cargado)
+        # Procesar desde indice_inicio hacia arriba (índices menores)
+        for idx in range(indice_inicio, -1, -1):
+            try:
+                driver.switch_to.window(ventana_principal)
+                registros_procesados += 1
 
-        if indice_ultimo is not None:
-            # Empezar desde el ANTERIOR al último procesado (hacia arriba/más reciente)
-            indice_inicio = indice_ultimo - 1
-            print(
-                f"✅ Se continuará desde el índice {indice_inicio} (anterior al último procesado)"
-            )
-        else:
-            print("⚠️ No se encontró el último DTE procesado")
-            print("   Se procesará desde el final de la tabla")
-            indice_inicio = total_filas - 1
-    else:
-        # Si no hay último exitoso, empezar desde el final
-        indice_inicio = total_filas - 1
-        print(f"📍 Comenzando desde el final de la tabla (índice {indice_inicio})")
-
-    # Validar que hay registros para procesar
-    if indice_inicio < 0:
-        print("⚠️ No hay registros nuevos para procesar")
-        driver.quit()
-        exit(0)
-
-    registros_a_procesar = indice_inicio + 1
-    print(f"\n✅ Se procesarán {registros_a_procesar} registros:")
-    print(f"   Desde índice: {indice_inicio} (último registro) - HACIA ARRIBA")
-    print(f"   Hasta índice: 0 (primer registro)")
-    print(f"   Dirección: ⬆️ Hacia registros más recientes (índices menores)")
-
-    # Procesamiento de registros
-    print("\n" + "=" * 60)
-    print("🚀 INICIANDO PROCESAMIENTO DE FACTURAS ANULADAS DE AYER")
-    print("=" * 60)
-
-    ventana_principal = driver.current_window_handle
-    registros_procesados = 0
-    registros_exitosos = 0
-
-    # Procesar desde indice_inicio hacia arriba (índices menores)
-    for idx in range(indice_inicio, -1, -1):
-        try:
-            driver.switch_to.window(ventana_principal)
-            registros_procesados += 1
+                print(
+                    f"\n📄 Procesando registro {registros_procesados}/{registros_a_procesar} (índice {idx}) ..."
+                )
 
-            print(
-                f"\n📄 Procesando registro {registros_procesados}/{registros_a_procesar} (índice {idx}) ..."
-            )
+                registro = registros_tabla[idx]
+                dte = registro["dte"]
+                fecha = registro["fecha"]
 
-            # Re-obtener las filas
-            filas = driver.find_elements(
-                By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-            )
-            if idx >= len(filas):
-                print(f"  ⚠️ Registro {idx} ya no está disponible")
-                continue
-            fila = filas[idx]
+                # Procesar con el flujo de modal
+                exito = procesar_registro_con_modal(
+                    driver, registro, ventana_principal, wait
+                )
 
-            # Procesar con el flujo de modal
-            exito = procesar_registro_con_modal(
-                driver, fila, idx, ventana_principal, wait
-            )
+                if exito:
+                    registros_exitosos += 1
+                    print(
+                        f"  ✅ Registro procesado exitosamente ({registros_exitosos}/{registros_procesados})"
+                    )
+                else:
+                    agregar_fallido(
+                        {
+                            "posicion": idx + 1,
+                            "dte": dte if dte else f"registro_{idx + 1}",
+                            "fecha": fecha if fecha else "desconocida",
+                            "error": "No se pudo completar la descarga",
+                            "timestamp": datetime.now().isoformat(),
+                        }
+                    )
 
-            if exito:
-                registros_exitosos += 1
-                print(
-                    f"  ✅ Registro procesado exitosamente ({registros_exitosos}/{registros_procesados})"
-                )
-            else:
-                dte = extraer_dte_de_fila(fila)
-                fecha = extraer_fecha_de_fila(fila)
-                registros_fallidos.append(
+            except Exception as e:
+                print(f"  ❌ Error crítico en registro {idx}: {e}")
+                dte = registros_tabla[idx]["dte"]
+                fecha = registros_tabla[idx]["fecha"]
+                agregar_fallido(
                     {
                         "posicion": idx + 1,
                         "dte": dte if dte else f"registro_{idx + 1}",
                         "fecha": fecha if fecha else "desconocida",
-                        "error": "No se pudo completar la descarga",
+                        "error": str(e),
                         "timestamp": datetime.now().isoformat(),
                     }
                 )
+                try:
+                    if len(driver.window_handles) > 1:
+                        for handle in driver.window_handles:
+                            if handle != ventana_principal:
+                                driver.switch_to.window(handle)
+                                driver.close()
+                    driver.switch_to.window(ventana_principal)
+                    cerrar_modal_si_esta_abierto(driver)
+                except:
+                    pass
+                continue
 
-        except Exception as e:
-            print(f"  ❌ Error crítico en registro {idx}: {e}")
-            filas_actuales = driver.find_elements(
-                By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-            )
-            dte = (
-                extraer_dte_de_fila(filas_actuales[idx])
-                if idx < len(filas_actuales)
-                else None
-            )
-            fecha = (
-                extraer_fecha_de_fila(filas_actuales[idx])
-                if idx < len(filas_actuales)
-                else None
-            )
-            registros_fallidos.append(
-                {
-                    "posicion": idx + 1,
-                    "dte": dte if dte else f"registro_{idx + 1}",
-                    "fecha": fecha if fecha else "desconocida",
-                    "error": str(e),
-                    "timestamp": datetime.now().isoformat(),
-                }
-            )
-            try:
-                if len(driver.window_handles) > 1:
-                    for handle in driver.window_handles:
-                        if handle != ventana_principal:
-                            driver.switch_to.window(handle)
-                            driver.close()
-                driver.switch_to.window(ventana_principal)
-                cerrar_modal_si_esta_abierto(driver)
-            except:
-                pass
-            continue
-
-    print(f"\n{'='*60}")
-    print(f"🎉 PROCESAMIENTO COMPLETADO")
-    print(f"{'='*60}")
-    print(f"📊 RESUMEN:")
-    print(f"   Total de registros procesados: {registros_procesados}")
-    print(f"   ✅ Registros exitosos: {registros_exitosos}")
-    print(f"   ❌ Registros fallidos: {len(registros_fallidos)}")
-    if ultimo_dte_exitoso:
-        print(f"   🏷️ Último DTE exitoso: {ultimo_dte_exitoso}")
-    print(f"\n📁 Archivos descargados en: {DOWNLOAD_FOLDER}")
-
-    # Guardar reporte de fallidos
-    guardar_reporte_fallidos()
-
-    # Actualizar estado según si hubo descargas nuevas
-    if registros_exitosos > 0:
-        print(
-            f"\n📥 Estado: Todo actualizado - nuevas descargas ({registros_exitosos} archivos)"
-        )
-    else:
-        print(f"\nℹ️ Estado: Todo actualizado - no hay facturas anuladas nuevas de ayer")
-        # Si no hay registros nuevos, actualizar el JSON con el último conocido
+        print(f"\n{'='*60}")
+        print(f"🎉 PROCESAMIENTO COMPLETADO")
+        print(f"{'='*60}")
+        print(f"📊 RESUMEN:")
+        print(f"   Total de registros procesados: {registros_procesados}")
+        print(f"   ✅ Registros exitosos: {registros_exitosos}")
+        print(f"   ❌ Registros fallidos: {len(registros_fallidos)}")
         if ultimo_dte_exitoso:
-            guardar_ultimo_exitoso(ultimo_dte_exitoso, tiene_descargas_nuevas=False)
+            print(f"   🏷️ Último DTE exitoso: {ultimo_dte_exitoso}")
+        print(f"\n📁 Archivos descargados en: {DOWNLOAD_FOLDER}")
 
-    print("\n✅ Proceso completado. El navegador se cerrará automáticamente...")
+        # Guardar reporte de fallidos
+        guardar_reporte_fallidos()
 
-except KeyboardInterrupt:
-    print("\n\n⚠️ Ejecución interrumpida por el usuario")
-    guardar_reporte_fallidos()
-    print("📊 Reportes guardados antes de salir")
+        # Actualizar estado según si hubo descargas nuevas
+        if registros_exitosos > 0:
+            print(
+                f"\n📥 Estado: Todo actualizado - nuevas descargas ({registros_exitosos} archivos)"
+            )
+        else:
+            print(
+                f"\nℹ️ Estado: Todo actualizado - no hay facturas anuladas nuevas de ayer"
+            )
+            # Si no hay registros nuevos, actualizar el JSON con el último conocido
+            if ultimo_dte_exitoso:
+                guardar_ultimo_exitoso(ultimo_dte_exitoso, tiene_descargas_nuevas=False)
 
-except Exception as e:
-    print(f"❌ Error: {e}")
-    print("\n📊 Detalles del error:")
-    traceback.print_exc()
-    guardar_reporte_fallidos()
+        print("\n✅ Proceso completado. El navegador se cerrará automáticamente...")
+        exitoso = True
 
-finally:
-    driver.quit()
-    print("\n👋 Navegador cerrado")
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Ejecución interrumpida por el usuario")
+        guardar_reporte_fallidos()
+        print("📊 Reportes guardados antes de salir")
+        if driver_compartido is not None:
+            raise
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        print("\n📊 Detalles del error:")
+        traceback.print_exc()
+        guardar_reporte_fallidos()
+
+    finally:
+        compactar_bitacora(BITACORA)
+        cerrar_manifiesto(manifiesto)
+        imprimir_resumen_esperas()
+        guardar_reporte_pasos(DOWNLOAD_FOLDER, "anuladas")
+        # El navegador compartido lo cierra quien lo creó
+        if driver_compartido is None:
+            driver.quit()
+            print("\n👋 Navegador cerrado")
+    return exitoso
+
+
+if __name__ == "__main__":
+    ejecutar()
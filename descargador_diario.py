@@ -1,12 +1,49 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
+from descarga_http import descargar_pdf_y_json_http
+from almacen_descargas import publicar_desde_almacen
+from estado_descargas import (
+    abrir_estado,
+    ultimo_punto_control,
+    contar_documentos,
+)
+from bitacora_descargas import (
+    abrir_bitacora,
+    anotar_documento,
+    anotar_punto_control,
+    compactar_bitacora,
+)
+from sesion_erp import abrir_pagina_autenticada, crear_navegador
+from extraccion_tabla import extraer_registros_tabla, indexar_registros, obtener_fila
+from listado_datatables import listar_registros_datatable, abrir_modal_desde_href
+from pestanas_impresion import procesar_en_pestanas, PESTANAS_EN_VUELO
+from seguimiento_descargas import (
+    descargar_pdf_y_json_chrome,
+)
+from manifiesto_descargas import (
+    abrir_manifiesto,
+    cerrar_manifiesto,
+    archivos_de_documento,
+)
+from metricas_pasos import paso, reiniciar_metricas, guardar_reporte_pasos
+from esperas import (
+    esperar_dropdown_visible,
+    esperar_modal_visible,
+    esperar_modal_cerrado,
+    esperar_nueva_ventana,
+    preparar_espera_draw,
+    esperar_draw_tabla,
+    imprimir_resumen_esperas,
+    reiniciar_esperas,
+)
 import time
 import os
-import json
+import queue
+import argparse
+import threading
 import traceback
 from datetime import datetime
 
@@ -14,44 +51,78 @@ from datetime import datetime
 DOWNLOAD_FOLDER = r"C:\Users\H01ventas05\Desktop\extractor-facturas-selenium-hermaco-main\descargas_diarias"
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
-# Configuración de Chrome para descargas automáticas
-chrome_options = webdriver.ChromeOptions()
-prefs = {
-    "download.default_directory": DOWNLOAD_FOLDER,
-    "download.prompt_for_download": False,
-    "download.directory_upgrade": True,
-    "plugins.always_open_pdf_externally": True,
-    "safebrowsing.enabled": True,
-}
-chrome_options.add_experimental_option("prefs", prefs)
-chrome_options.add_argument("--headless=new")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--window-size=1920,1080")
-
-# Inicializar el navegador
-driver = webdriver.Chrome(options=chrome_options)
+# Modo de descarga: True = PDF/JSON por HTTP directo con las cookies de Selenium,
+# False = clicks en los enlaces de la ventana de impresión (gestor de Chrome)
+DESCARGA_DIRECTA_HTTP = True
+
+# Listado: True = filas pedidas al endpoint JSON de la tabla (con los filtros
+# de la página), False = mostrar "Todos" y leer la grilla dibujada
+LISTADO_POR_ENDPOINT = True
+
+# Trabajadores en paralelo (un Chrome headless cada uno); 1 = modo secuencial
+parser = argparse.ArgumentParser(description="Descarga las facturas del día")
+parser.add_argument(
+    "-w",
+    "--trabajadores",
+    "--workers",
+    type=int,
+    default=1,
+    help="Cantidad de navegadores descargando en paralelo (por defecto 1)",
+)
+parser.add_argument(
+    "-p",
+    "--pestanas",
+    type=int,
+    default=1,
+    help=(
+        "Ventanas de impresión abiertas a la vez en cada navegador "
+        f"(por defecto 1; {PESTANAS_EN_VUELO} es un buen valor)"
+    ),
+)
+parser.add_argument(
+    "--fecha",
+    choices=["hoy", "ayer"],
+    default="hoy",
+    help="Facturas de hoy (por defecto) o del día anterior",
+)
+# Se leen al ejecutar el script; importado (orquestador) se usan los de ejecutar()
+TRABAJADORES = 1
+PESTANAS = 1
+
+# Opción del filtro de fecha de la tabla para cada valor de --fecha
+FILTROS_FECHA = {"hoy": "Hoy", "ayer": "Ayer"}
+
+
+# Navegador del script (lo crea ejecutar() o lo recibe del orquestador)
+driver = None
 
 # Variables globales
 registros_fallidos = []
 ultimo_dte_exitoso = None
-ARCHIVO_FALLIDOS = os.path.join(DOWNLOAD_FOLDER, "reporte_fallidos.json")
+# Último exitoso y fallidos (importa los JSON anteriores la primera vez)
+ESTADO = abrir_estado(DOWNLOAD_FOLDER, "facturas")
+BITACORA = abrir_bitacora(ESTADO)
+
+# Resultados compartidos entre trabajadores (protegidos por el candado)
+candado_resultados = threading.Lock()
+resultados_pendientes = {}
+siguiente_orden = 0
+registros_exitosos = 0
+registros_anulados_ignorados = 0
+estadisticas_trabajadores = {}
 
 
 def cargar_ultimo_exitoso():
     """
-    Carga el último DTE exitoso desde el archivo JSON
+    Carga el último DTE exitoso desde el estado de descargas
     """
-    archivo = os.path.join(DOWNLOAD_FOLDER, "ultimo_exitoso.json")
     try:
-        if os.path.exists(archivo):
-            with open(archivo, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                print(f"📂 Último DTE exitoso cargado: {data.get('ultimo_dte', 'N/A')}")
-                return data.get("ultimo_dte")
+        punto = ultimo_punto_control(ESTADO)
+        if punto:
+            print(f"📂 Último DTE exitoso cargado: {punto['valor']}")
+            return punto["valor"]
         else:
-            print("📂 No hay archivo de último exitoso. Comenzando desde el principio.")
+            print("📂 No hay último exitoso guardado. Comenzando desde el principio.")
             return None
     except Exception as e:
         print(f"⚠️ Error al cargar último exitoso: {e}")
@@ -60,144 +131,21 @@ def cargar_ultimo_exitoso():
 
 def guardar_ultimo_exitoso(dte, tiene_descargas_nuevas=True):
     """
-    Guarda el último DTE exitoso en el archivo JSON
+    Anota el último DTE exitoso en la bitácora de progreso
     """
-    archivo = os.path.join(DOWNLOAD_FOLDER, "ultimo_exitoso.json")
     try:
-        fecha_actual = datetime.now()
         estado = (
             "Todo actualizado - nuevas descargas"
             if tiene_descargas_nuevas
             else "Todo actualizado - nada nuevo"
         )
-        data = {
-            "ultima_ejecucion": fecha_actual.strftime("%Y-%m-%d %H:%M:%S"),
-            "fecha_actualizacion": fecha_actual.isoformat(),
-            "ultimo_dte": dte,
-            "estado": estado,
-        }
-        with open(archivo, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        anotar_punto_control(BITACORA, dte, estado)
         print(f"💾 Último DTE guardado: {dte}")
     except Exception as e:
         print(f"⚠️ Error al guardar último exitoso: {e}")
 
 
-def buscar_dte_con_ctrl_f(driver, dte_buscado):
-    """
-    Busca un DTE específico usando Ctrl+F y retorna su índice si lo encuentra
-    """
-    try:
-        print(f"🔍 Buscando DTE: {dte_buscado}")
-
-        # Abrir búsqueda con Ctrl+F
-        actions = ActionChains(driver)
-        actions.key_down(Keys.CONTROL).send_keys("f").key_up(Keys.CONTROL).perform()
-        time.sleep(0.5)
-
-        # Escribir el DTE
-        actions.send_keys(dte_buscado).perform()
-        time.sleep(1)
-
-        # Presionar Enter
-        actions.send_keys(Keys.ENTER).perform()
-        time.sleep(2)
-
-        # Cerrar búsqueda
-        actions.send_keys(Keys.ESCAPE).perform()
-        time.sleep(0.5)
-
-        # Buscar la celda con el DTE
-        try:
-            celda_dte = driver.find_element(
-                By.XPATH, f"//td[contains(normalize-space(.), '{dte_buscado}')]"
-            )
-            fila = celda_dte.find_element(By.XPATH, "./ancestor::tr[@role='row']")
-
-            # Hacer scroll a la fila
-            driver.execute_script(
-                "arguments[0].scrollIntoView({block: 'center'});", fila
-            )
-            time.sleep(0.5)
-
-            # Obtener el índice
-            filas = driver.find_elements(
-                By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-            )
-            for idx, f in enumerate(filas):
-                if f == fila:
-                    print(f"✅ DTE encontrado en índice: {idx}")
-                    return idx
-
-            print("⚠️ DTE encontrado pero no se pudo determinar el índice")
-            return None
-
-        except Exception:
-            print(f"❌ DTE no encontrado en la tabla")
-            return None
-
-    except Exception as e:
-        print(f"❌ Error al buscar DTE: {e}")
-        return None
-
-
-def extraer_dte_de_fila(fila):
-    """
-    Extrae el DTE de una fila
-    """
-    try:
-        celda = fila.find_element(
-            By.XPATH, ".//td[contains(normalize-space(.), 'DTE-')]"
-        )
-        dte = celda.text.strip()
-        if dte and "DTE-" in dte:
-            return dte
-    except Exception:
-        pass
-    return None
-
-
-def extraer_fecha_de_fila(fila):
-    """
-    Extrae la fecha de una fila
-    """
-    try:
-        celdas = fila.find_elements(By.TAG_NAME, "td")
-        for celda in celdas:
-            texto = celda.text.strip()
-            if "/" in texto and any(char.isdigit() for char in texto):
-                return texto
-    except Exception:
-        pass
-    return None
-
-
-def verificar_si_esta_anulada(fila):
-    """
-    Verifica si una factura está anulada revisando:
-    1. Estado de Documento = "Anulada"
-    2. Estado de pago = "Debido (Anulada)"
-    Retorna True si está anulada, False si no lo está
-    """
-    try:
-        celdas = fila.find_elements(By.TAG_NAME, "td")
-
-        for celda in celdas:
-            texto = celda.text.strip().lower()
-
-            # Verificar si contiene "anulada" o "debido (anulada)"
-            if "anulada" in texto:
-                # Puede ser "Anulada" o "Debido (Anulada)"
-                print(f"  🚫 Factura anulada detectada: {celda.text.strip()}")
-                return True
-
-    except Exception as e:
-        print(f"  ⚠️ Error al verificar estado de anulación: {e}")
-        return False
-
-    return False
-
-
+@paso("acciones")
 def click_acciones_fila(driver, fila):
     """
     Hace click en el botón de Acciones de la fila
@@ -207,7 +155,6 @@ def click_acciones_fila(driver, fila):
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", boton_acciones
         )
-        time.sleep(0.2)
 
         try:
             boton_acciones.click()
@@ -215,7 +162,6 @@ def click_acciones_fila(driver, fila):
             driver.execute_script("arguments[0].click();", boton_acciones)
 
         print("  ✅ Click en 'Acciones'")
-        time.sleep(0.5)
         return True
 
     except Exception as e:
@@ -223,20 +169,13 @@ def click_acciones_fila(driver, fila):
         return False
 
 
+@paso("ver_modal")
 def click_ver_en_dropdown(driver, fila, wait):
     """
     Hace click en la opción 'Ver' del dropdown de acciones
     """
     try:
-
-        def obtener_menu_visible(_):
-            menus = fila.find_elements(
-                By.XPATH, ".//ul[contains(@class,'dropdown-menu')]"
-            )
-            visibles = [m for m in menus if m.is_displayed()]
-            return visibles[0] if visibles else False
-
-        menu = WebDriverWait(driver, 5).until(obtener_menu_visible)
+        menu = esperar_dropdown_visible(driver, fila)
 
         boton_ver = menu.find_element(
             By.XPATH, ".//a[@class='btn-modal' and contains(., 'Ver')]"
@@ -245,7 +184,6 @@ def click_ver_en_dropdown(driver, fila, wait):
         driver.execute_script(
             "arguments[0].scrollIntoView({block:'nearest'});", boton_ver
         )
-        time.sleep(0.2)
 
         try:
             boton_ver.click()
@@ -253,7 +191,6 @@ def click_ver_en_dropdown(driver, fila, wait):
             driver.execute_script("arguments[0].click();", boton_ver)
 
         print("  ✅ Click en 'Ver'")
-        time.sleep(1)
         return True
 
     except Exception as e:
@@ -261,26 +198,15 @@ def click_ver_en_dropdown(driver, fila, wait):
         return False
 
 
+@paso("impresion")
 def click_impresion_en_modal(driver, wait):
     """
     Hace click en el botón 'Impresión' del modal flotante
     """
     try:
         print("  ⏳ Esperando que aparezca el modal...")
-        modal = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "modal-content"))
-        )
-
+        modal = esperar_modal_visible(driver)
         print("  ✅ Modal de detalles abierto")
-        time.sleep(2)
-
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "modal-footer"))
-            )
-            print("  ✓ Footer del modal cargado")
-        except:
-            print("  ⚠️ Footer del modal no encontrado, continuando...")
 
         boton_impresion = None
 
@@ -329,7 +255,6 @@ def click_impresion_en_modal(driver, wait):
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", boton_impresion
         )
-        time.sleep(0.5)
 
         try:
             boton_impresion.click()
@@ -337,7 +262,6 @@ def click_impresion_en_modal(driver, wait):
             driver.execute_script("arguments[0].click();", boton_impresion)
 
         print("  ✅ Click en 'Impresión' del modal")
-        time.sleep(0.5)
         return True
 
     except Exception as e:
@@ -345,74 +269,32 @@ def click_impresion_en_modal(driver, wait):
         return False
 
 
+@paso("ventana_impresion")
 def cambiar_a_nueva_ventana(driver, ventana_original):
     """Cambia el contexto a la nueva ventana abierta"""
     try:
-        WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) > 1)
-        for ventana in driver.window_handles:
-            if ventana != ventana_original:
-                driver.switch_to.window(ventana)
-                print("  ✅ Cambiado a nueva ventana de impresión")
-                return True
-        return False
+        ventana = esperar_nueva_ventana(driver, ventana_original)
+        driver.switch_to.window(ventana)
+        print("  ✅ Cambiado a nueva ventana de impresión")
+        return True
     except Exception as e:
         print(f"  ❌ Error al cambiar de ventana: {e}")
         return False
 
 
-def descargar_pdf_y_json(driver, wait):
+@paso("descarga")
+def descargar_pdf_y_json(driver, wait, dte=None, carpeta=DOWNLOAD_FOLDER):
     """
     Descarga PDF y JSON de la ventana actual
     """
-    descargas_exitosas = 0
+    if DESCARGA_DIRECTA_HTTP:
+        return descargar_pdf_y_json_http(driver, wait, carpeta, dte)
 
-    try:
-        # Descargar PDF
-        try:
-            boton_pdf = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//a[@class='btn-download-action' and contains(@href, '/pdf/')]",
-                    )
-                )
-            )
-            boton_pdf.click()
-            print("  ⬇️ Click en descarga PDF...")
-            descargas_exitosas += 1
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"  ⚠️ No se pudo hacer click en PDF: {e}")
-
-        # Descargar JSON
-        try:
-            boton_json = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//a[@class='btn-download-action' and contains(@href, '/json/')]",
-                    )
-                )
-            )
-            boton_json.click()
-            print("  ⬇️ Click en descarga JSON...")
-            descargas_exitosas += 1
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"  ⚠️ No se pudo hacer click en JSON: {e}")
-
-        if descargas_exitosas == 2:
-            print("  🎉 Ambas descargas iniciadas")
-            return True
-        else:
-            print(f"  ⚠️ Solo se ejecutaron {descargas_exitosas}/2 descargas")
-            return False
-
-    except Exception as e:
-        print(f"  ❌ Error al iniciar descargas: {e}")
-        return False
+    # Gestor de descargas de Chrome, con seguimiento por eventos de DevTools
+    return descargar_pdf_y_json_chrome(driver, wait, carpeta, dte)
 
 
+@paso("cierre_modal", por_resultado=False)
 def cerrar_modal_si_esta_abierto(driver):
     """
     Cierra el modal si está abierto
@@ -431,7 +313,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 )
                 boton_cerrar.click()
                 print("  ✅ Modal cerrado (botón 'Cerrar')")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -444,7 +326,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 )
                 boton_cerrar.click()
                 print("  ✅ Modal cerrado (data-dismiss)")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -457,7 +339,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 )
                 boton_x.click()
                 print("  ✅ Modal cerrado (botón X)")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -467,7 +349,7 @@ def cerrar_modal_si_esta_abierto(driver):
                 actions = ActionChains(driver)
                 actions.send_keys(Keys.ESCAPE).perform()
                 print("  ✅ Modal cerrado (tecla ESC)")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -478,31 +360,30 @@ def cerrar_modal_si_esta_abierto(driver):
         return True
 
 
-def procesar_registro_con_modal(driver, fila, idx, ventana_principal, wait):
+def abrir_impresion_registro(driver, registro, wait):
     """
-    Procesa un registro usando el flujo de modal (Ver -> Modal -> Impresión)
+    Abre el modal 'Ver' del registro y hace click en 'Impresión'.
+    La ventana de impresión queda abierta; el driver sigue en la ventana actual.
     """
-    global ultimo_dte_exitoso
-
-    dte = extraer_dte_de_fila(fila)
+    idx = registro["indice"]
+    dte = registro["dte"]
     if dte:
         print(f"  🏷️ DTE detectado: {dte}")
     else:
         print("  ⚠️ No se pudo detectar DTE en la fila")
 
-    try:
-        # Re-obtener la fila
-        driver.switch_to.window(ventana_principal)
-        filas = driver.find_elements(
-            By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-        )
-        if idx >= len(filas):
+    if registro.get("data_href"):
+        # Abrir el modal 'Ver' directamente, sin buscar la fila en la grilla
+        if not abrir_modal_desde_href(driver, registro):
+            return False
+    else:
+        # Obtener solo la fila que se va a descargar
+        fila = obtener_fila(driver, "sell_table", idx)
+        if fila is None:
             print("  ⚠️ La fila ya no está disponible")
             return False
-        fila = filas[idx]
 
         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", fila)
-        time.sleep(0.3)
 
         # Click en Acciones
         if not click_acciones_fila(driver, fila):
@@ -512,28 +393,41 @@ def procesar_registro_con_modal(driver, fila, idx, ventana_principal, wait):
         if not click_ver_en_dropdown(driver, fila, wait):
             return False
 
-        # Click en Impresión del modal
-        if not click_impresion_en_modal(driver, wait):
+    # Click en Impresión del modal
+    return click_impresion_en_modal(driver, wait)
+
+
+def descargar_desde_impresion(driver, wait, dte, carpeta):
+    """
+    Descarga PDF y JSON desde la ventana de impresión actual
+    (ambos modos retornan cuando los archivos ya están en disco).
+    """
+    if not descargar_pdf_y_json(driver, wait, dte, carpeta):
+        return False
+
+    print("  ✅ Descarga completada correctamente")
+    return True
+
+
+@paso("registro")
+def procesar_registro_con_modal(
+    driver, registro, ventana_principal, wait, carpeta=DOWNLOAD_FOLDER
+):
+    """
+    Procesa un registro usando el flujo de modal (Ver -> Modal -> Impresión)
+    """
+    try:
+        driver.switch_to.window(ventana_principal)
+
+        if not abrir_impresion_registro(driver, registro, wait):
             return False
 
         # Cambiar a ventana de impresión
         if not cambiar_a_nueva_ventana(driver, ventana_principal):
             return False
 
-        time.sleep(0.5)
-
         # Descargar archivos
-        if descargar_pdf_y_json(driver, wait):
-            print("  ✅ Descarga completada correctamente")
-            ultimo_dte_exitoso = dte if dte else f"registro_{idx + 1}"
-
-            # Guardar inmediatamente el último exitoso
-            if dte:
-                guardar_ultimo_exitoso(dte)
-
-            print("  ⏳ Esperando a que se completen las descargas...")
-            time.sleep(2)
-
+        if descargar_desde_impresion(driver, wait, registro["dte"], carpeta):
             # Cerrar ventana de impresión
             print("  🔒 Cerrando ventana de descarga...")
             driver.close()
@@ -544,7 +438,6 @@ def procesar_registro_con_modal(driver, fila, idx, ventana_principal, wait):
 
             return True
         else:
-            time.sleep(1)
 
             print("  🔒 Cerrando ventana de descarga...")
             driver.close()
@@ -573,382 +466,671 @@ def procesar_registro_con_modal(driver, fila, idx, ventana_principal, wait):
         return False
 
 
+def agregar_fallido(registro_fallido):
+    """
+    Agrega un registro fallido a la lista y a la bitácora
+    (así no se pierde si la ejecución se corta)
+    """
+    registro_fallido["corregido"] = False
+    registros_fallidos.append(registro_fallido)
+    anotar_documento(BITACORA, "fallido", registro_fallido["dte"], registro_fallido)
+
+
 def guardar_reporte_fallidos():
     """
-    Guarda o actualiza el reporte de registros fallidos en un único archivo
+    Aplica la bitácora al estado de descargas y muestra el total de fallidos
+    (los que ya estaban registrados conservan su marca de corregido)
     """
     if not registros_fallidos:
         return
 
     try:
-        # Cargar registros existentes si el archivo ya existe
-        registros_existentes = []
-        if os.path.exists(ARCHIVO_FALLIDOS):
-            with open(ARCHIVO_FALLIDOS, "r", encoding="utf-8") as f:
-                data_existente = json.load(f)
-                registros_existentes = data_existente.get("registros", [])
-
-        # Agregar nuevos fallidos (evitar duplicados por DTE)
-        dtes_existentes = {r.get("dte") for r in registros_existentes}
-        for nuevo_fallido in registros_fallidos:
-            if nuevo_fallido.get("dte") not in dtes_existentes:
-                nuevo_fallido["corregido"] = False
-                registros_existentes.append(nuevo_fallido)
-
-        # Guardar todo junto
-        with open(ARCHIVO_FALLIDOS, "w", encoding="utf-8") as f:
-            json.dump(
-                {
-                    "fecha_actualizacion": datetime.now().isoformat(),
-                    "total_fallidos": len(registros_existentes),
-                    "registros": registros_existentes,
-                },
-                f,
-                indent=2,
-                ensure_ascii=False,
-            )
-        print(f"\n📄 Reporte de fallidos actualizado: {ARCHIVO_FALLIDOS}")
-        print(f"   Total de registros fallidos: {len(registros_existentes)}")
-        print(f"   Nuevos fallidos agregados: {len(registros_fallidos)}")
+        compactar_bitacora(BITACORA)
+        print(f"\n📄 Reporte de fallidos actualizado: {ESTADO['ruta']}")
+        print(f"   Total de registros fallidos: {contar_documentos(ESTADO, 'fallido')}")
+        print(f"   Fallidos en esta ejecución: {len(registros_fallidos)}")
 
     except Exception as e:
         print(f"⚠️ Error al guardar reporte de fallidos: {e}")
 
 
-try:
-    # Maximizar ventana
-    driver.maximize_window()
-    print("\n🚀 Iniciando navegador...")
+def procesar_pendiente(driver, registro, ventana_principal, wait, carpeta):
+    """
+    Procesa un registro pendiente (omite las anuladas).
+
+    Returns:
+        tuple: (resultado, error) con resultado 'exitoso', 'anulado' o 'fallido'
+    """
+    idx = registro["indice"]
+    dte = registro["dte"]
+
+    # Verificar si la factura está anulada
+    if registro["anulada"]:
+        print(f"  🚫 Factura anulada detectada: {registro['estado_documento']}")
+        print(f"  ⏭️ Factura anulada ignorada: {dte if dte else f'registro_{idx + 1}'}")
+        return "anulado", None
+
+    # PDF y JSON ya descargados antes (por este u otro descargador)
+    if publicar_desde_almacen(dte, carpeta):
+        return "exitoso", None
 
-    # URL de tu ERP
-    URL_ERP = "https://hermaco.findexbusiness.com"
-    driver.get(URL_ERP)
-    print(f"📍 Navegando a: {URL_ERP}")
+    try:
+        driver.switch_to.window(ventana_principal)
 
-    wait = WebDriverWait(driver, 10)
+        # Procesar con el flujo de modal
+        if procesar_registro_con_modal(
+            driver, registro, ventana_principal, wait, carpeta
+        ):
+            return "exitoso", None
+        return "fallido", "No se pudo completar la descarga"
 
-    # Click en "Inicio de sesión"
-    login_link = wait.until(
-        EC.element_to_be_clickable(
-            (By.XPATH, "//a[@href='https://hermaco.findexbusiness.com/login']")
+    except Exception as e:
+        print(f"  ❌ Error crítico en registro {idx}: {e}")
+        try:
+            if len(driver.window_handles) > 1:
+                for handle in driver.window_handles:
+                    if handle != ventana_principal:
+                        driver.switch_to.window(handle)
+                        driver.close()
+            driver.switch_to.window(ventana_principal)
+            cerrar_modal_si_esta_abierto(driver)
+        except:
+            pass
+        return "fallido", str(e)
+
+
+def registrar_resultado(orden, registro, resultado, error, trabajador, segundos):
+    """
+    Junta el resultado de un registro (de cualquier trabajador).
+
+    El último exitoso solo avanza cuando todos los registros anteriores en el
+    orden de procesamiento ya terminaron, así una ejecución interrumpida
+    nunca salta registros que otro trabajador no alcanzó a descargar.
+    """
+    global siguiente_orden
+    global ultimo_dte_exitoso
+    global registros_exitosos
+    global registros_anulados_ignorados
+
+    idx = registro["indice"]
+    dte = registro["dte"]
+
+    with candado_resultados:
+        datos = estadisticas_trabajadores.setdefault(
+            trabajador,
+            {
+                "registros": 0,
+                "exitosos": 0,
+                "anulados": 0,
+                "fallidos": 0,
+                "segundos": 0.0,
+            },
         )
-    )
-    login_link.click()
-    print("✅ Click en 'Inicio de sesión'")
+        datos["registros"] += 1
+        datos["segundos"] += segundos
+
+        if resultado in ("exitoso", "anulado") and dte:
+            anotar_documento(
+                BITACORA,
+                "procesado" if resultado == "exitoso" else "anulado",
+                dte,
+                {"posicion": idx + 1, "fecha": registro["fecha"]},
+            )
 
-    time.sleep(2)
-    print("🔄 Rellenando credenciales...")
+        if resultado == "exitoso":
+            registros_exitosos += 1
+            datos["exitosos"] += 1
+            print(
+                f"  ✅ Registro procesado exitosamente ({dte if dte else f'registro_{idx + 1}'})"
+            )
+        elif resultado == "anulado":
+            registros_anulados_ignorados += 1
+            datos["anulados"] += 1
+        else:
+            datos["fallidos"] += 1
+            agregar_fallido(
+                {
+                    "posicion": idx + 1,
+                    "dte": dte if dte else f"registro_{idx + 1}",
+                    "fecha": registro["fecha"] if registro["fecha"] else "desconocida",
+                    "error": error,
+                    "timestamp": datetime.now().isoformat(),
+                }
+            )
+
+        # Avanzar el último exitoso por los registros ya terminados en orden
+        resultados_pendientes[orden] = (registro, resultado)
+        dte_a_guardar = None
+        while siguiente_orden in resultados_pendientes:
+            registro_previo, resultado_previo = resultados_pendientes.pop(
+                siguiente_orden
+            )
+            siguiente_orden += 1
+            if resultado_previo == "fallido":
+                continue
+            if registro_previo["dte"]:
+                # Las anuladas también cuentan para continuar el progreso
+                ultimo_dte_exitoso = registro_previo["dte"]
+                dte_a_guardar = registro_previo["dte"]
+            elif resultado_previo == "exitoso":
+                ultimo_dte_exitoso = f"registro_{registro_previo['indice'] + 1}"
 
-    # Rellenar usuario
-    username_input = wait.until(EC.presence_of_element_located((By.ID, "username")))
-    username_input.send_keys("Henri")
-    print("✅ Usuario ingresado")
+        if dte_a_guardar:
+            guardar_ultimo_exitoso(dte_a_guardar)
 
-    # Rellenar contraseña
-    password_input = driver.find_element(By.ID, "password")
-    password_input.send_keys("Bajmut")
-    print("✅ Contraseña ingresada")
 
-    # Click en botón de login
-    login_button = driver.find_element(
-        By.XPATH, "//button[@type='submit' and contains(@class, 'btn-primary')]"
-    )
-    login_button.click()
-    print("✅ Click en botón 'Acceder'")
+def mover_descargas(carpeta_origen, carpeta_destino, dte=None):
+    """
+    Mueve los archivos terminados de la carpeta del trabajador a la carpeta
+    de descargas común.
 
-    time.sleep(3)
-    print("✅ Login completado, esperando dashboard...")
+    Con 'dte' solo se mueven los archivos que el manifiesto anotó para ese
+    documento: con varias pestañas, las descargas de otros registros pueden
+    seguir en curso con su GUID como nombre. Sin 'dte' (navegador ya
+    cerrado) se mueve todo, menos las descargas a medias.
+    """
+    if dte:
+        nombres = [
+            nombre
+            for nombre in archivos_de_documento(carpeta_origen, dte)
+            if os.path.exists(os.path.join(carpeta_origen, nombre))
+        ]
+    else:
+        nombres = os.listdir(carpeta_origen)
 
-    # Navegar a Gestión de ventas
-    print("\n🔄 Navegando a 'Gestión de ventas'...")
-    gestion_ventas = wait.until(EC.element_to_be_clickable((By.ID, "tour_step7_menu")))
-    gestion_ventas.click()
-    print("✅ Click en 'Gestión de ventas' (desplegable abierto)")
+    for nombre in nombres:
+        if nombre.endswith((".crdownload", ".tmp", ".part")):
+            continue
+        try:
+            os.replace(
+                os.path.join(carpeta_origen, nombre),
+                os.path.join(carpeta_destino, nombre),
+            )
+        except OSError as e:
+            print(f"  ⚠️ No se pudo mover {nombre}: {e}")
 
-    time.sleep(1)
 
-    # Click en "Todas las ventas"
-    todas_ventas = wait.until(
-        EC.element_to_be_clickable(
-            (By.XPATH, "//a[@href='https://hermaco.findexbusiness.com/sells']")
+def procesar_registros(
+    driver, elementos, ventana_principal, wait, carpeta, nombre, total
+):
+    """
+    Procesa los pares (orden, registro) con un navegador, uno a la vez o con
+    varias pestañas de impresión en vuelo (--pestanas).
+    """
+    etiqueta = f"[{nombre}] " if TRABAJADORES > 1 else ""
+    # Registros tomados de la cola que todavía no tienen resultado
+    en_curso = {}
+    en_almacen = set()
+
+    def terminar(orden, registro, resultado, error):
+        if carpeta != DOWNLOAD_FOLDER and registro["dte"]:
+            # Los registros sin DTE se mueven al cerrar el navegador
+            mover_descargas(carpeta, DOWNLOAD_FOLDER, registro["dte"])
+        _, inicio = en_curso.pop(orden, (registro, time.monotonic()))
+        registrar_resultado(
+            orden, registro, resultado, error, nombre, time.monotonic() - inicio
         )
-    )
-    todas_ventas.click()
-    print("✅ Click en 'Todas las ventas'")
 
-    time.sleep(2)
-    print("📍 Estamos en la página de facturas")
+    if PESTANAS <= 1:
+        for orden, registro in elementos:
+            print(
+                f"\n📄 {etiqueta}Procesando registro {orden + 1}/{total} (índice {registro['indice']}) ..."
+            )
+            en_curso[orden] = (registro, time.monotonic())
+            try:
+                resultado, error = procesar_pendiente(
+                    driver, registro, ventana_principal, wait, carpeta
+                )
+            except Exception as e:
+                print(f"  ❌ {etiqueta}Error inesperado en el registro: {e}")
+                resultado, error = "fallido", str(e)
+            terminar(orden, registro, resultado, error)
+        return
+
+    def omitir(elemento):
+        orden, registro = elemento
+        en_curso[orden] = (registro, time.monotonic())
+        if registro["anulada"]:
+            print(
+                f"\n🚫 {etiqueta}Registro {orden + 1}/{total} anulado ({registro['estado_documento']}), se omite"
+            )
+            return True
+        if publicar_desde_almacen(registro["dte"], carpeta):
+            en_almacen.add(orden)
+            return True
+        return False
 
-    # Filtro de fecha - HOY
-    print("\n🔄 Abriendo filtro de fecha...")
-    filtro_fecha = wait.until(EC.element_to_be_clickable((By.ID, "sell_date_filter")))
-    filtro_fecha.click()
-    print("✅ Click en 'Filtrar por fecha' (desplegable abierto)")
+    def abrir(driver, elemento):
+        orden, registro = elemento
+        print(
+            f"\n📄 {etiqueta}Abriendo registro {orden + 1}/{total} (índice {registro['indice']}) ..."
+        )
+        return abrir_impresion_registro(driver, registro, wait)
+
+    def descargar(driver, elemento):
+        orden, registro = elemento
+        print(f"\n📥 {etiqueta}Descargando registro {orden + 1}/{total} ...")
+        return descargar_desde_impresion(driver, wait, registro["dte"], carpeta)
+
+    def registrar(elemento, exito):
+        orden, registro = elemento
+        if exito is None and orden in en_almacen:
+            en_almacen.discard(orden)
+            terminar(orden, registro, "exitoso", None)
+        elif exito is None:
+            terminar(orden, registro, "anulado", None)
+        elif exito:
+            terminar(orden, registro, "exitoso", None)
+        else:
+            terminar(orden, registro, "fallido", "No se pudo completar la descarga")
 
-    time.sleep(2)
     try:
-        hoy = wait.until(
-            EC.element_to_be_clickable(
-                (
-                    By.XPATH,
-                    "//li[contains(text(), 'Hoy')] | //a[contains(text(), 'Hoy')] | //span[contains(text(), 'Hoy')]",
-                )
-            )
+        procesar_en_pestanas(
+            driver,
+            elementos,
+            ventana_principal,
+            abrir,
+            descargar,
+            cerrar_modal_si_esta_abierto,
+            registrar,
+            omitir=omitir,
+            max_en_vuelo=PESTANAS,
         )
-        hoy.click()
-        print("✅ Seleccionado 'Hoy'")
-    except:
-        print("⚠️ No se encontró 'Hoy'. Continuando...")
+    except Exception as e:
+        # Los registros en vuelo se reportan como fallidos para que el
+        # último exitoso siga avanzando por los que vienen después
+        for orden, (registro, _) in sorted(en_curso.items()):
+            terminar(orden, registro, "fallido", f"Error en el navegador: {e}")
+        raise
 
-    time.sleep(3)
 
-    # Mostrar TODOS los registros
-    print("\n🔄 Cambiando filtro a mostrar TODOS los registros...")
-    select_length = wait.until(
-        EC.presence_of_element_located((By.NAME, "sell_table_length"))
-    )
+def elementos_de_cola(cola):
+    """Entrega los pares (orden, registro) de la cola hasta vaciarla."""
+    while True:
+        try:
+            yield cola.get_nowait()
+        except queue.Empty:
+            return
+
+
+def ejecutar_trabajador(numero, cola, total):
+    """
+    Trabajador con su propio Chrome headless y su propia carpeta de descargas.
+    Toma registros de la cola hasta vaciarla.
+    """
+    nombre = f"T{numero}"
+    carpeta = os.path.join(DOWNLOAD_FOLDER, f"_trabajador_{numero}")
+    os.makedirs(carpeta, exist_ok=True)
+
+    driver_trabajador = None
     try:
-        # Buscar la opción "Todos" o "-1" como valor
-        select_obj = Select(select_length)
-        opciones = [option.get_attribute("value") for option in select_obj.options]
-        print(f"  📋 Opciones disponibles: {opciones}")
-
-        # Intentar seleccionar "Todos" (puede ser "-1" o "all")
-        if "-1" in opciones:
-            Select(select_length).select_by_value("-1")
-            print("✅ Seleccionado mostrar TODOS los registros")
-        elif "all" in opciones:
-            Select(select_length).select_by_value("all")
-            print("✅ Seleccionado mostrar TODOS los registros")
-        else:
-            # Si no existe "Todos", usar el valor más alto
-            valores_numericos = [int(v) for v in opciones if v.isdigit()]
-            if valores_numericos:
-                max_valor = str(max(valores_numericos))
-                Select(select_length).select_by_value(max_valor)
-                print(
-                    f"✅ Seleccionado mostrar {max_valor} registros (máximo disponible)"
-                )
-            else:
-                print("⚠️ No se pudo determinar cómo mostrar todos los registros")
+        driver_trabajador = crear_navegador(carpeta)
+        wait_trabajador = WebDriverWait(driver_trabajador, 10)
+        abrir_pagina_autenticada(driver_trabajador, wait_trabajador, "/sells")
+        ventana = driver_trabajador.current_window_handle
+        print(f"🧵 [{nombre}] Navegador listo")
+
+        procesar_registros(
+            driver_trabajador,
+            elementos_de_cola(cola),
+            ventana,
+            wait_trabajador,
+            carpeta,
+            nombre,
+            total,
+        )
+
     except Exception as e:
-        print(f"  ❌ No se pudo cambiar el tamaño de página: {e}")
+        print(f"❌ [{nombre}] Error en el trabajador: {e}")
+        traceback.print_exc()
+
+    finally:
+        # Los registros que este trabajador no alcanzó quedan en la cola
+        # para los demás; si no queda nadie se reportan como fallidos al final
+        if driver_trabajador:
+            driver_trabajador.quit()
+        mover_descargas(carpeta, DOWNLOAD_FOLDER)
+        try:
+            os.rmdir(carpeta)
+        except OSError:
+            pass
+        print(f"👋 [{nombre}] Navegador cerrado")
 
-    # Dar tiempo a que carguen los registros
-    print("⏳ Esperando 5 segundos a que carguen los registros...")
-    time.sleep(5)
-    print("✅ Registros cargados")
 
-    # Hacer scroll al final de la tabla
-    print("\n🔄 Desplazando al final de la página...")
+def procesar_en_paralelo(pendientes, cantidad_trabajadores):
+    """
+    Reparte los registros pendientes entre varios navegadores headless.
+    Cada trabajador toma el siguiente registro libre de una cola común.
+    """
+    cola = queue.Queue()
+    for orden, registro in enumerate(pendientes):
+        cola.put((orden, registro))
+
+    hilos = [
+        threading.Thread(
+            target=ejecutar_trabajador,
+            args=(numero, cola, len(pendientes)),
+            name=f"trabajador_{numero}",
+        )
+        for numero in range(1, cantidad_trabajadores + 1)
+    ]
+    for hilo in hilos:
+        hilo.start()
     try:
-        # Obtener todas las filas
-        filas = driver.find_elements(
-            By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
+        for hilo in hilos:
+            hilo.join()
+    except KeyboardInterrupt:
+        # Vaciar la cola: cada trabajador termina el registro que tiene en curso
+        print("\n⚠️ Interrupción: esperando a que los trabajadores terminen...")
+        while True:
+            try:
+                cola.get_nowait()
+            except queue.Empty:
+                break
+        for hilo in hilos:
+            hilo.join()
+        raise
+
+    # Registros que quedaron sin procesar (todos los trabajadores fallaron)
+    while True:
+        try:
+            orden, registro = cola.get_nowait()
+        except queue.Empty:
+            break
+        registrar_resultado(
+            orden,
+            registro,
+            "fallido",
+            "Ningún trabajador disponible",
+            "sin_trabajador",
+            0.0,
         )
-        if filas:
-            ultima_fila = filas[-1]
-            driver.execute_script(
-                "arguments[0].scrollIntoView({block: 'center'});", ultima_fila
-            )
-            time.sleep(1)
-            print(f"✅ Desplazado al final de la tabla ({len(filas)} registros)")
-        else:
-            print("⚠️ No se encontraron registros en la tabla")
-    except Exception as e:
-        print(f"⚠️ Error al hacer scroll: {e}")
 
-    # Cargar el último DTE exitoso
-    ultimo_dte_cargado = cargar_ultimo_exitoso()
 
-    # Obtener todas las filas
-    filas = driver.find_elements(
-        By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-    )
-    total_filas = len(filas)
-    print(f"\n📊 Total de registros en tabla: {total_filas}")
+def imprimir_rendimiento_trabajadores(segundos_totales):
+    """Muestra cuántos registros procesó cada trabajador y a qué ritmo."""
+    if not estadisticas_trabajadores:
+        return
 
-    if total_filas == 0:
-        print("⚠️ No hay registros para procesar hoy")
-        driver.quit()
-        exit(0)
+    print(f"\n🧵 RENDIMIENTO POR TRABAJADOR ({segundos_totales:.1f}s en total)")
+    for nombre, datos in sorted(estadisticas_trabajadores.items()):
+        por_minuto = (
+            datos["registros"] / segundos_totales * 60 if segundos_totales else 0
+        )
+        promedio = datos["segundos"] / datos["registros"] if datos["registros"] else 0
+        print(
+            f"   {nombre}: {datos['registros']} registros "
+            f"(✅ {datos['exitosos']} / 🚫 {datos['anulados']} / ❌ {datos['fallidos']}) "
+            f"- {por_minuto:.1f} registros/min, {promedio:.1f}s por registro"
+        )
 
-    # Determinar desde dónde empezar
-    indice_inicio = None
 
-    if ultimo_dte_cargado:
-        print(f"\n🔍 Buscando último DTE procesado: {ultimo_dte_cargado}")
-        indice_ultimo = buscar_dte_con_ctrl_f(driver, ultimo_dte_cargado)
+def ejecutar(driver_compartido=None, trabajadores=1, pestanas=1, fecha="hoy"):
+    """
+    Descarga las facturas del día (o del día anterior).
 
-        if indice_ultimo is not None:
-            # Empezar desde el ANTERIOR al último procesado (hacia arriba/más reciente)
-            indice_inicio = indice_ultimo - 1
-            print(
-                f"✅ Se continuará desde el índice {indice_inicio} (anterior al último procesado)"
-            )
-        else:
-            print("⚠️ No se encontró el último DTE procesado")
-            print("   Se procesará desde el final de la tabla")
-            indice_inicio = total_filas - 1
-    else:
-        # Si no hay último exitoso, empezar desde el final
-        indice_inicio = total_filas - 1
-        print(f"📍 Comenzando desde el final de la tabla (índice {indice_inicio})")
-
-    # Validar que hay registros para procesar
-    if indice_inicio < 0:
-        print("⚠️ No hay registros nuevos para procesar")
-        driver.quit()
-        exit(0)
-
-    registros_a_procesar = indice_inicio + 1
-    print(f"\n✅ Se procesarán {registros_a_procesar} registros:")
-    print(f"   Desde índice: {indice_inicio} (último registro) - HACIA ARRIBA")
-    print(f"   Hasta índice: 0 (primer registro)")
-    print(f"   Dirección: ⬆️ Hacia registros más recientes (índices menores)")
-
-    # Procesamiento de registros
-    print("\n" + "=" * 60)
-    print("🚀 INICIANDO PROCESAMIENTO DE REGISTROS DE HOY")
-    print("=" * 60)
-
-    ventana_principal = driver.current_window_handle
-    registros_procesados = 0
+    Args:
+        driver_compartido: Navegador ya abierto (por ejemplo, el del
+            orquestador). Se usa sin cerrarlo; si es None se crea uno propio.
+        trabajadores: Navegadores descargando en paralelo (1 = secuencial)
+        pestanas: Ventanas de impresión a la vez en cada navegador
+        fecha: 'hoy' o 'ayer' (opción del filtro de fecha de la tabla)
+
+    Returns:
+        bool: True si el proceso terminó sin errores
+    """
+    global driver, TRABAJADORES, PESTANAS
+    global ultimo_dte_exitoso, siguiente_orden
+    global registros_exitosos, registros_anulados_ignorados
+    TRABAJADORES = max(1, trabajadores)
+    PESTANAS = max(1, pestanas)
+
+    # El orquestador puede ejecutar el script varias veces en el mismo proceso
+    registros_fallidos.clear()
+    resultados_pendientes.clear()
+    estadisticas_trabajadores.clear()
+    ultimo_dte_exitoso = None
+    siguiente_orden = 0
     registros_exitosos = 0
     registros_anulados_ignorados = 0
+    driver = driver_compartido or crear_navegador(DOWNLOAD_FOLDER)
+    exitoso = False
+    reiniciar_metricas()
+    reiniciar_esperas()
+    manifiesto = abrir_manifiesto(DOWNLOAD_FOLDER, "facturas")
 
-    # Procesar desde indice_inicio hacia arriba (índices menores)
-    for idx in range(indice_inicio, -1, -1):
-        try:
-            driver.switch_to.window(ventana_principal)
-            registros_procesados += 1
+    try:
+        # Maximizar ventana
+        driver.maximize_window()
+        print("\n🚀 Iniciando navegador...")
 
-            print(
-                f"\n📄 Procesando registro {registros_procesados}/{registros_a_procesar} (índice {idx}) ..."
-            )
+        wait = WebDriverWait(driver, 10)
 
-            # Re-obtener las filas
-            filas = driver.find_elements(
-                By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-            )
-            if idx >= len(filas):
-                print(f"  ⚠️ Registro {idx} ya no está disponible")
-                continue
-            fila = filas[idx]
+        # Sesión compartida: reutiliza las cookies guardadas o hace login completo
+        abrir_pagina_autenticada(driver, wait, "/sells")
+        print("📍 Estamos en la página de facturas")
 
-            # Verificar si la factura está anulada
-            if verificar_si_esta_anulada(fila):
-                dte = extraer_dte_de_fila(fila)
-                print(
-                    f"  ⏭️ Factura anulada ignorada: {dte if dte else f'registro_{idx + 1}'}"
+        # Filtro de fecha - HOY o AYER
+        dia = FILTROS_FECHA[fecha]
+        print("\n🔄 Abriendo filtro de fecha...")
+        filtro_fecha = wait.until(
+            EC.element_to_be_clickable((By.ID, "sell_date_filter"))
+        )
+        filtro_fecha.click()
+        print("✅ Click en 'Filtrar por fecha' (desplegable abierto)")
+        try:
+            opcion_dia = wait.until(
+                EC.element_to_be_clickable(
+                    (
+                        By.XPATH,
+                        f"//li[contains(text(), '{dia}')] | //a[contains(text(), '{dia}')] | //span[contains(text(), '{dia}')]",
+                    )
                 )
+            )
+            preparar_espera_draw(driver, "sell_table")
+            opcion_dia.click()
+            print(f"✅ Seleccionado '{dia}'")
+        except:
+            print(f"⚠️ No se encontró '{dia}'. Continuando...")
 
-                # Guardar como último exitoso aunque se omita (para continuar el progreso)
-                if dte:
-                    ultimo_dte_exitoso = dte
-                    guardar_ultimo_exitoso(dte)
+        esperar_draw_tabla(driver, "sell_table")
 
-                registros_anulados_ignorados += 1
-                continue
+        registros_tabla = None
+        if LISTADO_POR_ENDPOINT:
+            # Listado directo desde el endpoint JSON de la tabla (mismos filtros)
+            print("\n🔄 Listando registros desde el endpoint de la tabla...")
+            registros_tabla = listar_registros_datatable(driver, "sell_table")
 
-            # Procesar con el flujo de modal
-            exito = procesar_registro_con_modal(
-                driver, fila, idx, ventana_principal, wait
+        if registros_tabla is None:
+            # Mostrar TODOS los registros
+            print("\n🔄 Cambiando filtro a mostrar TODOS los registros...")
+            select_length = wait.until(
+                EC.presence_of_element_located((By.NAME, "sell_table_length"))
             )
+            preparar_espera_draw(driver, "sell_table")
+            try:
+                # Buscar la opción "Todos" o "-1" como valor
+                select_obj = Select(select_length)
+                opciones = [
+                    option.get_attribute("value") for option in select_obj.options
+                ]
+                print(f"  📋 Opciones disponibles: {opciones}")
+
+                # Intentar seleccionar "Todos" (puede ser "-1" o "all")
+                if "-1" in opciones:
+                    Select(select_length).select_by_value("-1")
+                    print("✅ Seleccionado mostrar TODOS los registros")
+                elif "all" in opciones:
+                    Select(select_length).select_by_value("all")
+                    print("✅ Seleccionado mostrar TODOS los registros")
+                else:
+                    # Si no existe "Todos", usar el valor más alto
+                    valores_numericos = [int(v) for v in opciones if v.isdigit()]
+                    if valores_numericos:
+                        max_valor = str(max(valores_numericos))
+                        Select(select_length).select_by_value(max_valor)
+                        print(
+                            f"✅ Seleccionado mostrar {max_valor} registros (máximo disponible)"
+                        )
+                    else:
+                        print(
+                            "⚠️ No se pudo determinar cómo mostrar todos los registros"
+                        )
+            except Exception as e:
+                print(f"  ❌ No se pudo cambiar el tamaño de página: {e}")
+
+            # Esperar a que la tabla dibuje los registros
+
+            print("⏳ Esperando a que carguen los registros...")
+
+            esperar_draw_tabla(driver, "sell_table")
+            print("✅ Registros cargados")
+
+            # Foto de la grilla: todas las filas en una sola llamada al navegador
+            print("\n🔄 Leyendo registros de la tabla...")
+            registros_tabla = extraer_registros_tabla(driver, "sell_table")
+        total_filas = len(registros_tabla)
+
+        # Cargar el último DTE exitoso
+        ultimo_dte_cargado = cargar_ultimo_exitoso()
+        print(f"\n📊 Total de registros en tabla: {total_filas}")
+
+        if total_filas == 0:
+            print(f"⚠️ No hay registros para procesar ({dia})")
+            return True
 
-            if exito:
-                registros_exitosos += 1
+        # Determinar desde dónde empezar
+        indice_inicio = None
+
+        if ultimo_dte_cargado:
+            print(f"\n🔍 Buscando último DTE procesado: {ultimo_dte_cargado}")
+            indice_ultimo = indexar_registros(registros_tabla, "dte").get(
+                ultimo_dte_cargado
+            )
+
+            if indice_ultimo is not None:
+                # Empezar desde el ANTERIOR al último procesado (hacia arriba/más reciente)
+                indice_inicio = indice_ultimo - 1
                 print(
-                    f"  ✅ Registro procesado exitosamente ({registros_exitosos}/{registros_procesados})"
+                    f"✅ Se continuará desde el índice {indice_inicio} (anterior al último procesado)"
                 )
             else:
-                dte = extraer_dte_de_fila(fila)
-                fecha = extraer_fecha_de_fila(fila)
-                registros_fallidos.append(
-                    {
-                        "posicion": idx + 1,
-                        "dte": dte if dte else f"registro_{idx + 1}",
-                        "fecha": fecha if fecha else "desconocida",
-                        "error": "No se pudo completar la descarga",
-                        "timestamp": datetime.now().isoformat(),
-                    }
-                )
+                print("⚠️ No se encontró el último DTE procesado")
+                print("   Se procesará desde el final de la tabla")
+                indice_inicio = total_filas - 1
+        else:
+            # Si no hay último exitoso, empezar desde el final
+            indice_inicio = total_filas - 1
+            print(f"📍 Comenzando desde el final de la tabla (índice {indice_inicio})")
 
-        except Exception as e:
-            print(f"  ❌ Error crítico en registro {idx}: {e}")
-            filas_actuales = driver.find_elements(
-                By.XPATH, "//table[@id='sell_table']//tbody/tr[@role='row']"
-            )
-            dte = (
-                extraer_dte_de_fila(filas_actuales[idx])
-                if idx < len(filas_actuales)
-                else None
-            )
-            fecha = (
-                extraer_fecha_de_fila(filas_actuales[idx])
-                if idx < len(filas_actuales)
-                else None
+        # Validar que hay registros para procesar
+        if indice_inicio < 0:
+            print("⚠️ No hay registros nuevos para procesar")
+            return True
+
+        registros_a_procesar = indice_inicio + 1
+        print(f"\n✅ Se procesarán {registros_a_procesar} registros:")
+        print(f"   Desde índice: {indice_inicio} (último registro) - HACIA ARRIBA")
+        print(f"   Hasta índice: 0 (primer registro)")
+        print(f"   Dirección: ⬆️ Hacia registros más recientes (índices menores)")
+
+        # Registros pendientes, en el orden en que se procesan
+        pendientes = [registros_tabla[idx] for idx in range(indice_inicio, -1, -1)]
+
+        if TRABAJADORES > 1 and not all(r.get("data_href") for r in pendientes):
+            # Sin el enlace 'Ver' cada trabajador tendría que repetir filtros y grilla
+            print(
+                "⚠️ Hay registros sin enlace 'Ver': se procesará con un solo navegador"
             )
-            registros_fallidos.append(
-                {
-                    "posicion": idx + 1,
-                    "dte": dte if dte else f"registro_{idx + 1}",
-                    "fecha": fecha if fecha else "desconocida",
-                    "error": str(e),
-                    "timestamp": datetime.now().isoformat(),
-                }
+            TRABAJADORES = 1
+
+        # Procesamiento de registros
+        print("\n" + "=" * 60)
+        print(f"🚀 INICIANDO PROCESAMIENTO DE REGISTROS DE {dia.upper()}")
+        if TRABAJADORES > 1:
+            print(f"🧵 Trabajadores en paralelo: {TRABAJADORES}")
+        if PESTANAS > 1:
+            print(f"🗂️ Pestañas de impresión en vuelo por navegador: {PESTANAS}")
+        print("=" * 60)
+
+        inicio_procesamiento = time.monotonic()
+
+        if TRABAJADORES > 1:
+            procesar_en_paralelo(pendientes, TRABAJADORES)
+        else:
+            # Procesar desde indice_inicio hacia arriba (índices menores)
+            procesar_registros(
+                driver,
+                enumerate(pendientes),
+                driver.current_window_handle,
+                wait,
+                DOWNLOAD_FOLDER,
+                "T1",
+                registros_a_procesar,
             )
-            try:
-                if len(driver.window_handles) > 1:
-                    for handle in driver.window_handles:
-                        if handle != ventana_principal:
-                            driver.switch_to.window(handle)
-                            driver.close()
-                driver.switch_to.window(ventana_principal)
-                cerrar_modal_si_esta_abierto(driver)
-            except:
-                pass
-            continue
 
-    print(f"\n{'='*60}")
-    print(f"🎉 PROCESAMIENTO COMPLETADO")
-    print(f"{'='*60}")
-    print(f"📊 RESUMEN:")
-    print(f"   Total de registros procesados: {registros_procesados}")
-    print(f"   ✅ Registros exitosos: {registros_exitosos}")
-    print(f"   🚫 Facturas anuladas ignoradas: {registros_anulados_ignorados}")
-    print(f"   ❌ Registros fallidos: {len(registros_fallidos)}")
-    if ultimo_dte_exitoso:
-        print(f"   🏷️ Último DTE exitoso: {ultimo_dte_exitoso}")
-    print(f"\n📁 Archivos descargados en: {DOWNLOAD_FOLDER}")
-
-    # Guardar reporte de fallidos
-    guardar_reporte_fallidos()
-
-    # Actualizar estado según si hubo descargas nuevas
-    if registros_exitosos > 0:
-        print(
-            f"\n📥 Estado: Todo actualizado - nuevas descargas ({registros_exitosos} archivos)"
-        )
-    else:
-        print(f"\nℹ️ Estado: Todo actualizado - nada nuevo")
-        # Si no hay registros nuevos, actualizar el JSON con el último conocido
+        segundos_procesamiento = time.monotonic() - inicio_procesamiento
+        registros_procesados = len(pendientes)
+
+        print(f"\n{'='*60}")
+        print(f"🎉 PROCESAMIENTO COMPLETADO")
+        print(f"{'='*60}")
+        print(f"📊 RESUMEN:")
+        print(f"   Total de registros procesados: {registros_procesados}")
+        print(f"   ✅ Registros exitosos: {registros_exitosos}")
+        print(f"   🚫 Facturas anuladas ignoradas: {registros_anulados_ignorados}")
+        print(f"   ❌ Registros fallidos: {len(registros_fallidos)}")
         if ultimo_dte_exitoso:
-            guardar_ultimo_exitoso(ultimo_dte_exitoso, tiene_descargas_nuevas=False)
+            print(f"   🏷️ Último DTE exitoso: {ultimo_dte_exitoso}")
+        print(f"\n📁 Archivos descargados en: {DOWNLOAD_FOLDER}")
+        imprimir_rendimiento_trabajadores(segundos_procesamiento)
 
-    print("\n✅ Proceso completado. El navegador se cerrará automáticamente...")
+        # Guardar reporte de fallidos
+        guardar_reporte_fallidos()
+
+        # Actualizar estado según si hubo descargas nuevas
+        if registros_exitosos > 0:
+            print(
+                f"\n📥 Estado: Todo actualizado - nuevas descargas ({registros_exitosos} archivos)"
+            )
+        else:
+            print(f"\nℹ️ Estado: Todo actualizado - nada nuevo")
+            # Si no hay registros nuevos, actualizar el JSON con el último conocido
+            if ultimo_dte_exitoso:
+                guardar_ultimo_exitoso(ultimo_dte_exitoso, tiene_descargas_nuevas=False)
 
-except KeyboardInterrupt:
-    print("\n\n⚠️ Ejecución interrumpida por el usuario")
-    guardar_reporte_fallidos()
-    print("📊 Reportes guardados antes de salir")
+        print("\n✅ Proceso completado. El navegador se cerrará automáticamente...")
+        exitoso = True
 
-except Exception as e:
-    print(f"❌ Error: {e}")
-    print("\n📊 Detalles del error:")
-    traceback.print_exc()
-    guardar_reporte_fallidos()
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Ejecución interrumpida por el usuario")
+        guardar_reporte_fallidos()
+        print("📊 Reportes guardados antes de salir")
+        if driver_compartido is not None:
+            raise
 
-finally:
-    driver.quit()
-    print("\n👋 Navegador cerrado")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        print("\n📊 Detalles del error:")
+        traceback.print_exc()
+        guardar_reporte_fallidos()
+
+    finally:
+        compactar_bitacora(BITACORA)
+        cerrar_manifiesto(manifiesto)
+        imprimir_resumen_esperas()
+        guardar_reporte_pasos(DOWNLOAD_FOLDER, "facturas")
+        # El navegador compartido lo cierra quien lo creó
+        if driver_compartido is None:
+            driver.quit()
+            print("\n👋 Navegador cerrado")
+    return exitoso
+
+
+if __name__ == "__main__":
+    argumentos = parser.parse_args()
+    ejecutar(
+        trabajadores=argumentos.trabajadores,
+        pestanas=argumentos.pestanas,
+        fecha=argumentos.fecha,
+    )
@@ -1,80 +1,91 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
+from descarga_http import descargar_pdf_y_json_http
+from estado_descargas import abrir_estado, ultimo_punto_control
+from bitacora_descargas import (
+    abrir_bitacora,
+    anotar_documento,
+    anotar_punto_control,
+    compactar_bitacora,
+)
+from sesion_erp import abrir_pagina_autenticada, crear_navegador
+from extraccion_tabla import extraer_registros_tabla, indexar_registros, obtener_fila
+from listado_datatables import listar_registros_datatable, abrir_modal_desde_href
+from pestanas_impresion import procesar_en_pestanas
+from seguimiento_descargas import (
+    descargar_pdf_y_json_chrome,
+)
+from manifiesto_descargas import (
+    abrir_manifiesto,
+    contar_manifiesto,
+    cerrar_manifiesto,
+)
+from metricas_pasos import (
+    paso,
+    registrar_paso,
+    reiniciar_metricas,
+    guardar_reporte_pasos,
+)
+from esperas import (
+    esperar_dropdown_visible,
+    esperar_dropdowns_cerrados,
+    esperar_modal_visible,
+    esperar_modal_cerrado,
+    esperar_nueva_ventana,
+    esperar_tabla_lista,
+    esperar_elemento_en_pantalla,
+    esperar_final_pagina,
+    preparar_espera_draw,
+    esperar_draw_tabla,
+    imprimir_resumen_esperas,
+    reiniciar_esperas,
+)
 import time
 import os
-import glob
-import json
 from pathlib import Path
-from datetime import datetime
 
 # Configuración de la carpeta de descargas
 DOWNLOAD_FOLDER = os.path.join(os.getcwd(), "descargas_remisiones")
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
-# Archivo JSON fijo para tracking
-ARCHIVO_ULTIMO_EXITOSO = os.path.join(DOWNLOAD_FOLDER, "ultimo_exitoso.json")
-
-# Configuración de Chrome para descargas automáticas
-chrome_options = webdriver.ChromeOptions()
-prefs = {
-    "download.default_directory": DOWNLOAD_FOLDER,
-    "download.prompt_for_download": False,
-    "download.directory_upgrade": True,
-    "plugins.always_open_pdf_externally": True,
-    "safebrowsing.enabled": True,
-}
-chrome_options.add_experimental_option("prefs", prefs)
-
-# Modo headless para servidor sin interfaz gráfica
-chrome_options.add_argument("--headless=new")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--window-size=1920,1080")
-
-# Inicializar el navegador
-driver = webdriver.Chrome(options=chrome_options)
+# Modo de descarga: True = PDF/JSON por HTTP directo con las cookies de Selenium,
+# False = clicks en los enlaces de la ventana de impresión (gestor de Chrome)
+DESCARGA_DIRECTA_HTTP = True
 
-# Variable para tracking
-ultimo_correlativo_exitoso = None
+# Listado: True = filas pedidas al endpoint JSON de la tabla (con los filtros
+# de la página), False = mostrar "Todos" y leer la grilla dibujada
+LISTADO_POR_ENDPOINT = True
 
+# Ventanas de impresión abiertas a la vez (1 = una remisión a la vez; con más,
+# las siguientes cargan en pestañas de fondo mientras se descarga la actual)
+PESTANAS_IMPRESION = 1
 
-def contar_archivos_iniciales():
-    """Cuenta los archivos PDF y JSON que ya existen en la carpeta de descargas"""
-    pdfs = len(glob.glob(os.path.join(DOWNLOAD_FOLDER, "*.pdf")))
-    jsons_remisiones = len(
-        [
-            f
-            for f in glob.glob(os.path.join(DOWNLOAD_FOLDER, "*.json"))
-            if not ("ultimo_exitoso" in f)
-        ]
-    )
-    return pdfs, jsons_remisiones
+# Último correlativo exitoso (importa ultimo_exitoso.json la primera vez)
+ESTADO = abrir_estado(DOWNLOAD_FOLDER, "remisiones")
+BITACORA = abrir_bitacora(ESTADO)
+
+# Navegador del script (lo crea ejecutar() o lo recibe del orquestador)
+driver = None
+
+# Variable para tracking
+ultimo_correlativo_exitoso = None
 
 
 def leer_ultimo_correlativo_exitoso():
-    """Lee el último correlativo exitoso del archivo JSON fijo"""
+    """Lee el último correlativo exitoso del estado de descargas"""
     try:
-        if not os.path.exists(ARCHIVO_ULTIMO_EXITOSO):
+        punto = ultimo_punto_control(ESTADO)
+        if not punto:
             print(
-                "ℹ️ No se encontró archivo de último correlativo exitoso. Se procesarán todas las remisiones."
+                "ℹ️ No hay último correlativo exitoso guardado. Se procesarán todas las remisiones."
             )
             return None
 
-        with open(ARCHIVO_ULTIMO_EXITOSO, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            ultimo_correlativo = data.get("ultimo_correlativo")
-
-            if ultimo_correlativo:
-                print(f"✅ Último correlativo exitoso encontrado: {ultimo_correlativo}")
-                return ultimo_correlativo
-            else:
-                print("⚠️ Archivo de último correlativo exitoso vacío.")
-                return None
+        print(f"✅ Último correlativo exitoso encontrado: {punto['valor']}")
+        return punto["valor"]
 
     except Exception as e:
         print(f"⚠️ Error al leer último correlativo exitoso: {e}")
@@ -82,26 +93,16 @@ def leer_ultimo_correlativo_exitoso():
 
 
 def guardar_ultimo_correlativo(correlativo, tiene_descargas_nuevas=True):
-    """Guarda el último correlativo exitoso en el archivo JSON fijo"""
+    """Anota el último correlativo exitoso en la bitácora de progreso"""
     try:
-        fecha_actual = datetime.now()
         estado = (
             "Todo actualizado - nuevas descargas"
             if tiene_descargas_nuevas
             else "Todo actualizado - nada nuevo"
         )
-        with open(ARCHIVO_ULTIMO_EXITOSO, "w", encoding="utf-8") as f:
-            json.dump(
-                {
-                    "ultima_ejecucion": fecha_actual.strftime("%Y-%m-%d %H:%M:%S"),
-                    "fecha_actualizacion": fecha_actual.isoformat(),
-                    "ultimo_correlativo": correlativo,
-                    "estado": estado,
-                },
-                f,
-                indent=2,
-                ensure_ascii=False,
-            )
+        anotar_punto_control(BITACORA, correlativo, estado)
+        if tiene_descargas_nuevas:
+            anotar_documento(BITACORA, "procesado", correlativo)
         print(f"  ✅ Último correlativo guardado: {correlativo}")
         return True
     except Exception as e:
@@ -109,72 +110,17 @@ def guardar_ultimo_correlativo(correlativo, tiene_descargas_nuevas=True):
         return False
 
 
-def buscar_correlativo_con_ctrl_f(driver, correlativo_buscado):
-    """
-    Busca un correlativo específico usando Ctrl+F del navegador.
-    Retorna el índice de la fila si lo encuentra, o None si no lo encuentra.
-    """
-    try:
-        print(f"\n🔍 Buscando correlativo: {correlativo_buscado}")
-
-        # Abrir búsqueda con Ctrl+F
-        actions = ActionChains(driver)
-        actions.key_down(Keys.CONTROL).send_keys("f").key_up(Keys.CONTROL).perform()
-        time.sleep(0.5)
-
-        # Escribir el correlativo en el cuadro de búsqueda
-        actions.send_keys(correlativo_buscado).perform()
-        print("  ⏳ Escribiendo correlativo en búsqueda...")
-        time.sleep(1)
-
-        # Presionar Enter para buscar
-        actions.send_keys(Keys.ENTER).perform()
-        print("  ⏳ Esperando respuesta del frontend...")
-        time.sleep(3)
-
-        # Cerrar el cuadro de búsqueda
-        actions.send_keys(Keys.ESCAPE).perform()
-        time.sleep(0.5)
-
-        # Intentar encontrar la fila que contiene el correlativo
-        try:
-            filas = driver.find_elements(
-                By.XPATH, "//table[@id='remission_notes_table']//tbody/tr[@role='row']"
-            )
-
-            for idx, fila in enumerate(filas):
-                correlativo_fila = extraer_correlativo_de_fila(fila)
-                if correlativo_fila == correlativo_buscado:
-                    print(f"  ✅ Correlativo encontrado en la fila {idx + 1}")
-                    return idx
-
-            print(f"  ⚠️ Correlativo no encontrado en la tabla")
-            return None
-
-        except Exception as e:
-            print(f"  ❌ Error al buscar en la tabla: {e}")
-            return None
-
-    except Exception as e:
-        print(f"❌ Error al buscar correlativo: {e}")
-        return None
-
-
 def buscar_correlativo_en_pagina(driver, correlativo_buscado):
     """
     Busca un correlativo específico en la página actual.
     Retorna el índice de la fila si lo encuentra, o None si no lo encuentra.
     """
     try:
-        filas = driver.find_elements(
-            By.XPATH, "//table[@id='remission_notes_table']//tbody/tr[@role='row']"
-        )
-
-        for idx, fila in enumerate(filas):
-            correlativo_actual = extraer_correlativo_de_fila(fila)
-            if correlativo_actual == correlativo_buscado:
-                print(f"  ✅ Correlativo encontrado en la fila {idx + 1}")
-                return idx
+        registros = extraer_registros_tabla(driver, "remission_notes_table")
+        idx = indexar_registros(registros, "correlativo").get(correlativo_buscado)
+        if idx is not None:
+            print(f"  ✅ Correlativo encontrado en la fila {idx + 1}")
+            return idx
 
         print(f"  ℹ️ Correlativo {correlativo_buscado} no encontrado en esta página")
         return None
@@ -191,12 +137,12 @@ def cerrar_dropdowns_abiertos(driver):
         ActionChains(driver).move_to_element(body).move_by_offset(
             -200, -200
         ).click().perform()
-        time.sleep(0.5)
+        esperar_dropdowns_cerrados(driver)
         print("  🔒 Dropdowns cerrados")
     except Exception:
         try:
             ActionChains(driver).send_keys(Keys.ESCAPE).perform()
-            time.sleep(0.5)
+            esperar_dropdowns_cerrados(driver)
             print("  🔒 Dropdowns cerrados con ESC")
         except:
             print("  ⚠️ No se pudieron cerrar dropdowns, continuando...")
@@ -205,61 +151,17 @@ def cerrar_dropdowns_abiertos(driver):
 def scroll_to_element(driver, element):
     """Hace scroll hasta el elemento para asegurarse de que esté visible"""
     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
-    time.sleep(0.5)
+    esperar_elemento_en_pantalla(driver, element)
 
 
 def scroll_to_bottom(driver):
     """Hace scroll hasta el final de la página"""
     driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-    time.sleep(1)
+    esperar_final_pagina(driver)
     print("  ⬇️ Scroll hasta el final de la página")
 
 
-def extraer_correlativo_de_fila(fila):
-    """
-    Busca en la fila el correlativo de la nota de remisión
-    y lo retorna. Devuelve None si no lo encuentra.
-    """
-    try:
-        # El correlativo suele estar en una celda específica
-        celdas = fila.find_elements(By.TAG_NAME, "td")
-        # Buscar en todas las celdas el patrón del correlativo
-        for celda in celdas:
-            texto = celda.text.strip()
-            # Los correlativos tienen formato como: D54375A9-1E4A-A65F-BC54-80CA4EE8D85C
-            if len(texto) == 36 and texto.count("-") == 4:
-                return texto
-    except Exception:
-        pass
-    return None
-
-
-def verificar_si_esta_anulada(fila):
-    """
-    Verifica si una remisión está anulada revisando:
-    1. Estado de Documento = "Anulada"
-    2. Estado de pago = "Debido (Anulada)"
-    Retorna True si está anulada, False si no lo está
-    """
-    try:
-        celdas = fila.find_elements(By.TAG_NAME, "td")
-
-        for celda in celdas:
-            texto = celda.text.strip().lower()
-
-            # Verificar si contiene "anulada" o "debido (anulada)"
-            if "anulada" in texto:
-                # Puede ser "Anulada" o "Debido (Anulada)"
-                print(f"  🚫 Remisión anulada detectada: {celda.text.strip()}")
-                return True
-
-    except Exception as e:
-        print(f"  ⚠️ Error al verificar estado de anulación: {e}")
-        return False
-
-    return False
-
-
+@paso("acciones")
 def click_acciones_fila(driver, fila):
     """
     Hace click en el botón de Acciones de la fila
@@ -272,7 +174,6 @@ def click_acciones_fila(driver, fila):
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", boton_acciones
         )
-        time.sleep(0.2)
 
         try:
             boton_acciones.click()
@@ -280,7 +181,6 @@ def click_acciones_fila(driver, fila):
             driver.execute_script("arguments[0].click();", boton_acciones)
 
         print("  ✅ Click en 'Acciones'")
-        time.sleep(0.5)
         return True
 
     except Exception as e:
@@ -288,20 +188,14 @@ def click_acciones_fila(driver, fila):
         return False
 
 
+@paso("ver_modal")
 def click_ver_en_dropdown(driver, fila, wait):
     """
     Hace click en la opción 'Ver' del dropdown de acciones
     """
     try:
-        # Buscar el menú dropdown visible
-        def obtener_menu_visible(_):
-            menus = fila.find_elements(
-                By.XPATH, ".//ul[contains(@class,'dropdown-menu')]"
-            )
-            visibles = [m for m in menus if m.is_displayed()]
-            return visibles[0] if visibles else False
-
-        menu = WebDriverWait(driver, 5).until(obtener_menu_visible)
+        # Esperar el menú dropdown visible
+        menu = esperar_dropdown_visible(driver, fila)
 
         # Buscar el botón "Ver"
         boton_ver = menu.find_element(
@@ -311,7 +205,6 @@ def click_ver_en_dropdown(driver, fila, wait):
         driver.execute_script(
             "arguments[0].scrollIntoView({block:'nearest'});", boton_ver
         )
-        time.sleep(0.2)
 
         try:
             boton_ver.click()
@@ -319,7 +212,6 @@ def click_ver_en_dropdown(driver, fila, wait):
             driver.execute_script("arguments[0].click();", boton_ver)
 
         print("  ✅ Click en 'Ver'")
-        time.sleep(1)
         return True
 
     except Exception as e:
@@ -327,19 +219,16 @@ def click_ver_en_dropdown(driver, fila, wait):
         return False
 
 
+@paso("impresion")
 def click_impresion_en_modal(driver, wait):
     """
     Hace click en el botón 'Impresión' del modal flotante
     """
     try:
-        # Esperar a que aparezca el modal
+        # Esperar a que aparezca el modal con su contenido cargado
         print("  ⏳ Esperando que aparezca el modal...")
-        modal = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "modal-content"))
-        )
-
+        esperar_modal_visible(driver)
         print("  ✅ Modal de detalles abierto")
-        time.sleep(2)  # Esperar a que se cargue el contenido del modal
 
         # Buscar el botón de impresión en el modal
         boton_impresion = None
@@ -393,7 +282,6 @@ def click_impresion_en_modal(driver, wait):
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", boton_impresion
         )
-        time.sleep(0.5)
 
         # Intentar hacer click
         try:
@@ -402,7 +290,6 @@ def click_impresion_en_modal(driver, wait):
             driver.execute_script("arguments[0].click();", boton_impresion)
 
         print("  ✅ Click en 'Impresión' del modal")
-        time.sleep(0.5)
         return True
 
     except Exception as e:
@@ -410,76 +297,41 @@ def click_impresion_en_modal(driver, wait):
         return False
 
 
+@paso("ventana_impresion")
 def cambiar_a_nueva_ventana(driver, ventana_original):
     """Cambia el contexto a la nueva ventana abierta"""
     try:
-        WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) > 1)
-        for ventana in driver.window_handles:
-            if ventana != ventana_original:
-                driver.switch_to.window(ventana)
-                print("  ✅ Cambiado a nueva ventana de impresión")
-                return True
-        return False
+        ventana = esperar_nueva_ventana(driver, ventana_original)
+        driver.switch_to.window(ventana)
+        print("  ✅ Cambiado a nueva ventana de impresión")
+        return True
     except Exception as e:
         print(f"  ❌ Error al cambiar de ventana: {e}")
         return False
 
 
+@paso("descarga")
 def descargar_pdf_y_json(
     driver, wait, carpeta_descargas, nombre_base, numero_remision=None
 ):
     """
     Descarga PDF y JSON de la ventana actual
     """
-    descargas_exitosas = 0
-
-    try:
-        # Descargar PDF
-        try:
-            boton_pdf = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//a[@class='btn-download-action' and contains(@href, '/pdf/')]",
-                    )
-                )
-            )
-            boton_pdf.click()
-            print("  ⬇️ Click en descarga PDF...")
-            descargas_exitosas += 1
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"  ⚠️ No se pudo hacer click en PDF: {e}")
-
-        # Descargar JSON
-        try:
-            boton_json = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "//a[@class='btn-download-action' and contains(@href, '/json/')]",
-                    )
-                )
-            )
-            boton_json.click()
-            print("  ⬇️ Click en descarga JSON...")
-            descargas_exitosas += 1
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"  ⚠️ No se pudo hacer click en JSON: {e}")
-
-        if descargas_exitosas == 2:
-            print("  🎉 Ambas descargas iniciadas")
-            return True
-        else:
-            print(f"  ⚠️ Solo se ejecutaron {descargas_exitosas}/2 descargas")
-            return False
+    if DESCARGA_DIRECTA_HTTP:
+        return descargar_pdf_y_json_http(
+            driver,
+            wait,
+            carpeta_descargas,
+            nombre_base or f"remision_{numero_remision}",
+        )
 
-    except Exception as e:
-        print(f"  ❌ Error al iniciar descargas: {e}")
-        return False
+    # Gestor de descargas de Chrome, con seguimiento por eventos de DevTools
+    return descargar_pdf_y_json_chrome(
+        driver, wait, carpeta_descargas, nombre_base or f"remision_{numero_remision}"
+    )
 
 
+@paso("cierre_modal", por_resultado=False)
 def cerrar_modal_si_esta_abierto(driver):
     """
     Cierra el modal si está abierto después de regresar a la ventana principal
@@ -500,7 +352,6 @@ def cerrar_modal_si_esta_abierto(driver):
                 driver.execute_script(
                     "arguments[0].scrollIntoView({block: 'center'});", boton_cerrar
                 )
-                time.sleep(0.3)
 
                 try:
                     boton_cerrar.click()
@@ -508,7 +359,7 @@ def cerrar_modal_si_esta_abierto(driver):
                     driver.execute_script("arguments[0].click();", boton_cerrar)
 
                 print("  ✅ Modal cerrado con botón 'Cerrar'")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -525,7 +376,7 @@ def cerrar_modal_si_esta_abierto(driver):
                     driver.execute_script("arguments[0].click();", boton_x)
 
                 print("  ✅ Modal cerrado con botón X")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -534,7 +385,7 @@ def cerrar_modal_si_esta_abierto(driver):
             try:
                 ActionChains(driver).send_keys(Keys.ESCAPE).perform()
                 print("  ✅ Modal cerrado con ESC")
-                time.sleep(0.5)
+                esperar_modal_cerrado(driver)
                 return True
             except:
                 pass
@@ -546,15 +397,122 @@ def cerrar_modal_si_esta_abierto(driver):
         return False
 
 
+def abrir_impresion_registro(driver, registro, wait):
+    """
+    Abre el modal 'Ver' del registro y hace click en 'Impresión'.
+    La ventana de impresión queda abierta; el driver sigue en la ventana actual.
+    """
+    if registro.get("data_href"):
+        # Abrir el modal 'Ver' directamente, sin buscar la fila en la grilla
+        return abrir_modal_desde_href(driver, registro) and click_impresion_en_modal(
+            driver, wait
+        )
+
+    # Re-obtener la fila para evitar stale elements
+    fila = obtener_fila(driver, "remission_notes_table", registro["indice"])
+    if fila is None:
+        print("  ⚠️ La fila ya no está disponible.")
+        return False
+
+    # Hacer scroll a la fila
+    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", fila)
+
+    # Click en "Acciones" y en "Ver"
+    if not click_acciones_fila(driver, fila):
+        return False
+    if not click_ver_en_dropdown(driver, fila, wait):
+        return False
+
+    # Esperar y hacer click en "Impresión" del modal
+    return click_impresion_en_modal(driver, wait)
+
+
+def descargar_desde_impresion(driver, wait, registro):
+    """
+    Descarga PDF y JSON desde la ventana de impresión actual y guarda el
+    correlativo como último exitoso.
+    """
+    global ultimo_correlativo_exitoso
+
+    correlativo = registro["correlativo"]
+    if not descargar_pdf_y_json(
+        driver, wait, DOWNLOAD_FOLDER, correlativo, registro["indice"] + 1
+    ):
+        return False
+
+    print("  ✅ Descargas iniciadas correctamente")
+
+    # Guardar el último correlativo exitoso
+    if correlativo:
+        ultimo_correlativo_exitoso = correlativo
+        guardar_ultimo_correlativo(correlativo)
+    return True
+
+
+def procesar_remisiones_en_pestanas(driver, registros, ventana_principal, wait):
+    """
+    Procesa las remisiones con varias ventanas de impresión abiertas a la vez
+    (PESTANAS_IMPRESION). Las que fallan en pestaña pasan por el flujo normal
+    con reintentos, en el mismo orden.
+
+    Returns:
+        int: Cantidad de remisiones anuladas ignoradas
+    """
+    anuladas = []
+
+    def omitir(registro):
+        return registro["anulada"]
+
+    def abrir(driver, registro):
+        print(f"\n📄 Abriendo registro {registro['indice'] + 1} en pestaña ...")
+        return abrir_impresion_registro(driver, registro, wait)
+
+    def descargar(driver, registro):
+        print(f"\n📥 Descargando registro {registro['indice'] + 1} ...")
+        return descargar_desde_impresion(driver, wait, registro)
+
+    def reintentar(registro):
+        return procesar_registro_con_reintentos(
+            driver, registro, ventana_principal, wait, pagina_actual="1"
+        )
+
+    def registrar(registro, exito):
+        global ultimo_correlativo_exitoso
+
+        correlativo = registro["correlativo"] or f"registro_{registro['indice'] + 1}"
+        if exito is None:
+            print(f"\n🚫 Remisión anulada ignorada: {correlativo}")
+            # Guardar como último exitoso aunque se omita (para continuar el progreso)
+            if registro["correlativo"]:
+                ultimo_correlativo_exitoso = registro["correlativo"]
+                guardar_ultimo_correlativo(registro["correlativo"])
+            anuladas.append(registro)
+        elif not exito:
+            print(f"  ❌ Registro {registro['indice'] + 1} falló después de 3 intentos")
+
+    procesar_en_pestanas(
+        driver,
+        registros,
+        ventana_principal,
+        abrir,
+        descargar,
+        cerrar_modal_si_esta_abierto,
+        registrar,
+        omitir=omitir,
+        reintentar=reintentar,
+        max_en_vuelo=PESTANAS_IMPRESION,
+    )
+    return len(anuladas)
+
+
+@paso("registro")
 def procesar_registro_con_reintentos(
-    driver, fila, idx, ventana_principal, wait, pagina_actual=None, max_reintentos=3
+    driver, registro, ventana_principal, wait, pagina_actual=None, max_reintentos=3
 ):
     """
     Procesa un registro con sistema de reintentos (3 intentos con pausa en el último)
     """
-    global ultimo_correlativo_exitoso
-
-    correlativo = extraer_correlativo_de_fila(fila)
+    correlativo = registro["correlativo"]
     if correlativo:
         print(f"  🏷️ Correlativo detectado: {correlativo}")
     else:
@@ -563,75 +521,34 @@ def procesar_registro_con_reintentos(
         )
 
     for intento in range(1, max_reintentos + 1):
+        inicio_intento = time.monotonic()
         try:
             print(f"  🔄 Intento {intento}/{max_reintentos}")
 
-            # Si es el tercer intento, esperar 1 segundo antes de intentar
+            # Antes del último intento, esperar a que la tabla esté lista
             if intento == 3:
-                print("  ⏱️ Pausa de 1 segundo antes del último intento...")
-                time.sleep(1)
+                print(
+                    "  ⏱️ Esperando a que la tabla esté lista antes del último intento..."
+                )
+                esperar_tabla_lista(driver, "remission_notes_table")
 
-            # Re-obtener la fila para evitar stale elements
             driver.switch_to.window(ventana_principal)
-            filas = driver.find_elements(
-                By.XPATH, "//table[@id='remission_notes_table']//tbody/tr[@role='row']"
-            )
-            if idx >= len(filas):
-                print("  ⚠️ La fila ya no está disponible.")
-                return False
-            fila = filas[idx]
 
-            # Hacer scroll a la fila
-            driver.execute_script(
-                "arguments[0].scrollIntoView({block: 'center'});", fila
-            )
-            time.sleep(0.3)
-
-            # Re-extraer correlativo por si acaso
-            if not correlativo:
-                correlativo = extraer_correlativo_de_fila(fila)
-
-            # Click en "Acciones"
-            if not click_acciones_fila(driver, fila):
-                if intento < max_reintentos:
-                    continue
-                else:
-                    raise Exception("No se pudo hacer click en Acciones")
-
-            # Click en "Ver"
-            if not click_ver_en_dropdown(driver, fila, wait):
-                if intento < max_reintentos:
-                    continue
-                else:
-                    raise Exception("No se pudo hacer click en Ver")
-
-            # Esperar y hacer click en "Impresión" del modal
-            if not click_impresion_en_modal(driver, wait):
+            # Ver -> modal -> click en "Impresión"
+            if not abrir_impresion_registro(driver, registro, wait):
                 # Intentar cerrar el modal antes de reintentar
                 cerrar_modal_si_esta_abierto(driver)
                 if intento < max_reintentos:
                     continue
                 else:
-                    raise Exception("No se pudo hacer click en Impresión del modal")
+                    raise Exception("No se pudo abrir la impresión del registro")
 
             # Cambiar a la nueva ventana y descargar
             if cambiar_a_nueva_ventana(driver, ventana_principal):
-                time.sleep(0.5)
-
-                if descargar_pdf_y_json(
-                    driver, wait, DOWNLOAD_FOLDER, correlativo, idx + 1
-                ):
-                    print("  ✅ Descargas iniciadas correctamente")
-
-                    # Guardar el último correlativo exitoso
-                    if correlativo:
-                        ultimo_correlativo_exitoso = correlativo
-                        guardar_ultimo_correlativo(correlativo)
-
+                if descargar_desde_impresion(driver, wait, registro):
                     # Cerrar la ventana de descarga
                     driver.close()
                     driver.switch_to.window(ventana_principal)
-                    time.sleep(0.5)
 
                     # Cerrar el modal que quedó abierto
                     cerrar_modal_si_esta_abierto(driver)
@@ -667,7 +584,6 @@ def procesar_registro_con_reintentos(
 
                 # Cerrar modal si está abierto
                 cerrar_modal_si_esta_abierto(driver)
-                time.sleep(0.2)
             except:
                 pass
 
@@ -675,328 +591,278 @@ def procesar_registro_con_reintentos(
                 continue
             else:
                 return False
+        finally:
+            registrar_paso(f"intento_{intento}", time.monotonic() - inicio_intento)
 
     return False
 
 
-try:
-    # Contar archivos iniciales
-    print("📊 Contando archivos existentes en la carpeta de descargas...")
-    pdfs_iniciales, jsons_iniciales = contar_archivos_iniciales()
-    print(f"   📄 PDFs existentes: {pdfs_iniciales}")
-    print(f"   📄 JSONs existentes: {jsons_iniciales}")
-    print(f"   📦 Total archivos iniciales: {pdfs_iniciales + jsons_iniciales}")
-
-    # Leer último correlativo exitoso
-    print("\n🔍 Buscando último correlativo procesado...")
-    ultimo_correlativo_procesado = leer_ultimo_correlativo_exitoso()
-
-    # Maximizar ventana
-    driver.maximize_window()
-    print("\n🚀 Iniciando navegador...")
-
-    # URL de tu ERP
-    URL_ERP = "https://hermaco.findexbusiness.com"
-    driver.get(URL_ERP)
-    print(f"📍 Navegando a: {URL_ERP}")
-
-    wait = WebDriverWait(driver, 10)
-
-    # Click en "Inicio de sesión"
-    login_link = wait.until(
-        EC.element_to_be_clickable(
-            (By.XPATH, "//a[@href='https://hermaco.findexbusiness.com/login']")
-        )
-    )
-    login_link.click()
-    print("✅ Click en 'Inicio de sesión'")
-
-    time.sleep(2)
-    print("🔄 Rellenando credenciales...")
+def ejecutar(driver_compartido=None):
+    """
+    Descarga las notas de remisión nuevas.
 
-    # Rellenar usuario
-    username_input = wait.until(EC.presence_of_element_located((By.ID, "username")))
-    username_input.send_keys("Henri")
-    print("✅ Usuario ingresado")
+    Args:
+        driver_compartido: Navegador ya abierto (por ejemplo, el del
+            orquestador). Se usa sin cerrarlo; si es None se crea uno propio.
 
-    # Rellenar contraseña
-    password_input = driver.find_element(By.ID, "password")
-    password_input.send_keys("Bajmut")
-    print("✅ Contraseña ingresada")
+    Returns:
+        bool: True si el proceso terminó sin errores
+    """
+    global driver, ultimo_correlativo_exitoso
+    driver = driver_compartido or crear_navegador(DOWNLOAD_FOLDER)
+    exitoso = False
+    reiniciar_metricas()
+    reiniciar_esperas()
+    manifiesto = abrir_manifiesto(DOWNLOAD_FOLDER, "remisiones")
 
-    # Click en botón de login
-    login_button = driver.find_element(
-        By.XPATH, "//button[@type='submit' and contains(@class, 'btn-primary')]"
-    )
-    login_button.click()
-    print("✅ Click en botón 'Acceder'")
+    try:
+        # Leer último correlativo exitoso
+        print("\n🔍 Buscando último correlativo procesado...")
+        ultimo_correlativo_procesado = leer_ultimo_correlativo_exitoso()
 
-    time.sleep(3)
-    print("✅ Login completado, esperando dashboard...")
+        # Maximizar ventana
+        driver.maximize_window()
+        print("\n🚀 Iniciando navegador...")
 
-    # Navegar a Gestión de ventas
-    print("\n🔄 Navegando a 'Gestión de ventas'...")
-    gestion_ventas = wait.until(EC.element_to_be_clickable((By.ID, "tour_step7_menu")))
-    gestion_ventas.click()
-    print("✅ Click en 'Gestión de ventas' (desplegable abierto)")
+        wait = WebDriverWait(driver, 10)
 
-    time.sleep(1)
+        # Sesión compartida: reutiliza las cookies guardadas o hace login completo
+        abrir_pagina_autenticada(driver, wait, "/remission-notes")
+        print("📍 Estamos en la página de notas de remisión")
 
-    # Click en "Notas de remisión"
-    print("\n🔄 Navegando a 'Notas de remisión'...")
-    notas_remision = wait.until(
-        EC.element_to_be_clickable(
-            (
-                By.XPATH,
-                "//a[@href='https://hermaco.findexbusiness.com/remission-notes']",
-            )
+        # Filtro de fecha
+        print("\n🔄 Abriendo filtro de fecha...")
+        filtro_fecha = wait.until(
+            EC.element_to_be_clickable((By.ID, "remission_date_filter"))
         )
-    )
-    notas_remision.click()
-    print("✅ Click en 'Notas de remisión'")
+        filtro_fecha.click()
+        print("✅ Click en 'Filtrar por fecha' (desplegable abierto)")
 
-    time.sleep(2)
-    print("📍 Estamos en la página de notas de remisión")
-
-    # Filtro de fecha
-    print("\n🔄 Abriendo filtro de fecha...")
-    filtro_fecha = wait.until(
-        EC.element_to_be_clickable((By.ID, "remission_date_filter"))
-    )
-    filtro_fecha.click()
-    print("✅ Click en 'Filtrar por fecha' (desplegable abierto)")
+        try:
+            hoy = wait.until(
+                EC.element_to_be_clickable(
+                    (
+                        By.XPATH,
+                        "//li[contains(text(), 'Hoy')] | //a[contains(text(), 'Hoy')] | //span[contains(text(), 'Hoy')]",
+                    )
+                )
+            )
+            preparar_espera_draw(driver, "remission_notes_table")
+            hoy.click()
+            print("✅ Seleccionado 'Hoy'")
+            esperar_draw_tabla(driver, "remission_notes_table")
+        except:
+            print("⚠️ No se encontró 'Hoy'. Inspecciona el desplegable.")
+
+        registros_tabla = None
+        if LISTADO_POR_ENDPOINT:
+            # Listado directo desde el endpoint JSON de la tabla (mismos filtros)
+            print("\n🔄 Listando registros desde el endpoint de la tabla...")
+            registros_tabla = listar_registros_datatable(
+                driver, "remission_notes_table"
+            )
 
-    time.sleep(2)
-    try:
-        hoy = wait.until(
-            EC.element_to_be_clickable(
-                (
-                    By.XPATH,
-                    "//li[contains(text(), 'Hoy')] | //a[contains(text(), 'Hoy')] | //span[contains(text(), 'Hoy')]",
+        if registros_tabla is None:
+            # Mostrar "Todos" los registros
+            print("\n🔄 Cambiando filtro a mostrar TODOS los registros...")
+            select_length = wait.until(
+                EC.presence_of_element_located(
+                    (By.NAME, "remission_notes_table_length")
                 )
             )
-        )
-        hoy.click()
-        print("✅ Seleccionado 'Hoy'")
-    except:
-        print("⚠️ No se encontró 'Hoy'. Inspecciona el desplegable.")
+            try:
+                preparar_espera_draw(driver, "remission_notes_table")
+                Select(select_length).select_by_value("-1")
+                print("✅ Seleccionado 'Todos' los registros")
+            except Exception as e:
+                print(f"  ❌ No se pudo cambiar el tamaño de página: {e}")
+                return False
 
-    time.sleep(3)
+            # Esperar a que la tabla dibuje todos los registros
+            print("⏳ Esperando a que carguen TODOS los registros...")
+            esperar_draw_tabla(driver, "remission_notes_table", timeout=60)
+            print("✅ Registros cargados")
 
-    # Mostrar "Todos" los registros
-    print("\n🔄 Cambiando filtro a mostrar TODOS los registros...")
-    select_length = wait.until(
-        EC.presence_of_element_located((By.NAME, "remission_notes_table_length"))
-    )
-    try:
-        Select(select_length).select_by_value("-1")
-        print("✅ Seleccionado 'Todos' los registros")
-    except Exception as e:
-        print(f"  ❌ No se pudo cambiar el tamaño de página: {e}")
-        driver.quit()
-        exit(1)
-
-    # Dar tiempo a que carguen todos los registros
-    print("⏳ Esperando 10 segundos a que carguen TODOS los registros...")
-    time.sleep(10)
-    print("✅ Registros cargados")
-
-    # Hacer scroll hasta el final de la página
-    print("\n🔄 Haciendo scroll hasta el final de la página...")
-    scroll_to_bottom(driver)
-    time.sleep(1)
-
-    # PROCESAMIENTO: Como se muestran todos los registros, no hay paginación
-    print("\n" + "=" * 60)
-    print("🚀 INICIANDO PROCESAMIENTO DE NOTAS DE REMISIÓN")
-    print("=" * 60)
-
-    ventana_principal = driver.current_window_handle
-    registros_procesados_totales = 0
-    registros_anulados_ignorados = 0
-
-    # Obtener todas las filas
-    filas = driver.find_elements(
-        By.XPATH, "//table[@id='remission_notes_table']//tbody/tr[@role='row']"
-    )
-    total_filas = len(filas)
+            # Hacer scroll hasta el final de la página
+            print("\n🔄 Haciendo scroll hasta el final de la página...")
+            scroll_to_bottom(driver)
 
-    print(f"\n{'='*60}")
-    print(f"📄 TOTAL DE REGISTROS: {total_filas}")
-    print(f"{'='*60}")
+            # Foto de la grilla: todas las filas en una sola llamada al navegador
+            registros_tabla = extraer_registros_tabla(driver, "remission_notes_table")
 
-    # Determinar desde dónde empezar (buscar con Ctrl+F si hay último correlativo)
-    indice_ultimo = None
-    if ultimo_correlativo_procesado:
-        indice_ultimo = buscar_correlativo_con_ctrl_f(
-            driver, ultimo_correlativo_procesado
-        )
+        # PROCESAMIENTO: Como se muestran todos los registros, no hay paginación
+        print("\n" + "=" * 60)
+        print("🚀 INICIANDO PROCESAMIENTO DE NOTAS DE REMISIÓN")
+        print("=" * 60)
 
-        if indice_ultimo is not None:
-            print(f"✅ Último correlativo encontrado en índice {indice_ultimo}")
-            print(
-                f"⬆️ Se procesarán los registros ANTERIORES (hacia arriba) desde el índice {indice_ultimo - 1} hasta el índice 0"
-            )
-        else:
-            print(
-                f"⚠️ Correlativo previo no encontrado, procesando desde el final hacia arriba"
-            )
-            indice_ultimo = total_filas  # Empezar desde el final si no se encuentra
+        ventana_principal = driver.current_window_handle
+        registros_procesados_totales = 0
+        registros_anulados_ignorados = 0
 
-    else:
-        print(f"ℹ️ No hay correlativo previo, procesando desde el final hacia arriba")
-        indice_ultimo = total_filas  # Empezar desde el final
+        total_filas = len(registros_tabla)
 
-    # Procesar cada registro HACIA ARRIBA (índices menores = más recientes)
-    # Rango: desde (indice_ultimo - 1) hasta 0 (inclusive), decrementando
-    registros_a_procesar = indice_ultimo
-    print(f"\n🔢 Se procesarán {registros_a_procesar} registros nuevos")
+        print(f"\n{'='*60}")
+        print(f"📄 TOTAL DE REGISTROS: {total_filas}")
+        print(f"{'='*60}")
 
-    # Si no hay registros nuevos, terminar
-    if registros_a_procesar == 0:
-        print("\n" + "=" * 60)
-        print("ℹ️ No hay registros nuevos para procesar")
-        print("=" * 60)
-        # Guardar con mensaje de actualizado
+        # Determinar desde dónde empezar (buscar el último correlativo en la foto)
+        indice_ultimo = None
         if ultimo_correlativo_procesado:
-            try:
-                fecha_actual = datetime.now()
-                with open(ARCHIVO_ULTIMO_EXITOSO, "w", encoding="utf-8") as f:
-                    json.dump(
-                        {
-                            "ultima_ejecucion": fecha_actual.strftime(
-                                "%Y-%m-%d %H:%M:%S"
-                            ),
-                            "fecha_actualizacion": fecha_actual.isoformat(),
-                            "ultimo_correlativo": ultimo_correlativo_procesado,
-                            "estado": "Todo actualizado - nada nuevo",
-                        },
-                        f,
-                        indent=2,
-                        ensure_ascii=False,
-                    )
-                print(f"✅ Estado actualizado: Todo actualizado - nada nuevo")
-            except Exception as e:
-                print(f"⚠️ Error al actualizar estado: {e}")
-        print("\n✅ Proceso completado. El navegador se cerrará automáticamente...")
-        driver.quit()
-        print("\n👋 Navegador cerrado")
-        exit(0)
+            print(f"\n🔍 Buscando correlativo: {ultimo_correlativo_procesado}")
+            indice_ultimo = indexar_registros(registros_tabla, "correlativo").get(
+                ultimo_correlativo_procesado
+            )
 
-    for idx in range(
-        indice_ultimo - 1, -1, -1
-    ):  # Desde indice_ultimo-1 hasta 0, decrementando
-        try:
-            driver.switch_to.window(ventana_principal)
-            registros_procesados_totales += 1
+            if indice_ultimo is not None:
+                print(f"✅ Último correlativo encontrado en índice {indice_ultimo}")
+                print(
+                    f"⬆️ Se procesarán los registros ANTERIORES (hacia arriba) desde el índice {indice_ultimo - 1} hasta el índice 0"
+                )
+            else:
+                print(
+                    f"⚠️ Correlativo previo no encontrado, procesando desde el final hacia arriba"
+                )
+                indice_ultimo = total_filas  # Empezar desde el final si no se encuentra
 
+        else:
             print(
-                f"\n📄 Procesando registro {idx + 1}/{total_filas} (Procesados: {registros_procesados_totales}/{registros_a_procesar}) ..."
+                f"ℹ️ No hay correlativo previo, procesando desde el final hacia arriba"
             )
+            indice_ultimo = total_filas  # Empezar desde el final
+
+        # Procesar cada registro HACIA ARRIBA (índices menores = más recientes)
+        # Rango: desde (indice_ultimo - 1) hasta 0 (inclusive), decrementando
+        registros_a_procesar = indice_ultimo
+        print(f"\n🔢 Se procesarán {registros_a_procesar} registros nuevos")
+
+        # Si no hay registros nuevos, terminar
+        if registros_a_procesar == 0:
+            print("\n" + "=" * 60)
+            print("ℹ️ No hay registros nuevos para procesar")
+            print("=" * 60)
+            # Guardar con mensaje de actualizado
+            if ultimo_correlativo_procesado:
+                if guardar_ultimo_correlativo(
+                    ultimo_correlativo_procesado, tiene_descargas_nuevas=False
+                ):
+                    print(f"✅ Estado actualizado: Todo actualizado - nada nuevo")
+            print("\n✅ Proceso completado. El navegador se cerrará automáticamente...")
+            return True
 
-            # Re-obtener las filas
-            filas = driver.find_elements(
-                By.XPATH, "//table[@id='remission_notes_table']//tbody/tr[@role='row']"
+        if PESTANAS_IMPRESION > 1:
+            print(f"🗂️ Ventanas de impresión en vuelo: {PESTANAS_IMPRESION}")
+            pendientes = [
+                registros_tabla[idx] for idx in range(indice_ultimo - 1, -1, -1)
+            ]
+            registros_procesados_totales = len(pendientes)
+            registros_anulados_ignorados = procesar_remisiones_en_pestanas(
+                driver, pendientes, ventana_principal, wait
             )
-            if idx >= len(filas):
-                print("  ⚠️ La fila ya no está disponible. Saltando...")
-                continue
-            fila = filas[idx]
+        else:
+            for idx in range(
+                indice_ultimo - 1, -1, -1
+            ):  # Desde indice_ultimo-1 hasta 0, decrementando
+                try:
+                    driver.switch_to.window(ventana_principal)
+                    registros_procesados_totales += 1
 
-            # Verificar si la remisión está anulada
-            if verificar_si_esta_anulada(fila):
-                correlativo = extraer_correlativo_de_fila(fila)
-                print(
-                    f"  ⏭️ Remisión anulada ignorada: {correlativo if correlativo else f'registro_{idx + 1}'}"
-                )
+                    print(
+                        f"\n📄 Procesando registro {idx + 1}/{total_filas} (Procesados: {registros_procesados_totales}/{registros_a_procesar}) ..."
+                    )
 
-                # Guardar como último exitoso aunque se omita (para continuar el progreso)
-                if correlativo:
-                    ultimo_correlativo_exitoso = correlativo
-                    guardar_ultimo_correlativo(correlativo)
+                    registro = registros_tabla[idx]
 
-                registros_anulados_ignorados += 1
-                continue
+                    # Verificar si la remisión está anulada
+                    if registro["anulada"]:
+                        correlativo = registro["correlativo"]
+                        print(
+                            f"  🚫 Remisión anulada detectada: {registro['estado_documento']}"
+                        )
+                        print(
+                            f"  ⏭️ Remisión anulada ignorada: {correlativo if correlativo else f'registro_{idx + 1}'}"
+                        )
 
-            # Procesar con sistema de reintentos
-            exito = procesar_registro_con_reintentos(
-                driver,
-                fila,
-                idx,
-                ventana_principal,
-                wait,
-                pagina_actual="1",
-                max_reintentos=3,
-            )
+                        # Guardar como último exitoso aunque se omita (para continuar el progreso)
+                        if correlativo:
+                            ultimo_correlativo_exitoso = correlativo
+                            guardar_ultimo_correlativo(correlativo)
 
-            if not exito:
-                print(f"  ❌ Registro falló después de 3 intentos")
+                        registros_anulados_ignorados += 1
+                        continue
 
-        except Exception as e:
-            print(f"  ❌ Error crítico en registro {idx + 1}: {e}")
-            try:
-                if len(driver.window_handles) > 1:
-                    for handle in driver.window_handles:
-                        if handle != ventana_principal:
-                            driver.switch_to.window(handle)
-                            driver.close()
-                driver.switch_to.window(ventana_principal)
-                cerrar_modal_si_esta_abierto(driver)
-                time.sleep(0.3)
-            except:
-                pass
-            continue
-
-    print(f"\n{'='*60}")
-    print(f"🎉 PROCESAMIENTO COMPLETADO")
-    print(f"{'='*60}")
-    print(f"✅ Total de registros procesados: {registros_procesados_totales}")
-    print(f"🚫 Remisiones anuladas ignoradas: {registros_anulados_ignorados}")
-
-    # Contar archivos finales
-    pdfs_finales = len(glob.glob(os.path.join(DOWNLOAD_FOLDER, "*.pdf")))
-    jsons_finales = len(
-        [
-            f
-            for f in glob.glob(os.path.join(DOWNLOAD_FOLDER, "*.json"))
-            if not ("registros_fallidos" in f or "ultimo_correlativo_exitoso" in f)
-        ]
-    )
+                    # Procesar con sistema de reintentos
+                    exito = procesar_registro_con_reintentos(
+                        driver,
+                        registro,
+                        ventana_principal,
+                        wait,
+                        pagina_actual="1",
+                        max_reintentos=3,
+                    )
 
-    print(f"\n📊 RESUMEN DE ARCHIVOS:")
-    print(f"   📄 PDFs iniciales: {pdfs_iniciales}")
-    print(f"   📄 PDFs finales: {pdfs_finales}")
-    print(f"   ✨ PDFs nuevos descargados: {pdfs_finales - pdfs_iniciales}")
-    print(f"")
-    print(f"   📄 JSONs iniciales: {jsons_iniciales}")
-    print(f"   📄 JSONs finales: {jsons_finales}")
-    print(f"   ✨ JSONs nuevos descargados: {jsons_finales - jsons_iniciales}")
-    print(f"")
-    print(f"   📦 Total archivos iniciales: {pdfs_iniciales + jsons_iniciales}")
-    print(f"   📦 Total archivos finales: {pdfs_finales + jsons_finales}")
-    print(
-        f"   🎁 Total archivos nuevos: {(pdfs_finales - pdfs_iniciales) + (jsons_finales - jsons_iniciales)}"
-    )
-    print(f"\n📁 Archivos descargados en: {DOWNLOAD_FOLDER}")
+                    if not exito:
+                        print(f"  ❌ Registro falló después de 3 intentos")
+
+                except Exception as e:
+                    print(f"  ❌ Error crítico en registro {idx + 1}: {e}")
+                    try:
+                        if len(driver.window_handles) > 1:
+                            for handle in driver.window_handles:
+                                if handle != ventana_principal:
+                                    driver.switch_to.window(handle)
+                                    driver.close()
+                        driver.switch_to.window(ventana_principal)
+                        cerrar_modal_si_esta_abierto(driver)
+                    except:
+                        pass
+                    continue
 
-    if ultimo_correlativo_exitoso:
-        print(f"📄 Último correlativo procesado: {ultimo_correlativo_exitoso}")
+        print(f"\n{'='*60}")
+        print(f"🎉 PROCESAMIENTO COMPLETADO")
+        print(f"{'='*60}")
+        print(f"✅ Total de registros procesados: {registros_procesados_totales}")
+        print(f"🚫 Remisiones anuladas ignoradas: {registros_anulados_ignorados}")
 
-    print("\n✅ Proceso completado. El navegador se cerrará automáticamente...")
+        # Archivos de esta ejecución (manifiesto, sin recorrer la carpeta)
+        conteo = contar_manifiesto(manifiesto)
+        print(f"\n📊 RESUMEN DE ARCHIVOS:")
+        print(f"   📄 PDFs de esta ejecución: {conteo['pdfs']}")
+        print(f"   📄 JSONs de esta ejecución: {conteo['jsons']}")
+        print(f"   🎁 Total archivos nuevos: {conteo['nuevos']}")
+        print(f"\n📁 Archivos descargados en: {DOWNLOAD_FOLDER}")
 
-except KeyboardInterrupt:
-    print("\n\n⚠️ Ejecución interrumpida por el usuario")
-    if ultimo_correlativo_exitoso:
-        print(f"� Último correlativo guardado: {ultimo_correlativo_exitoso}")
+        if ultimo_correlativo_exitoso:
+            print(f"📄 Último correlativo procesado: {ultimo_correlativo_exitoso}")
 
-except Exception as e:
-    print(f"❌ Error: {e}")
-    import traceback
+        print("\n✅ Proceso completado. El navegador se cerrará automáticamente...")
+        exitoso = True
 
-    traceback.print_exc()
-    if ultimo_correlativo_exitoso:
-        print(f"📄 Último correlativo guardado: {ultimo_correlativo_exitoso}")
+    except KeyboardInterrupt:
+        print("\n\n⚠️ Ejecución interrumpida por el usuario")
+        if ultimo_correlativo_exitoso:
+            print(f"� Último correlativo guardado: {ultimo_correlativo_exitoso}")
+        if driver_compartido is not None:
+            raise
 
-finally:
-    driver.quit()
-    print("\n👋 Navegador cerrado")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+
+        traceback.print_exc()
+        if ultimo_correlativo_exitoso:
+            print(f"📄 Último correlativo guardado: {ultimo_correlativo_exitoso}")
+
+    finally:
+        compactar_bitacora(BITACORA)
+        cerrar_manifiesto(manifiesto)
+        imprimir_resumen_esperas()
+        guardar_reporte_pasos(DOWNLOAD_FOLDER, "remisiones")
+        # El navegador compartido lo cierra quien lo creó
+        if driver_compartido is None:
+            driver.quit()
+            print("\n👋 Navegador cerrado")
+    return exitoso
+
+
+if __name__ == "__main__":
+    ejecutar()
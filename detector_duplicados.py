@@ -1,9 +1,32 @@
 import json
 import os
 import re
+import mmap
+import hashlib
 from pathlib import Path
 from collections import defaultdict
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from almacen_descargas import ARCHIVO_INDICE, contenidos_repetidos
+from cache_metadatos import huella_json, metadatos_de_archivos
+
+# Comparación de PDF por contenido: bytes que se leen del inicio y del final
+# de cada archivo en la etapa de huella parcial, e hilos para leer archivos
+TAMANO_MUESTRA_PDF = 8 * 1024
+HILOS_HUELLA_PDF = 8
+
+# Campos que se comparan cuando dos archivos tienen el mismo numeroControl
+# pero distinto contenido (lo único que se guarda de cada grupo)
+CAMPOS_DIFERENCIAS = [
+    ("identificacion", "codigoGeneracion"),
+    ("identificacion", "fecEmi"),
+    ("identificacion", "horEmi"),
+    ("resumen", "totalPagar"),
+    ("resumen", "montoTotalOperacion"),
+    ("emisor", "nombre"),
+    ("receptor", "nombre"),
+]
 
 
 def mostrar_menu():
@@ -17,15 +40,17 @@ def mostrar_menu():
     print("  1. Detectar duplicados en JSON")
     print("  2. Detectar duplicados en PDF")
     print("  3. Eliminar duplicados")
-    print("  4. Salir")
+    print("  4. Consultar duplicados en el índice del almacén")
+    print("  5. Detectar duplicados en PDF por contenido")
+    print("  6. Salir")
     print("-" * 80)
 
     while True:
-        opcion = input("\nIngrese el número de opción (1-4): ").strip()
-        if opcion in ["1", "2", "3", "4"]:
+        opcion = input("\nIngrese el número de opción (1-6): ").strip()
+        if opcion in ["1", "2", "3", "4", "5", "6"]:
             return opcion
         else:
-            print("⚠️  Opción inválida. Por favor ingrese 1, 2, 3 o 4.")
+            print("⚠️  Opción inválida. Por favor ingrese 1, 2, 3, 4, 5 o 6.")
 
 
 def eliminar_duplicados():
@@ -40,7 +65,8 @@ def eliminar_duplicados():
     # Solicitar el archivo JSON de duplicados
     print("\nIngrese la ruta del archivo JSON con los duplicados")
     print(
-        "(Por ejemplo: duplicados_20251105_091226.json o duplicados_pdf_20251106_103230.json)"
+        "(Por ejemplo: duplicados_20251105_091226.json, duplicados_pdf_20251106_103230.json"
+        " o duplicados_indice_20251107_080000.json)"
     )
     archivo_duplicados_input = input("\nRuta del archivo: ").strip()
 
@@ -73,9 +99,13 @@ def eliminar_duplicados():
     # Determinar el tipo de duplicados (JSON o PDF)
     tipo_duplicado = duplicados[0].get("tipo", "")
     es_duplicado_pdf = tipo_duplicado == "duplicado_pdf"
+    es_duplicado_indice = tipo_duplicado == "duplicado_indice"
 
     print(f"\n📋 Se encontraron {len(duplicados)} duplicados en el archivo")
-    print(f"📦 Tipo de duplicados: {'PDF' if es_duplicado_pdf else 'JSON'}")
+    if es_duplicado_indice:
+        print("📦 Tipo de duplicados: Índice del almacén (rutas completas)")
+    else:
+        print(f"📦 Tipo de duplicados: {'PDF' if es_duplicado_pdf else 'JSON'}")
     print("-" * 80)
 
     # Confirmar antes de eliminar
@@ -88,7 +118,10 @@ def eliminar_duplicados():
         return
 
     # Determinar la carpeta de descargas
-    if es_duplicado_pdf:
+    if es_duplicado_indice:
+        # El índice guarda rutas completas, en cualquier carpeta de descargas
+        carpeta_descargas = None
+    elif es_duplicado_pdf:
         # Para PDF, usar la carpeta del JSON
         carpeta_descargas = Path(
             datos_duplicados.get("carpeta_analizada", "descargas_erp")
@@ -97,12 +130,13 @@ def eliminar_duplicados():
         # Para JSON, usar descargas_erp por defecto
         carpeta_descargas = Path("descargas_erp")
 
-    if not carpeta_descargas.exists():
+    if carpeta_descargas is not None and not carpeta_descargas.exists():
         print(f"\n❌ Error: La carpeta {carpeta_descargas} no existe")
         return
 
-    print(f"📁 Carpeta de trabajo: {carpeta_descargas}")
-    print("-" * 80)
+    if carpeta_descargas is not None:
+        print(f"📁 Carpeta de trabajo: {carpeta_descargas}")
+        print("-" * 80)
 
     # Contadores
     eliminados = 0
@@ -114,7 +148,42 @@ def eliminar_duplicados():
 
     # Procesar cada duplicado
     for duplicado in duplicados:
-        if es_duplicado_pdf:
+        if es_duplicado_indice:
+            # Procesar duplicados del índice (rutas completas)
+            archivo_original = duplicado.get("archivo_original")
+            archivo_duplicado = duplicado.get("archivo_duplicado")
+            identificador = duplicado.get("identificador", "N/A")
+
+            if not archivo_original or not archivo_duplicado:
+                print(
+                    f"⚠️  Registro sin archivo_original o archivo_duplicado: {duplicado}"
+                )
+                continue
+
+            ruta_archivo_duplicado = Path(archivo_duplicado)
+
+            if not ruta_archivo_duplicado.exists():
+                print(f"⚠️  No encontrado: {archivo_duplicado}")
+                no_encontrados += 1
+                continue
+
+            # El reporte puede ser antiguo: nunca borrar la única copia
+            if not Path(archivo_original).exists():
+                print(f"⚠️  Se conserva {archivo_duplicado}")
+                print(f"  (El original ya no existe: {archivo_original})")
+                no_encontrados += 1
+                continue
+
+            try:
+                os.remove(ruta_archivo_duplicado)
+                print(f"✓ Eliminado: {archivo_duplicado}")
+                print(f"  (Conservado: {archivo_original})")
+                print(f"  Identificador: {identificador}")
+                eliminados += 1
+            except Exception as e:
+                print(f"❌ Error al eliminar {archivo_duplicado}: {e}")
+                errores += 1
+        elif es_duplicado_pdf:
             # Procesar duplicados PDF
             archivo_original = duplicado.get("archivo_original")
             archivo_duplicado = duplicado.get("archivo_duplicado")
@@ -177,7 +246,8 @@ def eliminar_duplicados():
     print("\n" + "=" * 80)
     print("📊 RESUMEN DE ELIMINACIÓN")
     print("=" * 80)
-    print(f"Carpeta procesada: {carpeta_descargas}")
+    if carpeta_descargas is not None:
+        print(f"Carpeta procesada: {carpeta_descargas}")
     print(f"Total de duplicados procesados: {len(duplicados)}")
     print(f"✓ Archivos eliminados: {eliminados}")
     print(f"⚠️  Archivos no encontrados: {no_encontrados}")
@@ -187,12 +257,10 @@ def eliminar_duplicados():
 
 def obtener_hash_contenido(datos):
     """
-    Convierte el diccionario a una cadena JSON ordenada para comparación
+    Huella SHA-256 del JSON serializado con claves ordenadas: dos archivos
+    con el mismo contenido tienen la misma huella
     """
-    # Excluimos campos que no son relevantes para la comparación
-    datos_copia = datos.copy()
-    # Convertir a string JSON con claves ordenadas para comparación consistente
-    return json.dumps(datos_copia, sort_keys=True, ensure_ascii=False)
+    return huella_json(datos)
 
 
 def son_archivos_identicos(datos1, datos2):
@@ -202,6 +270,19 @@ def son_archivos_identicos(datos1, datos2):
     return obtener_hash_contenido(datos1) == obtener_hash_contenido(datos2)
 
 
+def extraer_campos_comparacion(metadatos):
+    """
+    Se queda solo con lo que usa encontrar_diferencias (de los metadatos de
+    la caché): los campos de CAMPOS_DIFERENCIAS y la cantidad de items
+    """
+    campos = {
+        f"{seccion}.{campo}": metadatos.get(f"{seccion}.{campo}")
+        for seccion, campo in CAMPOS_DIFERENCIAS
+    }
+    campos["cuerpoDocumento.cantidad"] = metadatos.get("cuerpoDocumento.cantidad")
+    return campos
+
+
 def detector_duplicados():
     """
     Detecta archivos duplicados y con correlación inconsistente
@@ -227,8 +308,7 @@ def detector_duplicados():
         print(f"\n❌ Error: La carpeta {carpeta_descargas} no existe")
         return
 
-    # Diccionarios para almacenar los resultados
-    archivos_por_numero_control = defaultdict(list)
+    # Listas para almacenar los resultados
     duplicados_completos = []
     sin_correlacion = []
 
@@ -254,76 +334,91 @@ def detector_duplicados():
     print(f"📁 Carpeta: {carpeta_descargas}")
     print("-" * 80)
 
-    # Primera pasada: agrupar por numeroControl
-    archivos_datos = {}
+    # Primera pasada: una huella por archivo (de la caché de metadatos, o
+    # parseando en un pool de procesos los archivos nuevos), agrupando por
+    # numeroControl y huella. De cada grupo solo se guardan los nombres y los
+    # campos de comparación, no el documento completo
+    grupos_por_numero_control = defaultdict(dict)
+    procesados = 0
     errores = 0
 
-    for archivo in archivos_json_validos:
-        try:
-            with open(archivo, "r", encoding="utf-8") as f:
-                datos = json.load(f)
-
-            numero_control = datos.get("identificacion", {}).get("numeroControl")
-
-            if not numero_control:
-                print(f"⚠️  {archivo.name}: No tiene numeroControl")
-                continue
-
-            archivos_datos[archivo.name] = datos
-            archivos_por_numero_control[numero_control].append(archivo.name)
-
-        except json.JSONDecodeError as e:
-            print(f"❌ {archivo.name}: Error al leer JSON - {e}")
-            errores += 1
-        except Exception as e:
-            print(f"❌ {archivo.name}: Error inesperado - {e}")
+    for resultado in metadatos_de_archivos(
+        archivos_json_validos, procesos=True, con_huella=True
+    ):
+        if "error" in resultado:
+            print(f"❌ {resultado['archivo']}: {resultado['error']}")
             errores += 1
+            continue
+        numero_control = resultado["identificacion.numeroControl"]
+        if not numero_control:
+            print(f"⚠️  {resultado['archivo']}: No tiene numeroControl")
+            continue
+
+        grupos = grupos_por_numero_control[numero_control]
+        grupo = grupos.setdefault(
+            resultado["huella"],
+            {"archivos": [], "campos": extraer_campos_comparacion(resultado)},
+        )
+        grupo["archivos"].append(resultado["archivo"])
+        procesados += 1
 
-    print(f"✓ {len(archivos_datos)} archivos procesados correctamente")
+    print(f"✓ {procesados} archivos procesados correctamente")
     if errores > 0:
         print(f"❌ {errores} archivos con errores")
     print("-" * 80)
 
-    # Segunda pasada: comparar archivos con mismo numeroControl
+    # Segunda pasada: dentro de cada numeroControl, los archivos con la misma
+    # huella son duplicados; huellas distintas son archivos sin correlación
     print("\n🔍 Buscando duplicados...")
 
-    for numero_control, lista_archivos in archivos_por_numero_control.items():
-        if len(lista_archivos) > 1:
-            print(f"\n📋 numeroControl: {numero_control}")
-            print(f"   Encontrados {len(lista_archivos)} archivos:")
+    numeros_control_repetidos = 0
+    for numero_control, grupos in grupos_por_numero_control.items():
+        cantidad = sum(len(grupo["archivos"]) for grupo in grupos.values())
+        if cantidad < 2:
+            continue
+        numeros_control_repetidos += 1
+        print(f"\n📋 numeroControl: {numero_control}")
+        print(f"   Encontrados {cantidad} archivos:")
+
+        # Primero el archivo sin numeración (1), (2)... y luego por nombre
+        for grupo in grupos.values():
+            grupo["archivos"].sort(
+                key=lambda n: (bool(re.search(r"\s*\(\d+\)\.json$", n)), n)
+            )
 
-            # Comparar todos los pares de archivos
-            for i in range(len(lista_archivos)):
-                for j in range(i + 1, len(lista_archivos)):
-                    archivo1 = lista_archivos[i]
-                    archivo2 = lista_archivos[j]
-
-                    datos1 = archivos_datos[archivo1]
-                    datos2 = archivos_datos[archivo2]
-
-                    if son_archivos_identicos(datos1, datos2):
-                        # Duplicados completos
-                        print(f"   ✓ DUPLICADO COMPLETO: {archivo1} ≈ {archivo2}")
-                        duplicados_completos.append(
-                            {
-                                "numeroControl": numero_control,
-                                "archivo1": archivo1,
-                                "archivo2": archivo2,
-                                "tipo": "duplicado_completo",
-                            }
-                        )
-                    else:
-                        # Mismo numeroControl pero contenido diferente
-                        print(f"   ⚠️  SIN CORRELACIÓN: {archivo1} ≠ {archivo2}")
-                        sin_correlacion.append(
-                            {
-                                "numeroControl": numero_control,
-                                "archivo1": archivo1,
-                                "archivo2": archivo2,
-                                "tipo": "sin_correlacion",
-                                "diferencias": encontrar_diferencias(datos1, datos2),
-                            }
-                        )
+        # Duplicados completos: se conserva el primero de cada huella
+        for grupo in grupos.values():
+            conservado = grupo["archivos"][0]
+            for archivo in grupo["archivos"][1:]:
+                print(f"   ✓ DUPLICADO COMPLETO: {archivo} ≈ {conservado}")
+                duplicados_completos.append(
+                    {
+                        "numeroControl": numero_control,
+                        "archivo1": archivo,
+                        "archivo2": conservado,
+                        "tipo": "duplicado_completo",
+                    }
+                )
+
+        # Mismo numeroControl pero contenido diferente: un par por cada
+        # par de huellas distintas
+        distintos = sorted(grupos.values(), key=lambda grupo: grupo["archivos"][0])
+        for i in range(len(distintos)):
+            for j in range(i + 1, len(distintos)):
+                archivo1 = distintos[i]["archivos"][0]
+                archivo2 = distintos[j]["archivos"][0]
+                print(f"   ⚠️  SIN CORRELACIÓN: {archivo1} ≠ {archivo2}")
+                sin_correlacion.append(
+                    {
+                        "numeroControl": numero_control,
+                        "archivo1": archivo1,
+                        "archivo2": archivo2,
+                        "tipo": "sin_correlacion",
+                        "diferencias": encontrar_diferencias(
+                            distintos[i]["campos"], distintos[j]["campos"]
+                        ),
+                    }
+                )
 
     # Generar reporte
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -371,61 +466,33 @@ def detector_duplicados():
     print("📊 RESUMEN DEL ANÁLISIS")
     print("=" * 80)
     print(f"Carpeta analizada: {carpeta_descargas}")
-    print(f"Total de archivos analizados: {len(archivos_datos)}")
+    print(f"Total de archivos analizados: {procesados}")
     print(f"Archivos con errores: {errores}")
-    print(f"Números de control únicos: {len(archivos_por_numero_control)}")
-    print(
-        f"Números de control duplicados: {sum(1 for lista in archivos_por_numero_control.values() if len(lista) > 1)}"
-    )
+    print(f"Números de control únicos: {len(grupos_por_numero_control)}")
+    print(f"Números de control duplicados: {numeros_control_repetidos}")
     print(f"Duplicados completos encontrados: {len(duplicados_completos)}")
     print(f"Archivos sin correlación: {len(sin_correlacion)}")
     print("=" * 80)
 
 
-def encontrar_diferencias(datos1, datos2):
+def encontrar_diferencias(campos1, campos2):
     """
-    Encuentra las diferencias principales entre dos archivos JSON
+    Encuentra las diferencias principales entre dos archivos JSON, a partir
+    de sus campos de comparación (extraer_campos_comparacion)
     """
     diferencias = []
 
-    # Comparar campos principales
-    campos_a_comparar = [
-        ("identificacion", "codigoGeneracion"),
-        ("identificacion", "fecEmi"),
-        ("identificacion", "horEmi"),
-        ("resumen", "totalPagar"),
-        ("resumen", "montoTotalOperacion"),
-        ("emisor", "nombre"),
-        ("receptor", "nombre"),
-    ]
-
-    for campo_path in campos_a_comparar:
-        if len(campo_path) == 2:
-            seccion, campo = campo_path
-            valor1 = datos1.get(seccion, {}).get(campo)
-            valor2 = datos2.get(seccion, {}).get(campo)
-
-            if valor1 != valor2:
-                diferencias.append(
-                    {
-                        "campo": f"{seccion}.{campo}",
-                        "valor_archivo1": valor1,
-                        "valor_archivo2": valor2,
-                    }
-                )
-
-    # Comparar número de items
-    items1 = len(datos1.get("cuerpoDocumento", []))
-    items2 = len(datos2.get("cuerpoDocumento", []))
-
-    if items1 != items2:
-        diferencias.append(
-            {
-                "campo": "cuerpoDocumento.cantidad",
-                "valor_archivo1": items1,
-                "valor_archivo2": items2,
-            }
-        )
+    # Comparar campos principales y número de items
+    for campo, valor1 in campos1.items():
+        valor2 = campos2.get(campo)
+        if valor1 != valor2:
+            diferencias.append(
+                {
+                    "campo": campo,
+                    "valor_archivo1": valor1,
+                    "valor_archivo2": valor2,
+                }
+            )
 
     return diferencias[:10]  # Limitar a 10 diferencias principales
 
@@ -598,6 +665,260 @@ def detector_duplicados_pdf():
     print("=" * 80)
 
 
+def huella_parcial_pdf(ruta, tamano):
+    """
+    SHA-256 de los primeros y últimos TAMANO_MUESTRA_PDF bytes del archivo.
+    Si el archivo es más chico que las dos muestras, es la huella completa.
+    """
+    huella = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        if tamano <= 2 * TAMANO_MUESTRA_PDF:
+            huella.update(f.read())
+        else:
+            huella.update(f.read(TAMANO_MUESTRA_PDF))
+            f.seek(-TAMANO_MUESTRA_PDF, os.SEEK_END)
+            huella.update(f.read(TAMANO_MUESTRA_PDF))
+    return huella.hexdigest()
+
+
+def huella_completa_pdf(ruta, tamano):
+    """SHA-256 de todo el archivo, leído con mmap."""
+    huella = hashlib.sha256()
+    if tamano:
+        with open(ruta, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contenido:
+                huella.update(contenido)
+    return huella.hexdigest()
+
+
+def separar_por_huella(grupos, funcion_huella, executor):
+    """
+    Parte cada grupo de archivos (listas de (ruta, tamaño)) según la huella
+    que calcula 'funcion_huella' en los hilos de 'executor'.
+
+    Returns:
+        tuple: (lista de (huella, grupo) con más de un archivo por huella,
+                archivos con error)
+    """
+    archivos = [archivo for grupo in grupos for archivo in grupo]
+    futuros = [
+        executor.submit(funcion_huella, ruta, tamano) for ruta, tamano in archivos
+    ]
+
+    por_huella = defaultdict(list)
+    errores = []
+    for (ruta, tamano), futuro in zip(archivos, futuros):
+        try:
+            # El tamaño va en la clave: solo se comparan archivos del mismo grupo
+            por_huella[(tamano, futuro.result())].append((ruta, tamano))
+        except OSError as e:
+            print(f"❌ {os.path.basename(ruta)}: No se pudo leer - {e}")
+            errores.append(ruta)
+
+    repetidos = [
+        (huella, grupo) for (_, huella), grupo in por_huella.items() if len(grupo) > 1
+    ]
+    return repetidos, errores
+
+
+def detector_duplicados_pdf_contenido():
+    """
+    Detecta PDF con el mismo contenido aunque tengan nombres distintos.
+    Agrupa por tamaño (un stat por archivo), luego por la huella del inicio y
+    el final de cada archivo y por último por la huella completa; solo los
+    archivos que siguen empatados pasan a la etapa siguiente
+    """
+    print("\n" + "=" * 80)
+    print("SELECCIÓN DE CARPETA PARA DETECTAR DUPLICADOS EN PDF POR CONTENIDO")
+    print("=" * 80)
+
+    # Solicitar carpeta al usuario
+    print("\nIngrese la ruta de la carpeta con los archivos PDF")
+    print("(Presione Enter para usar 'descargas_erp' por defecto)")
+    carpeta_input = input("\nRuta de la carpeta: ").strip()
+
+    if not carpeta_input:
+        carpeta_descargas = Path("descargas_erp")
+    else:
+        # Remover comillas si las tiene
+        carpeta_input = carpeta_input.strip('"').strip("'")
+        carpeta_descargas = Path(carpeta_input)
+
+    # Verificar que la carpeta existe
+    if not carpeta_descargas.exists():
+        print(f"\n❌ Error: La carpeta {carpeta_descargas} no existe")
+        return
+
+    # Etapa 1: agrupar por tamaño (scandir ya trae el stat en Windows)
+    archivos_por_tamano = defaultdict(list)
+    total_archivos = 0
+    with os.scandir(carpeta_descargas) as entradas:
+        for entrada in entradas:
+            if not entrada.name.lower().endswith(".pdf") or not entrada.is_file():
+                continue
+            tamano = entrada.stat().st_size
+            archivos_por_tamano[tamano].append((entrada.path, tamano))
+            total_archivos += 1
+
+    print(f"\n🔍 Analizando {total_archivos} archivos PDF por contenido...")
+    print("-" * 80)
+
+    grupos_tamano = [g for g in archivos_por_tamano.values() if len(g) > 1]
+    candidatos_tamano = sum(len(g) for g in grupos_tamano)
+    print(
+        f"📏 Mismo tamaño: {candidatos_tamano} archivos en {len(grupos_tamano)} grupos"
+    )
+
+    with ThreadPoolExecutor(max_workers=HILOS_HUELLA_PDF) as executor:
+        # Etapa 2: huella del inicio y el final de cada archivo
+        grupos_parcial, errores_parcial = separar_por_huella(
+            grupos_tamano, huella_parcial_pdf, executor
+        )
+        candidatos_parcial = sum(len(g) for _, g in grupos_parcial)
+        print(
+            f"🧩 Misma huella parcial: {candidatos_parcial} archivos en "
+            f"{len(grupos_parcial)} grupos"
+        )
+
+        # Etapa 3: huella completa (los archivos chicos ya la tienen)
+        grupos_completos = [
+            (huella, g)
+            for huella, g in grupos_parcial
+            if g[0][1] <= 2 * TAMANO_MUESTRA_PDF
+        ]
+        grupos_grandes = [
+            g for _, g in grupos_parcial if g[0][1] > 2 * TAMANO_MUESTRA_PDF
+        ]
+        grupos_contenido, errores_completo = separar_por_huella(
+            grupos_grandes, huella_completa_pdf, executor
+        )
+        grupos_contenido += grupos_completos
+
+    errores = len(errores_parcial) + len(errores_completo)
+
+    # Encontrar duplicados
+    duplicados_pdf = []
+
+    print("\n🔍 Buscando duplicados...")
+    print("-" * 80)
+
+    for sha256, grupo in grupos_contenido:
+        nombres = [os.path.basename(ruta) for ruta, _ in grupo]
+
+        # Prioridad: archivo sin numeración (1), (2)... > primero alfabéticamente
+        archivo_original = min(
+            nombres, key=lambda n: (bool(re.search(r"\s*\(\d+\)\.pdf$", n)), n)
+        )
+        nombre_base = normalizar_nombre_pdf(archivo_original)
+
+        print(f"\n📋 Contenido de: {archivo_original}")
+        print(f"   Encontrados {len(nombres)} archivos ({grupo[0][1]} bytes):")
+        for nombre in sorted(nombres):
+            print(f"   - {nombre}")
+            if nombre != archivo_original:
+                duplicados_pdf.append(
+                    {
+                        "nombre_base": nombre_base,
+                        "archivo_original": archivo_original,
+                        "archivo_duplicado": nombre,
+                        "sha256": sha256,
+                        "tamano": grupo[0][1],
+                        "tipo": "duplicado_pdf",
+                    }
+                )
+
+    # Generar reporte
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    # Guardar duplicados PDF (mismo formato que el detector por nombre)
+    if duplicados_pdf:
+        archivo_duplicados_pdf = f"duplicados_pdf_contenido_{timestamp}.json"
+        with open(archivo_duplicados_pdf, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "fecha_analisis": datetime.now().isoformat(),
+                    "carpeta_analizada": str(carpeta_descargas),
+                    "modo": "contenido",
+                    "total_duplicados": len(duplicados_pdf),
+                    "duplicados": duplicados_pdf,
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+        print(f"\n✅ Se encontraron {len(duplicados_pdf)} archivos PDF duplicados")
+        print(f"   Guardados en: {archivo_duplicados_pdf}")
+    else:
+        print(f"\n✓ No se encontraron archivos PDF duplicados")
+
+    # Resumen final
+    print("\n" + "=" * 80)
+    print("📊 RESUMEN DEL ANÁLISIS DE PDF POR CONTENIDO")
+    print("=" * 80)
+    print(f"Carpeta analizada: {carpeta_descargas}")
+    print(f"Total de archivos PDF: {total_archivos}")
+    print(f"Archivos con el mismo tamaño: {candidatos_tamano}")
+    print(f"Archivos con la misma huella parcial: {candidatos_parcial}")
+    print(f"Contenidos repetidos: {len(grupos_contenido)}")
+    print(f"Archivos duplicados encontrados: {len(duplicados_pdf)}")
+    print(f"Archivos con errores de lectura: {errores}")
+    print("=" * 80)
+
+
+def detector_duplicados_indice():
+    """
+    Lista los archivos con el mismo contenido usando el índice SHA-256 del
+    almacén de descargas, sin abrir ni comparar los archivos
+    """
+    print("\n" + "=" * 80)
+    print("DUPLICADOS SEGÚN EL ÍNDICE DEL ALMACÉN")
+    print("=" * 80)
+
+    if not os.path.exists(ARCHIVO_INDICE):
+        print(f"\n❌ Error: No existe el índice {ARCHIVO_INDICE}")
+        return
+
+    grupos = contenidos_repetidos()
+    duplicados = []
+
+    for sha256, ubicaciones in grupos.items():
+        original = ubicaciones[0]
+        print(f"\n📋 {original['identificador']} ({original['extension'].upper()})")
+        print(f"   {len(ubicaciones)} rutas con el mismo contenido:")
+        for ubicacion in ubicaciones:
+            print(f"   • {ubicacion['ruta']}")
+        for ubicacion in ubicaciones[1:]:
+            duplicados.append(
+                {
+                    "sha256": sha256,
+                    "identificador": original["identificador"],
+                    "archivo_original": original["ruta"],
+                    "archivo_duplicado": ubicacion["ruta"],
+                    "tipo": "duplicado_indice",
+                }
+            )
+
+    if duplicados:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        archivo_duplicados = f"duplicados_indice_{timestamp}.json"
+        with open(archivo_duplicados, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "fecha_analisis": datetime.now().isoformat(),
+                    "indice": ARCHIVO_INDICE,
+                    "total_duplicados": len(duplicados),
+                    "duplicados": duplicados,
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+        print(f"\n✅ Se encontraron {len(duplicados)} rutas duplicadas")
+        print(f"   Guardadas en: {archivo_duplicados}")
+    else:
+        print(f"\n✓ No hay contenidos repetidos en el índice")
+
+
 def main():
     """
     Función principal que gestiona el menú y las opciones
@@ -620,6 +941,16 @@ def main():
             eliminar_duplicados()
 
         elif opcion == "4":
+            # Consultar el índice del almacén
+            detector_duplicados_indice()
+            print("\n✅ Análisis completado")
+
+        elif opcion == "5":
+            # Detectar duplicados en PDF por contenido
+            detector_duplicados_pdf_contenido()
+            print("\n✅ Análisis completado")
+
+        elif opcion == "6":
             # Salir
             print("\n👋 ¡Hasta luego!")
             break
@@ -0,0 +1,345 @@
+"""
+ESPERAS POR EVENTO - HERMACO ERP
+================================
+Reemplaza las pausas fijas (time.sleep) del flujo de descarga por esperas
+con nombre que terminan apenas se cumple su condición:
+
+- dropdown de Acciones visible (y dropdowns cerrados)
+- modal de detalle visible (con su footer cargado)
+- modal cerrado
+- nueva ventana abierta
+- evento 'draw' de DataTables (cambio de página, filtro o tamaño)
+- tabla lista (sin el indicador de 'procesando' y con filas)
+- scroll terminado (elemento en pantalla o final de la página)
+- descarga terminada en la carpeta
+
+Cada espera registra cuánto tardó realmente. Al final de la ejecución
+imprimir_resumen_esperas() muestra el total por espera y lo compara con la
+pausa fija que se usaba antes en ese mismo punto.
+"""
+
+import os
+import time
+import threading
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+# Frecuencia con la que se revisa cada condición
+INTERVALO_SONDEO = 0.1
+
+# Pausa fija que se usaba antes en cada punto (para estimar el ahorro)
+PAUSAS_FIJAS_ANTERIORES = {
+    "dropdown_visible": 0.7,
+    "modal_visible": 3.0,
+    "modal_cerrado": 0.5,
+    "nueva_ventana": 0.5,
+    "draw_tabla": 3.0,
+    "descarga_completa": 2.0,
+    "elemento_visible": 2.0,
+    "dropdown_cerrado": 0.5,
+    "tabla_lista": 1.0,
+    "scroll_elemento": 0.5,
+    "scroll_final": 1.0,
+}
+
+_tiempos_espera = {}
+_candado_tiempos = threading.Lock()
+
+
+def reiniciar_esperas():
+    """Empieza una medición nueva (al inicio de cada descargador)."""
+    with _candado_tiempos:
+        _tiempos_espera.clear()
+
+
+def registrar_espera(nombre, segundos, cumplida=True):
+    """Guarda la duración real de una espera."""
+    with _candado_tiempos:
+        datos = _tiempos_espera.setdefault(
+            nombre, {"cantidad": 0, "total": 0.0, "maximo": 0.0, "vencidas": 0}
+        )
+        datos["cantidad"] += 1
+        datos["total"] += segundos
+        datos["maximo"] = max(datos["maximo"], segundos)
+        if not cumplida:
+            datos["vencidas"] += 1
+
+
+def esperar(driver, nombre, condicion, timeout=10):
+    """
+    Espera a que 'condicion(driver)' retorne un valor verdadero y lo retorna.
+    Registra el tiempo bajo 'nombre'; si vence el timeout lanza la excepción
+    de WebDriverWait igual que antes.
+    """
+    inicio = time.monotonic()
+    try:
+        resultado = WebDriverWait(
+            driver, timeout, poll_frequency=INTERVALO_SONDEO
+        ).until(condicion)
+        registrar_espera(nombre, time.monotonic() - inicio)
+        return resultado
+    except Exception:
+        registrar_espera(nombre, time.monotonic() - inicio, cumplida=False)
+        raise
+
+
+def esperar_dropdown_visible(driver, fila, timeout=5):
+    """Espera el menú desplegable visible dentro de la fila y lo retorna."""
+
+    def menu_visible(_):
+        menus = fila.find_elements(By.XPATH, ".//ul[contains(@class,'dropdown-menu')]")
+        visibles = [m for m in menus if m.is_displayed()]
+        return visibles[0] if visibles else False
+
+    return esperar(driver, "dropdown_visible", menu_visible, timeout)
+
+
+def esperar_dropdowns_cerrados(driver, timeout=5):
+    """Espera a que no quede ningún menú desplegable visible en la página."""
+    return esperar(
+        driver,
+        "dropdown_cerrado",
+        lambda d: d.execute_script(JS_SIN_DROPDOWNS),
+        timeout,
+    )
+
+
+def esperar_modal_visible(driver, timeout=15):
+    """
+    Espera el modal de detalle visible y con su footer cargado
+    (el contenido llega por ajax después de abrirse). Retorna el modal.
+    """
+
+    def modal_listo(d):
+        for modal in d.find_elements(By.CLASS_NAME, "modal-content"):
+            if modal.is_displayed() and modal.find_elements(
+                By.CLASS_NAME, "modal-footer"
+            ):
+                return modal
+        return False
+
+    return esperar(driver, "modal_visible", modal_listo, timeout)
+
+
+def esperar_modal_cerrado(driver, timeout=5):
+    """Espera a que no quede ningún modal visible."""
+
+    def sin_modal(d):
+        return not any(
+            m.is_displayed() for m in d.find_elements(By.CLASS_NAME, "modal-content")
+        )
+
+    try:
+        return esperar(driver, "modal_cerrado", sin_modal, timeout)
+    except Exception:
+        return False
+
+
+def esperar_nueva_ventana(
+    driver, ventana_original, timeout=10, ventanas_conocidas=None
+):
+    """
+    Espera a que se abra una ventana distinta a la original (y a las
+    'ventanas_conocidas', si ya hay otras pestañas abiertas) y retorna su handle.
+    """
+    conocidas = set(ventanas_conocidas or ()) | {ventana_original}
+
+    def ventana_nueva(d):
+        for ventana in d.window_handles:
+            if ventana not in conocidas:
+                return ventana
+        return False
+
+    return esperar(driver, "nueva_ventana", ventana_nueva, timeout)
+
+
+def esperar_elemento_visible(driver, localizador, timeout=10):
+    """Espera un elemento visible (por ejemplo, el selector de rango de fechas)."""
+
+    def elemento_visible(d):
+        for elemento in d.find_elements(*localizador):
+            if elemento.is_displayed():
+                return elemento
+        return False
+
+    return esperar(driver, "elemento_visible", elemento_visible, timeout)
+
+
+# Marca en la página cuándo la tabla terminó de dibujarse
+JS_PREPARAR_DRAW = """
+const id = arguments[0];
+window.__esperaDraw = window.__esperaDraw || {};
+window.__esperaDraw[id] = false;
+if (window.jQuery) {
+    jQuery("#" + id).one("draw.dt", function () { window.__esperaDraw[id] = true; });
+}
+"""
+
+JS_DRAW_TERMINADO = """
+const id = arguments[0];
+if (window.__esperaDraw && id in window.__esperaDraw && window.jQuery) {
+    return window.__esperaDraw[id];
+}
+const procesando = document.getElementById(id + "_processing");
+return !procesando || procesando.offsetParent === null;
+"""
+
+
+def preparar_espera_draw(driver, id_tabla):
+    """
+    Registra un listener de un solo uso para el evento 'draw.dt' de la tabla.
+    Debe llamarse ANTES de la acción que recarga la tabla (filtro, página,
+    tamaño de página).
+    """
+    try:
+        driver.execute_script(JS_PREPARAR_DRAW, id_tabla)
+    except Exception as e:
+        print(f"  ⚠️ No se pudo preparar la espera de la tabla: {e}")
+
+
+def esperar_draw_tabla(driver, id_tabla, timeout=30):
+    """
+    Espera a que la tabla termine de dibujarse después de la acción.
+    Retorna False si venció el tiempo (el flujo puede continuar igual).
+    """
+    try:
+        esperar(
+            driver,
+            "draw_tabla",
+            lambda d: d.execute_script(JS_DRAW_TERMINADO, id_tabla),
+            timeout,
+        )
+        return True
+    except Exception:
+        print(f"  ⚠️ La tabla {id_tabla} no terminó de cargar en {timeout}s")
+        return False
+
+
+JS_SIN_DROPDOWNS = """
+return !Array.from(document.querySelectorAll(".dropdown-menu")).some(
+    (menu) => menu.offsetParent !== null
+);
+"""
+
+JS_TABLA_LISTA = """
+const id = arguments[0];
+const procesando = document.getElementById(id + "_processing");
+if (procesando && procesando.offsetParent !== null) {
+    return false;
+}
+return document.querySelectorAll("#" + id + " tbody tr").length > 0;
+"""
+
+JS_ELEMENTO_EN_PANTALLA = """
+const caja = arguments[0].getBoundingClientRect();
+return caja.bottom > 0 && caja.top < window.innerHeight;
+"""
+
+JS_FINAL_PAGINA = """
+const alto = Math.max(
+    document.body.scrollHeight, document.documentElement.scrollHeight
+);
+return Math.ceil(window.scrollY + window.innerHeight) >= alto - 1;
+"""
+
+
+def esperar_tabla_lista(driver, id_tabla, timeout=10):
+    """
+    Espera a que la tabla no esté procesando y tenga filas (sin depender de
+    un evento 'draw' preparado). Retorna False si venció el tiempo.
+    """
+    try:
+        esperar(
+            driver,
+            "tabla_lista",
+            lambda d: d.execute_script(JS_TABLA_LISTA, id_tabla),
+            timeout,
+        )
+        return True
+    except Exception:
+        print(f"  ⚠️ La tabla {id_tabla} no quedó lista en {timeout}s")
+        return False
+
+
+def esperar_elemento_en_pantalla(driver, elemento, timeout=5):
+    """Espera a que el scroll deje el elemento dentro de la ventana."""
+    try:
+        esperar(
+            driver,
+            "scroll_elemento",
+            lambda d: d.execute_script(JS_ELEMENTO_EN_PANTALLA, elemento),
+            timeout,
+        )
+        return True
+    except Exception:
+        return False
+
+
+def esperar_final_pagina(driver, timeout=5):
+    """Espera a que el scroll llegue al final de la página."""
+    try:
+        esperar(
+            driver,
+            "scroll_final",
+            lambda d: d.execute_script(JS_FINAL_PAGINA),
+            timeout,
+        )
+        return True
+    except Exception:
+        return False
+
+
+def listar_archivos(carpeta):
+    """Retorna el conjunto de nombres de archivo de la carpeta."""
+    try:
+        return set(os.listdir(carpeta))
+    except OSError:
+        return set()
+
+
+def esperar_descarga_completa(carpeta, archivos_previos, cantidad=2, timeout=30):
+    """
+    Espera a que el gestor de descargas de Chrome deje en la carpeta al menos
+    'cantidad' archivos que no estaban en 'archivos_previos' y ninguna
+    descarga a medias (.crdownload / .tmp).
+    Retorna True si se completaron antes del timeout.
+    """
+    inicio = time.monotonic()
+    while time.monotonic() - inicio < timeout:
+        nuevos = listar_archivos(carpeta) - archivos_previos
+        en_curso = any(n.endswith((".crdownload", ".tmp")) for n in nuevos)
+
+        if len(nuevos) >= cantidad and not en_curso:
+            registrar_espera("descarga_completa", time.monotonic() - inicio)
+            return True
+        time.sleep(INTERVALO_SONDEO)
+
+    registrar_espera("descarga_completa", time.monotonic() - inicio, cumplida=False)
+    return False
+
+
+def imprimir_resumen_esperas():
+    """Muestra cuánto tardó cada tipo de espera y el ahorro frente a las pausas fijas."""
+    with _candado_tiempos:
+        tiempos = {nombre: dict(datos) for nombre, datos in _tiempos_espera.items()}
+
+    if not tiempos:
+        return
+
+    print(f"\n⏱️ TIEMPOS DE ESPERA")
+    print(
+        f"   {'Espera':<20} {'Veces':>6} {'Total':>9} {'Prom.':>7} {'Máx.':>7} {'Ahorro':>9}"
+    )
+    ahorro_total = 0.0
+    for nombre, datos in sorted(tiempos.items()):
+        promedio = datos["total"] / datos["cantidad"]
+        pausa_fija = PAUSAS_FIJAS_ANTERIORES.get(nombre, 0.0) * datos["cantidad"]
+        ahorro = pausa_fija - datos["total"]
+        ahorro_total += ahorro
+        vencidas = f"  ({datos['vencidas']} vencidas)" if datos["vencidas"] else ""
+        print(
+            f"   {nombre:<20} {datos['cantidad']:>6} {datos['total']:>8.1f}s "
+            f"{promedio:>6.2f}s {datos['maximo']:>6.2f}s {ahorro:>8.1f}s{vencidas}"
+        )
+    print(f"   💡 Tiempo ahorrado frente a las pausas fijas: {ahorro_total:.1f}s")
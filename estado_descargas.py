@@ -0,0 +1,493 @@
+"""
+ESTADO DE DESCARGAS EN SQLITE - HERMACO ERP
+===========================================
+Reemplaza los archivos de seguimiento que cada descargador reescribía
+completos en cada cambio:
+
+- ultimo_exitoso.json / ultimo_dte_exitoso_*.json / ultimo_codigo_exitoso_*.json
+- reporte_fallidos.json
+- 01descargados.json / 02ignorados.json
+
+por una base SQLite en la carpeta de descargas ('estado_descargas.db') con:
+
+- documentos: procesados, fallidos, ignorados y anulados por tipo de
+  documento (facturas, anuladas, gastos, remisiones), con índice por
+  identificador
+- puntos_control: último DTE / correlativo / código de cada ejecución
+
+Cada escritura es una transacción. Al abrir el estado por primera vez se
+importan los archivos JSON que existan en la carpeta, así el historial de
+producción no se pierde; los archivos originales no se borran.
+
+Uso manual de la importación:
+    python estado_descargas.py <carpeta> <tipo>
+"""
+
+import os
+import sys
+import json
+import glob
+import sqlite3
+import threading
+from datetime import datetime
+
+NOMBRE_BASE_DATOS = "estado_descargas.db"
+
+# Categorías de documentos
+CATEGORIAS = ("procesado", "fallido", "ignorado", "anulado")
+
+_conexiones = threading.local()
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    tipo TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    identificador TEXT NOT NULL,
+    datos TEXT NOT NULL DEFAULT '{}',
+    corregido INTEGER NOT NULL DEFAULT 0,
+    fecha TEXT NOT NULL,
+    PRIMARY KEY (tipo, categoria, identificador)
+);
+CREATE INDEX IF NOT EXISTS documentos_identificador
+    ON documentos (tipo, identificador);
+CREATE TABLE IF NOT EXISTS puntos_control (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    estado TEXT,
+    datos TEXT NOT NULL DEFAULT '{}',
+    fecha TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS puntos_control_tipo ON puntos_control (tipo, id);
+CREATE TABLE IF NOT EXISTS importaciones (
+    archivo TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    registros INTEGER NOT NULL,
+    fecha TEXT NOT NULL
+);
+"""
+
+
+def abrir_estado(carpeta, tipo):
+    """
+    Abre (o crea) el estado de un tipo de documento en la carpeta de
+    descargas e importa los archivos JSON anteriores que no se hayan
+    importado todavía.
+
+    Args:
+        carpeta: Carpeta de descargas del script
+        tipo: 'facturas', 'anuladas', 'gastos' o 'remisiones'
+
+    Returns:
+        dict: Estado para usar con las demás funciones del módulo
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    estado = {
+        "carpeta": carpeta,
+        "tipo": tipo,
+        "ruta": os.path.join(carpeta, NOMBRE_BASE_DATOS),
+    }
+    try:
+        importar_archivos_anteriores(estado)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ No se pudieron importar los archivos de seguimiento: {e}")
+    return estado
+
+
+def conectar(estado):
+    """Conexión a la base del estado (una por hilo y por archivo)."""
+    conexiones = getattr(_conexiones, "por_ruta", None)
+    if conexiones is None:
+        conexiones = _conexiones.por_ruta = {}
+
+    conexion = conexiones.get(estado["ruta"])
+    if conexion is None:
+        conexion = sqlite3.connect(estado["ruta"], timeout=30)
+        conexion.row_factory = sqlite3.Row
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.executescript(ESQUEMA)
+        conexiones[estado["ruta"]] = conexion
+    return conexion
+
+
+def fecha_actual():
+    """Fecha y hora actual en formato ISO."""
+    return datetime.now().isoformat()
+
+
+def filas_documentos(estado, categoria, registros, clave):
+    """Filas para la tabla documentos (omite los registros sin identificador)."""
+    return [
+        (
+            estado["tipo"],
+            categoria,
+            str(registro[clave]),
+            json.dumps(registro, ensure_ascii=False),
+            1 if registro.get("corregido") else 0,
+            fecha_actual(),
+        )
+        for registro in registros
+        if registro.get(clave)
+    ]
+
+
+def insertar_documentos(conexion, filas, reemplazar=True):
+    """Inserta las filas dentro de la transacción abierta."""
+    instruccion = "INSERT OR REPLACE" if reemplazar else "INSERT OR IGNORE"
+    cursor = conexion.executemany(
+        f"{instruccion} INTO documentos "
+        "(tipo, categoria, identificador, datos, corregido, fecha) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        filas,
+    )
+    return cursor.rowcount
+
+
+def registrar_documentos(estado, categoria, registros, clave="dte", reemplazar=True):
+    """
+    Guarda varios registros de una categoría en una sola transacción.
+
+    Args:
+        estado: dict de abrir_estado
+        categoria: 'procesado', 'fallido', 'ignorado' o 'anulado'
+        registros: lista de dicts con los datos de cada documento
+        clave: campo del dict que identifica al documento
+        reemplazar: False para conservar los que ya estaban (no los pisa)
+
+    Returns:
+        int: Documentos nuevos o actualizados
+    """
+    filas = filas_documentos(estado, categoria, registros, clave)
+    conexion = conectar(estado)
+    with conexion:
+        return insertar_documentos(conexion, filas, reemplazar)
+
+
+def registrar_documento(estado, categoria, identificador, datos=None):
+    """Guarda (o actualiza) un solo documento."""
+    conexion = conectar(estado)
+    with conexion:
+        return insertar_documentos(
+            conexion,
+            [
+                (
+                    estado["tipo"],
+                    categoria,
+                    str(identificador),
+                    json.dumps(datos or {}, ensure_ascii=False),
+                    0,
+                    fecha_actual(),
+                )
+            ],
+        )
+
+
+def quitar_documentos(estado, categoria, identificadores):
+    """Quita documentos de una categoría (por ejemplo, ignorados ya pagados)."""
+    conexion = conectar(estado)
+    with conexion:
+        conexion.executemany(
+            "DELETE FROM documentos "
+            "WHERE tipo = ? AND categoria = ? AND identificador = ?",
+            [(estado["tipo"], categoria, str(i)) for i in identificadores],
+        )
+
+
+def reemplazar_categoria(estado, categoria, registros, clave):
+    """Deja en la categoría exactamente los registros dados (una transacción)."""
+    filas = filas_documentos(estado, categoria, registros, clave)
+    conexion = conectar(estado)
+    with conexion:
+        conexion.execute(
+            "DELETE FROM documentos WHERE tipo = ? AND categoria = ?",
+            (estado["tipo"], categoria),
+        )
+        return insertar_documentos(conexion, filas)
+
+
+def marcar_corregido(estado, identificador):
+    """Marca un documento fallido como corregido. Retorna True si existía."""
+    conexion = conectar(estado)
+    with conexion:
+        fila = conexion.execute(
+            "SELECT datos FROM documentos "
+            "WHERE tipo = ? AND categoria = 'fallido' AND identificador = ?",
+            (estado["tipo"], identificador),
+        ).fetchone()
+        if fila is None:
+            return False
+
+        datos = json.loads(fila["datos"])
+        datos["corregido"] = True
+        datos["fecha_correccion"] = fecha_actual()
+        conexion.execute(
+            "UPDATE documentos SET corregido = 1, datos = ?, fecha = ? "
+            "WHERE tipo = ? AND categoria = 'fallido' AND identificador = ?",
+            (
+                json.dumps(datos, ensure_ascii=False),
+                datos["fecha_correccion"],
+                estado["tipo"],
+                identificador,
+            ),
+        )
+    return True
+
+
+def existe_documento(estado, categoria, identificador):
+    """True si el documento está en la categoría (búsqueda por índice)."""
+    fila = (
+        conectar(estado)
+        .execute(
+            "SELECT 1 FROM documentos "
+            "WHERE tipo = ? AND categoria = ? AND identificador = ?",
+            (estado["tipo"], categoria, str(identificador)),
+        )
+        .fetchone()
+    )
+    return fila is not None
+
+
+def listar_documentos(estado, categoria, incluir_corregidos=True):
+    """Datos de los documentos de una categoría, en el orden en que se guardaron."""
+    consulta = (
+        "SELECT datos FROM documentos WHERE tipo = ? AND categoria = ?"
+        + ("" if incluir_corregidos else " AND corregido = 0")
+        + " ORDER BY rowid"
+    )
+    filas = conectar(estado).execute(consulta, (estado["tipo"], categoria))
+    return [json.loads(fila["datos"]) for fila in filas]
+
+
+def contar_documentos(estado, categoria):
+    fila = (
+        conectar(estado)
+        .execute(
+            "SELECT COUNT(*) FROM documentos WHERE tipo = ? AND categoria = ?",
+            (estado["tipo"], categoria),
+        )
+        .fetchone()
+    )
+    return fila[0]
+
+
+def guardar_punto_control(estado, valor, descripcion=None, datos=None):
+    """
+    Guarda el último DTE / correlativo / código procesado de la ejecución.
+    Cada punto se agrega como una fila nueva (no se reescribe nada).
+    """
+    conexion = conectar(estado)
+    with conexion:
+        conexion.execute(
+            "INSERT INTO puntos_control (tipo, valor, estado, datos, fecha) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                estado["tipo"],
+                str(valor),
+                descripcion,
+                json.dumps(datos or {}, ensure_ascii=False),
+                fecha_actual(),
+            ),
+        )
+
+
+def ultimo_punto_control(estado):
+    """
+    Retorna el punto de control más reciente del tipo, o None.
+
+    Returns:
+        dict: {'valor', 'estado', 'fecha', ...datos adicionales}
+    """
+    fila = (
+        conectar(estado)
+        .execute(
+            "SELECT valor, estado, datos, fecha FROM puntos_control "
+            "WHERE tipo = ? ORDER BY id DESC LIMIT 1",
+            (estado["tipo"],),
+        )
+        .fetchone()
+    )
+    if fila is None:
+        return None
+
+    punto = json.loads(fila["datos"])
+    punto.update(
+        {"valor": fila["valor"], "estado": fila["estado"], "fecha": fila["fecha"]}
+    )
+    return punto
+
+
+def aplicar_eventos(estado, eventos):
+    """
+    Aplica en una sola transacción los eventos de la bitácora de progreso
+    (ver bitacora_descargas.py). De los puntos de control solo se guarda el
+    último del lote.
+
+    Returns:
+        int: Eventos aplicados
+    """
+    ultimo_punto = None
+    conexion = conectar(estado)
+    with conexion:
+        for evento in eventos:
+            if evento["evento"] == "punto":
+                ultimo_punto = evento
+            elif not evento.get("id"):
+                continue
+            elif evento["evento"] == "quitar":
+                conexion.execute(
+                    "DELETE FROM documentos "
+                    "WHERE tipo = ? AND categoria = ? AND identificador = ?",
+                    (estado["tipo"], evento["categoria"], str(evento["id"])),
+                )
+            else:
+                insertar_documentos(
+                    conexion,
+                    [
+                        (
+                            estado["tipo"],
+                            evento["categoria"],
+                            str(evento["id"]),
+                            json.dumps(evento.get("datos") or {}, ensure_ascii=False),
+                            0,
+                            evento["fecha"],
+                        )
+                    ],
+                    # Un fallido ya registrado conserva su marca de corregido
+                    reemplazar=evento["categoria"] != "fallido",
+                )
+
+        if ultimo_punto:
+            conexion.execute(
+                "INSERT INTO puntos_control (tipo, valor, estado, datos, fecha) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    estado["tipo"],
+                    str(ultimo_punto["valor"]),
+                    ultimo_punto.get("descripcion"),
+                    json.dumps(ultimo_punto.get("datos") or {}, ensure_ascii=False),
+                    ultimo_punto["fecha"],
+                ),
+            )
+    return len(eventos)
+
+
+# ---------------------------------------------------------------------------
+# Importación de los archivos JSON anteriores
+# ---------------------------------------------------------------------------
+
+
+def leer_json(archivo):
+    with open(archivo, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def registros_de_archivo(data):
+    """Los archivos de seguimiento traen la lista en 'registros' o directa."""
+    if isinstance(data, dict):
+        return data.get("registros", [])
+    return data if isinstance(data, list) else []
+
+
+def importar_ultimo_exitoso(estado, archivo):
+    """ultimo_exitoso.json y los ultimo_*_exitoso_<fecha>.json."""
+    data = leer_json(archivo)
+    valor = (
+        data.get("ultimo_dte")
+        or data.get("ultimo_correlativo")
+        or data.get("ultimo_codigo")
+    )
+    if not valor:
+        return 0
+
+    extras = {
+        k: v
+        for k, v in data.items()
+        if k not in ("ultimo_dte", "ultimo_correlativo", "ultimo_codigo", "estado")
+    }
+    extras["importado_de"] = os.path.basename(archivo)
+    guardar_punto_control(estado, valor, data.get("estado"), extras)
+    return 1
+
+
+def importar_reporte_fallidos(estado, archivo):
+    """reporte_fallidos.json (conserva la marca de corregido)."""
+    registros = registros_de_archivo(leer_json(archivo))
+    return registrar_documentos(estado, "fallido", registros, "dte", reemplazar=False)
+
+
+def importar_tracking(estado, archivo, categoria):
+    """01descargados.json / 02ignorados.json de gastos."""
+    registros = registros_de_archivo(leer_json(archivo))
+    return registrar_documentos(
+        estado, categoria, registros, "numero_documento", reemplazar=False
+    )
+
+
+def importar_archivos_anteriores(estado):
+    """
+    Importa una sola vez cada archivo de seguimiento de la carpeta.
+    Los puntos de control con fecha en el nombre se importan del más viejo
+    al más nuevo, así el último queda como el punto vigente.
+    """
+    carpeta = estado["carpeta"]
+
+    con_fecha = []
+    for patron in ("ultimo_dte_exitoso_*.json", "ultimo_codigo_exitoso_*.json"):
+        con_fecha.extend(glob.glob(os.path.join(carpeta, patron)))
+    con_fecha.sort(key=os.path.getmtime)
+
+    importadores = [(archivo, importar_ultimo_exitoso) for archivo in con_fecha]
+    importadores += [
+        (os.path.join(carpeta, "ultimo_exitoso.json"), importar_ultimo_exitoso),
+        (os.path.join(carpeta, "reporte_fallidos.json"), importar_reporte_fallidos),
+        (
+            os.path.join(carpeta, "01descargados.json"),
+            lambda e, a: importar_tracking(e, a, "procesado"),
+        ),
+        (
+            os.path.join(carpeta, "02ignorados.json"),
+            lambda e, a: importar_tracking(e, a, "ignorado"),
+        ),
+    ]
+
+    conexion = conectar(estado)
+    importados = 0
+    for archivo, importador in importadores:
+        if not os.path.exists(archivo):
+            continue
+        nombre = os.path.basename(archivo)
+        ya_importado = conexion.execute(
+            "SELECT 1 FROM importaciones WHERE archivo = ?", (nombre,)
+        ).fetchone()
+        if ya_importado:
+            continue
+
+        try:
+            registros = importador(estado, archivo)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudo importar {nombre}: {e}")
+            continue
+
+        with conexion:
+            conexion.execute(
+                "INSERT INTO importaciones (archivo, tipo, registros, fecha) "
+                "VALUES (?, ?, ?, ?)",
+                (nombre, estado["tipo"], registros, fecha_actual()),
+            )
+        print(f"📥 Importado {nombre} al estado de descargas ({registros} registros)")
+        importados += 1
+    return importados
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python estado_descargas.py <carpeta> <tipo>")
+        sys.exit(1)
+
+    estado = abrir_estado(sys.argv[1], sys.argv[2])
+    print(f"\n📊 Estado de {estado['tipo']} en {estado['ruta']}")
+    for categoria in CATEGORIAS:
+        print(f"   {categoria:<10} {contar_documentos(estado, categoria):>8}")
+    punto = ultimo_punto_control(estado)
+    if punto:
+        print(f"   Último punto de control: {punto['valor']} ({punto['fecha']})")
@@ -0,0 +1,138 @@
+"""
+EXTRACCIÓN MASIVA DE TABLAS - HERMACO ERP
+=========================================
+Lee todas las filas de una tabla DataTables (sell_table, expense_table,
+remission_notes_table) con UNA sola llamada a execute_script por página.
+
+En lugar de pedirle a chromedriver el texto de cada celda (varias llamadas
+HTTP por fila), el navegador arma la lista completa de registros y la
+devuelve de una vez. Los descargadores recorren esa foto en memoria y solo
+vuelven a tocar el DOM para hacer click en la fila que van a descargar.
+"""
+
+from selenium.webdriver.common.by import By
+
+# Script ejecutado en el navegador. Devuelve un registro por fila con los
+# mismos criterios que usaban las funciones extraer_*_de_fila de cada script.
+JS_EXTRAER_FILAS = """
+const tabla = document.getElementById(arguments[0]);
+if (!tabla) { return []; }
+
+const patronCorrelativo = /^[0-9A-Fa-f]{8}(-[0-9A-Fa-f]{4}){3}-[0-9A-Fa-f]{12}$/;
+const texto = (el) => (el ? (el.innerText || el.textContent || "").trim() : null);
+const filas = tabla.querySelectorAll("tbody > tr[role='row']");
+const registros = [];
+
+filas.forEach((fila, indice) => {
+    const celdas = Array.from(fila.querySelectorAll("td")).map(texto);
+    const registro = {
+        indice: indice,
+        dte: null,
+        fecha: null,
+        anulada: false,
+        estado_documento: null,
+        estado_pago: null,
+        codigo: null,
+        numero_documento: celdas.length >= 5 ? (celdas[4] || null) : null,
+        correlativo: null,
+        data_href: null,
+        data_container: null,
+        href_imprimir: null,
+    };
+
+    for (const valor of celdas) {
+        if (!valor) { continue; }
+        if (registro.dte === null && valor.includes("DTE-")) {
+            registro.dte = valor;
+        }
+        if (registro.fecha === null && valor.includes("/") && /\\d/.test(valor)) {
+            registro.fecha = valor;
+        }
+        if (!registro.anulada && valor.toLowerCase().includes("anulada")) {
+            registro.anulada = true;
+            registro.estado_documento = valor;
+        }
+        if (registro.correlativo === null && patronCorrelativo.test(valor)) {
+            registro.correlativo = valor;
+        }
+    }
+
+    registro.estado_pago = texto(
+        fila.querySelector("td a.payment-status span.label")
+    );
+    registro.codigo = texto(
+        fila.querySelector("td.clickable_td span.text-primary strong")
+    ) || null;
+
+    // Enlace 'Ver' del menú Acciones (abre el modal con el detalle)
+    for (const enlace of fila.querySelectorAll("ul.dropdown-menu a.btn-modal")) {
+        if ((enlace.textContent || "").includes("Ver")) {
+            registro.data_href = enlace.getAttribute("data-href");
+            registro.data_container = enlace.getAttribute("data-container");
+            break;
+        }
+    }
+
+    // Enlace 'Imprimir DTE' del menú Acciones (gastos)
+    const imprimir = fila.querySelector("ul.dropdown-menu a.print-dte-expense");
+    if (imprimir) {
+        registro.href_imprimir =
+            imprimir.getAttribute("data-href") || imprimir.getAttribute("href");
+    }
+
+    registros.push(registro);
+});
+
+return registros;
+"""
+
+
+def xpath_filas_tabla(id_tabla):
+    """Retorna el XPath de las filas de datos de una tabla DataTables."""
+    return f"//table[@id='{id_tabla}']//tbody/tr[@role='row']"
+
+
+def extraer_registros_tabla(driver, id_tabla):
+    """
+    Extrae todas las filas visibles de la tabla en una sola llamada.
+
+    Args:
+        driver: Instancia de WebDriver
+        id_tabla: ID de la tabla ('sell_table', 'expense_table', ...)
+
+    Returns:
+        list: Un dict por fila con las llaves indice, dte, fecha, anulada,
+              estado_documento, estado_pago, codigo, numero_documento,
+              correlativo, data_href, data_container y href_imprimir
+              (None si no aplica)
+    """
+    try:
+        return driver.execute_script(JS_EXTRAER_FILAS, id_tabla) or []
+    except Exception as e:
+        print(f"⚠️ Error al extraer registros de la tabla {id_tabla}: {e}")
+        return []
+
+
+def indexar_registros(registros, campo):
+    """
+    Construye un diccionario valor -> índice de fila para búsquedas directas
+    (reemplaza la búsqueda con Ctrl+F y los recorridos fila por fila).
+    Si un valor se repite se conserva la primera aparición.
+    """
+    indice = {}
+    for registro in registros:
+        valor = registro.get(campo)
+        if valor and valor not in indice:
+            indice[valor] = registro["indice"]
+    return indice
+
+
+def obtener_fila(driver, id_tabla, indice):
+    """
+    Obtiene el WebElement de una fila concreta sin traer toda la tabla.
+    Retorna None si la fila ya no está disponible.
+    """
+    filas = driver.find_elements(
+        By.XPATH, f"({xpath_filas_tabla(id_tabla)})[{indice + 1}]"
+    )
+    return filas[0] if filas else None
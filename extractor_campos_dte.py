@@ -0,0 +1,244 @@
+"""
+EXTRACCIÓN RÁPIDA DE CAMPOS DE JSON DE DTE - HERMACO ERP
+========================================================
+Para leer numeroControl o el nombre del receptor no hace falta construir
+todo el documento: cuerpoDocumento (los items), firmaElectronica y
+selloRecibido son la mayor parte del archivo y no se usan.
+
+extraer_campos() busca en el texto la clave de cada sección que se pide
+('identificacion', 'receptor', ...) y decodifica solo ese objeto con
+json.JSONDecoder.raw_decode. Si la clave no aparece exactamente una vez, o
+el valor no es un objeto, el documento es inusual y se parsea completo.
+
+Comparación con json.load sobre un corpus sintético:
+    python extractor_campos_dte.py --benchmark [--archivos N] [--items N]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+_decodificador = json.JSONDecoder()
+_espacios = re.compile(r"[ \t\n\r]*")
+
+
+def leer_seccion(texto, seccion):
+    """
+    Objeto de la sección, decodificando solo ese fragmento del texto.
+
+    Returns:
+        tuple: (True, dict o None) si se pudo leer de forma segura,
+               (False, None) si hay que parsear el documento completo
+    """
+    clave = f'"{seccion}"'
+    posicion = texto.find(clave)
+    # La clave debe aparecer una sola vez y no dentro de un texto (\"clave\")
+    if (
+        posicion < 0
+        or texto.find(clave, posicion + len(clave)) >= 0
+        or texto[posicion - 1] == "\\"
+    ):
+        return False, None
+
+    posicion = _espacios.match(texto, posicion + len(clave)).end()
+    if texto[posicion : posicion + 1] != ":":
+        return False, None
+    posicion = _espacios.match(texto, posicion + 1).end()
+
+    try:
+        valor, _ = _decodificador.raw_decode(texto, posicion)
+    except ValueError:
+        return False, None
+    if valor is not None and not isinstance(valor, dict):
+        return False, None
+    return True, valor
+
+
+def extraer_campos(texto, campos):
+    """
+    Valores de los campos pedidos sin parsear todo el documento.
+
+    Args:
+        texto: Contenido del JSON
+        campos: Lista de (sección, campo), p. ej. ('receptor', 'nombre')
+
+    Returns:
+        dict: 'seccion.campo' -> valor (None si no está), o None si el
+              documento es inusual y hay que parsearlo completo
+    """
+    if not texto.lstrip().startswith("{"):
+        return None
+
+    secciones = {}
+    resultado = {}
+    for seccion, campo in campos:
+        if seccion not in secciones:
+            seguro, valor = leer_seccion(texto, seccion)
+            if not seguro:
+                return None
+            secciones[seccion] = valor or {}
+        resultado[f"{seccion}.{campo}"] = secciones[seccion].get(campo)
+    return resultado
+
+
+def campos_de_documento(datos, campos):
+    """Los mismos valores que extraer_campos, de un documento ya parseado."""
+    resultado = {}
+    for seccion, campo in campos:
+        valores = datos.get(seccion) if isinstance(datos, dict) else None
+        resultado[f"{seccion}.{campo}"] = (
+            valores.get(campo) if isinstance(valores, dict) else None
+        )
+    return resultado
+
+
+def extraer_campos_archivo(ruta, campos):
+    """
+    Campos de un archivo JSON: por el camino rápido o, si el documento es
+    inusual, con json.loads. Lanza las mismas excepciones que json.load.
+    """
+    with open(ruta, "r", encoding="utf-8") as f:
+        texto = f.read()
+    resultado = extraer_campos(texto, campos)
+    if resultado is None:
+        resultado = campos_de_documento(json.loads(texto), campos)
+    return resultado
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+
+def documento_sintetico(numero, items):
+    """DTE sintético con la forma de los que descarga el ERP."""
+    azar = random.Random(numero)
+    return {
+        "identificacion": {
+            "version": 1,
+            "ambiente": "01",
+            "tipoDte": "01",
+            "numeroControl": f"DTE-01-M001P001-{numero:015d}",
+            "codigoGeneracion": f"{azar.getrandbits(128):032X}",
+            "fecEmi": "2025-11-05",
+            "horEmi": "09:12:26",
+            "tipoMoneda": "USD",
+        },
+        "emisor": {"nit": "06140000000000", "nombre": "HERMACO, S.A. DE C.V."},
+        "receptor": {
+            "nit": f"0614{numero % 5000:010d}",
+            "nombre": f'CLIENTE {numero % 5000} "SUCURSAL" Ñ',
+            "direccion": {"departamento": "06", "complemento": "San Salvador"},
+        },
+        "cuerpoDocumento": [
+            {
+                "numItem": i + 1,
+                "codigo": f"PROD-{azar.randint(1, 99999):05d}",
+                "descripcion": f"PRODUCTO {i} receptor emisor resumen",
+                "cantidad": azar.randint(1, 20),
+                "precioUni": round(azar.uniform(0.5, 500), 2),
+                "ventaGravada": round(azar.uniform(0.5, 5000), 2),
+                "tributos": ["20"],
+            }
+            for i in range(items)
+        ],
+        "resumen": {
+            "totalPagar": round(azar.uniform(1, 10000), 2),
+            "montoTotalOperacion": round(azar.uniform(1, 10000), 2),
+            "totalLetras": "CIEN 00/100 USD",
+        },
+        "firmaElectronica": "".join(
+            azar.choice(
+                "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+            )
+            for _ in range(4000)
+        ),
+        "selloRecibido": f"2025{azar.getrandbits(160):040X}",
+    }
+
+
+def benchmark(archivos, items):
+    """Compara extraer_campos_archivo contra json.load en un corpus sintético."""
+    campos = [
+        ("identificacion", "numeroControl"),
+        ("identificacion", "codigoGeneracion"),
+        ("receptor", "nombre"),
+        ("receptor", "nit"),
+        ("resumen", "totalPagar"),
+    ]
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        print(f"🧪 Generando {archivos} DTE sintéticos con {items} items cada uno...")
+        rutas = []
+        for numero in range(archivos):
+            ruta = os.path.join(carpeta, f"dte_{numero}.json")
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump(documento_sintetico(numero, items), f, ensure_ascii=False)
+            rutas.append(ruta)
+        tamano = sum(os.path.getsize(ruta) for ruta in rutas)
+        print(f"   {tamano / 1024 / 1024:.1f} MB en disco")
+
+        # Una lectura previa para que las dos pruebas partan con el disco en caché
+        for ruta in rutas:
+            with open(ruta, "rb") as f:
+                f.read()
+
+        inicio = time.perf_counter()
+        completos = []
+        for ruta in rutas:
+            with open(ruta, "r", encoding="utf-8") as f:
+                completos.append(campos_de_documento(json.load(f), campos))
+        segundos_json = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        rapidos = [extraer_campos_archivo(ruta, campos) for ruta in rutas]
+        segundos_rapido = time.perf_counter() - inicio
+
+    if completos != rapidos:
+        print("❌ Los resultados del camino rápido no coinciden con json.load")
+        return False
+
+    print(f"\n📊 RESULTADOS ({archivos} archivos)")
+    print(
+        f"   json.load:            {segundos_json:7.3f}s "
+        f"({segundos_json / archivos * 1000:.3f} ms por archivo)"
+    )
+    print(
+        f"   extraer_campos:       {segundos_rapido:7.3f}s "
+        f"({segundos_rapido / archivos * 1000:.3f} ms por archivo)"
+    )
+    print(f"   🚀 Aceleración: {segundos_json / segundos_rapido:.1f}x")
+    print("   ✓ Mismos valores en todos los archivos")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extracción rápida de campos de JSON de DTE"
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Comparar contra json.load en un corpus sintético",
+    )
+    parser.add_argument("--archivos", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("json", nargs="*", help="Archivos JSON a leer")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        sys.exit(0 if benchmark(args.archivos, args.items) else 1)
+
+    for ruta in args.json:
+        print(
+            ruta,
+            extraer_campos_archivo(
+                ruta,
+                [("identificacion", "numeroControl"), ("receptor", "nombre")],
+            ),
+        )
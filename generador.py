@@ -1,7 +1,9 @@
 import os
 import json
+import argparse
 from datetime import datetime
-from pathlib import Path
+
+from cache_metadatos import metadatos_de_archivos, leer_procesados, guardar_procesados
 
 # Ruta donde se encuentran los archivos JSON de facturas
 RUTA_BACKUP = r"C:\zeta2\Henri\Copia de seguridad de facturas(No borrar)\Backup"
@@ -12,111 +14,257 @@ ARCHIVO_CLIENTES = os.path.join(os.getcwd(), "lista_clientes.json")
 
 def buscar_archivos_json(ruta):
     """
-    Busca todos los archivos JSON en la ruta especificada
+    Busca los archivos JSON en la ruta especificada (recursivamente)
+
+    Args:
+        ruta: Carpeta del respaldo de facturas
+
+    Returns:
+        dict: {ruta: (tamaño, fecha de modificación)} de cada archivo, la
+              misma firma que usa la caché de metadatos; None si no se pudo
+              recorrer la carpeta
     """
-    archivos_json = []
+    if not os.path.exists(ruta):
+        print(f"❌ La ruta no existe: {ruta}")
+        return None
+
+    firmas = {}
+    pendientes = [os.path.abspath(ruta)]
     try:
-        ruta_path = Path(ruta)
-        if not ruta_path.exists():
-            print(f"❌ La ruta no existe: {ruta}")
-            return []
+        while pendientes:
+            with os.scandir(pendientes.pop()) as entradas:
+                for entrada in entradas:
+                    if entrada.is_dir(follow_symlinks=False):
+                        pendientes.append(entrada.path)
+                        continue
+                    if not entrada.name.lower().endswith(".json"):
+                        continue
+                    estado = entrada.stat()
+                    firmas[entrada.path] = (estado.st_size, estado.st_mtime_ns)
+    except OSError as e:
+        print(f"❌ Error al buscar archivos JSON: {e}")
+        return None
 
-        # Buscar todos los archivos .json recursivamente
-        archivos_json = list(ruta_path.rglob("*.json"))
-        print(f"📊 Total de archivos JSON encontrados: {len(archivos_json)}")
-        return archivos_json
+    print(f"📊 Total de archivos JSON encontrados: {len(firmas)}")
+    return firmas
 
-    except Exception as e:
-        print(f"❌ Error al buscar archivos JSON: {e}")
-        return []
+
+def extraer_cliente_de_json(metadatos):
+    """
+    Extrae el cliente (receptor) de los metadatos de un JSON
+    Retorna dict con nombre y documento (NIT o número de documento, puede
+    ser None) o None si no se encuentra el nombre
+    """
+    nombre_cliente = metadatos.get("receptor.nombre")
+    if not isinstance(nombre_cliente, str) or not nombre_cliente.strip():
+        return None
+
+    documento = metadatos.get("receptor.nit") or metadatos.get("receptor.numDocumento")
+    documento = str(documento).replace("-", "").strip() if documento else None
+    return {"nombre": nombre_cliente.strip(), "documento": documento or None}
 
 
-def extraer_cliente_de_json(archivo_path):
+def crear_indice_clientes(detalle=()):
+    """
+    Índice de clientes por documento y por nombre, a partir del detalle
+    guardado en lista_clientes.json
+    """
+    indice = {"entradas": [], "por_documento": {}, "por_nombre": {}}
+    for entrada in detalle:
+        entrada = {
+            "nombre": entrada["nombre"],
+            "documento": entrada.get("documento"),
+            "otros_nombres": list(entrada.get("otros_nombres", [])),
+            "facturas": entrada.get("facturas", 0),
+        }
+        indice["entradas"].append(entrada)
+        if entrada["documento"]:
+            indice["por_documento"][entrada["documento"]] = entrada
+        for nombre in [entrada["nombre"]] + entrada["otros_nombres"]:
+            indice["por_nombre"].setdefault(nombre, entrada)
+    return indice
+
+
+def agregar_cliente(indice, cliente):
+    """
+    Suma una factura del cliente al índice. Se identifica por documento; si
+    la factura no lo trae, por nombre. Los nombres distintos con el mismo
+    documento quedan en 'otros_nombres'
     """
-    Extrae el nombre del cliente (receptor) de un archivo JSON
-    Retorna el nombre del cliente o None si no se encuentra
+    nombre = cliente["nombre"]
+    documento = cliente["documento"]
+
+    entrada = indice["por_documento"].get(documento) if documento else None
+    if entrada is None:
+        entrada = indice["por_nombre"].get(nombre)
+        # Mismo nombre con otro documento: es otro cliente
+        if entrada and documento and entrada["documento"] not in (None, documento):
+            entrada = None
+    if entrada is None:
+        entrada = {
+            "nombre": nombre,
+            "documento": documento,
+            "otros_nombres": [],
+            "facturas": 0,
+        }
+        indice["entradas"].append(entrada)
+
+    if documento and not entrada["documento"]:
+        entrada["documento"] = documento
+    if documento:
+        indice["por_documento"].setdefault(documento, entrada)
+    if nombre != entrada["nombre"] and nombre not in entrada["otros_nombres"]:
+        entrada["otros_nombres"].append(nombre)
+    indice["por_nombre"].setdefault(nombre, entrada)
+    entrada["facturas"] += 1
+
+
+def cargar_lista_clientes(ruta_backup):
     """
+    Lista de clientes existente, si se generó desde la misma ruta y tiene
+    el detalle por cliente. Retorna None si hay que generarla desde cero
+    """
+    if not os.path.exists(ARCHIVO_CLIENTES):
+        return None
     try:
-        with open(archivo_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-            # Buscar el campo receptor -> nombre
-            if "receptor" in data and isinstance(data["receptor"], dict):
-                nombre_cliente = data["receptor"].get("nombre")
-                if nombre_cliente:
-                    return nombre_cliente.strip()
-
-    except json.JSONDecodeError:
-        # Ignorar archivos JSON mal formados
-        pass
-    except Exception as e:
-        # Ignorar otros errores silenciosamente
-        pass
+        with open(ARCHIVO_CLIENTES, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ No se pudo leer la lista de clientes existente: {e}")
+        return None
 
-    return None
+    if datos.get("ruta_origen") != ruta_backup or "clientes_detalle" not in datos:
+        return None
+    return datos
 
 
-def generar_lista_clientes(ruta_backup):
+def generar_lista_clientes(ruta_backup, completo=False):
     """
-    Genera una lista única de clientes a partir de los archivos JSON
+    Genera o actualiza la lista única de clientes a partir de los archivos JSON
+
+    Args:
+        ruta_backup: Carpeta del respaldo de facturas
+        completo: Regenerar desde cero; si no, solo se agregan los archivos
+                  cuya ruta todavía no se sumó a la lista (sin importar sus
+                  fechas: un JSON movido o copiado con su fecha original
+                  también se cuenta)
     """
     print("\n" + "=" * 60)
     print("🚀 INICIANDO GENERACIÓN DE LISTA DE CLIENTES")
     print("=" * 60)
 
-    # Buscar todos los archivos JSON
+    existente = None if completo else cargar_lista_clientes(ruta_backup)
+    procesados = {}
+    if existente:
+        version, procesados = leer_procesados(ARCHIVO_CLIENTES)
+        if version != existente.get("fecha_generacion"):
+            print(
+                "\n⚠️ El registro de archivos procesados no corresponde a la lista "
+                "existente: se regenera desde cero"
+            )
+            existente = None
+            procesados = {}
+
+    if existente:
+        print("\n♻️ Actualizando la lista existente con las facturas nuevas")
+        indice = crear_indice_clientes(existente.get("clientes_detalle", []))
+        archivos_anteriores = existente.get("total_archivos_analizados", 0)
+    else:
+        indice = crear_indice_clientes()
+        archivos_anteriores = 0
+
+    # Buscar los archivos JSON y separar los que todavía no se procesaron
     print(f"\n🔍 Buscando archivos JSON en: {ruta_backup}")
-    archivos_json = buscar_archivos_json(ruta_backup)
+    firmas = buscar_archivos_json(ruta_backup)
+    if firmas is None:
+        return
+
+    nuevos = [ruta for ruta in firmas if ruta not in procesados]
+    # Los ya sumados que cambiaron solo actualizan su firma (es el mismo documento)
+    cambiados = {
+        ruta: firma
+        for ruta, firma in firmas.items()
+        if ruta in procesados and procesados[ruta] != firma
+    }
+    desaparecidos = [ruta for ruta in procesados if ruta not in firmas]
+    if existente:
+        print(f"🆕 Archivos nuevos desde la última ejecución: {len(nuevos)}")
 
-    if not archivos_json:
+    if not firmas and not existente:
         print("⚠️ No se encontraron archivos JSON para procesar")
         return
 
-    # Set para almacenar clientes únicos
-    clientes_unicos = set()
     archivos_procesados = 0
     archivos_con_cliente = 0
 
     print(f"\n📄 Procesando archivos...")
 
-    for idx, archivo in enumerate(archivos_json, 1):
-        archivos_procesados += 1
+    # Metadatos de cada archivo, en un pool de procesos
+    # (solo se parsean los que no están en la caché)
+    metadatos = metadatos_de_archivos(nuevos, procesos=True)
 
-        # Mostrar progreso cada 100 archivos
-        if archivos_procesados % 100 == 0:
-            print(
-                f"  ⏳ Procesados: {archivos_procesados}/{len(archivos_json)} archivos..."
-            )
+    for datos in metadatos:
+        if "error" in datos:
+            # Sin anotarlo como procesado: se vuelve a intentar la próxima vez
+            print(f"⚠️ {datos['archivo']}: {datos['error']}")
+            continue
+        cambiados[datos["ruta"]] = firmas[datos["ruta"]]
+        archivos_procesados += 1
 
-        # Extraer nombre del cliente
-        nombre_cliente = extraer_cliente_de_json(archivo)
+        # Extraer el cliente
+        cliente = extraer_cliente_de_json(datos)
 
-        if nombre_cliente:
-            clientes_unicos.add(nombre_cliente)
+        if cliente:
+            agregar_cliente(indice, cliente)
             archivos_con_cliente += 1
 
+    detalle = sorted(
+        indice["entradas"], key=lambda e: (e["nombre"], e["documento"] or "")
+    )
+    clientes_unicos = {entrada["nombre"] for entrada in detalle}
+    for entrada in detalle:
+        clientes_unicos.update(entrada["otros_nombres"])
+
     print(f"\n✅ Procesamiento completado")
-    print(f"   📊 Total de archivos procesados: {archivos_procesados}")
+    print(f"   📊 Archivos procesados en esta ejecución: {archivos_procesados}")
     print(f"   👥 Archivos con información de cliente: {archivos_con_cliente}")
     print(f"   ✨ Clientes únicos encontrados: {len(clientes_unicos)}")
+    print(
+        f"   🪪 Clientes con NIT / documento: "
+        f"{sum(1 for entrada in detalle if entrada['documento'])}"
+    )
 
     # Convertir set a lista ordenada alfabéticamente
-    lista_clientes_ordenada = sorted(list(clientes_unicos))
+    lista_clientes_ordenada = sorted(clientes_unicos)
 
     # Generar estructura JSON para guardar
+    ahora = datetime.now()
     datos_salida = {
-        "fecha_generacion": datetime.now().isoformat(),
-        "fecha_legible": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "fecha_generacion": ahora.isoformat(),
+        "fecha_legible": ahora.strftime("%Y-%m-%d %H:%M:%S"),
         "ruta_origen": ruta_backup,
         "total_clientes": len(lista_clientes_ordenada),
-        "total_archivos_analizados": archivos_procesados,
+        "total_archivos_analizados": archivos_anteriores + archivos_procesados,
         "clientes": lista_clientes_ordenada,
+        "clientes_detalle": detalle,
     }
 
-    # Guardar en archivo JSON
+    # Guardar en archivo JSON (reemplazo atómico)
     try:
-        with open(ARCHIVO_CLIENTES, "w", encoding="utf-8") as f:
+        temporal = ARCHIVO_CLIENTES + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
             json.dump(datos_salida, f, indent=2, ensure_ascii=False)
+        os.replace(temporal, ARCHIVO_CLIENTES)
+
+        # Archivos sumados a esta versión de la lista (si no se guardan, la
+        # próxima ejecución no coincide con la lista y la regenera completa)
+        guardar_procesados(
+            ARCHIVO_CLIENTES,
+            datos_salida["fecha_generacion"],
+            cambiados,
+            quitar=desaparecidos,
+            reemplazar=not existente,
+        )
 
         print(f"\n💾 Lista de clientes guardada en: {ARCHIVO_CLIENTES}")
         print(f"\n📋 PRIMEROS 10 CLIENTES (ejemplo):")
@@ -154,17 +302,36 @@ def mostrar_resumen_clientes():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generador de lista de clientes")
+    parser.add_argument(
+        "--completo",
+        action="store_true",
+        help="Regenerar la lista desde cero con todos los archivos",
+    )
+    parser.add_argument(
+        "--actualizar",
+        action="store_true",
+        help="Agregar solo las facturas nuevas, sin preguntar",
+    )
+    args = parser.parse_args()
+
     try:
         print("\n🔧 GENERADOR DE LISTA DE CLIENTES")
         print("=" * 60)
 
+        completo = args.completo
+
         # Verificar si ya existe un archivo de clientes
-        if mostrar_resumen_clientes():
+        if not args.completo and not args.actualizar and mostrar_resumen_clientes():
             print("\n⚠️ Ya existe un archivo de clientes generado previamente.")
-            respuesta = input("¿Desea regenerar la lista? (s/n): ").strip().lower()
-            if respuesta != "s":
+            print("   a = agregar solo las facturas nuevas")
+            print("   r = regenerar la lista desde cero")
+            print("   n = cancelar")
+            respuesta = input("¿Qué desea hacer? (a/r/n): ").strip().lower()
+            if respuesta not in ("a", "r"):
                 print("\n✅ Operación cancelada. Se mantiene el archivo existente.")
                 exit(0)
+            completo = respuesta == "r"
 
         # Verificar que la ruta existe
         if not os.path.exists(RUTA_BACKUP):
@@ -173,7 +340,7 @@ if __name__ == "__main__":
             exit(1)
 
         # Generar lista de clientes
-        generar_lista_clientes(RUTA_BACKUP)
+        generar_lista_clientes(RUTA_BACKUP, completo=completo)
 
         print("\n" + "=" * 60)
         print("🎉 PROCESO COMPLETADO EXITOSAMENTE")
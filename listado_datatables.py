@@ -0,0 +1,328 @@
+"""
+LISTADO DIRECTO DESDE EL ENDPOINT DE DATATABLES - HERMACO ERP
+=============================================================
+Las tablas sell_table, expense_table y remission_notes_table cargan sus filas
+desde un endpoint JSON del ERP. Este módulo llama ese endpoint directamente
+(con los mismos filtros de fecha y estado que ya tiene aplicados la página)
+y pagina con bloques pequeños, sin mostrar "Todos" ni esperar a que el
+navegador dibuje miles de filas.
+
+Cada fila se convierte al mismo registro que devuelve extraccion_tabla, así
+los descargadores deciden qué descargar sin tocar la grilla. Para descargar
+se abre el modal 'Ver' directamente con el data-href del registro.
+
+Para probarlo sin el ERP: python servidor_datatables_local.py --probar
+"""
+
+import re
+import json
+from html import unescape
+from urllib.parse import parse_qsl, urlencode, urljoin
+
+from descarga_http import obtener_cliente_http, construir_encabezados
+from metricas_pasos import paso
+
+# Filas pedidas por llamada al endpoint
+TAMANO_PAGINA = 100
+
+# Script ejecutado en el navegador: toma la URL, el método y los parámetros
+# de la última petición de la tabla (incluye los filtros activos)
+JS_CONSULTA_DATATABLE = """
+const idTabla = arguments[0];
+if (!window.jQuery || !jQuery.fn.dataTable || !jQuery.fn.dataTable.isDataTable("#" + idTabla)) {
+    return null;
+}
+const dt = jQuery("#" + idTabla).DataTable();
+const ajax = dt.settings()[0].ajax;
+const columnas = [];
+dt.columns().every(function () {
+    if (this.visible()) {
+        const dato = this.dataSrc();
+        columnas.push(typeof dato === "string" || typeof dato === "number" ? dato : null);
+    }
+});
+const csrf = document.querySelector("meta[name='csrf-token']");
+return {
+    url: dt.ajax.url() || (typeof ajax === "string" ? ajax : (ajax && ajax.url)) || location.href,
+    metodo: ((ajax && ajax.type) || "GET").toUpperCase(),
+    parametros: jQuery.param(dt.ajax.params() || {}),
+    columnas: columnas,
+    csrf: csrf ? csrf.getAttribute("content") : null,
+};
+"""
+
+# Script que abre el modal de un registro igual que el enlace 'Ver' del menú
+# Acciones: crea un a.btn-modal temporal y lo hace click (el ERP escucha
+# los clicks de .btn-modal en todo el documento)
+JS_ABRIR_MODAL = """
+const enlace = document.createElement("a");
+enlace.href = "#";
+enlace.className = "btn-modal";
+enlace.setAttribute("data-href", arguments[0]);
+enlace.setAttribute("data-container", arguments[1] || ".view_modal");
+enlace.style.display = "none";
+document.body.appendChild(enlace);
+enlace.click();
+enlace.remove();
+return true;
+"""
+
+PATRON_ETIQUETA = re.compile(r"<[^>]+>")
+PATRON_ENLACE = re.compile(r"<a\b([^>]*)>(.*?)</a>", re.IGNORECASE | re.DOTALL)
+PATRON_ATRIBUTO = re.compile(r"([\w-]+)\s*=\s*(\"[^\"]*\"|'[^']*')")
+PATRON_ESTADO_PAGO = re.compile(
+    r"payment-status[^>]*>.*?<span[^>]*class=[\"'][^\"']*\blabel\b[^\"']*[\"'][^>]*>(.*?)</span>",
+    re.IGNORECASE | re.DOTALL,
+)
+PATRON_CODIGO = re.compile(
+    r"class=[\"']text-primary[\"'][^>]*>\s*<strong>(.*?)</strong>",
+    re.IGNORECASE | re.DOTALL,
+)
+PATRON_CORRELATIVO = re.compile(r"^[0-9A-Fa-f]{8}(-[0-9A-Fa-f]{4}){3}-[0-9A-Fa-f]{12}$")
+
+
+def capturar_consulta_datatable(driver, id_tabla):
+    """
+    Lee de la página la consulta que usa la tabla para pedir sus filas.
+
+    Returns:
+        dict: url, metodo, parametros (query string), columnas y csrf,
+              o None si la tabla no es un DataTable con origen ajax
+    """
+    try:
+        consulta = driver.execute_script(JS_CONSULTA_DATATABLE, id_tabla)
+    except Exception as e:
+        print(f"⚠️ No se pudo leer la consulta de {id_tabla}: {e}")
+        return None
+
+    if not consulta:
+        print(f"⚠️ La tabla {id_tabla} no está disponible como DataTable")
+        return None
+
+    consulta["url"] = urljoin(driver.current_url, consulta["url"])
+    return consulta
+
+
+def parametros_de_pagina(parametros, inicio, longitud, draw):
+    """
+    Reemplaza start/length/draw en la query string de la tabla
+    conservando el resto de filtros.
+    """
+    pares = [
+        (clave, valor)
+        for clave, valor in parse_qsl(parametros, keep_blank_values=True)
+        if clave not in ("start", "length", "draw")
+    ]
+    pares.extend([("draw", draw), ("start", inicio), ("length", longitud)])
+    return urlencode(pares)
+
+
+def solicitar_pagina(consulta, encabezados, inicio, longitud, draw):
+    """
+    Pide una página de filas al endpoint de la tabla.
+    Retorna el JSON de DataTables (draw, recordsFiltered, data).
+    """
+    parametros = parametros_de_pagina(consulta["parametros"], inicio, longitud, draw)
+    encabezados = dict(encabezados)
+    encabezados["Accept"] = "application/json, text/javascript, */*; q=0.01"
+    encabezados["X-Requested-With"] = "XMLHttpRequest"
+    if consulta.get("csrf"):
+        encabezados["X-CSRF-TOKEN"] = consulta["csrf"]
+
+    cliente = obtener_cliente_http()
+    if consulta.get("metodo") == "POST":
+        encabezados["Content-Type"] = "application/x-www-form-urlencoded"
+        respuesta = cliente.request(
+            "POST", consulta["url"], body=parametros, headers=encabezados
+        )
+    else:
+        separador = "&" if "?" in consulta["url"] else "?"
+        respuesta = cliente.request(
+            "GET", consulta["url"] + separador + parametros, headers=encabezados
+        )
+
+    if respuesta.status != 200:
+        raise Exception(f"HTTP {respuesta.status} al listar {consulta['url']}")
+
+    tipo_contenido = respuesta.headers.get("Content-Type", "")
+    if "text/html" in tipo_contenido:
+        # El ERP responde con la página de login cuando la sesión expiró
+        raise Exception("El endpoint respondió HTML (¿sesión expirada?)")
+
+    return json.loads(respuesta.data.decode("utf-8"))
+
+
+def texto_de_html(valor):
+    """Convierte el HTML de una celda en texto plano."""
+    if valor is None:
+        return ""
+    texto = PATRON_ETIQUETA.sub(" ", str(valor))
+    return " ".join(unescape(texto).split())
+
+
+def atributos_de_enlace(atributos):
+    """Convierte los atributos de una etiqueta <a> en un diccionario."""
+    return {
+        clave.lower(): unescape(valor[1:-1])
+        for clave, valor in PATRON_ATRIBUTO.findall(atributos)
+    }
+
+
+def celdas_de_fila(fila, columnas):
+    """
+    Ordena los valores de una fila como las columnas visibles de la tabla.
+    El endpoint puede devolver cada fila como lista o como objeto.
+    """
+    if isinstance(fila, dict):
+        if columnas:
+            return ["" if c is None else fila.get(str(c), "") for c in columnas]
+        return list(fila.values())
+    return list(fila)
+
+
+def registro_desde_fila(fila, columnas, indice):
+    """
+    Convierte una fila JSON al registro de extraccion_tabla
+    (mismos criterios que el script que se ejecuta en el navegador).
+    """
+    celdas_html = ["" if c is None else str(c) for c in celdas_de_fila(fila, columnas)]
+    celdas = [texto_de_html(c) for c in celdas_html]
+    html_fila = " ".join(celdas_html)
+
+    registro = {
+        "indice": indice,
+        "dte": None,
+        "fecha": None,
+        "anulada": False,
+        "estado_documento": None,
+        "estado_pago": None,
+        "codigo": None,
+        "numero_documento": (celdas[4] or None) if len(celdas) >= 5 else None,
+        "correlativo": None,
+        "data_href": None,
+        "data_container": None,
+        "href_imprimir": None,
+    }
+
+    for valor in celdas:
+        if not valor:
+            continue
+        if registro["dte"] is None and "DTE-" in valor:
+            registro["dte"] = valor
+        if (
+            registro["fecha"] is None
+            and "/" in valor
+            and any(char.isdigit() for char in valor)
+        ):
+            registro["fecha"] = valor
+        if not registro["anulada"] and "anulada" in valor.lower():
+            registro["anulada"] = True
+            registro["estado_documento"] = valor
+        if registro["correlativo"] is None and PATRON_CORRELATIVO.match(valor):
+            registro["correlativo"] = valor
+
+    coincidencia = PATRON_ESTADO_PAGO.search(html_fila)
+    if coincidencia:
+        registro["estado_pago"] = texto_de_html(coincidencia.group(1))
+
+    coincidencia = PATRON_CODIGO.search(html_fila)
+    if coincidencia:
+        registro["codigo"] = texto_de_html(coincidencia.group(1)) or None
+
+    for atributos, contenido in PATRON_ENLACE.findall(html_fila):
+        enlace = atributos_de_enlace(atributos)
+        clases = enlace.get("class", "").split()
+        if (
+            registro["data_href"] is None
+            and "btn-modal" in clases
+            and "Ver" in texto_de_html(contenido)
+        ):
+            registro["data_href"] = enlace.get("data-href")
+            registro["data_container"] = enlace.get("data-container")
+        if registro["href_imprimir"] is None and "print-dte-expense" in clases:
+            registro["href_imprimir"] = enlace.get("data-href") or enlace.get("href")
+
+    return registro
+
+
+def listar_registros(consulta, encabezados, tamano_pagina=TAMANO_PAGINA):
+    """
+    Recorre el endpoint de la tabla en páginas de 'tamano_pagina' filas.
+
+    Args:
+        consulta: dict devuelto por capturar_consulta_datatable
+        encabezados: Encabezados HTTP con las cookies de la sesión
+        tamano_pagina: Filas pedidas por llamada
+
+    Returns:
+        list: Registros en el mismo orden que la tabla
+    """
+    registros = []
+    inicio = 0
+    draw = 1
+    total = None
+
+    while total is None or inicio < total:
+        respuesta = solicitar_pagina(consulta, encabezados, inicio, tamano_pagina, draw)
+        filas = respuesta.get("data") or []
+
+        for fila in filas:
+            registros.append(
+                registro_desde_fila(fila, consulta.get("columnas"), len(registros))
+            )
+
+        # Sin recordsFiltered el endpoint no pagina: devolvió todo de una vez
+        if "recordsFiltered" not in respuesta or not filas:
+            break
+
+        total = int(respuesta["recordsFiltered"])
+        inicio += len(filas)
+        draw += 1
+        print(f"  📥 {len(registros)}/{total} registros listados")
+
+    return registros
+
+
+def listar_registros_datatable(driver, id_tabla, tamano_pagina=TAMANO_PAGINA):
+    """
+    Lista todos los registros de una tabla desde su endpoint JSON usando
+    la sesión y los filtros que ya tiene aplicados el navegador.
+
+    Returns:
+        list: Registros de la tabla, o None si no se pudo usar el endpoint
+              (el script debe volver a leer la grilla)
+    """
+    consulta = capturar_consulta_datatable(driver, id_tabla)
+    if not consulta:
+        return None
+
+    print(f"🌐 Listando {id_tabla} desde {consulta['url']} ({consulta['metodo']})")
+    try:
+        encabezados = construir_encabezados(driver, consulta["url"])
+        registros = listar_registros(consulta, encabezados, tamano_pagina)
+        print(f"✅ {len(registros)} registros obtenidos del endpoint")
+        return registros
+    except Exception as e:
+        print(f"⚠️ Error al listar desde el endpoint: {e}")
+        return None
+
+
+@paso("ver_modal")
+def abrir_modal_desde_href(driver, registro):
+    """
+    Abre el modal 'Ver' de un registro sin buscar su fila en la grilla.
+    Retorna False si el registro no trae data-href.
+    """
+    if not registro.get("data_href"):
+        print("  ⚠️ El registro no tiene enlace 'Ver'")
+        return False
+
+    try:
+        driver.execute_script(
+            JS_ABRIR_MODAL, registro["data_href"], registro.get("data_container")
+        )
+        print("  ✅ Modal 'Ver' solicitado directamente")
+        return True
+    except Exception as e:
+        print(f"  ❌ Error al abrir el modal: {e}")
+        return False
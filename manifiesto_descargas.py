@@ -0,0 +1,209 @@
+"""
+MANIFIESTO DE DESCARGAS POR EJECUCIÓN - HERMACO ERP
+===================================================
+Cada ejecución de un descargador anota exactamente qué archivos dejó en su
+carpeta (DTE, extensión, tamaño, SHA-256 y si es nuevo, reemplazó a uno
+anterior, ya existía idéntico o se publicó desde el almacén) y al terminar
+los guarda en 'manifiestos/manifiesto_<script>_<fecha>.json' dentro de la
+carpeta de descargas.
+
+Los resúmenes de los descargadores y los reportes del orquestador se
+arman con estos manifiestos en lugar de contar toda la carpeta con glob:
+el costo depende de los archivos nuevos y no de los cientos de miles de
+documentos que ya tiene la carpeta.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+
+CARPETA_MANIFIESTOS = "manifiestos"
+
+# Estados de un archivo dentro del manifiesto
+ESTADOS_NUEVOS = ("nuevo", "almacen")
+
+# Manifiestos abiertos por carpeta de descargas
+_manifiestos = {}
+_candado_manifiestos = threading.Lock()
+
+
+def abrir_manifiesto(carpeta, script):
+    """
+    Empieza el manifiesto de una ejecución. Desde ahí, cada archivo que
+    termina en 'carpeta' (o en una subcarpeta de trabajador) se anota.
+
+    Returns:
+        dict: Manifiesto para contar_manifiesto y cerrar_manifiesto
+    """
+    carpeta = os.path.abspath(carpeta)
+    manifiesto = {
+        "carpeta": carpeta,
+        "script": script,
+        "inicio": datetime.now().isoformat(),
+        "archivos": {},
+    }
+    with _candado_manifiestos:
+        _manifiestos[carpeta] = manifiesto
+    return manifiesto
+
+
+def buscar_manifiesto(ruta):
+    """Manifiesto abierto de la carpeta del archivo o de su carpeta padre."""
+    carpeta = os.path.dirname(os.path.abspath(ruta))
+    return _manifiestos.get(carpeta) or _manifiestos.get(os.path.dirname(carpeta))
+
+
+def anotar_archivo(ruta, identificador, extension, sha256=None, estado="nuevo"):
+    """
+    Anota un archivo que la ejecución dejó en disco. No hace nada si la
+    carpeta no tiene un manifiesto abierto.
+
+    Args:
+        ruta: Archivo con su nombre final
+        identificador: DTE o código del documento (None si no se conoce)
+        extension: 'pdf' o 'json'
+        sha256: Hash del contenido, si ya se calculó
+        estado: 'nuevo', 'reemplazado', 'identico' o 'almacen'
+    """
+    with _candado_manifiestos:
+        manifiesto = buscar_manifiesto(ruta)
+        if manifiesto is None:
+            return
+        try:
+            tamano = os.path.getsize(ruta)
+        except OSError:
+            tamano = None
+
+        nombre = os.path.basename(ruta)
+        anterior = manifiesto["archivos"].get(nombre)
+        # Un reintento no convierte en 'identico' un archivo nuevo de esta ejecución
+        if anterior and anterior["estado"] in ESTADOS_NUEVOS:
+            estado = anterior["estado"]
+        manifiesto["archivos"][nombre] = {
+            "archivo": nombre,
+            "identificador": identificador,
+            "extension": extension,
+            "tamano": tamano,
+            "sha256": sha256,
+            "estado": estado,
+        }
+
+
+def archivos_de_documento(carpeta, identificador):
+    """
+    Nombres de los archivos anotados para un documento en el manifiesto
+    abierto de 'carpeta' (o de su carpeta padre).
+    """
+    carpeta = os.path.abspath(carpeta)
+    with _candado_manifiestos:
+        manifiesto = _manifiestos.get(carpeta) or _manifiestos.get(
+            os.path.dirname(carpeta)
+        )
+        if manifiesto is None or not identificador:
+            return []
+        return [
+            archivo["archivo"]
+            for archivo in manifiesto["archivos"].values()
+            if archivo["identificador"] == identificador
+        ]
+
+
+def contar_archivos(archivos):
+    """Conteo de PDFs y JSONs (y de los nuevos) de una lista de entradas."""
+    conteo = {"pdfs": 0, "jsons": 0, "total": 0, "nuevos": 0}
+    for archivo in archivos:
+        if archivo["extension"] == "pdf":
+            conteo["pdfs"] += 1
+        elif archivo["extension"] == "json":
+            conteo["jsons"] += 1
+        else:
+            continue
+        conteo["total"] += 1
+        if archivo["estado"] in ESTADOS_NUEVOS:
+            conteo["nuevos"] += 1
+    return conteo
+
+
+def contar_manifiesto(manifiesto):
+    """Conteo de los archivos anotados hasta ahora en el manifiesto."""
+    with _candado_manifiestos:
+        archivos = list(manifiesto["archivos"].values())
+    return contar_archivos(archivos)
+
+
+def cerrar_manifiesto(manifiesto):
+    """
+    Guarda el manifiesto en la carpeta 'manifiestos' y deja de anotar.
+
+    Returns:
+        str: Ruta del manifiesto, o None si no se pudo guardar
+    """
+    with _candado_manifiestos:
+        if _manifiestos.get(manifiesto["carpeta"]) is manifiesto:
+            del _manifiestos[manifiesto["carpeta"]]
+        archivos = sorted(manifiesto["archivos"].values(), key=lambda a: a["archivo"])
+
+    fin = datetime.now()
+    datos = {
+        "script": manifiesto["script"],
+        "carpeta": manifiesto["carpeta"],
+        "inicio": manifiesto["inicio"],
+        "fin": fin.isoformat(),
+        "conteo": contar_archivos(archivos),
+        "archivos": archivos,
+    }
+
+    carpeta = os.path.join(manifiesto["carpeta"], CARPETA_MANIFIESTOS)
+    ruta = os.path.join(
+        carpeta,
+        f"manifiesto_{manifiesto['script']}_{fin.strftime('%Y%m%d_%H%M%S')}.json",
+    )
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+        os.replace(temporal, ruta)
+        print(f"🧾 Manifiesto de la ejecución: {ruta}")
+        return ruta
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el manifiesto de la ejecución: {e}")
+        return None
+
+
+def leer_manifiestos(carpeta, desde=None):
+    """
+    Manifiestos guardados en la carpeta de descargas.
+
+    Args:
+        carpeta: Carpeta de descargas
+        desde: datetime; solo los de ejecuciones que empezaron después
+
+    Returns:
+        list: Contenido de cada manifiesto, del más antiguo al más nuevo
+    """
+    carpeta_manifiestos = os.path.join(carpeta, CARPETA_MANIFIESTOS)
+    try:
+        nombres = sorted(
+            entrada.name
+            for entrada in os.scandir(carpeta_manifiestos)
+            if entrada.name.startswith("manifiesto_") and entrada.name.endswith(".json")
+        )
+    except OSError:
+        return []
+
+    manifiestos = []
+    for nombre in nombres:
+        try:
+            with open(
+                os.path.join(carpeta_manifiestos, nombre), "r", encoding="utf-8"
+            ) as f:
+                datos = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Manifiesto ilegible {nombre}: {e}")
+            continue
+        if desde and datetime.fromisoformat(datos["inicio"]) < desde:
+            continue
+        manifiestos.append(datos)
+    return manifiestos
@@ -0,0 +1,175 @@
+"""
+TIEMPOS POR PASO DE CADA REGISTRO - HERMACO ERP
+===============================================
+Mide con reloj monotónico cada paso del flujo de descarga de un registro:
+
+- acciones: click en el botón 'Acciones' de la fila
+- ver_modal: click en 'Ver' (o modal abierto desde su data-href)
+- impresion: click en 'Impresión' del modal (o en 'Imprimir DTE')
+- ventana_impresion: cambio a la ventana de impresión
+- descarga: PDF y JSON en disco
+- cierre_modal: cierre del modal que quedó abierto
+- registro: el registro completo
+- intento_N: cada intento de los flujos con reintentos
+
+Al final de la ejecución imprimir_resumen_pasos() muestra p50/p90/p99 y el
+total de cada paso, y guardar_reporte_pasos() deja el mismo resumen en
+'reportes_pasos/reporte_pasos_<fecha>.json' dentro de la carpeta de
+descargas (fuera de los documentos), para comparar entre días.
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+from datetime import datetime
+
+CARPETA_REPORTES = "reportes_pasos"
+
+_tiempos_pasos = {}
+_candado_pasos = threading.Lock()
+_inicio_ejecucion = time.monotonic()
+
+
+def reiniciar_metricas():
+    """Empieza una medición nueva (al inicio de cada descargador)."""
+    global _inicio_ejecucion
+    with _candado_pasos:
+        _tiempos_pasos.clear()
+        _inicio_ejecucion = time.monotonic()
+
+
+def registrar_paso(nombre, segundos, exitoso=True):
+    """Guarda la duración de un paso."""
+    with _candado_pasos:
+        datos = _tiempos_pasos.setdefault(nombre, {"tiempos": [], "fallidos": 0})
+        datos["tiempos"].append(segundos)
+        if not exitoso:
+            datos["fallidos"] += 1
+
+
+def paso(nombre, por_resultado=True):
+    """
+    Decorador que mide cada llamada de la función como el paso 'nombre'.
+    Cuenta como fallido si lanza una excepción (que se vuelve a lanzar) o,
+    con 'por_resultado', si retorna un valor falso.
+    """
+
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def medida(*args, **kwargs):
+            inicio = time.monotonic()
+            exitoso = False
+            try:
+                resultado = funcion(*args, **kwargs)
+                exitoso = bool(resultado) or not por_resultado
+                return resultado
+            finally:
+                registrar_paso(nombre, time.monotonic() - inicio, exitoso)
+
+        return medida
+
+    return decorador
+
+
+def percentil(valores_ordenados, porcentaje):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not valores_ordenados:
+        return 0.0
+    posicion = max(0, -(-len(valores_ordenados) * porcentaje // 100) - 1)
+    return valores_ordenados[int(posicion)]
+
+
+def resumen_pasos():
+    """
+    Resumen de la medición actual.
+
+    Returns:
+        dict: duración, registros, registros por minuto y, por paso,
+              cantidad, fallidos, total, p50, p90, p99 y máximo
+    """
+    with _candado_pasos:
+        tiempos = {
+            nombre: (sorted(datos["tiempos"]), datos["fallidos"])
+            for nombre, datos in _tiempos_pasos.items()
+        }
+        segundos = time.monotonic() - _inicio_ejecucion
+
+    pasos = {}
+    for nombre, (valores, fallidos) in tiempos.items():
+        pasos[nombre] = {
+            "cantidad": len(valores),
+            "fallidos": fallidos,
+            "total": round(sum(valores), 3),
+            "p50": round(percentil(valores, 50), 3),
+            "p90": round(percentil(valores, 90), 3),
+            "p99": round(percentil(valores, 99), 3),
+            "maximo": round(valores[-1], 3),
+        }
+
+    registros = pasos.get("registro", {}).get("cantidad", 0)
+    return {
+        "duracion_segundos": round(segundos, 1),
+        "registros": registros,
+        "registros_por_minuto": (
+            round(registros / (segundos / 60), 2) if segundos else 0
+        ),
+        "pasos": pasos,
+    }
+
+
+def imprimir_resumen_pasos(resumen=None):
+    """Muestra p50/p90/p99 y el total de cada paso."""
+    resumen = resumen or resumen_pasos()
+    if not resumen["pasos"]:
+        return
+
+    print(f"\n📈 TIEMPOS POR PASO")
+    print(f"   {'Paso':<18} {'Veces':>6} {'p50':>7} {'p90':>7} {'p99':>7} {'Total':>9}")
+    for nombre, datos in sorted(resumen["pasos"].items()):
+        fallidos = f"  ({datos['fallidos']} fallidos)" if datos["fallidos"] else ""
+        print(
+            f"   {nombre:<18} {datos['cantidad']:>6} {datos['p50']:>6.2f}s "
+            f"{datos['p90']:>6.2f}s {datos['p99']:>6.2f}s {datos['total']:>8.1f}s"
+            f"{fallidos}"
+        )
+    print(
+        f"   🚀 Registros: {resumen['registros']} "
+        f"({resumen['registros_por_minuto']:.2f} por minuto)"
+    )
+
+
+def guardar_reporte_pasos(carpeta, script):
+    """
+    Imprime el resumen y lo guarda en 'reporte_pasos_<fecha>.json' dentro de
+    la subcarpeta 'reportes_pasos' de 'carpeta' (así el distribuidor y los
+    conteos de la carpeta no lo toman por un documento).
+
+    Returns:
+        str: Ruta del reporte, o None si no hubo pasos medidos
+    """
+    resumen = resumen_pasos()
+    if not resumen["pasos"]:
+        return None
+
+    imprimir_resumen_pasos(resumen)
+    ahora = datetime.now()
+    carpeta = os.path.join(carpeta, CARPETA_REPORTES)
+    ruta = os.path.join(
+        carpeta, f"reporte_pasos_{ahora.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(
+                {"script": script, "fecha": ahora.isoformat(), **resumen},
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+        print(f"   📄 Reporte de tiempos por paso: {ruta}")
+        return ruta
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el reporte de tiempos por paso: {e}")
+        return None
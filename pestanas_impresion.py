@@ -0,0 +1,184 @@
+"""
+PESTAÑAS DE IMPRESIÓN EN PARALELO - HERMACO ERP
+===============================================
+Solapa la carga de las ventanas de impresión dentro de UN solo Chrome.
+
+Flujo normal (un registro a la vez):
+    Ver -> modal -> Impresión -> esperar ventana -> descargar -> cerrar
+
+Flujo en pestañas: la ventana de impresión de cada registro se deja
+cargando en segundo plano y se vuelve a la ventana principal a abrir la
+del siguiente, hasta tener 'max_en_vuelo' pestañas abiertas. Luego se
+descarga la pestaña más antigua (que ya terminó de cargar) y se abre otra.
+Así la latencia del ERP de varios registros corre al mismo tiempo sin el
+costo de memoria de otro navegador.
+
+Los registros se completan en el mismo orden en que se abrieron, por lo
+que el seguimiento del último exitoso de cada script no cambia. Cada
+registro se mide (paso 'registro') desde que se abre su pestaña hasta que
+termina su descarga.
+"""
+
+import time
+from collections import deque
+
+from esperas import esperar_nueva_ventana
+from metricas_pasos import registrar_paso
+
+# Pestañas de impresión abiertas al mismo tiempo por defecto
+PESTANAS_EN_VUELO = 3
+
+# Marca de un registro que no necesita pestaña (por ejemplo, anulado)
+_OMITIDO = object()
+
+
+def abrir_pestana_impresion(
+    driver, elemento, ventana_principal, abrir_impresion, cerrar_modal
+):
+    """
+    Abre la ventana de impresión de un registro y vuelve a la ventana
+    principal sin esperar a que cargue.
+
+    Returns:
+        str: Handle de la nueva pestaña, o None si no se pudo abrir
+    """
+    handle = None
+    try:
+        driver.switch_to.window(ventana_principal)
+        ventanas_conocidas = set(driver.window_handles)
+
+        if abrir_impresion(driver, elemento):
+            handle = esperar_nueva_ventana(
+                driver, ventana_principal, ventanas_conocidas=ventanas_conocidas
+            )
+            print("  🗂️ Impresión cargando en segundo plano")
+    except Exception as e:
+        print(f"  ❌ Error al abrir la pestaña de impresión: {e}")
+
+    try:
+        driver.switch_to.window(ventana_principal)
+        cerrar_modal(driver)
+    except Exception:
+        pass
+    return handle
+
+
+def cerrar_pestana(driver, handle, ventana_principal):
+    """Cierra una pestaña de impresión y vuelve a la ventana principal."""
+    try:
+        if handle in driver.window_handles:
+            driver.switch_to.window(handle)
+            driver.close()
+    except Exception as e:
+        print(f"  ⚠️ No se pudo cerrar la pestaña: {e}")
+    driver.switch_to.window(ventana_principal)
+
+
+def descargar_pestana(driver, elemento, handle, ventana_principal, descargar):
+    """
+    Cambia a la pestaña de impresión, descarga y la cierra.
+    Retorna True si la descarga se completó.
+    """
+    exito = False
+    try:
+        driver.switch_to.window(handle)
+        exito = descargar(driver, elemento)
+    except Exception as e:
+        print(f"  ❌ Error al descargar desde la pestaña: {e}")
+    cerrar_pestana(driver, handle, ventana_principal)
+    return exito
+
+
+def procesar_en_pestanas(
+    driver,
+    elementos,
+    ventana_principal,
+    abrir_impresion,
+    descargar,
+    cerrar_modal,
+    registrar,
+    omitir=None,
+    reintentar=None,
+    max_en_vuelo=PESTANAS_EN_VUELO,
+):
+    """
+    Procesa los registros con varias pestañas de impresión en vuelo.
+
+    Args:
+        driver: Instancia de WebDriver
+        elementos: Iterable de registros (o tuplas) en el orden de proceso
+        ventana_principal: Handle de la ventana con la tabla
+        abrir_impresion: f(driver, elemento) -> bool; abre el modal y hace
+                         click en 'Impresión' (sin cambiar de ventana)
+        descargar: f(driver, elemento) -> bool; descarga desde la ventana
+                   de impresión actual
+        cerrar_modal: f(driver); cierra el modal de la ventana principal
+        registrar: f(elemento, exito); recibe el resultado en orden
+                   (exito es None si el registro se omitió)
+        omitir: f(elemento) -> bool; registros que no se descargan
+        reintentar: f(elemento) -> bool; flujo normal con reintentos para
+                    los registros que fallaron en pestaña
+        max_en_vuelo: Pestañas abiertas al mismo tiempo
+    """
+    pendientes = iter(elementos)
+    devueltos = deque()
+    en_vuelo = deque()
+    pestanas_abiertas = 0
+
+    while True:
+        # Abrir pestañas hasta llenar el cupo
+        while pestanas_abiertas < max_en_vuelo:
+            if devueltos:
+                elemento = devueltos.popleft()
+            else:
+                elemento = next(pendientes, _OMITIDO)
+                if elemento is _OMITIDO:
+                    break
+
+            if omitir and omitir(elemento):
+                en_vuelo.append((elemento, _OMITIDO, None))
+                continue
+
+            inicio = time.monotonic()
+            handle = abrir_pestana_impresion(
+                driver, elemento, ventana_principal, abrir_impresion, cerrar_modal
+            )
+            en_vuelo.append((elemento, handle, inicio))
+            if handle:
+                pestanas_abiertas += 1
+
+        if not en_vuelo:
+            break
+
+        # Completar la pestaña más antigua
+        elemento, handle, inicio = en_vuelo.popleft()
+        if handle is _OMITIDO:
+            registrar(elemento, None)
+            continue
+
+        exito = False
+        if handle:
+            pestanas_abiertas -= 1
+            exito = descargar_pestana(
+                driver, elemento, handle, ventana_principal, descargar
+            )
+
+        if not exito and reintentar:
+            # El flujo normal cierra todas las ventanas extra: devolver a la
+            # cola los registros en vuelo para reabrirlos después
+            for _, handle_en_vuelo, _ in en_vuelo:
+                if handle_en_vuelo and handle_en_vuelo is not _OMITIDO:
+                    cerrar_pestana(driver, handle_en_vuelo, ventana_principal)
+            devueltos.extendleft(
+                elemento_en_vuelo for elemento_en_vuelo, _, _ in reversed(en_vuelo)
+            )
+            en_vuelo.clear()
+            pestanas_abiertas = 0
+
+            print("  🔁 Reintentando con el flujo normal...")
+            # El reintento mide su propio registro
+            exito = reintentar(elemento)
+        else:
+            registrar_paso("registro", time.monotonic() - inicio, bool(exito))
+
+        registrar(elemento, exito)
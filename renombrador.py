@@ -1,7 +1,8 @@
-import json
 import os
 from pathlib import Path
 
+from cache_metadatos import metadatos_de_archivos, mover_en_cache
+
 
 def renombrar_archivos_json():
     """
@@ -70,14 +71,18 @@ def renombrar_archivos_json():
     print("\n🔄 Procesando archivos...")
     print("-" * 60)
 
-    for archivo in archivos_json_validos:
+    # numeroControl de cada archivo (solo se parsean los nuevos o modificados)
+    metadatos = metadatos_de_archivos(archivos_json_validos)
+
+    for archivo, datos in zip(archivos_json_validos, metadatos):
         try:
-            # Leer el contenido del archivo JSON
-            with open(archivo, "r", encoding="utf-8") as f:
-                datos = json.load(f)
+            if "error" in datos:
+                print(f"❌ {archivo.name}: {datos['error']}")
+                errores += 1
+                continue
 
             # Extraer el numeroControl
-            numero_control = datos.get("identificacion", {}).get("numeroControl")
+            numero_control = datos["identificacion.numeroControl"]
 
             if not numero_control:
                 print(f"⚠️  {archivo.name}: No se encontró el campo 'numeroControl'")
@@ -104,12 +109,10 @@ def renombrar_archivos_json():
 
             # Renombrar el archivo
             archivo.rename(nueva_ruta)
+            mover_en_cache(archivo, nueva_ruta)
             print(f"✓ Renombrado: {archivo.name} -> {nuevo_nombre}")
             renombrados += 1
 
-        except json.JSONDecodeError as e:
-            print(f"❌ {archivo.name}: Error al leer JSON - {e}")
-            errores += 1
         except Exception as e:
             print(f"❌ {archivo.name}: Error inesperado - {e}")
             errores += 1
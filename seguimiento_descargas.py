@@ -0,0 +1,286 @@
+"""
+SEGUIMIENTO DE DESCARGAS POR EVENTOS DE DEVTOOLS
+================================================
+Cuando se usa el gestor de descargas de Chrome (DESCARGA_DIRECTA_HTTP = False)
+ya no se revisa la carpeta buscando '*.crdownload' ni el archivo más reciente.
+
+Chrome guarda cada descarga con su GUID como nombre (Browser.setDownloadBehavior
+con 'allowAndName') y avisa su avance con los eventos downloadWillBegin /
+downloadProgress, que chromedriver deja en el log 'performance'. Cada descarga
+se asocia al DTE que la inició (por la URL del enlace) y se entrega como un
+Future que se resuelve con la ruta final del archivo, ya renombrado a
+'hermaco-<DTE>' (sin copias 'nombre (1).pdf', igual que la descarga HTTP).
+
+Así varias descargas pueden estar en curso a la vez sin confundirse, y el
+tiempo de espera no depende del tamaño de la carpeta.
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import Future
+
+from selenium.webdriver.common.by import By
+
+from descarga_http import (
+    XPATH_ENLACE_PDF,
+    XPATH_ENLACE_JSON,
+    obtener_enlaces_descarga,
+    limpiar_nombre_archivo,
+    nombre_canonico,
+    finalizar_descarga,
+)
+from esperas import registrar_espera, INTERVALO_SONDEO
+from almacen_descargas import guardar_en_almacen
+from manifiesto_descargas import anotar_archivo
+
+# Seguimiento activo por sesión de navegador
+_seguimientos = {}
+_candado_seguimientos = threading.Lock()
+
+
+def configurar_registro_descargas(chrome_options):
+    """
+    Activa en las opciones de Chrome el log 'performance' con los eventos de
+    página (donde llegan los eventos de descarga) y sin los de red.
+    """
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    chrome_options.add_experimental_option(
+        "perfLoggingPrefs", {"enableNetwork": False, "enablePage": True}
+    )
+
+
+def obtener_seguimiento(driver, carpeta):
+    """
+    Retorna el seguimiento de descargas del navegador (se crea una sola vez).
+    Al crearlo, Chrome pasa a guardar las descargas en 'carpeta' con su GUID.
+    Si el navegador es compartido y otro descargador pide otra carpeta, las
+    descargas siguientes pasan a esa carpeta.
+    """
+    with _candado_seguimientos:
+        seguimiento = _seguimientos.get(driver.session_id)
+        if seguimiento is None or seguimiento["carpeta"] != carpeta:
+            driver.execute_cdp_cmd(
+                "Browser.setDownloadBehavior",
+                {
+                    "behavior": "allowAndName",
+                    "downloadPath": carpeta,
+                    "eventsEnabled": True,
+                },
+            )
+        if seguimiento is None:
+            seguimiento = {
+                "driver": driver,
+                "carpeta": carpeta,
+                "esperadas": {},
+                "en_curso": {},
+            }
+            _seguimientos[driver.session_id] = seguimiento
+        seguimiento["carpeta"] = carpeta
+        return seguimiento
+
+
+def esperar_descarga(seguimiento, url, dte=None, extension=None, callback=None):
+    """
+    Registra una descarga que se va a iniciar (antes del click en el enlace).
+
+    Args:
+        seguimiento: dict de obtener_seguimiento
+        url: URL del enlace que inicia la descarga
+        dte: DTE o código dueño del archivo (nombre si el servidor no envía uno)
+        extension: 'pdf' o 'json'
+        callback: f(ruta) llamado al terminar (ruta None si falló)
+
+    Returns:
+        Future: se resuelve con la ruta final del archivo, o None si se canceló
+    """
+    futuro = Future()
+    if callback:
+        futuro.add_done_callback(lambda f: callback(f.result()))
+    seguimiento["esperadas"].setdefault(url, []).append(
+        {"futuro": futuro, "dte": dte, "extension": extension}
+    )
+    return futuro
+
+
+def nombre_final(descarga):
+    """Nombre con el que queda el archivo: el canónico del DTE o el sugerido."""
+    if descarga.get("dte") and descarga.get("extension"):
+        return nombre_canonico(descarga["dte"], descarga["extension"])
+
+    nombre = descarga.get("nombre_sugerido") or descarga["guid"]
+    nombre = limpiar_nombre_archivo(nombre)
+    extension = descarga.get("extension")
+    if extension and not nombre.lower().endswith(f".{extension}"):
+        nombre = f"{nombre}.{extension}"
+    return nombre
+
+
+def tomar_esperada(seguimiento, url, nombre_sugerido):
+    """
+    Busca la descarga registrada para la URL. Si el servidor redirigió a otra
+    URL, toma la más antigua con la misma extensión que el nombre sugerido.
+    """
+    esperadas = seguimiento["esperadas"]
+    if url not in esperadas:
+        extension = os.path.splitext(nombre_sugerido or "")[1].lstrip(".").lower()
+        url = next(
+            (u for u, lista in esperadas.items() if lista[0]["extension"] == extension),
+            None,
+        )
+        if url is None:
+            return None
+
+    descarga = esperadas[url].pop(0)
+    if not esperadas[url]:
+        del esperadas[url]
+    return descarga
+
+
+def descarga_iniciada(seguimiento, parametros):
+    """Asocia el GUID de una descarga nueva con la descarga esperada de su URL."""
+    guid = parametros["guid"]
+    if guid in seguimiento["en_curso"]:
+        return
+
+    descarga = tomar_esperada(
+        seguimiento, parametros.get("url"), parametros.get("suggestedFilename")
+    )
+    if descarga is None:
+        # Descarga que nadie registró: se sigue igual para renombrarla
+        descarga = {"futuro": Future(), "dte": None, "extension": None}
+
+    descarga["guid"] = guid
+    descarga["nombre_sugerido"] = parametros.get("suggestedFilename")
+    descarga["inicio"] = time.monotonic()
+    seguimiento["en_curso"][guid] = descarga
+
+
+def descarga_avanzo(seguimiento, parametros):
+    """Resuelve el Future de la descarga cuando termina o se cancela."""
+    estado = parametros.get("state")
+    if estado not in ("completed", "canceled"):
+        return
+
+    descarga = seguimiento["en_curso"].pop(parametros["guid"], None)
+    if descarga is None:
+        return
+
+    ruta = None
+    if estado == "completed":
+        origen = os.path.join(seguimiento["carpeta"], descarga["guid"])
+        nombre = nombre_final(descarga)
+        try:
+            ruta, resultado = finalizar_descarga(
+                origen, os.path.join(seguimiento["carpeta"], nombre)
+            )
+            if resultado == "identico":
+                print(f"  ♻️ {nombre} ya existía idéntico, no se duplica")
+            sha256 = None
+            if descarga.get("dte") and descarga.get("extension"):
+                sha256 = guardar_en_almacen(
+                    ruta, descarga["dte"], descarga["extension"]
+                )
+            anotar_archivo(
+                ruta, descarga.get("dte"), descarga.get("extension"), sha256, resultado
+            )
+        except OSError as e:
+            print(f"  ⚠️ No se pudo renombrar la descarga {descarga['guid']}: {e}")
+
+    registrar_espera(
+        "descarga_completa",
+        time.monotonic() - descarga["inicio"],
+        cumplida=ruta is not None,
+    )
+    descarga["futuro"].set_result(ruta)
+
+
+def procesar_eventos(seguimiento):
+    """
+    Lee los eventos pendientes del log 'performance' del navegador y
+    actualiza las descargas en curso.
+    """
+    for entrada in seguimiento["driver"].get_log("performance"):
+        try:
+            mensaje = json.loads(entrada["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+
+        metodo = mensaje.get("method", "")
+        if metodo.endswith(".downloadWillBegin"):
+            descarga_iniciada(seguimiento, mensaje["params"])
+        elif metodo.endswith(".downloadProgress"):
+            descarga_avanzo(seguimiento, mensaje["params"])
+
+
+def esperar_futuros(seguimiento, futuros, timeout=30):
+    """
+    Procesa eventos hasta que todos los futuros terminen o venza el tiempo.
+    Retorna la lista de rutas (None para las que no terminaron).
+    """
+    inicio = time.monotonic()
+    while time.monotonic() - inicio < timeout:
+        if all(futuro.done() for futuro in futuros):
+            break
+        procesar_eventos(seguimiento)
+        time.sleep(INTERVALO_SONDEO)
+
+    return [futuro.result() if futuro.done() else None for futuro in futuros]
+
+
+def iniciar_descargas_chrome(driver, wait, carpeta, dte=None):
+    """
+    Hace click en los enlaces PDF y JSON de la ventana de impresión actual
+    sin esperar a que terminen.
+
+    Returns:
+        list: Futures de las descargas que se iniciaron
+    """
+    seguimiento = obtener_seguimiento(driver, carpeta)
+    url_pdf, url_json = obtener_enlaces_descarga(driver, wait)
+
+    futuros = []
+    for url, xpath, extension in (
+        (url_pdf, XPATH_ENLACE_PDF, "pdf"),
+        (url_json, XPATH_ENLACE_JSON, "json"),
+    ):
+        if not url:
+            continue
+        try:
+            enlace = driver.find_element(By.XPATH, xpath)
+            futuro = esperar_descarga(seguimiento, url, dte, extension)
+            enlace.click()
+            print(f"  ⬇️ Click en descarga {extension.upper()}...")
+            futuros.append(futuro)
+        except Exception as e:
+            print(f"  ⚠️ No se pudo hacer click en {extension.upper()}: {e}")
+    return futuros
+
+
+def descargar_pdf_y_json_chrome(driver, wait, carpeta, dte=None, timeout=30):
+    """
+    Descarga PDF y JSON con el gestor de Chrome y espera los eventos de fin
+    de ambas descargas.
+
+    Returns:
+        bool: True si los dos archivos quedaron en disco
+    """
+    try:
+        futuros = iniciar_descargas_chrome(driver, wait, carpeta, dte)
+        rutas = esperar_futuros(obtener_seguimiento(driver, carpeta), futuros, timeout)
+    except Exception as e:
+        print(f"  ❌ Error al descargar con Chrome: {e}")
+        return False
+
+    for ruta in rutas:
+        if ruta:
+            print(f"  💾 Guardado: {os.path.basename(ruta)}")
+
+    descargas_exitosas = sum(1 for ruta in rutas if ruta)
+    if descargas_exitosas == 2:
+        print("  🎉 Ambas descargas completadas")
+        return True
+
+    print(f"  ⚠️ Solo se completaron {descargas_exitosas}/2 descargas")
+    return False
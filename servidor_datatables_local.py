@@ -0,0 +1,260 @@
+"""
+SERVIDOR LOCAL DE PRUEBA PARA DATATABLES
+========================================
+Imita los endpoints JSON que alimentan sell_table, expense_table y
+remission_notes_table en el ERP, con datos generados, para probar el
+listado directo (listado_datatables.py) sin conexión.
+
+Uso:
+    python servidor_datatables_local.py            # levanta el servidor
+    python servidor_datatables_local.py --probar   # levanta y lista las 3 tablas
+"""
+
+import sys
+import json
+import uuid
+import random
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+PUERTO = 8765
+TOTAL_REGISTROS = 250
+
+# Columnas visibles de cada tabla (en el orden de la grilla del ERP)
+COLUMNAS = {
+    "/sells": [
+        "action",
+        "transaction_date",
+        "invoice_no",
+        "name",
+        "final_total",
+        "payment_status",
+        "efactura_status",
+    ],
+    "/expenses": [
+        "transaction_date",
+        "location_name",
+        "contact_name",
+        "document_type",
+        "document_number",
+        "codigo_generacion",
+        "payment_status",
+        "final_total",
+        "action",
+    ],
+    "/remission-notes": [
+        "action",
+        "transaction_date",
+        "correlativo",
+        "customer",
+        "status",
+    ],
+}
+
+
+def html_acciones(ruta, id_registro):
+    """Menú 'Acciones' con los mismos enlaces que usa el ERP."""
+    enlaces = (
+        f'<li><a href="#" data-href="{ruta}/{id_registro}" class="btn-modal" '
+        f'data-container=".view_modal"><i class="fas fa-eye"></i> Ver</a></li>'
+    )
+    if ruta == "/expenses":
+        enlaces += (
+            f'<li><a href="#" data-href="{ruta}/{id_registro}/print-dte" '
+            f'class="print-dte-expense"><i class="fas fa-print"></i> Imprimir DTE</a></li>'
+        )
+    return (
+        '<div class="btn-group"><button type="button" class="btn btn-info '
+        'dropdown-toggle btn-xs btn-actions" data-toggle="dropdown">Acciones</button>'
+        f'<ul class="dropdown-menu dropdown-menu-left" role="menu">{enlaces}</ul></div>'
+    )
+
+
+def html_estado_pago(estado):
+    """Etiqueta de estado de pago como la dibuja el ERP."""
+    color = "bg-green" if estado == "Pagado" else "bg-yellow"
+    return (
+        f'<a href="#" class="view_payment_modal payment-status-label payment-status" '
+        f'data-orig-value="{estado}"><span class="label {color}">{estado}</span></a>'
+    )
+
+
+def generar_datos(total=TOTAL_REGISTROS, semilla=7):
+    """Genera registros de ventas, gastos y notas de remisión."""
+    azar = random.Random(semilla)
+    inicio = datetime(2025, 1, 1, 8, 0)
+    datos = {ruta: [] for ruta in COLUMNAS}
+
+    for i in range(total):
+        fecha = (inicio + timedelta(minutes=37 * i)).strftime("%d/%m/%Y %H:%M")
+        anulada = azar.random() < 0.08
+        pagado = azar.random() < 0.8
+
+        datos["/sells"].append(
+            {
+                "action": html_acciones("/sells", 1000 + i),
+                "transaction_date": fecha,
+                "invoice_no": f"DTE-01-M001P001-{i:015d}",
+                "name": f"Cliente {i}",
+                "final_total": f"$ {azar.uniform(5, 900):.2f}",
+                "payment_status": html_estado_pago(
+                    "Debido (Anulada)" if anulada else "Pagado"
+                ),
+                "efactura_status": "Anulada" if anulada else "Procesado",
+            }
+        )
+        datos["/expenses"].append(
+            {
+                "transaction_date": fecha,
+                "location_name": "Hermaco",
+                "contact_name": f"Proveedor {i % 40}",
+                "document_type": "Comprobante de crédito fiscal",
+                "document_number": f"DTE-03-{i:08d}",
+                "codigo_generacion": (
+                    '<span class="text-primary"><strong>'
+                    f"{str(uuid.UUID(int=azar.getrandbits(128))).upper()}"
+                    "</strong></span>"
+                ),
+                "payment_status": html_estado_pago("Pagado" if pagado else "Debido"),
+                "final_total": f"$ {azar.uniform(5, 900):.2f}",
+                "action": html_acciones("/expenses", 5000 + i),
+            }
+        )
+        datos["/remission-notes"].append(
+            {
+                "action": html_acciones("/remission-notes", 9000 + i),
+                "transaction_date": fecha,
+                "correlativo": str(uuid.UUID(int=azar.getrandbits(128))).upper(),
+                "customer": f"Cliente {i}",
+                "status": "Anulada" if anulada else "Emitida",
+            }
+        )
+
+    return datos
+
+
+class ManejadorDataTables(BaseHTTPRequestHandler):
+    """Responde como el endpoint server-side de DataTables del ERP."""
+
+    datos = generar_datos()
+
+    def log_message(self, formato, *args):
+        pass
+
+    def responder(self, parametros):
+        ruta = urlparse(self.path).path.rstrip("/")
+        if ruta not in self.datos:
+            self.send_error(404)
+            return
+
+        filas = self.datos[ruta]
+
+        # Filtros equivalentes a los de la página
+        estado = parametros.get("efactura_status")
+        if estado:
+            filas = [
+                f
+                for f in filas
+                if estado.lower() in f.get("efactura_status", "").lower()
+            ]
+        busqueda = parametros.get("search[value]", "").strip().lower()
+        if busqueda:
+            filas = [f for f in filas if busqueda in json.dumps(f).lower()]
+
+        inicio = int(parametros.get("start", 0))
+        longitud = int(parametros.get("length", 10))
+        pagina = filas[inicio:] if longitud < 0 else filas[inicio : inicio + longitud]
+
+        cuerpo = json.dumps(
+            {
+                "draw": int(parametros.get("draw", 1)),
+                "recordsTotal": len(self.datos[ruta]),
+                "recordsFiltered": len(filas),
+                "data": pagina,
+            }
+        ).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        self.responder(
+            dict(parse_qsl(urlparse(self.path).query, keep_blank_values=True))
+        )
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length", 0))
+        cuerpo = self.rfile.read(largo).decode("utf-8")
+        self.responder(dict(parse_qsl(cuerpo, keep_blank_values=True)))
+
+
+def iniciar_servidor(puerto=PUERTO):
+    """Levanta el servidor en un hilo y lo retorna."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), ManejadorDataTables)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    return servidor
+
+
+def probar_listado(puerto=PUERTO):
+    """Lista las tres tablas contra el servidor local y muestra un resumen."""
+    from listado_datatables import listar_registros
+
+    errores = 0
+    for ruta, columnas in COLUMNAS.items():
+        print(f"\n📋 Tabla {ruta}")
+        consulta = {
+            "url": f"http://127.0.0.1:{puerto}{ruta}",
+            "metodo": "GET",
+            "parametros": "draw=1&start=0&length=25&start_date=2025-01-01",
+            "columnas": columnas,
+            "csrf": None,
+        }
+        registros = listar_registros(consulta, {}, tamano_pagina=40)
+        esperados = len(ManejadorDataTables.datos[ruta])
+
+        print(f"   Registros listados: {len(registros)}/{esperados}")
+        print(f"   Con enlace 'Ver': {sum(1 for r in registros if r['data_href'])}")
+        print(f"   Anulados: {sum(1 for r in registros if r['anulada'])}")
+        if ruta == "/sells":
+            print(f"   Con DTE: {sum(1 for r in registros if r['dte'])}")
+        if ruta == "/expenses":
+            pagados = sum(1 for r in registros if r["estado_pago"] == "Pagado")
+            print(f"   Pagados: {pagados}")
+            print(f"   Con código: {sum(1 for r in registros if r['codigo'])}")
+        if ruta == "/remission-notes":
+            print(
+                f"   Con correlativo: {sum(1 for r in registros if r['correlativo'])}"
+            )
+
+        if len(registros) != esperados:
+            errores += 1
+            print("   ❌ La cantidad no coincide")
+
+    print(
+        "\n✅ Prueba completada"
+        if not errores
+        else f"\n❌ {errores} tablas con errores"
+    )
+    return errores == 0
+
+
+if __name__ == "__main__":
+    servidor = iniciar_servidor()
+    print(f"🌐 Servidor DataTables local en http://127.0.0.1:{PUERTO}")
+
+    if "--probar" in sys.argv:
+        exito = probar_listado()
+        servidor.shutdown()
+        sys.exit(0 if exito else 1)
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+        print("\n👋 Servidor detenido")
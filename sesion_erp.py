@@ -0,0 +1,228 @@
+"""
+SESIÓN AUTENTICADA COMPARTIDA - HERMACO ERP
+===========================================
+Guarda las cookies del ERP después de un login exitoso para que todos los
+descargadores (diario, anuladas, remisiones, gastos y corrector) puedan
+reutilizarlas y entrar directamente a /sells, /expenses o /remission-notes.
+
+Antes de usar las cookies guardadas se validan con una petición HTTP liviana;
+solo si la sesión expiró se ejecuta el flujo completo de login.
+
+También crea el navegador de los descargadores (crear_navegador): el
+orquestador abre uno solo y se lo pasa a cada descargador, que lo encuentra
+ya autenticado y entra directo a su pantalla.
+"""
+
+import os
+import json
+from datetime import datetime
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+from descarga_http import obtener_cliente_http
+from seguimiento_descargas import configurar_registro_descargas
+
+URL_ERP = "https://hermaco.findexbusiness.com"
+USUARIO_ERP = "Henri"
+CONTRASENA_ERP = "Bajmut"
+
+# Archivo compartido por todos los descargadores
+ARCHIVO_SESION = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "sesion_erp.json"
+)
+
+# Página protegida usada para validar las cookies (redirige a /login si expiró)
+RUTA_VERIFICACION = "/home"
+
+
+def crear_navegador(carpeta_descargas):
+    """
+    Crea un Chrome headless que descarga en 'carpeta_descargas'
+    """
+    chrome_options = webdriver.ChromeOptions()
+    prefs = {
+        "download.default_directory": carpeta_descargas,
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        "plugins.always_open_pdf_externally": True,
+        "safebrowsing.enabled": True,
+    }
+    chrome_options.add_experimental_option("prefs", prefs)
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    configurar_registro_descargas(chrome_options)
+    return webdriver.Chrome(options=chrome_options)
+
+
+def navegador_autenticado(driver):
+    """
+    True si el navegador ya está en una página del ERP fuera del login
+    (por ejemplo, porque otro descargador lo dejó con la sesión iniciada).
+    """
+    try:
+        url = driver.current_url or ""
+    except Exception:
+        return False
+    return url.startswith(URL_ERP) and "/login" not in url
+
+
+def cargar_sesion():
+    """
+    Carga las cookies guardadas de la última sesión.
+    Retorna la lista de cookies o None si no hay sesión guardada.
+    """
+    try:
+        if not os.path.exists(ARCHIVO_SESION):
+            return None
+        with open(ARCHIVO_SESION, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("cookies") or None
+    except Exception as e:
+        print(f"⚠️ Error al leer sesión guardada: {e}")
+        return None
+
+
+def guardar_sesion(driver):
+    """
+    Guarda las cookies actuales del navegador en el archivo de sesión.
+    La escritura es atómica para que varios scripts puedan leerlo a la vez.
+    """
+    try:
+        data = {
+            "fecha_actualizacion": datetime.now().isoformat(),
+            "cookies": driver.get_cookies(),
+        }
+        archivo_temporal = ARCHIVO_SESION + ".tmp"
+        with open(archivo_temporal, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(archivo_temporal, ARCHIVO_SESION)
+        print("💾 Sesión guardada para reutilizarla en otros descargadores")
+    except Exception as e:
+        print(f"⚠️ Error al guardar sesión: {e}")
+
+
+def sesion_es_valida(cookies):
+    """
+    Verifica con una petición HTTP liviana si las cookies siguen autenticadas.
+    El ERP responde 200 en la página protegida o redirige a /login si expiró.
+    """
+    try:
+        cabecera_cookies = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+        respuesta = obtener_cliente_http().request(
+            "GET",
+            URL_ERP + RUTA_VERIFICACION,
+            headers={"Cookie": cabecera_cookies, "Accept": "text/html"},
+            redirect=False,
+            preload_content=False,
+        )
+        respuesta.release_conn()
+        return respuesta.status == 200
+    except Exception as e:
+        print(f"⚠️ No se pudo validar la sesión guardada: {e}")
+        return False
+
+
+def inyectar_cookies(driver, cookies):
+    """
+    Carga las cookies guardadas en el navegador.
+    El navegador debe estar en una página del dominio del ERP.
+    """
+    for cookie in cookies:
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            print(f"  ⚠️ Cookie '{cookie.get('name')}' no se pudo cargar: {e}")
+
+
+def iniciar_sesion(driver, wait):
+    """
+    Ejecuta el flujo completo de login en el ERP y guarda la sesión.
+    """
+    driver.get(URL_ERP)
+    print(f"📍 Navegando a: {URL_ERP}")
+
+    # Click en "Inicio de sesión"
+    login_link = wait.until(
+        EC.element_to_be_clickable((By.XPATH, f"//a[@href='{URL_ERP}/login']"))
+    )
+    login_link.click()
+    print("✅ Click en 'Inicio de sesión'")
+
+    print("🔄 Rellenando credenciales...")
+
+    # Rellenar usuario
+    username_input = wait.until(EC.presence_of_element_located((By.ID, "username")))
+    username_input.send_keys(USUARIO_ERP)
+    print("✅ Usuario ingresado")
+
+    # Rellenar contraseña
+    password_input = driver.find_element(By.ID, "password")
+    password_input.send_keys(CONTRASENA_ERP)
+    print("✅ Contraseña ingresada")
+
+    # Click en botón de login
+    login_button = driver.find_element(
+        By.XPATH, "//button[@type='submit' and contains(@class, 'btn-primary')]"
+    )
+    login_button.click()
+    print("✅ Click en botón 'Acceder'")
+
+    # Esperar a salir de la página de login
+    wait.until(lambda d: "/login" not in d.current_url)
+    print("✅ Login completado")
+
+    guardar_sesion(driver)
+
+
+def abrir_pagina_autenticada(driver, wait, ruta):
+    """
+    Abre una página del ERP con una sesión autenticada.
+
+    Si el navegador ya tiene la sesión iniciada, solo navega. Si no, intenta
+    reutilizar las cookies guardadas; si no existen o ya expiraron, ejecuta
+    el login completo.
+
+    Args:
+        driver: Instancia de WebDriver
+        wait: WebDriverWait asociado al driver
+        ruta: Ruta del ERP a abrir (por ejemplo '/sells' o '/expenses')
+
+    Returns:
+        bool: True si se reutilizó la sesión (del navegador o guardada),
+              False si hubo login
+    """
+    # Navegador compartido que ya tiene la sesión: basta con navegar
+    if navegador_autenticado(driver):
+        driver.get(URL_ERP + ruta)
+        if "/login" not in driver.current_url:
+            print(f"✅ Navegador ya autenticado, abierto: {ruta}")
+            return True
+        print("⚠️ La sesión del navegador expiró...")
+
+    cookies = cargar_sesion()
+
+    if cookies and sesion_es_valida(cookies):
+        print("🔑 Sesión guardada válida, reutilizando cookies...")
+        driver.get(URL_ERP)
+        inyectar_cookies(driver, cookies)
+        driver.get(URL_ERP + ruta)
+
+        if "/login" not in driver.current_url:
+            print(f"✅ Sesión reutilizada, abierto: {ruta}")
+            return True
+
+        print("⚠️ El ERP rechazó la sesión guardada, iniciando sesión...")
+    elif cookies:
+        print("⌛ La sesión guardada expiró, iniciando sesión...")
+    else:
+        print("🔐 No hay sesión guardada, iniciando sesión...")
+
+    iniciar_sesion(driver, wait)
+    driver.get(URL_ERP + ruta)
+    print(f"✅ Abierto: {ruta}")
+    return False
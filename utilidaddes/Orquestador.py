@@ -1,20 +1,41 @@
 """
 ORQUESTADOR DE DESCARGAS - HERMACO ERP
 ========================================
-Este script ejecuta en secuencia los descargadores de:
-1. Facturas de ayer (descargador_diario_copy.py)
+Este script ejecuta los descargadores de:
+1. Facturas de ayer (descargador_diario.py --fecha ayer)
 2. Remisiones (descargadorderemisiones.py)
 3. Gastos (descargadordegastos.py)
+4. Facturas anuladas (descargador_anuladas.py)
+
+Por defecto van uno tras otro. Con --concurrentes N se lanzan como procesos
+en paralelo (hasta N a la vez): usan pantallas del ERP y carpetas de descarga
+distintas, así que la ejecución dura lo que el script más lento.
+
+Con --en-proceso los descargadores se importan y se llama a su ejecutar()
+dentro de este mismo proceso, con un solo Chrome que inicia sesión una vez
+y se comparte entre todos (sin arrancar Python, Chrome ni login por script).
+
+La salida de cada script se muestra en vivo, línea por línea con el nombre
+del script, y se guarda en logs_orquestador/<script>.log (rotativo); en
+memoria solo quedan las últimas líneas para el resumen de errores.
 
 Modo: Headless (sin interfaz gráfica)
-Uso: python Orquestador.py
+Uso: python Orquestador.py [--concurrentes N | --en-proceso]
 """
 
 import subprocess
 import sys
 import os
 import json
-import glob
+import time
+import argparse
+import ast
+import importlib
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import traceback
 
@@ -25,6 +46,22 @@ if sys.platform == "win32":
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
 
+# Logs por script: rotan al llegar a TAMANO_MAXIMO_LOG (se guardan LOGS_RESPALDO)
+CARPETA_LOGS = "logs_orquestador"
+TAMANO_MAXIMO_LOG = 5 * 1024 * 1024
+LOGS_RESPALDO = 5
+# Líneas de salida que se conservan para el resumen de errores
+LINEAS_COLA = 40
+
+# JSON de seguimiento que no son documentos (conteo sin manifiestos)
+ARCHIVOS_TRACKING = [
+    "ultimo_exitoso.json",
+    "01descargados.json",
+    "02ignorados.json",
+    "ultimo_dte_exitoso",
+    "reporte_fallidos",
+]
+
 
 class OrquestadorDescargas:
     def __init__(self):
@@ -37,7 +74,10 @@ class OrquestadorDescargas:
         self.scripts = [
             {
                 "nombre": "Descargador de Facturas de Ayer",
-                "archivo": "descargador_diario_copy.py",
+                "archivo": "descargador_diario.py",
+                # Argumentos del script (procesos) y de ejecutar() (en proceso)
+                "argumentos": ["--fecha", "ayer"],
+                "parametros": {"fecha": "ayer"},
                 "descripcion": "Descarga facturas del día anterior",
                 "carpeta_descargas": "descargas_diarias",
                 "filtro": "Ayer (facturas del día anterior)",
@@ -56,8 +96,20 @@ class OrquestadorDescargas:
                 "carpeta_descargas": "descargas_gastos",
                 "filtro": "Estado: Pagado - Tipo: Gastos (DTE-14)",
             },
+            {
+                "nombre": "Descargador de Facturas Anuladas",
+                "archivo": "descargador_anuladas.py",
+                "descripcion": "Descarga las facturas anuladas del día anterior",
+                "carpeta_descargas": "descargas_anuladas",
+                "filtro": "Estado: Anulado - Fecha: Ayer",
+            },
         ]
         self.resultados = []
+        # Conteo de archivos por carpeta, leído una vez de los manifiestos
+        self.conteos = {}
+        # Con scripts en paralelo, cada bloque de salida se imprime entero
+        self.candado_salida = threading.Lock()
+        self.modo = "secuencial"
 
     def imprimir_banner(self):
         """Imprime el banner inicial"""
@@ -68,7 +120,7 @@ class OrquestadorDescargas:
             f"📅 Fecha y hora de inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         )
         print(f"📂 Directorio de trabajo: {self.directorio_base}")
-        print(f"🔧 Modo: Headless (sin interfaz gráfica)")
+        print(f"🔧 Modo: Headless (sin interfaz gráfica) - {self.modo}")
         print(f"📋 Scripts a ejecutar: {len(self.scripts)}")
         print("=" * 70 + "\n")
 
@@ -99,6 +151,7 @@ class OrquestadorDescargas:
                 print(f"      • PDFs: {conteo['pdfs']}")
                 print(f"      • JSONs: {conteo['jsons']}")
                 print(f"      • Total: {conteo['total']}")
+                print(f"      • Nuevos: {conteo['nuevos']}")
 
             if not resultado["exitoso"]:
                 print(f"   ⚠️  Error: {resultado['error']}")
@@ -111,6 +164,7 @@ class OrquestadorDescargas:
         # Calcular total de archivos descargados
         total_pdfs = 0
         total_jsons = 0
+        total_nuevos = 0
         for i, resultado in enumerate(self.resultados):
             if resultado["exitoso"]:
                 script_info = self.scripts[i]
@@ -119,11 +173,13 @@ class OrquestadorDescargas:
                     conteo = self.contar_archivos_descargados(carpeta_descargas)
                     total_pdfs += conteo["pdfs"]
                     total_jsons += conteo["jsons"]
+                    total_nuevos += conteo["nuevos"]
 
         print(f"\n� Total de archivos descargados:")
         print(f"   • PDFs: {total_pdfs}")
         print(f"   • JSONs: {total_jsons}")
         print(f"   • Total: {total_pdfs + total_jsons}")
+        print(f"   • Nuevos: {total_nuevos}")
 
         print(
             f"\n�📅 Fecha y hora de finalización: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
@@ -134,44 +190,54 @@ class OrquestadorDescargas:
 
     def contar_archivos_descargados(self, carpeta):
         """
-        Cuenta los archivos PDF y JSON en una carpeta de descargas
+        Cuenta los archivos PDF y JSON que dejaron los descargadores en esta
+        ejecución, según sus manifiestos (sin recorrer la carpeta de descargas)
 
         Args:
             carpeta: Nombre de la carpeta de descargas
 
         Returns:
-            dict: Diccionario con conteo de PDFs y JSONs
+            dict: Diccionario con conteo de PDFs, JSONs y archivos nuevos
         """
-        # Usar la ruta base de descargas configurada
-        carpeta_path = os.path.join(self.ruta_base_descargas, carpeta)
-
-        if not os.path.exists(carpeta_path):
-            return {"pdfs": 0, "jsons": 0, "total": 0}
-
-        # Contar PDFs
-        pdfs = len(glob.glob(os.path.join(carpeta_path, "*.pdf")))
-
-        # Contar JSONs (excluir archivos de tracking)
-        todos_jsons = glob.glob(os.path.join(carpeta_path, "*.json"))
-        archivos_tracking = [
-            "ultimo_exitoso.json",
-            "01descargados.json",
-            "02ignorados.json",
-            "ultimo_dte_exitoso",
-            "reporte_fallidos",
-        ]
-
-        jsons = len(
-            [
-                f
-                for f in todos_jsons
-                if not any(
-                    tracking in os.path.basename(f) for tracking in archivos_tracking
+        if carpeta not in self.conteos:
+            carpeta_path = os.path.join(self.ruta_base_descargas, carpeta)
+            try:
+                # Junto a los descargadores (o en sys.path en modo en proceso)
+                from manifiesto_descargas import leer_manifiestos, contar_archivos
+            except ImportError:
+                self.conteos[carpeta] = self.contar_archivos_en_carpeta(carpeta_path)
+                return self.conteos[carpeta]
+
+            archivos = [
+                archivo
+                for manifiesto in leer_manifiestos(
+                    carpeta_path, desde=self.fecha_inicio
                 )
+                for archivo in manifiesto["archivos"]
             ]
-        )
+            self.conteos[carpeta] = contar_archivos(archivos)
+        return self.conteos[carpeta]
 
-        return {"pdfs": pdfs, "jsons": jsons, "total": pdfs + jsons}
+    def contar_archivos_en_carpeta(self, carpeta_path):
+        """
+        Cuenta los PDF y JSON de la carpeta cuando no está el módulo de
+        manifiestos (sin manifiestos no se sabe cuáles son nuevos)
+        """
+        conteo = {"pdfs": 0, "jsons": 0, "total": 0, "nuevos": 0}
+        try:
+            with os.scandir(carpeta_path) as entradas:
+                for entrada in entradas:
+                    nombre = entrada.name.lower()
+                    if nombre.endswith(".pdf"):
+                        conteo["pdfs"] += 1
+                    elif nombre.endswith(".json") and not any(
+                        tracking in entrada.name for tracking in ARCHIVOS_TRACKING
+                    ):
+                        conteo["jsons"] += 1
+        except OSError:
+            return conteo
+        conteo["total"] = conteo["pdfs"] + conteo["jsons"]
+        return conteo
 
     def generar_reporte_json(self):
         """
@@ -189,6 +255,7 @@ class OrquestadorDescargas:
             # Calcular totales de archivos descargados
             total_pdfs = 0
             total_jsons = 0
+            total_nuevos = 0
             for i, resultado in enumerate(self.resultados):
                 if resultado["exitoso"]:
                     script_info = self.scripts[i]
@@ -197,6 +264,7 @@ class OrquestadorDescargas:
                         conteo = self.contar_archivos_descargados(carpeta_descargas)
                         total_pdfs += conteo["pdfs"]
                         total_jsons += conteo["jsons"]
+                        total_nuevos += conteo["nuevos"]
 
             # Construir el reporte
             reporte = {
@@ -214,6 +282,7 @@ class OrquestadorDescargas:
                     "pdfs": total_pdfs,
                     "jsons": total_jsons,
                     "total": total_pdfs + total_jsons,
+                    "nuevos": total_nuevos,
                 },
                 "scripts_ejecutados": [],
             }
@@ -225,7 +294,7 @@ class OrquestadorDescargas:
                 filtro_usado = script_info.get("filtro", "No especificado")
 
                 # Contar archivos descargados
-                conteo = {"pdfs": 0, "jsons": 0, "total": 0}
+                conteo = {"pdfs": 0, "jsons": 0, "total": 0, "nuevos": 0}
                 if carpeta_descargas:
                     conteo = self.contar_archivos_descargados(carpeta_descargas)
 
@@ -241,6 +310,7 @@ class OrquestadorDescargas:
                     "carpeta_descargas": carpeta_descargas,
                     "archivos_descargados": conteo,
                     "error": resultado.get("error", None),
+                    "ultimas_lineas": resultado.get("ultimas_lineas", []),
                 }
 
                 reporte["scripts_ejecutados"].append(script_detalle)
@@ -257,6 +327,63 @@ class OrquestadorDescargas:
             traceback.print_exc()
             return None
 
+    def crear_log_script(self, script_info):
+        """
+        Logger que escribe la salida de un script en su archivo rotativo
+
+        Args:
+            script_info: Diccionario con información del script
+
+        Returns:
+            logging.Logger: Logger del script (sin salida a consola)
+        """
+        carpeta_logs = os.path.join(self.directorio_base, CARPETA_LOGS)
+        os.makedirs(carpeta_logs, exist_ok=True)
+        nombre_log = os.path.splitext(script_info["archivo"])[0]
+
+        log = logging.getLogger(f"orquestador.{nombre_log}")
+        log.setLevel(logging.INFO)
+        log.propagate = False
+        if not log.handlers:
+            manejador = RotatingFileHandler(
+                os.path.join(carpeta_logs, f"{nombre_log}.log"),
+                maxBytes=TAMANO_MAXIMO_LOG,
+                backupCount=LOGS_RESPALDO,
+                encoding="utf-8",
+            )
+            manejador.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            log.addHandler(manejador)
+        return log
+
+    def leer_salida(self, flujo, nombre, log, cola, es_error=False):
+        """
+        Lee la salida de un script línea por línea: la muestra con el nombre
+        del script, la escribe en su log y guarda solo las últimas en 'cola'
+        """
+        marca = "📛 " if es_error else ""
+        for linea in iter(flujo.readline, ""):
+            linea = linea.rstrip("\r\n")
+            with self.candado_salida:
+                print(f"[{nombre}] {marca}{linea}", flush=True)
+            if es_error:
+                log.error(f"[stderr] {linea}")
+            else:
+                log.info(linea)
+            cola.append(f"{marca}{linea}")
+        flujo.close()
+
+    def imprimir_encabezado_script(self, script_info, numero, total):
+        """Imprime el encabezado de un script antes de ejecutarlo"""
+        print("\n" + "=" * 70)
+        print(f"🚀 EJECUTANDO SCRIPT {numero}/{total}")
+        print("=" * 70)
+        print(f"📄 Script: {script_info['nombre']}")
+        print(f"📝 Descripción: {script_info['descripcion']}")
+        print(f"📂 Archivo: {script_info['archivo']}")
+        print(f"📍 Directorio base: {self.directorio_base}")
+        print(f"⏰ Hora de inicio: {datetime.now().strftime('%H:%M:%S')}")
+        print("=" * 70 + "\n")
+
     def ejecutar_script(self, script_info, numero, total):
         """
         Ejecuta un script individual de Python
@@ -271,78 +398,110 @@ class OrquestadorDescargas:
         """
         nombre = script_info["nombre"]
         archivo = script_info["archivo"]
-        descripcion = script_info["descripcion"]
 
         # Usar ruta relativa al mismo nivel que el orquestador
         ruta_completa = os.path.join(self.directorio_base, archivo)
 
-        print("\n" + "=" * 70)
-        print(f"🚀 EJECUTANDO SCRIPT {numero}/{total}")
-        print("=" * 70)
-        print(f"📄 Script: {nombre}")
-        print(f"📝 Descripción: {descripcion}")
-        print(f"📂 Archivo: {archivo}")
-        print(f"📍 Directorio base: {self.directorio_base}")
-        print(f"⏰ Hora de inicio: {datetime.now().strftime('%H:%M:%S')}")
-        print("=" * 70 + "\n")
+        with self.candado_salida:
+            self.imprimir_encabezado_script(script_info, numero, total)
 
         # Verificar que el archivo existe
         if not os.path.exists(ruta_completa):
             print(f"❌ ERROR: El archivo '{archivo}' no existe en la ruta especificada")
             print(f"   Ruta buscada: {ruta_completa}\n")
+            self.resultados.append(
+                {
+                    "orden": numero,
+                    "nombre": nombre,
+                    "exitoso": False,
+                    "duracion": 0,
+                    "error": f"No existe el archivo: {archivo}",
+                }
+            )
             return False
 
         try:
             # Obtener el tiempo de inicio
             inicio = datetime.now()
 
-            # Ejecutar el script
-            # subprocess.run espera a que el proceso termine completamente
-            resultado = subprocess.run(
-                [sys.executable, ruta_completa],
+            # Ejecutar el script sin buffer, para recibir su salida en vivo
+            entorno = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+            proceso = subprocess.Popen(
+                [sys.executable, ruta_completa, *script_info.get("argumentos", [])],
                 cwd=self.directorio_base,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
                 encoding="utf-8",
                 errors="replace",
+                bufsize=1,
+                env=entorno,
             )
 
+            # stdout y stderr se leen a la vez (si no, uno puede bloquear al otro)
+            log = self.crear_log_script(script_info)
+            log.info(f"===== Inicio de {nombre} (PID {proceso.pid}) =====")
+            # Una cola por flujo: los errores no se pierden entre la salida normal
+            cola_salida = deque(maxlen=LINEAS_COLA)
+            cola_errores = deque(maxlen=LINEAS_COLA)
+            lectores = [
+                threading.Thread(
+                    target=self.leer_salida,
+                    args=(flujo, nombre, log, cola, es_error),
+                    daemon=True,
+                )
+                for flujo, cola, es_error in (
+                    (proceso.stdout, cola_salida, False),
+                    (proceso.stderr, cola_errores, True),
+                )
+            ]
+            for lector in lectores:
+                lector.start()
+
+            codigo_salida = proceso.wait()
+            for lector in lectores:
+                lector.join()
+
             # Calcular duración
             duracion = (datetime.now() - inicio).total_seconds()
-
-            # Mostrar la salida del script
-            if resultado.stdout:
-                print("\n📤 SALIDA DEL SCRIPT:")
-                print("-" * 70)
-                print(resultado.stdout)
-                print("-" * 70)
+            log.info(
+                f"===== Fin de {nombre}: código {codigo_salida}, {duracion:.2f}s ====="
+            )
 
             # Verificar si hubo errores
-            if resultado.returncode != 0:
-                print(
-                    f"\n❌ El script terminó con código de error: {resultado.returncode}"
-                )
-                if resultado.stderr:
-                    print("\n📛 ERRORES DETECTADOS:")
-                    print("-" * 70)
-                    print(resultado.stderr)
-                    print("-" * 70)
+            if codigo_salida != 0:
+                cola = list(cola_salida) + list(cola_errores)
+                with self.candado_salida:
+                    print(f"\n❌ {nombre} terminó con código de error: {codigo_salida}")
+                    if cola:
+                        print(f"\n📛 ÚLTIMAS {len(cola)} LÍNEAS DE SALIDA:")
+                        print("-" * 70)
+                        print("\n".join(cola))
+                        print("-" * 70)
 
                 self.resultados.append(
                     {
+                        "orden": numero,
                         "nombre": nombre,
                         "exitoso": False,
                         "duracion": duracion,
-                        "error": f"Código de salida: {resultado.returncode}",
+                        "error": f"Código de salida: {codigo_salida}",
+                        "ultimas_lineas": list(cola),
                     }
                 )
                 return False
 
-            print(f"\n✅ Script completado exitosamente")
+            print(f"\n✅ {nombre} completado exitosamente")
             print(f"⏱️  Duración: {duracion:.2f} segundos")
 
             self.resultados.append(
-                {"nombre": nombre, "exitoso": True, "duracion": duracion, "error": None}
+                {
+                    "orden": numero,
+                    "nombre": nombre,
+                    "exitoso": True,
+                    "duracion": duracion,
+                    "error": None,
+                }
             )
             return True
 
@@ -357,6 +516,7 @@ class OrquestadorDescargas:
             )
             self.resultados.append(
                 {
+                    "orden": numero,
                     "nombre": nombre,
                     "exitoso": False,
                     "duracion": duracion,
@@ -388,10 +548,164 @@ class OrquestadorDescargas:
             # Esperar un poco entre scripts
             if i < total:
                 print(f"\n⏸️  Esperando 5 segundos antes del siguiente script...\n")
-                import time
-
                 time.sleep(5)
 
+        return self.finalizar()
+
+    def ejecutar_concurrente(self, max_concurrentes=None):
+        """
+        Lanza los scripts como procesos en paralelo, hasta 'max_concurrentes'
+        a la vez (por defecto todos). Cada uno descarga en su propia carpeta.
+
+        Args:
+            max_concurrentes: Límite de scripts corriendo al mismo tiempo
+
+        Returns:
+            bool: True si todos fueron exitosos, False si alguno falló
+        """
+        total = len(self.scripts)
+        limite = max(1, min(max_concurrentes or total, total))
+        self.modo = f"concurrente (hasta {limite} a la vez)"
+        self.imprimir_banner()
+
+        # Cada hilo solo espera a su subprocess; el trabajo real está en los procesos
+        with ThreadPoolExecutor(
+            max_workers=limite, thread_name_prefix="orquestador"
+        ) as executor:
+            futuros = {
+                executor.submit(self.ejecutar_script, script, i, total): script
+                for i, script in enumerate(self.scripts, 1)
+            }
+            for futuro, script in futuros.items():
+                if not futuro.result():
+                    print(f"\n⚠️  ADVERTENCIA: El script '{script['nombre']}' falló")
+
+        return self.finalizar()
+
+    def define_ejecutar(self, archivo):
+        """
+        Revisa sin importarlo que el script exista y defina ejecutar()
+
+        Args:
+            archivo: Nombre del script en el directorio base
+
+        Returns:
+            bool: True si el script tiene una función ejecutar de primer nivel
+        """
+        ruta_completa = os.path.join(self.directorio_base, archivo)
+        try:
+            with open(ruta_completa, "r", encoding="utf-8") as f:
+                arbol = ast.parse(f.read(), filename=ruta_completa)
+        except (OSError, SyntaxError) as e:
+            print(f"❌ No se pudo leer {archivo}: {e}")
+            return False
+        return any(
+            isinstance(nodo, ast.FunctionDef) and nodo.name == "ejecutar"
+            for nodo in arbol.body
+        )
+
+    def ejecutar_modulo(self, script_info, numero, total, driver):
+        """
+        Importa un descargador y ejecuta su flujo en este proceso, con el
+        navegador compartido
+
+        Args:
+            script_info: Diccionario con información del script
+            numero: Número del script en la secuencia
+            total: Total de scripts a ejecutar
+            driver: Navegador compartido por todos los descargadores
+
+        Returns:
+            bool: True si fue exitoso, False si falló
+        """
+        nombre = script_info["nombre"]
+        self.imprimir_encabezado_script(script_info, numero, total)
+
+        inicio = datetime.now()
+        try:
+            # Sin ejecutar() el script corre todo su flujo al importarlo
+            if not self.define_ejecutar(script_info["archivo"]):
+                raise RuntimeError(
+                    f"{script_info['archivo']} no define ejecutar(driver_compartido=...); "
+                    "no se puede correr en proceso (use el modo secuencial)"
+                )
+            modulo = importlib.import_module(
+                os.path.splitext(script_info["archivo"])[0]
+            )
+            exitoso = bool(
+                modulo.ejecutar(
+                    driver_compartido=driver, **script_info.get("parametros", {})
+                )
+            )
+            error = None if exitoso else "El descargador terminó con errores"
+        except KeyboardInterrupt:
+            raise
+        except Exception as e:
+            print(f"\n❌ ERROR al ejecutar {nombre}:")
+            print(f"   {str(e)}")
+            traceback.print_exc()
+            exitoso = False
+            error = str(e)
+
+        duracion = (datetime.now() - inicio).total_seconds()
+        if exitoso:
+            print(f"\n✅ {nombre} completado exitosamente")
+            print(f"⏱️  Duración: {duracion:.2f} segundos")
+
+        self.resultados.append(
+            {
+                "orden": numero,
+                "nombre": nombre,
+                "exitoso": exitoso,
+                "duracion": duracion,
+                "error": error,
+            }
+        )
+        return exitoso
+
+    def ejecutar_en_proceso(self):
+        """
+        Ejecuta los descargadores uno tras otro dentro de este proceso, con un
+        solo navegador: el primero inicia sesión y los demás la reutilizan
+
+        Returns:
+            bool: True si todos fueron exitosos, False si alguno falló
+        """
+        self.modo = "en proceso (un solo navegador)"
+        self.imprimir_banner()
+
+        # Los descargadores se importan desde el directorio base y usan
+        # carpetas relativas a él, igual que cuando se lanzan como procesos
+        os.chdir(self.directorio_base)
+        if self.directorio_base not in sys.path:
+            sys.path.insert(0, self.directorio_base)
+        from sesion_erp import crear_navegador
+
+        print("🌐 Iniciando el navegador compartido...")
+        driver = crear_navegador(self.directorio_base)
+        total = len(self.scripts)
+        try:
+            for i, script in enumerate(self.scripts, 1):
+                if not self.ejecutar_modulo(script, i, total, driver):
+                    print(f"\n⚠️  ADVERTENCIA: El script '{script['nombre']}' falló")
+                    print("   Continuando con el siguiente script...\n")
+        finally:
+            driver.quit()
+            print("\n👋 Navegador compartido cerrado")
+
+        return self.finalizar()
+
+    def finalizar(self):
+        """
+        Imprime el resumen y genera el reporte JSON de la ejecución
+
+        Returns:
+            bool: True si todos fueron exitosos, False si alguno falló
+        """
+        # Los resultados quedan en el orden de self.scripts (el resumen y el
+        # reporte los emparejan por posición), aunque terminen en otro orden
+        self.resultados.sort(key=lambda r: r["orden"])
+
         self.imprimir_resumen_final()
 
         # Generar reporte JSON
@@ -404,9 +718,37 @@ class OrquestadorDescargas:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(
+        description="Ejecuta los descargadores de facturas, remisiones y gastos"
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrentes",
+        type=int,
+        default=1,
+        help=(
+            "Scripts ejecutándose en paralelo (por defecto 1 = en secuencia; "
+            "0 = todos a la vez)"
+        ),
+    )
+    parser.add_argument(
+        "--en-proceso",
+        action="store_true",
+        help=(
+            "Ejecuta los descargadores en este proceso con un solo navegador "
+            "y un solo login"
+        ),
+    )
+    argumentos = parser.parse_args()
+
     try:
         orquestador = OrquestadorDescargas()
-        exitoso = orquestador.ejecutar_secuencia()
+        if argumentos.en_proceso:
+            exitoso = orquestador.ejecutar_en_proceso()
+        elif argumentos.concurrentes == 1:
+            exitoso = orquestador.ejecutar_secuencia()
+        else:
+            exitoso = orquestador.ejecutar_concurrente(argumentos.concurrentes or None)
 
         # Código de salida: 0 si todo OK, 1 si hubo fallos
         sys.exit(0 if exitoso else 1)
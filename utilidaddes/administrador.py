@@ -7,11 +7,19 @@ if sys.platform == "win32":
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
 
 import os
+import json
+import time
 import shutil
+import hashlib
 import re
+import random
+import argparse
+import tempfile
+import functools
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Nombres de carpetas origen a buscar
 CARPETAS_ORIGEN_NOMBRES = [
@@ -49,6 +57,30 @@ REGLAS_PREFIJOS = {
 # Patrón especial para notas de crédito (DTE-05 con M001)
 PATRON_NOTA_CREDITO = r"DTE-05-M001"
 
+# Nombre de archivo de DTE: prefijo opcional ('hermaco-'), tipo de DTE y
+# prefijo completo (M001P001, M0030001, ...)
+PATRON_NOMBRE_DTE = re.compile(r"(?:[^-]*-)?DTE-(\d{2})-([MS][^-]+)-")
+
+# Archivos JSON de control que no se distribuyen
+JSON_DE_CONTROL = (
+    "registros_fallidos",
+    "ultimo_",
+    "duplicados",
+    "sin_correlacion",
+    "01descargados",
+    "02ignorados",
+    # Reportes de tiempos guardados antes de la subcarpeta reportes_pasos/
+    "reporte_pasos",
+)
+
+# Copias entre discos distintos: hilos simultáneos y tamaño de bloque
+HILOS_COPIA = 4
+TAMANO_BLOQUE_COPIA = 1024 * 1024
+
+# Ancho de la barra de progreso y segundos entre actualizaciones
+ANCHO_BARRA = 40
+INTERVALO_PROGRESO = 0.2
+
 
 def extraer_prefijo_completo(nombre_archivo):
     """
@@ -107,6 +139,89 @@ def obtener_carpeta_destino(nombre_archivo, prefijo_completo):
     return None
 
 
+def crear_tabla_rutas():
+    """
+    Tabla de ruteo (tipo de DTE, sucursal) -> carpeta destino, armada con
+    REGLAS_PREFIJOS y la regla de notas de crédito. La clave (None,
+    sucursal) vale para cualquier tipo de DTE.
+    """
+    tabla = {(None, sucursal): carpeta for sucursal, carpeta in REGLAS_PREFIJOS.items()}
+    tipo_nota, sucursal_nota = re.match(
+        r"DTE-(\d{2})-([MS]\w{3})", PATRON_NOTA_CREDITO
+    ).groups()
+    tabla[(tipo_nota, sucursal_nota)] = "notas_credito"
+    return tabla
+
+
+TABLA_RUTAS = crear_tabla_rutas()
+
+
+@functools.lru_cache(maxsize=None)
+def clasificar_prefijo(tipo_dte, prefijo_completo):
+    """
+    Carpeta destino y sucursal de un tipo de DTE y prefijo (en caché: hay
+    pocos prefijos distintos y cientos de miles de archivos)
+    """
+    prefijo_sucursal = extraer_prefijo_sucursal(prefijo_completo)
+    carpeta = TABLA_RUTAS.get((tipo_dte, prefijo_sucursal)) or TABLA_RUTAS.get(
+        (None, prefijo_sucursal)
+    )
+    return carpeta, prefijo_sucursal
+
+
+def clasificar_archivo(nombre_archivo):
+    """
+    Clasifica un archivo con una sola búsqueda anclada al inicio del nombre.
+    Los nombres con otra forma usan las funciones de extracción de siempre.
+
+    Returns:
+        tuple: (carpeta destino o None, prefijo de sucursal, prefijo completo)
+    """
+    coincidencia = PATRON_NOMBRE_DTE.match(nombre_archivo)
+    if coincidencia:
+        tipo_dte, prefijo_completo = coincidencia.groups()
+        carpeta, prefijo_sucursal = clasificar_prefijo(tipo_dte, prefijo_completo)
+        return carpeta, prefijo_sucursal, prefijo_completo
+
+    prefijo_completo = extraer_prefijo_completo(nombre_archivo)
+    if not prefijo_completo:
+        return None, None, None
+    return (
+        obtener_carpeta_destino(nombre_archivo, prefijo_completo),
+        extraer_prefijo_sucursal(prefijo_completo),
+        prefijo_completo,
+    )
+
+
+def listar_archivos(carpeta):
+    """
+    Lista una sola vez la carpeta y separa los PDF y los JSON (sin los
+    JSON de control).
+
+    Returns:
+        tuple: (lista de PDF, lista de JSON), cada uno como (nombre, ruta)
+    """
+    archivos_pdf = []
+    archivos_json = []
+    with os.scandir(carpeta) as entradas:
+        for entrada in entradas:
+            nombre = entrada.name
+            extension = nombre[-5:].lower()
+            if nombre.startswith("."):
+                continue
+            if extension.endswith(".pdf"):
+                destino = archivos_pdf
+            elif extension == ".json":
+                if any(control in nombre for control in JSON_DE_CONTROL):
+                    continue
+                destino = archivos_json
+            else:
+                continue
+            if entrada.is_file():
+                destino.append((nombre, entrada.path))
+    return archivos_pdf, archivos_json
+
+
 def configurar_carpetas():
     """
     Solicita al usuario las rutas de carpetas origen y destino
@@ -267,6 +382,238 @@ def mostrar_menu():
             print("⚠️  Opción inválida. Por favor ingrese 1, 2, 3, 4 o 5.")
 
 
+def construir_plan(archivos_para_clasificar, archivos_sin_clasificar_por_carpeta):
+    """
+    Arma el plan de distribución sin tocar ningún archivo.
+
+    Returns:
+        dict: operaciones (origen, destino, carpeta y prefijo de cada
+              archivo), archivos sin clasificar y prefijos no reconocidos
+    """
+    plan = {
+        "operaciones": [],
+        "sin_clasificar": [],
+        "prefijos_desconocidos": defaultdict(int),
+    }
+
+    # Archivos de copia directa (remisiones y gastos)
+    for carpeta_nombre, archivos in archivos_sin_clasificar_por_carpeta.items():
+        carpeta_destino = str(CARPETAS_DESTINO[carpeta_nombre])
+        for nombre_archivo, ruta in archivos:
+            plan["operaciones"].append(
+                {
+                    "origen": ruta,
+                    "destino": os.path.join(carpeta_destino, nombre_archivo),
+                    "carpeta": carpeta_nombre,
+                    "prefijo": None,
+                }
+            )
+
+    # Archivos que requieren clasificación
+    carpetas_destino = {
+        clave: str(carpeta) for clave, carpeta in CARPETAS_DESTINO.items()
+    }
+    for nombre_archivo, ruta in archivos_para_clasificar:
+        carpeta_destino_key, prefijo_sucursal, prefijo_completo = clasificar_archivo(
+            nombre_archivo
+        )
+
+        if not prefijo_completo:
+            # No se pudo extraer prefijo
+            plan["sin_clasificar"].append(nombre_archivo)
+            continue
+
+        if carpeta_destino_key:
+            plan["operaciones"].append(
+                {
+                    "origen": ruta,
+                    "destino": os.path.join(
+                        carpetas_destino[carpeta_destino_key], nombre_archivo
+                    ),
+                    "carpeta": carpeta_destino_key,
+                    "prefijo": prefijo_sucursal,
+                }
+            )
+        else:
+            # Prefijo no reconocido
+            plan["sin_clasificar"].append(nombre_archivo)
+            plan["prefijos_desconocidos"][
+                prefijo_sucursal if prefijo_sucursal else prefijo_completo
+            ] += 1
+
+    return plan
+
+
+def mostrar_progreso(hechos, total, inicio, final=False):
+    """Barra de progreso en una sola línea de la consola."""
+    proporcion = hechos / total if total else 1
+    llenos = int(ANCHO_BARRA * proporcion)
+    barra = "█" * llenos + "░" * (ANCHO_BARRA - llenos)
+    segundos = time.monotonic() - inicio
+    print(
+        f"\r   [{barra}] {proporcion:6.1%} {hechos}/{total} ({segundos:.1f}s)",
+        end="\n" if final else "",
+        flush=True,
+    )
+
+
+def mismo_dispositivo(carpeta_origen, carpeta_destino, cache_dispositivos):
+    """Si las dos carpetas están en el mismo disco (os.replace es un rename)."""
+    clave = (carpeta_origen, carpeta_destino)
+    if clave not in cache_dispositivos:
+        try:
+            cache_dispositivos[clave] = (
+                os.stat(carpeta_origen).st_dev == os.stat(carpeta_destino).st_dev
+            )
+        except OSError:
+            cache_dispositivos[clave] = False
+    return cache_dispositivos[clave]
+
+
+def sha256_archivo(ruta):
+    """SHA-256 de un archivo, leído por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE_COPIA), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def copiar_verificado(origen, destino, mover):
+    """
+    Copia 'origen' a un temporal junto a 'destino' calculando su SHA-256,
+    verifica que el temporal tenga el mismo hash y recién entonces lo deja
+    con su nombre final. Con 'mover', después borra el origen.
+
+    Returns:
+        str: SHA-256 del archivo copiado
+    """
+    temporal = f"{destino}.part"
+    sha = hashlib.sha256()
+    try:
+        with open(origen, "rb") as entrada, open(temporal, "wb") as salida:
+            for bloque in iter(lambda: entrada.read(TAMANO_BLOQUE_COPIA), b""):
+                sha.update(bloque)
+                salida.write(bloque)
+        sha256 = sha.hexdigest()
+
+        if sha256_archivo(temporal) != sha256:
+            raise OSError("El hash de la copia no coincide con el del origen")
+
+        shutil.copystat(origen, temporal)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    if mover:
+        os.remove(origen)
+    return sha256
+
+
+def ejecutar_plan(plan, modo):
+    """
+    Ejecuta las operaciones del plan:
+    - mover dentro del mismo disco: os.replace (sin copiar datos)
+    - mover entre discos y copiar: copia verificada con SHA-256 en un pool
+      de HILOS_COPIA hilos
+
+    Cada operación queda con 'estado' ('movido', 'copiado' o 'error'),
+    'metodo' y, si se copió, 'sha256'.
+    """
+    operaciones = plan["operaciones"]
+    total = len(operaciones)
+    inicio = time.monotonic()
+    ultimo_progreso = 0.0
+    hechos = 0
+    cache_dispositivos = {}
+    copias = []
+
+    def terminar():
+        nonlocal hechos, ultimo_progreso
+        hechos += 1
+        ahora = time.monotonic()
+        if ahora - ultimo_progreso >= INTERVALO_PROGRESO:
+            ultimo_progreso = ahora
+            mostrar_progreso(hechos, total, inicio)
+
+    # Primero los renombres dentro del mismo disco (inmediatos)
+    for operacion in operaciones:
+        origen, destino = operacion["origen"], operacion["destino"]
+        if modo == "mover" and mismo_dispositivo(
+            os.path.dirname(origen), os.path.dirname(destino), cache_dispositivos
+        ):
+            operacion["metodo"] = "replace"
+            try:
+                os.replace(origen, destino)
+                operacion["estado"] = "movido"
+            except OSError as e:
+                operacion["estado"] = "error"
+                operacion["error"] = str(e)
+            terminar()
+        else:
+            operacion["metodo"] = "copia_verificada"
+            copias.append(operacion)
+
+    # Después las copias, con un número acotado de hilos
+    if copias:
+        with ThreadPoolExecutor(max_workers=HILOS_COPIA) as executor:
+            futuros = {
+                executor.submit(
+                    copiar_verificado,
+                    operacion["origen"],
+                    operacion["destino"],
+                    modo == "mover",
+                ): operacion
+                for operacion in copias
+            }
+            for futuro in as_completed(futuros):
+                operacion = futuros[futuro]
+                try:
+                    operacion["sha256"] = futuro.result()
+                    operacion["estado"] = "movido" if modo == "mover" else "copiado"
+                except Exception as e:
+                    operacion["estado"] = "error"
+                    operacion["error"] = str(e)
+                terminar()
+
+    mostrar_progreso(hechos, total, inicio, final=True)
+
+
+def guardar_manifiesto_distribucion(plan, modo, timestamp):
+    """
+    Guarda el plan (y el resultado de cada operación) en
+    'manifiesto_distribucion_<fecha>.json'.
+
+    Returns:
+        str: Ruta del manifiesto
+    """
+    archivo_manifiesto = f"manifiesto_distribucion_{timestamp}.json"
+    operaciones = [
+        {
+            **operacion,
+            "estado": operacion.get("estado", "planificado"),
+        }
+        for operacion in plan["operaciones"]
+    ]
+    with open(archivo_manifiesto, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "fecha": datetime.now().isoformat(),
+                "modo": modo,
+                "total_operaciones": len(operaciones),
+                "operaciones": operaciones,
+                "sin_clasificar": plan["sin_clasificar"],
+                "prefijos_desconocidos": dict(plan["prefijos_desconocidos"]),
+            },
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
+    return archivo_manifiesto
+
+
 def distribuir_archivos(modo="mover"):
     """
     Distribuye los archivos PDF y JSON según sus prefijos
@@ -301,23 +648,8 @@ def distribuir_archivos(modo="mover"):
     for carpeta_origen in CARPETAS_ORIGEN:
         print(f"\n📂 Procesando: {carpeta_origen.name}")
 
-        # Obtener todos los archivos PDF y JSON
-        archivos_pdf = list(carpeta_origen.glob("*.pdf"))
-        archivos_json = list(carpeta_origen.glob("*.json"))
-
-        # Filtrar archivos JSON que no sean de reporte
-        archivos_json_validos = [
-            f
-            for f in archivos_json
-            if not (
-                "registros_fallidos" in f.name
-                or "ultimo_" in f.name
-                or "duplicados" in f.name
-                or "sin_correlacion" in f.name
-                or "01descargados" in f.name
-                or "02ignorados" in f.name
-            )
-        ]
+        # Obtener todos los archivos PDF y JSON (sin los JSON de control)
+        archivos_pdf, archivos_json_validos = listar_archivos(carpeta_origen)
 
         carpeta_archivos = archivos_pdf + archivos_json_validos
 
@@ -366,6 +698,32 @@ def distribuir_archivos(modo="mover"):
             print(f"\n❌ Operación cancelada por el usuario")
             return
 
+    # Plan completo antes de tocar archivos (el modo reporte solo lo muestra)
+    plan = construir_plan(archivos_para_clasificar, archivos_sin_clasificar_por_carpeta)
+    archivos_sin_clasificar = plan["sin_clasificar"]
+    prefijos_desconocidos = plan["prefijos_desconocidos"]
+
+    print(f"\n🗺️  Plan: {len(plan['operaciones'])} archivos a distribuir")
+    print(f"   ⚠️  Sin clasificar: {len(archivos_sin_clasificar)}")
+
+    if modo != "reporte" and plan["operaciones"]:
+        print(f"\n🔄 Procesando archivos...")
+        ejecutar_plan(plan, modo)
+
+        errores_operacion = [
+            operacion
+            for operacion in plan["operaciones"]
+            if operacion["estado"] == "error"
+        ]
+        for operacion in errores_operacion[:20]:
+            print(
+                f"   ❌ Error al procesar {os.path.basename(operacion['origen'])}: {operacion['error']}"
+            )
+        if len(errores_operacion) > 20:
+            print(
+                f"   ... y {len(errores_operacion) - 20} errores más (ver manifiesto)"
+            )
+
     # Contadores y estadísticas
     estadisticas = {
         "SS": 0,
@@ -374,114 +732,19 @@ def distribuir_archivos(modo="mover"):
         "notas_credito": 0,
         "descargas_remisiones": 0,
         "descargas_gastos": 0,
-        "sin_clasificar": 0,
+        "sin_clasificar": len(archivos_sin_clasificar),
         "errores": 0,
     }
-
-    archivos_sin_clasificar = []
-    prefijos_desconocidos = defaultdict(int)
-
-    print(f"\n🔄 Procesando archivos...")
-    print("-" * 80)
-
-    # PARTE 1: Procesar archivos sin clasificar (copia directa)
-    if archivos_sin_clasificar_por_carpeta:
-        print(f"\n📦 PROCESANDO ARCHIVOS DE COPIA DIRECTA...")
-        print("-" * 80)
-
-        for carpeta_nombre, archivos in archivos_sin_clasificar_por_carpeta.items():
-            carpeta_destino = CARPETAS_DESTINO[carpeta_nombre]
-            print(f"\n📂 Carpeta: {carpeta_nombre} -> {carpeta_nombre}")
-            print(f"   Archivos: {len(archivos)}")
-
-            for archivo in archivos:
-                nombre_archivo = archivo.name
-                ruta_destino = carpeta_destino / nombre_archivo
-
-                try:
-                    if modo == "mover":
-                        shutil.move(str(archivo), str(ruta_destino))
-                        print(f"   ✓ Movido: {nombre_archivo}")
-                    elif modo == "copiar":
-                        shutil.copy2(str(archivo), str(ruta_destino))
-                        print(f"   ✓ Copiado: {nombre_archivo}")
-                    else:  # modo reporte
-                        print(f"   📋 {nombre_archivo} -> {carpeta_nombre}")
-
-                    estadisticas[carpeta_nombre] += 1
-
-                except Exception as e:
-                    print(f"   ❌ Error al procesar {nombre_archivo}: {e}")
-                    estadisticas["errores"] += 1
-
-    # PARTE 2: Procesar archivos que requieren clasificación
-    if archivos_para_clasificar:
-        print(f"\n🔍 PROCESANDO ARCHIVOS CON CLASIFICACIÓN...")
-        print("-" * 80)
-
-        for archivo in archivos_para_clasificar:
-            nombre_archivo = archivo.name
-
-            # Extraer prefijo completo
-            prefijo_completo = extraer_prefijo_completo(nombre_archivo)
-
-            if not prefijo_completo:
-                # No se pudo extraer prefijo
-                archivos_sin_clasificar.append(nombre_archivo)
-                estadisticas["sin_clasificar"] += 1
-                print(f"⚠️  Sin prefijo: {nombre_archivo}")
-                continue
-
-            # Extraer prefijo de sucursal (primeros 4 caracteres)
-            prefijo_sucursal = extraer_prefijo_sucursal(prefijo_completo)
-
-            # Obtener carpeta destino
-            carpeta_destino_key = obtener_carpeta_destino(
-                nombre_archivo, prefijo_completo
-            )
-
-            if carpeta_destino_key:
-                carpeta_destino = CARPETAS_DESTINO[carpeta_destino_key]
-
-                # Mover o copiar el archivo
-                ruta_destino = carpeta_destino / nombre_archivo
-
-                try:
-                    if modo == "mover":
-                        shutil.move(str(archivo), str(ruta_destino))
-                        print(
-                            f"✓ Movido: {nombre_archivo} -> {carpeta_destino_key} [{prefijo_sucursal}]"
-                        )
-                    elif modo == "copiar":
-                        shutil.copy2(str(archivo), str(ruta_destino))
-                        print(
-                            f"✓ Copiado: {nombre_archivo} -> {carpeta_destino_key} [{prefijo_sucursal}]"
-                        )
-                    else:  # modo reporte
-                        print(
-                            f"📋 {nombre_archivo} -> {carpeta_destino_key} [{prefijo_sucursal}]"
-                        )
-
-                    estadisticas[carpeta_destino_key] += 1
-
-                except Exception as e:
-                    print(f"❌ Error al procesar {nombre_archivo}: {e}")
-                    estadisticas["errores"] += 1
-
-            else:
-                # Prefijo no reconocido
-                archivos_sin_clasificar.append(nombre_archivo)
-                prefijos_desconocidos[
-                    prefijo_sucursal if prefijo_sucursal else prefijo_completo
-                ] += 1
-                estadisticas["sin_clasificar"] += 1
-                print(
-                    f"⚠️  Prefijo no reconocido [{prefijo_sucursal}] (completo: {prefijo_completo}): {nombre_archivo}"
-                )
+    for operacion in plan["operaciones"]:
+        if operacion.get("estado") == "error":
+            estadisticas["errores"] += 1
+        else:
+            estadisticas[operacion["carpeta"]] += 1
 
     # Generar reporte
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     archivo_reporte = f"reporte_distribucion_{timestamp}.txt"
+    archivo_manifiesto = guardar_manifiesto_distribucion(plan, modo, timestamp)
 
     # Obtener nombres de carpetas origen para el reporte
     nombres_carpetas_origen = [str(carpeta.name) for carpeta in CARPETAS_ORIGEN]
@@ -569,9 +832,71 @@ def distribuir_archivos(modo="mover"):
             print(f"     • {prefijo}: {cantidad} archivo(s)")
 
     print(f"\n📄 Reporte guardado en: {archivo_reporte}")
+    print(f"🧾 Manifiesto de la distribución: {archivo_manifiesto}")
     print("=" * 80)
 
 
+def clasificar_archivo_anterior(nombre_archivo):
+    """Clasificación paso a paso (referencia para el benchmark)."""
+    prefijo_completo = extraer_prefijo_completo(nombre_archivo)
+    if not prefijo_completo:
+        return None, None, None
+    prefijo_sucursal = extraer_prefijo_sucursal(prefijo_completo)
+    carpeta = obtener_carpeta_destino(nombre_archivo, prefijo_completo)
+    return carpeta, prefijo_sucursal, prefijo_completo
+
+
+def benchmark_clasificador(cantidad):
+    """
+    Compara el listado con glob + clasificación paso a paso contra el listado
+    con scandir + clasificador de una pasada, en una carpeta sintética
+    """
+    azar = random.Random(0)
+    prefijos = list(REGLAS_PREFIJOS) + ["M004", "S003"]
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        print(f"🧪 Creando carpeta sintética con {cantidad} archivos...")
+        for numero in range(cantidad // 2):
+            tipo = azar.choice(["01", "01", "03", "05", "14"])
+            prefijo = azar.choice(prefijos) + f"P{azar.randint(1, 3):03d}"
+            base = f"hermaco-DTE-{tipo}-{prefijo}-{numero:015d}"
+            for extension in (".pdf", ".json"):
+                open(os.path.join(carpeta, base + extension), "wb").close()
+
+        carpeta_path = Path(carpeta)
+        inicio = time.perf_counter()
+        anteriores = {}
+        for archivo in list(carpeta_path.glob("*.pdf")) + list(
+            carpeta_path.glob("*.json")
+        ):
+            if any(control in archivo.name for control in JSON_DE_CONTROL):
+                continue
+            anteriores[archivo.name] = clasificar_archivo_anterior(archivo.name)
+        segundos_anterior = time.perf_counter() - inicio
+
+        clasificar_prefijo.cache_clear()
+        inicio = time.perf_counter()
+        nuevos = {}
+        archivos_pdf, archivos_json = listar_archivos(carpeta)
+        for nombre, _ in archivos_pdf + archivos_json:
+            nuevos[nombre] = clasificar_archivo(nombre)
+        segundos_nuevo = time.perf_counter() - inicio
+
+    if anteriores != nuevos:
+        print("❌ El clasificador de una pasada no coincide con el anterior")
+        return False
+
+    print(f"\n📊 RESULTADOS ({cantidad} archivos)")
+    print(f"   glob + clasificación paso a paso: {segundos_anterior:7.3f}s")
+    print(f"   scandir + tabla de ruteo:         {segundos_nuevo:7.3f}s")
+    print(f"   🚀 Aceleración: {segundos_anterior / segundos_nuevo:.1f}x")
+    print(
+        f"   ✓ Misma carpeta para todos los archivos "
+        f"({clasificar_prefijo.cache_info().currsize} prefijos en caché)"
+    )
+    return True
+
+
 def main():
     """
     Función principal
@@ -610,4 +935,15 @@ def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Administrador de facturas HERMACO")
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Medir el clasificador en una carpeta sintética",
+    )
+    parser.add_argument("--archivos", type=int, default=500000)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        sys.exit(0 if benchmark_clasificador(args.archivos) else 1)
     main()